@@ -0,0 +1,121 @@
+"""
+Async database access for the async route handlers
+asyncpg-backed AsyncSession dependency plus a bounded thread pool for the blocking work (pandas, pyodbc) they still do
+"""
+import asyncio
+import functools
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from sqlalchemy import DateTime, literal
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from database_config import (
+    POSTGRES_DATABASE_URL, ASYNC_DB_POOL_SIZE, ASYNC_DB_MAX_OVERFLOW, BLOCKING_POOL_WORKERS
+)
+
+logger = logging.getLogger(__name__)
+
+ASYNC_DATABASE_URL = POSTGRES_DATABASE_URL.replace("postgresql://", "postgresql+asyncpg://", 1)
+
+# Same pool behaviour and statement timeout as the sync engine in main.py
+async_engine = create_async_engine(
+    ASYNC_DATABASE_URL,
+    pool_size=ASYNC_DB_POOL_SIZE,
+    max_overflow=ASYNC_DB_MAX_OVERFLOW,
+    pool_pre_ping=True,
+    pool_recycle=300,
+    pool_timeout=30,
+    connect_args={"server_settings": {"statement_timeout": "300000"}}
+)
+AsyncSessionLocal = async_sessionmaker(async_engine, class_=AsyncSession, expire_on_commit=False, autoflush=False)
+
+
+async def get_async_db():
+    """FastAPI dependency: AsyncSession for async def handlers (get_db is for sync handlers)"""
+    async with AsyncSessionLocal() as db:
+        try:
+            yield db
+        except Exception as e:
+            logger.error(f"Database error: {str(e)}")
+            await db.rollback()
+            raise
+
+
+def bind_datetime(value):
+    """Bind a datetime the way psycopg2 did: timestamptz when aware, timestamp when naive (asyncpg is strict)"""
+    return literal(value, DateTime(timezone=value.tzinfo is not None))
+
+
+class BlockingPool:
+    """Bounded thread pool for blocking calls made from async handlers, with queue/latency counters"""
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="blocking")
+        self._lock = threading.Lock()
+        self._submitted = 0
+        self._completed = 0
+        self._running = 0
+        self._max_queue_wait = 0.0
+        self._total_queue_wait = 0.0
+        self._total_run_time = 0.0
+
+    def _call(self, func: Callable, submitted_at: float):
+        started_at = time.perf_counter()
+        queue_wait = started_at - submitted_at
+        with self._lock:
+            self._running += 1
+            self._total_queue_wait += queue_wait
+            self._max_queue_wait = max(self._max_queue_wait, queue_wait)
+        try:
+            return func()
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._completed += 1
+                self._total_run_time += time.perf_counter() - started_at
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """Run func(*args, **kwargs) on the pool and await its result without blocking the event loop"""
+        with self._lock:
+            self._submitted += 1
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self.executor, self._call, functools.partial(func, *args, **kwargs), time.perf_counter()
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            completed = self._completed
+            return {
+                "max_workers": self.max_workers,
+                "running": self._running,
+                "queued": self._submitted - self._completed - self._running,
+                "completed": completed,
+                "avg_queue_wait_ms": round(self._total_queue_wait / completed * 1000, 2) if completed else 0.0,
+                "max_queue_wait_ms": round(self._max_queue_wait * 1000, 2),
+                "avg_run_time_ms": round(self._total_run_time / completed * 1000, 2) if completed else 0.0,
+            }
+
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+
+def get_async_pool_stats() -> Dict[str, Any]:
+    """Connection usage of the async engine's pool"""
+    pool = async_engine.sync_engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "checked_in": pool.checkedin(),
+    }
+
+
+# Global instance
+blocking_pool = BlockingPool(BLOCKING_POOL_WORKERS)
+run_blocking = blocking_pool.run
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+EXPLAIN benchmark for the hot-path index pack (migrations/versions)
+Runs each hot query shape and reports which index the planner picks: python benchmark_indexes.py [--analyze] [--no-seqscan]
+"""
+
+import sys
+import json
+import argparse
+import logging
+from datetime import timedelta
+
+from sqlalchemy import create_engine, text
+
+from database_config import POSTGRES_DATABASE_URL
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# (name, expected index, query) - query shapes taken from the endpoints that run them
+BENCHMARKS = [
+    ("PIC upload counts", "idx_uploaded_orders_pic_upload_date", """
+        SELECT COUNT(*) FROM uploaded_orders WHERE "PIC" = :pic AND "UploadDate" >= :since
+    """),
+    ("Brand/batch/PIC orders", "idx_uploaded_orders_brand_batch_pic", """
+        SELECT "Id", "InterfaceStatus" FROM uploaded_orders
+        WHERE "Brand" = :brand AND "Batch" = :batch AND "PIC" = :pic
+    """),
+    ("Interface status by date", "idx_uploaded_orders_interface_status_upload_date", """
+        SELECT COUNT(*) FROM uploaded_orders WHERE "InterfaceStatus" = 'Interface' AND "UploadDate" >= :since
+    """),
+    ("Orders uploaded today", "idx_uploaded_orders_upload_day", """
+        SELECT COUNT(*) FROM uploaded_orders WHERE date("UploadDate") = :day
+    """),
+    ("Shop id by brand", "idx_brand_shops_lower_brand_marketplace", """
+        SELECT * FROM brand_shops WHERE lower(brand) = lower(:shop_brand) AND marketplace_id = :marketplace_id LIMIT 1
+    """),
+]
+
+
+def sample_params(conn):
+    """Realistic parameter values taken from the newest data"""
+    latest = conn.execute(text("""
+        SELECT "PIC", "Brand", "Batch", "UploadDate" FROM uploaded_orders ORDER BY "Id" DESC LIMIT 1
+    """)).fetchone()
+    shop = conn.execute(text("""
+        SELECT brand, marketplace_id FROM brand_shops WHERE brand IS NOT NULL ORDER BY id LIMIT 1
+    """)).fetchone()
+    if not latest:
+        raise RuntimeError("uploaded_orders is empty - nothing to benchmark")
+    return {
+        "pic": latest[0],
+        "brand": latest[1],
+        "batch": latest[2],
+        "since": latest[3] - timedelta(days=7),
+        "day": latest[3].date(),
+        "shop_brand": shop[0] if shop else latest[1],
+        "marketplace_id": shop[1] if shop else 2,
+    }
+
+
+def used_indexes(plan):
+    """All index names referenced anywhere in an EXPLAIN (FORMAT JSON) plan tree"""
+    found = []
+    if plan.get("Index Name"):
+        found.append(plan["Index Name"])
+    for child in plan.get("Plans", []):
+        found.extend(used_indexes(child))
+    return found
+
+
+def run_benchmarks(analyze: bool, no_seqscan: bool) -> bool:
+    engine = create_engine(POSTGRES_DATABASE_URL)
+    all_chosen = True
+    with engine.connect() as conn:
+        params = sample_params(conn)
+        logger.info(f"📋 Sample parameters: {params}")
+        if no_seqscan:
+            # Proves the index is usable for the query shape even on a small dev database
+            conn.execute(text("SET enable_seqscan = off"))
+
+        explain = "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON)" if analyze else "EXPLAIN (FORMAT JSON)"
+        for name, expected_index, query in BENCHMARKS:
+            result = conn.execute(text(f"{explain} {query}"), params).scalar()
+            if isinstance(result, str):
+                result = json.loads(result)
+            plan = result[0]["Plan"]
+            indexes = used_indexes(plan)
+            chosen = expected_index in indexes
+            all_chosen = all_chosen and chosen
+
+            timing = f", {result[0]['Execution Time']:.2f} ms" if analyze else ""
+            marker = "✅" if chosen else "❌"
+            logger.info(
+                f"{marker} {name}: {plan['Node Type']} using {', '.join(indexes) or 'no index'} "
+                f"(expected {expected_index}, cost {plan['Total Cost']:.1f}{timing})"
+            )
+        conn.rollback()
+    return all_chosen
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Show which index the planner chooses for each hot query")
+    parser.add_argument("--analyze", action="store_true", help="Use EXPLAIN ANALYZE (executes the queries)")
+    parser.add_argument("--no-seqscan", action="store_true", help="Disable sequential scans for the session")
+    args = parser.parse_args()
+
+    logger.info("🚀 Running index benchmark...")
+    if run_benchmarks(args.analyze, args.no_seqscan):
+        logger.info("🎉 Every query uses its index")
+    else:
+        logger.warning("⚠️ Some queries do not use their index (run 'alembic upgrade head', or try --no-seqscan on small data)")
+        sys.exit(1)
@@ -0,0 +1,177 @@
+"""
+clean_orders table maintenance
+Keeps clean_orders (newest upload per OrderNumber) in sync with uploaded_orders through statement-level triggers
+"""
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# pg advisory lock key: only one uvicorn worker sets up / rebuilds clean_orders at a time
+CLEAN_ORDERS_LOCK_KEY = 7_311_804
+
+CLEAN_ORDER_COLUMNS = [
+    "Id", "Marketplace", "Brand", "OrderNumber", "OrderStatus", "AWB", "Transporter",
+    "OrderDate", "SLA", "Batch", "PIC", "UploadDate", "Remarks", "InterfaceStatus", "TaskId",
+    "OrderNumberFlexo", "OrderStatusFlexo", "NormalizedOrderStatus", "IsCancelled"
+]
+
+# Columns added after clean_orders was first created: added in place and backfilled from uploaded_orders
+ADDED_COLUMNS = {
+    "NormalizedOrderStatus": "TEXT",
+    "IsCancelled": "BOOLEAN",
+}
+
+_COLUMN_LIST = ", ".join(f'"{column}"' for column in CLEAN_ORDER_COLUMNS)
+_UPDATE_LIST = ", ".join(f'"{column}" = EXCLUDED."{column}"' for column in CLEAN_ORDER_COLUMNS if column != "OrderNumber")
+
+# Newest upload per order from any row source (uploaded_orders or a trigger transition table)
+_NEWEST_PER_ORDER = f"""
+    SELECT DISTINCT ON ("OrderNumber") {_COLUMN_LIST}
+    FROM {{source}}
+    WHERE "OrderNumber" IS NOT NULL {{condition}}
+    ORDER BY "OrderNumber", "UploadDate" DESC
+"""
+
+INDEX_STATEMENTS = [
+    'CREATE UNIQUE INDEX IF NOT EXISTS idx_clean_orders_id ON clean_orders ("Id")',
+    'CREATE INDEX IF NOT EXISTS idx_clean_orders_upload_date ON clean_orders ("UploadDate" DESC, "Id" DESC)',
+    'CREATE INDEX IF NOT EXISTS idx_clean_orders_pic ON clean_orders ("PIC", "UploadDate")',
+    'CREATE INDEX IF NOT EXISTS idx_clean_orders_batch ON clean_orders ("Batch", "UploadDate")',
+    'CREATE INDEX IF NOT EXISTS idx_clean_orders_marketplace_brand ON clean_orders ("Marketplace", "Brand")',
+    'CREATE INDEX IF NOT EXISTS idx_clean_orders_interface_status ON clean_orders ("InterfaceStatus")',
+    'CREATE INDEX IF NOT EXISTS idx_clean_orders_not_cancelled ON clean_orders ("UploadDate" DESC, "Id" DESC) WHERE NOT "IsCancelled"',
+]
+
+_PROMOTE_DELETED = _NEWEST_PER_ORDER.format(
+    source="uploaded_orders", condition='AND "OrderNumber" IN (SELECT "OrderNumber" FROM old_rows)'
+)
+_NEWEST_CHANGED = _NEWEST_PER_ORDER.format(source="new_rows", condition="")
+
+# One function for all triggers; each trigger exposes only the transition tables its event has
+SYNC_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION sync_clean_orders() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        TRUNCATE clean_orders;
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'DELETE' THEN
+        DELETE FROM clean_orders c USING old_rows o WHERE c."Id" = o."Id";
+        -- Promote the next newest upload of a deleted order, if there is one
+        INSERT INTO clean_orders ({_COLUMN_LIST})
+        {_PROMOTE_DELETED}
+        ON CONFLICT ("OrderNumber") DO NOTHING;
+        RETURN NULL;
+    END IF;
+
+    IF TG_OP = 'UPDATE' THEN
+        -- A row whose OrderNumber changed no longer represents its old order
+        DELETE FROM clean_orders c USING new_rows n
+        WHERE c."Id" = n."Id" AND c."OrderNumber" IS DISTINCT FROM n."OrderNumber";
+    END IF;
+
+    INSERT INTO clean_orders ({_COLUMN_LIST})
+    {_NEWEST_CHANGED}
+    ON CONFLICT ("OrderNumber") DO UPDATE SET {_UPDATE_LIST}
+    WHERE clean_orders."Id" = EXCLUDED."Id"
+       OR clean_orders."UploadDate" IS NULL
+       OR EXCLUDED."UploadDate" >= clean_orders."UploadDate";
+    RETURN NULL;
+END;
+$$
+"""
+
+TRIGGER_STATEMENTS = {
+    "trg_clean_orders_insert": """
+        CREATE TRIGGER trg_clean_orders_insert AFTER INSERT ON uploaded_orders
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION sync_clean_orders()
+    """,
+    "trg_clean_orders_update": """
+        CREATE TRIGGER trg_clean_orders_update AFTER UPDATE ON uploaded_orders
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION sync_clean_orders()
+    """,
+    "trg_clean_orders_delete": """
+        CREATE TRIGGER trg_clean_orders_delete AFTER DELETE ON uploaded_orders
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION sync_clean_orders()
+    """,
+    "trg_clean_orders_truncate": """
+        CREATE TRIGGER trg_clean_orders_truncate AFTER TRUNCATE ON uploaded_orders
+        FOR EACH STATEMENT EXECUTE FUNCTION sync_clean_orders()
+    """,
+}
+
+
+def _fill_clean_orders(conn) -> int:
+    result = conn.execute(text(
+        f"INSERT INTO clean_orders ({_COLUMN_LIST}) "
+        + _NEWEST_PER_ORDER.format(source="uploaded_orders", condition="")
+        + ' ON CONFLICT ("OrderNumber") DO NOTHING'
+    ))
+    return result.rowcount
+
+
+def ensure_clean_orders_table(engine):
+    """Replace the old clean_orders view with the trigger-maintained table (backfilled once)"""
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": CLEAN_ORDERS_LOCK_KEY})
+
+            relkind = conn.execute(text(
+                "SELECT relkind FROM pg_class WHERE oid = to_regclass('clean_orders')"
+            )).scalar()
+            created = relkind != 'r'
+            if relkind == 'v':
+                conn.execute(text("DROP VIEW clean_orders"))
+            if created:
+                conn.execute(text(f"CREATE TABLE clean_orders AS SELECT {_COLUMN_LIST} FROM uploaded_orders WITH NO DATA"))
+                conn.execute(text('ALTER TABLE clean_orders ADD PRIMARY KEY ("OrderNumber")'))
+            else:
+                existing_columns = {row[0] for row in conn.execute(text("""
+                    SELECT column_name FROM information_schema.columns WHERE table_name = 'clean_orders'
+                """))}
+                missing = [column for column in ADDED_COLUMNS if column not in existing_columns]
+                for column in missing:
+                    conn.execute(text(f'ALTER TABLE clean_orders ADD COLUMN "{column}" {ADDED_COLUMNS[column]}'))
+                if missing:
+                    conn.execute(text(
+                        "UPDATE clean_orders c SET "
+                        + ", ".join(f'"{column}" = u."{column}"' for column in missing)
+                        + ' FROM uploaded_orders u WHERE c."Id" = u."Id"'
+                    ))
+
+            for statement in INDEX_STATEMENTS:
+                conn.execute(text(statement))
+
+            conn.execute(text(SYNC_FUNCTION))
+            existing = {row[0] for row in conn.execute(text("""
+                SELECT tgname FROM pg_trigger
+                WHERE tgrelid = 'uploaded_orders'::regclass AND NOT tgisinternal
+            """))}
+            for name, statement in TRIGGER_STATEMENTS.items():
+                if name not in existing:
+                    conn.execute(text(statement))
+
+            # The triggers hold a lock on uploaded_orders until commit, so no write is missed
+            if created:
+                filled = _fill_clean_orders(conn)
+                print(f"✅ clean_orders table created and backfilled with {filled} orders")
+    except Exception as e:
+        logger.error(f"clean_orders table setup failed: {e}")
+
+
+def rebuild_clean_orders(db: Session) -> int:
+    """Rebuild clean_orders from uploaded_orders (repair tool; the triggers keep it in sync normally)"""
+    db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": CLEAN_ORDERS_LOCK_KEY})
+    db.execute(text("LOCK TABLE uploaded_orders IN SHARE MODE"))
+    db.execute(text("TRUNCATE clean_orders"))
+    filled = _fill_clean_orders(db)
+    db.commit()
+    return filled
@@ -0,0 +1,54 @@
+"""
+Conditional GET for polled read endpoints
+ETags derived from the response cache's dataset versions; a matching If-None-Match is answered with 304 before the handler queries anything
+"""
+import hashlib
+from datetime import datetime, timedelta, timezone
+from typing import Iterable
+
+from fastapi import HTTPException, Request, Response
+
+from response_cache import response_cache
+
+# Views behind some endpoints count "today" (CURRENT_DATE), so the WIB date is part of every ETag
+WIB = timezone(timedelta(hours=7))
+
+
+def data_etag(request: Request, tags: Iterable[str]) -> str:
+    """Weak ETag of the response to this request: path, query and the versions of the datasets it reads
+
+    Every committed write bumps its datasets' versions (response_cache.invalidate), so the ETag
+    changes exactly when the data behind the response can have changed.
+    """
+    versions = response_cache.tag_versions(sorted(set(tags)))
+    raw = "|".join([
+        request.url.path,
+        "&".join(sorted(f"{name}={value}" for name, value in request.query_params.multi_items())),
+        datetime.now(WIB).date().isoformat(),
+        *(f"{tag}={version}" for tag, version in versions.items()),
+    ])
+    return f'W/"{hashlib.md5(raw.encode()).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    # Weak comparison: W/"x" and "x" are the same validator
+    return "*" in candidates or etag.removeprefix("W/") in (candidate.removeprefix("W/") for candidate in candidates)
+
+
+def conditional_get(*tags: str):
+    """FastAPI dependency: 304 when If-None-Match matches the current ETag, otherwise sets ETag on the response
+
+    Declare it after the authentication dependency so unauthenticated requests still get 401.
+    """
+    def dependency(request: Request, response: Response):
+        etag = data_etag(request, tags)
+        headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+        if etag_matches(request.headers.get("if-none-match", ""), etag):
+            # Starlette sends 304 without a body
+            raise HTTPException(status_code=304, headers=headers)
+        response.headers.update(headers)
+
+    return dependency
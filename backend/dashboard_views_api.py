@@ -15,28 +15,16 @@ import sys
 import os
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+# Sessions come from the shared reporting pool. main imports this module while it is still
+# initializing, so importing get_db from main here would fail and fall back to a private engine
+from db_registry import get_reporting_db as get_db
+from single_flight import single_flight
+from conditional_get import conditional_get
+
 try:
-    from main import get_db, get_current_user, get_wib_now
+    from main import get_current_user, get_wib_now
 except ImportError:
     # For direct execution or if modules don't exist
-    def get_db():
-        # Create database session directly
-        from sqlalchemy import create_engine
-        from sqlalchemy.orm import sessionmaker
-        import os
-        
-        # Database connection
-        postgres_host = os.getenv("POSTGRES_HOST", "localhost")
-        postgres_port = os.getenv("POSTGRES_PORT", "5432")
-        postgres_db = os.getenv("POSTGRES_DB", "sweeping_apps")
-        postgres_user = os.getenv("POSTGRES_USER", "sweeping_user")
-        postgres_password = os.getenv("POSTGRES_PASSWORD", "sweeping_password")
-        
-        database_url = f"postgresql://{postgres_user}:{postgres_password}@{postgres_host}:{postgres_port}/{postgres_db}"
-        engine = create_engine(database_url)
-        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-        return SessionLocal()
-    
     def get_current_user():
         # Mock current user - replace with actual implementation
         return "admin"
@@ -52,10 +40,26 @@ logger = logging.getLogger(__name__)
 # Create router for dashboard views API
 router = APIRouter(prefix="/api/dashboard", tags=["dashboard-views"])
 
+# Date-range statistics are sums over order_daily_rollup (see order_rollup.py), so they cost the same
+# whatever the order volume. Rollup rows are per upload hour: a range covers every hour it touches.
+ROLLUP_RANGE = """
+    day >= CAST(:start_date AS date) AND day <= CAST(:end_date AS date)
+    AND day + hour * INTERVAL '1 hour' >= date_trunc('hour', CAST(:start_date AS timestamp))
+    AND day + hour * INTERVAL '1 hour' <= :end_date
+    AND order_count > 0
+"""
+ORDERS_SUM = "COALESCE(SUM(order_count), 0)::bigint"
+INTERFACED_SUM = "COALESCE(SUM(order_count) FILTER (WHERE interface_status = 'Interface'), 0)::bigint"
+# interface_status '' is a NULL InterfaceStatus, which "!= 'Interface'" never counted
+NOT_INTERFACED_SUM = "COALESCE(SUM(order_count) FILTER (WHERE interface_status NOT IN ('Interface', '')), 0)::bigint"
+INTERFACE_RATE = f"ROUND({INTERFACED_SUM} * 100.0 / NULLIF(SUM(order_count), 0), 2)"
+RANGE_TOTAL = f"(SELECT SUM(order_count) FROM order_daily_rollup WHERE {ROLLUP_RANGE})"
+
 @router.get("/stats")
 def get_dashboard_stats_optimized(
     start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
     end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
+    not_modified: None = Depends(conditional_get("orders", "dashboard")),
     db: Session = Depends(get_db)
 ):
     """
@@ -120,23 +124,20 @@ def get_dashboard_stats_optimized(
                 end_datetime = end_datetime.astimezone(wib).replace(tzinfo=None)
             
             # Use date-filtered query
-            stats_query = text("""
+            stats_query = text(f"""
                 SELECT 
-                    COUNT(*) as total_orders,
-                    COUNT(CASE WHEN "InterfaceStatus" = 'Interface' THEN 1 END) as interface_orders,
-                    COUNT(CASE WHEN "InterfaceStatus" != 'Interface' THEN 1 END) as not_interface_orders,
-                    ROUND(
-                        COUNT(CASE WHEN "InterfaceStatus" = 'Interface' THEN 1 END) * 100.0 / 
-                        NULLIF(COUNT(*), 0), 2
-                    ) as interface_rate,
-                    COUNT(*) as today_orders,
-                    COUNT(*) as recent_orders,
-                    COUNT(*) as yesterday_orders,
-                    COUNT(*) as last_30_days_orders,
-                    MAX("UploadDate") as last_data_date,
+                    {ORDERS_SUM} as total_orders,
+                    {INTERFACED_SUM} as interface_orders,
+                    {NOT_INTERFACED_SUM} as not_interface_orders,
+                    {INTERFACE_RATE} as interface_rate,
+                    {ORDERS_SUM} as today_orders,
+                    {ORDERS_SUM} as recent_orders,
+                    {ORDERS_SUM} as yesterday_orders,
+                    {ORDERS_SUM} as last_30_days_orders,
+                    MAX(last_upload_at) as last_data_date,
                     CURRENT_TIMESTAMP as last_updated
-                FROM uploaded_orders
-                WHERE "UploadDate" >= :start_date AND "UploadDate" <= :end_date
+                FROM order_daily_rollup
+                WHERE {ROLLUP_RANGE}
             """)
             
             result = db.execute(stats_query, {
@@ -169,17 +170,17 @@ def get_dashboard_stats_optimized(
         
         # Get brand distribution (with date filter if provided)
         if start_datetime and end_datetime:
-            brand_query = text("""
+            brand_query = text(f"""
                 SELECT 
-                    "Brand" as brand,
-                    COUNT(*) as count,
-                    ROUND(COUNT(*) * 100.0 / (SELECT COUNT(*) FROM uploaded_orders WHERE "UploadDate" >= :start_date AND "UploadDate" <= :end_date), 2) as percentage,
-                    COUNT(CASE WHEN "InterfaceStatus" = 'Interface' THEN 1 END) as interfaced_count,
-                    COUNT(CASE WHEN "InterfaceStatus" != 'Interface' THEN 1 END) as not_interfaced_count
-                FROM uploaded_orders
-                WHERE "UploadDate" >= :start_date AND "UploadDate" <= :end_date
-                AND "Brand" IS NOT NULL AND "Brand" != ''
-                GROUP BY "Brand"
+                    brand,
+                    {ORDERS_SUM} as count,
+                    ROUND(SUM(order_count) * 100.0 / {RANGE_TOTAL}, 2) as percentage,
+                    {INTERFACED_SUM} as interfaced_count,
+                    {NOT_INTERFACED_SUM} as not_interfaced_count
+                FROM order_daily_rollup
+                WHERE {ROLLUP_RANGE}
+                AND brand != ''
+                GROUP BY brand
                 ORDER BY count DESC
                 LIMIT 20
             """)
@@ -188,17 +189,17 @@ def get_dashboard_stats_optimized(
                 "end_date": end_datetime
             }).fetchall()
             
-            marketplace_query = text("""
+            marketplace_query = text(f"""
                 SELECT 
-                    "Marketplace" as marketplace,
-                    COUNT(*) as count,
-                    ROUND(COUNT(*) * 100.0 / (SELECT COUNT(*) FROM uploaded_orders WHERE "UploadDate" >= :start_date AND "UploadDate" <= :end_date), 2) as percentage,
-                    COUNT(CASE WHEN "InterfaceStatus" = 'Interface' THEN 1 END) as interfaced_count,
-                    COUNT(CASE WHEN "InterfaceStatus" != 'Interface' THEN 1 END) as not_interfaced_count
-                FROM uploaded_orders
-                WHERE "UploadDate" >= :start_date AND "UploadDate" <= :end_date
-                AND "Marketplace" IS NOT NULL AND "Marketplace" != ''
-                GROUP BY "Marketplace"
+                    marketplace,
+                    {ORDERS_SUM} as count,
+                    ROUND(SUM(order_count) * 100.0 / {RANGE_TOTAL}, 2) as percentage,
+                    {INTERFACED_SUM} as interfaced_count,
+                    {NOT_INTERFACED_SUM} as not_interfaced_count
+                FROM order_daily_rollup
+                WHERE {ROLLUP_RANGE}
+                AND marketplace != ''
+                GROUP BY marketplace
                 ORDER BY count DESC
                 LIMIT 20
             """)
@@ -223,11 +224,17 @@ def get_dashboard_stats_optimized(
             marketplace_results = db.execute(marketplace_query).fetchall()
         
         # Get daily orders for the last 7 days
-        daily_query = text("""
-            SELECT date, count, interfaced_count, not_interfaced_count, interface_rate
-            FROM dashboard_daily_evolution
-            WHERE date >= CURRENT_DATE - INTERVAL '7 days'
-            ORDER BY date DESC
+        daily_query = text(f"""
+            SELECT
+                day as date,
+                {ORDERS_SUM} as count,
+                {INTERFACED_SUM} as interfaced_count,
+                {NOT_INTERFACED_SUM} as not_interfaced_count,
+                {INTERFACE_RATE} as interface_rate
+            FROM order_daily_rollup
+            WHERE day >= CURRENT_DATE - INTERVAL '7 days' AND order_count > 0
+            GROUP BY day
+            ORDER BY day DESC
         """)
         daily_results = db.execute(daily_query).fetchall()
         
@@ -287,12 +294,29 @@ def get_dashboard_stats_optimized(
 def get_dashboard_advanced_stats_optimized(
     start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
     end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
-    not_interfaced_limit: Optional[int] = Query(1000, description="Limit for not interfaced orders"),
-    db: Session = Depends(get_db)
+    not_interfaced_limit: Optional[int] = Query(1000, description="Limit for not interfaced orders")
 ):
     """
     Get advanced dashboard statistics using optimized views
+    (identical concurrent requests share one computation, see single_flight)
     """
+    params = {
+        "start_date": (start_date or "").strip() or None,
+        "end_date": (end_date or "").strip() or None,
+        "not_interfaced_limit": not_interfaced_limit,
+    }
+    return single_flight.run(
+        "dashboard_advanced_stats", params, ("orders", "dashboard"),
+        lambda db: compute_dashboard_advanced_stats(db, **params)
+    )
+
+def compute_dashboard_advanced_stats(
+    db: Session,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    not_interfaced_limit: Optional[int] = 1000
+):
+    """Advanced dashboard statistics (uncached computation behind /advanced-stats)"""
     try:
         # Parse date filters
         start_datetime = None
@@ -346,20 +370,17 @@ def get_dashboard_advanced_stats_optimized(
         
         # Get batch distribution - use date filter if provided
         if start_datetime and end_datetime:
-            batch_query = text("""
+            batch_query = text(f"""
                 SELECT 
-                    "Batch" as batch,
-                    COUNT(*) as count,
-                    COUNT(CASE WHEN "InterfaceStatus" = 'Interface' THEN 1 END) as interfaced_count,
-                    COUNT(CASE WHEN "InterfaceStatus" != 'Interface' THEN 1 END) as not_interfaced_count,
-                    ROUND(
-                        COUNT(CASE WHEN "InterfaceStatus" = 'Interface' THEN 1 END) * 100.0 / 
-                        NULLIF(COUNT(*), 0), 2
-                    ) as interface_rate
-                FROM uploaded_orders
-                WHERE "UploadDate" >= :start_date AND "UploadDate" <= :end_date
-                AND "Batch" IS NOT NULL AND "Batch" != ''
-                GROUP BY "Batch"
+                    batch,
+                    {ORDERS_SUM} as count,
+                    {INTERFACED_SUM} as interfaced_count,
+                    {NOT_INTERFACED_SUM} as not_interfaced_count,
+                    {INTERFACE_RATE} as interface_rate
+                FROM order_daily_rollup
+                WHERE {ROLLUP_RANGE}
+                AND batch != ''
+                GROUP BY batch
                 ORDER BY count DESC
                 LIMIT 50
             """)
@@ -378,23 +399,20 @@ def get_dashboard_advanced_stats_optimized(
         
         # Get PIC performance - use date filter if provided
         if start_datetime and end_datetime:
-            pic_query = text("""
+            pic_query = text(f"""
                 SELECT 
-                    "PIC" as pic,
-                    COUNT(*) as total_uploads,
-                    COUNT(CASE WHEN "InterfaceStatus" = 'Interface' THEN 1 END) as interfaced_uploads,
-                    COUNT(CASE WHEN "InterfaceStatus" != 'Interface' THEN 1 END) as not_interfaced_uploads,
-                    ROUND(
-                        COUNT(CASE WHEN "InterfaceStatus" = 'Interface' THEN 1 END) * 100.0 / 
-                        NULLIF(COUNT(*), 0), 2
-                    ) as interface_rate,
-                    COUNT(DISTINCT "Brand") as unique_brands,
-                    COUNT(DISTINCT "Marketplace") as unique_marketplaces,
-                    MAX("UploadDate") as last_upload_date
-                FROM uploaded_orders
-                WHERE "UploadDate" >= :start_date AND "UploadDate" <= :end_date
-                AND "PIC" IS NOT NULL AND "PIC" != ''
-                GROUP BY "PIC"
+                    pic,
+                    {ORDERS_SUM} as total_uploads,
+                    {INTERFACED_SUM} as interfaced_uploads,
+                    {NOT_INTERFACED_SUM} as not_interfaced_uploads,
+                    {INTERFACE_RATE} as interface_rate,
+                    COUNT(DISTINCT NULLIF(brand, '')) as unique_brands,
+                    COUNT(DISTINCT NULLIF(marketplace, '')) as unique_marketplaces,
+                    MAX(last_upload_at) as last_upload_date
+                FROM order_daily_rollup
+                WHERE {ROLLUP_RANGE}
+                AND pic != ''
+                GROUP BY pic
                 ORDER BY total_uploads DESC
                 LIMIT 20
             """)
@@ -414,16 +432,16 @@ def get_dashboard_advanced_stats_optimized(
         
         # Get hourly evolution - use date filter if provided
         if start_datetime and end_datetime:
-            hourly_query = text("""
+            hourly_query = text(f"""
                 SELECT 
-                    EXTRACT(HOUR FROM "UploadDate") as hour,
-                    LPAD(EXTRACT(HOUR FROM "UploadDate")::text, 2, '0') || ':' || '00' as hour_label,
-                    COUNT(*) as count,
-                    COUNT(CASE WHEN "InterfaceStatus" = 'Interface' THEN 1 END) as interfaced_count,
-                    COUNT(CASE WHEN "InterfaceStatus" != 'Interface' THEN 1 END) as not_interfaced_count
-                FROM uploaded_orders
-                WHERE "UploadDate" >= :start_date AND "UploadDate" <= :end_date
-                GROUP BY EXTRACT(HOUR FROM "UploadDate")
+                    hour,
+                    LPAD(hour::text, 2, '0') || ':' || '00' as hour_label,
+                    {ORDERS_SUM} as count,
+                    {INTERFACED_SUM} as interfaced_count,
+                    {NOT_INTERFACED_SUM} as not_interfaced_count
+                FROM order_daily_rollup
+                WHERE {ROLLUP_RANGE}
+                GROUP BY hour
                 ORDER BY hour
             """)
             hourly_results = db.execute(hourly_query, {
@@ -440,24 +458,21 @@ def get_dashboard_advanced_stats_optimized(
         
         # Get recent uploads - use date filter if provided
         if start_datetime and end_datetime:
-            recent_uploads_query = text("""
+            recent_uploads_query = text(f"""
                 SELECT 
-                    "Batch" as batch,
-                    "Marketplace" as marketplace,
-                    "Brand" as brand,
-                    "PIC" as pic,
-                    COUNT(*) as total_orders,
-                    COUNT(CASE WHEN "InterfaceStatus" = 'Interface' THEN 1 END) as interfaced_orders,
-                    COUNT(CASE WHEN "InterfaceStatus" != 'Interface' THEN 1 END) as not_interfaced_orders,
-                    MAX("UploadDate") as upload_date,
-                    ROUND(
-                        COUNT(CASE WHEN "InterfaceStatus" = 'Interface' THEN 1 END) * 100.0 / 
-                        NULLIF(COUNT(*), 0), 2
-                    ) as interface_rate
-                FROM uploaded_orders
-                WHERE "UploadDate" >= :start_date AND "UploadDate" <= :end_date
-                AND "Batch" IS NOT NULL AND "Marketplace" IS NOT NULL AND "Brand" IS NOT NULL
-                GROUP BY "Batch", "Marketplace", "Brand", "PIC"
+                    batch,
+                    marketplace,
+                    brand,
+                    NULLIF(pic, '') as pic,
+                    {ORDERS_SUM} as total_orders,
+                    {INTERFACED_SUM} as interfaced_orders,
+                    {NOT_INTERFACED_SUM} as not_interfaced_orders,
+                    MAX(last_upload_at) as upload_date,
+                    {INTERFACE_RATE} as interface_rate
+                FROM order_daily_rollup
+                WHERE {ROLLUP_RANGE}
+                AND batch != '' AND marketplace != '' AND brand != ''
+                GROUP BY batch, marketplace, brand, pic
                 ORDER BY upload_date DESC
                 LIMIT 50
             """)
@@ -528,14 +543,14 @@ def get_dashboard_advanced_stats_optimized(
         
         # Get interface status summary - use date filter if provided
         if start_datetime and end_datetime:
-            interface_status_query = text("""
+            interface_status_query = text(f"""
                 SELECT 
-                    "InterfaceStatus" as status,
-                    COUNT(*) as count,
-                    ROUND(COUNT(*) * 100.0 / (SELECT COUNT(*) FROM uploaded_orders WHERE "UploadDate" >= :start_date AND "UploadDate" <= :end_date), 2) as percentage
-                FROM uploaded_orders
-                WHERE "UploadDate" >= :start_date AND "UploadDate" <= :end_date
-                GROUP BY "InterfaceStatus"
+                    NULLIF(interface_status, '') as status,
+                    {ORDERS_SUM} as count,
+                    ROUND(SUM(order_count) * 100.0 / {RANGE_TOTAL}, 2) as percentage
+                FROM order_daily_rollup
+                WHERE {ROLLUP_RANGE}
+                GROUP BY interface_status
                 ORDER BY count DESC
             """)
             interface_status_results = db.execute(interface_status_query, {
@@ -552,15 +567,15 @@ def get_dashboard_advanced_stats_optimized(
         
         # Get order status summary - use date filter if provided
         if start_datetime and end_datetime:
-            order_status_query = text("""
+            order_status_query = text(f"""
                 SELECT 
-                    "OrderStatus" as status,
-                    COUNT(*) as count,
-                    ROUND(COUNT(*) * 100.0 / (SELECT COUNT(*) FROM uploaded_orders WHERE "UploadDate" >= :start_date AND "UploadDate" <= :end_date), 2) as percentage
-                FROM uploaded_orders
-                WHERE "UploadDate" >= :start_date AND "UploadDate" <= :end_date
-                AND "OrderStatus" IS NOT NULL AND "OrderStatus" != ''
-                GROUP BY "OrderStatus"
+                    order_status as status,
+                    {ORDERS_SUM} as count,
+                    ROUND(SUM(order_count) * 100.0 / {RANGE_TOTAL}, 2) as percentage
+                FROM order_daily_rollup
+                WHERE {ROLLUP_RANGE}
+                AND order_status != ''
+                GROUP BY order_status
                 ORDER BY count DESC
                 LIMIT 20
             """)
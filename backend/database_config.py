@@ -26,3 +26,102 @@ WMSPROD_DB_CONNECTION_STRING = f"DRIVER={{ODBC Driver 17 for SQL Server}};SERVER
 
 # PostgreSQL connection string (pooling parameters are set in create_engine, not in URL)
 POSTGRES_DATABASE_URL = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{POSTGRES_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+
+# External SQL Server (Flexo_Db / WMSPROD) connection pool settings
+EXTERNAL_DB_POOL_MIN_SIZE = int(os.getenv("EXTERNAL_DB_POOL_MIN_SIZE", "1"))
+EXTERNAL_DB_POOL_MAX_SIZE = int(os.getenv("EXTERNAL_DB_POOL_MAX_SIZE", "8"))
+EXTERNAL_DB_POOL_CHECKOUT_TIMEOUT = float(os.getenv("EXTERNAL_DB_POOL_CHECKOUT_TIMEOUT", "30"))
+EXTERNAL_DB_POOL_MAX_IDLE_SECONDS = float(os.getenv("EXTERNAL_DB_POOL_MAX_IDLE_SECONDS", "300"))
+EXTERNAL_DB_POOL_HEALTH_CHECK_INTERVAL = float(os.getenv("EXTERNAL_DB_POOL_HEALTH_CHECK_INTERVAL", "30"))
+
+# External order lookup: 'temp_table' (bulk-load + single join) or 'in_list' (chunked IN (...) queries)
+EXTERNAL_LOOKUP_MODE = os.getenv("EXTERNAL_LOOKUP_MODE", "temp_table").lower()
+EXTERNAL_LOOKUP_FETCH_SIZE = int(os.getenv("EXTERNAL_LOOKUP_FETCH_SIZE", "5000"))
+
+# Concurrency of external lookups: worker threads shared per process, chunks in flight per caller,
+# and the per-query timeout enforced by the ODBC driver (seconds)
+EXTERNAL_LOOKUP_MAX_WORKERS = int(os.getenv("EXTERNAL_LOOKUP_MAX_WORKERS", "6"))
+EXTERNAL_LOOKUP_CONCURRENCY = int(os.getenv("EXTERNAL_LOOKUP_CONCURRENCY", "4"))
+EXTERNAL_QUERY_TIMEOUT = int(os.getenv("EXTERNAL_QUERY_TIMEOUT", "30"))
+
+# Interface status result cache: 'Interface' results are kept for hours (an interfaced order
+# never goes back), 'Not Yet Interface' only briefly so new interfaces are picked up quickly
+INTERFACE_CACHE_MAX_ENTRIES = int(os.getenv("INTERFACE_CACHE_MAX_ENTRIES", "200000"))
+INTERFACE_CACHE_POSITIVE_TTL = float(os.getenv("INTERFACE_CACHE_POSITIVE_TTL", "43200"))
+INTERFACE_CACHE_NEGATIVE_TTL = float(os.getenv("INTERFACE_CACHE_NEGATIVE_TTL", "120"))
+
+# Second upload phase: background interface checks of 'Pending Check' orders
+INTERFACE_CHECK_WORKERS = int(os.getenv("INTERFACE_CHECK_WORKERS", "2"))
+INTERFACE_CHECK_BATCH_SIZE = int(os.getenv("INTERFACE_CHECK_BATCH_SIZE", "5000"))
+
+# Background interface status reconciler (re-checks 'Not Yet Interface' orders, newest uploads first)
+RECONCILER_ENABLED = os.getenv("RECONCILER_ENABLED", "true").lower() == "true"
+RECONCILER_INTERVAL_SECONDS = float(os.getenv("RECONCILER_INTERVAL_SECONDS", "60"))
+RECONCILER_BATCH_SIZE = int(os.getenv("RECONCILER_BATCH_SIZE", "1000"))
+RECONCILER_BASE_BACKOFF_SECONDS = int(os.getenv("RECONCILER_BASE_BACKOFF_SECONDS", "300"))
+RECONCILER_MAX_BACKOFF_SECONDS = int(os.getenv("RECONCILER_MAX_BACKOFF_SECONDS", "21600"))
+RECONCILER_LOOKBACK_DAYS = int(os.getenv("RECONCILER_LOOKBACK_DAYS", "30"))
+
+# Upload job queue (workers claim upload_tasks rows one at a time under pg_advisory_xact_lock(UPLOAD_QUEUE_LOCK_KEY),
+# in fair-share order and within the caps below)
+UPLOAD_SPOOL_DIR = os.getenv("UPLOAD_SPOOL_DIR", "")  # default: backend/uploads/spool
+UPLOAD_MAX_ATTEMPTS = int(os.getenv("UPLOAD_MAX_ATTEMPTS", "3"))
+UPLOAD_RETRY_DELAY_SECONDS = int(os.getenv("UPLOAD_RETRY_DELAY_SECONDS", "30"))
+UPLOAD_HEARTBEAT_INTERVAL = float(os.getenv("UPLOAD_HEARTBEAT_INTERVAL", "15"))
+UPLOAD_HEARTBEAT_TIMEOUT = float(os.getenv("UPLOAD_HEARTBEAT_TIMEOUT", "120"))
+UPLOAD_QUEUE_POLL_INTERVAL = float(os.getenv("UPLOAD_QUEUE_POLL_INTERVAL", "2"))
+# Queue worker threads inside each API process (0 when dedicated upload_worker.py processes run)
+UPLOAD_WORKERS_IN_API = int(os.getenv("UPLOAD_WORKERS_IN_API", "1"))
+UPLOAD_WORKER_PROCESSES = int(os.getenv("UPLOAD_WORKER_PROCESSES", "2"))
+# Fair-share scheduling: uploads processed at once across all workers, and per PIC
+UPLOAD_MAX_CONCURRENT = int(os.getenv("UPLOAD_MAX_CONCURRENT", "4"))
+UPLOAD_MAX_PER_USER = int(os.getenv("UPLOAD_MAX_PER_USER", "1"))
+
+# uploaded_orders monthly partitions: months created ahead, and months kept live before a
+# partition is detached into uploaded_orders_archive (0 keeps everything live)
+ORDER_PARTITION_MONTHS_AHEAD = int(os.getenv("ORDER_PARTITION_MONTHS_AHEAD", "2"))
+ORDER_RETENTION_MONTHS = int(os.getenv("ORDER_RETENTION_MONTHS", "12"))
+
+# Async handlers: asyncpg pool per process, and the bounded thread pool for their blocking
+# work (pandas parsing/Excel writing, pyodbc lookups)
+ASYNC_DB_POOL_SIZE = int(os.getenv("ASYNC_DB_POOL_SIZE", "5"))
+ASYNC_DB_MAX_OVERFLOW = int(os.getenv("ASYNC_DB_MAX_OVERFLOW", "10"))
+BLOCKING_POOL_WORKERS = int(os.getenv("BLOCKING_POOL_WORKERS", "8"))
+# Event-loop stall monitor: probe interval and the lag counted as a stall
+EVENT_LOOP_MONITOR_INTERVAL = float(os.getenv("EVENT_LOOP_MONITOR_INTERVAL", "0.25"))
+EVENT_LOOP_STALL_THRESHOLD_MS = float(os.getenv("EVENT_LOOP_STALL_THRESHOLD_MS", "100"))
+
+# PostgreSQL engines per purpose (db_registry): request handlers, background jobs (upload workers,
+# interface checks, reconciler, scheduler) and reporting reads (dashboard views, streamed lists).
+# Each uvicorn worker has its own pools, so size = per-process connections.
+_PRODUCTION = os.getenv("ENVIRONMENT", "development").lower() == "production"
+DB_API_POOL_SIZE = int(os.getenv("DB_API_POOL_SIZE", "5" if _PRODUCTION else "10"))
+DB_API_MAX_OVERFLOW = int(os.getenv("DB_API_MAX_OVERFLOW", "10" if _PRODUCTION else "20"))
+DB_BACKGROUND_POOL_SIZE = int(os.getenv("DB_BACKGROUND_POOL_SIZE", "3"))
+DB_BACKGROUND_MAX_OVERFLOW = int(os.getenv("DB_BACKGROUND_MAX_OVERFLOW", "5"))
+DB_REPORTING_POOL_SIZE = int(os.getenv("DB_REPORTING_POOL_SIZE", "2"))
+DB_REPORTING_MAX_OVERFLOW = int(os.getenv("DB_REPORTING_MAX_OVERFLOW", "3"))
+# statement_timeout per purpose (ms); reporting queries get less time than bulk background writes
+DB_API_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_API_STATEMENT_TIMEOUT_MS", "300000"))
+DB_BACKGROUND_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_BACKGROUND_STATEMENT_TIMEOUT_MS", "300000"))
+DB_REPORTING_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_REPORTING_STATEMENT_TIMEOUT_MS", "120000"))
+
+# Response cache: per-process LRU (byte budget) in front of a shared Redis tier. Without REDIS_URL
+# an in-process stand-in is used. Tag versions are re-read from the shared tier at most this often,
+# which bounds how long another worker can serve an invalidated entry.
+REDIS_URL = os.getenv("REDIS_URL", "")
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", "300"))
+RESPONSE_CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESPONSE_CACHE_TAG_CHECK_SECONDS = float(os.getenv("RESPONSE_CACHE_TAG_CHECK_SECONDS", "1"))
+
+# Single-flight reads: after an invalidation the previous result of a coalesced read is served for up
+# to this long while one request recomputes it in the background
+SINGLE_FLIGHT_STALE_SECONDS = int(os.getenv("SINGLE_FLIGHT_STALE_SECONDS", "600"))
+SINGLE_FLIGHT_STALE_MAX_BYTES = int(os.getenv("SINGLE_FLIGHT_STALE_MAX_BYTES", str(32 * 1024 * 1024)))
+SINGLE_FLIGHT_REFRESH_WORKERS = int(os.getenv("SINGLE_FLIGHT_REFRESH_WORKERS", "2"))
+
+# Upload log lines are written to upload_task_logs in batches by a background thread instead of one
+# INSERT per line; other processes see a line up to the flush interval after it was logged
+UPLOAD_LOG_FLUSH_INTERVAL = float(os.getenv("UPLOAD_LOG_FLUSH_INTERVAL", "1"))
+UPLOAD_LOG_FLUSH_BATCH_SIZE = int(os.getenv("UPLOAD_LOG_FLUSH_BATCH_SIZE", "200"))
+UPLOAD_LOG_MAX_PENDING = int(os.getenv("UPLOAD_LOG_MAX_PENDING", "20000"))
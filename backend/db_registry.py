@@ -0,0 +1,181 @@
+"""
+Shared PostgreSQL engines and session factories
+One pool per purpose (api, background, reporting) for every module and background job, with per-pool usage counters
+"""
+import logging
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import sessionmaker
+
+from database_config import (
+    POSTGRES_DATABASE_URL,
+    DB_API_POOL_SIZE, DB_API_MAX_OVERFLOW, DB_API_STATEMENT_TIMEOUT_MS,
+    DB_BACKGROUND_POOL_SIZE, DB_BACKGROUND_MAX_OVERFLOW, DB_BACKGROUND_STATEMENT_TIMEOUT_MS,
+    DB_REPORTING_POOL_SIZE, DB_REPORTING_MAX_OVERFLOW, DB_REPORTING_STATEMENT_TIMEOUT_MS,
+)
+
+logger = logging.getLogger(__name__)
+
+# purpose -> (pool_size, max_overflow, statement_timeout_ms)
+POOL_PURPOSES = {
+    "api": (DB_API_POOL_SIZE, DB_API_MAX_OVERFLOW, DB_API_STATEMENT_TIMEOUT_MS),
+    "background": (DB_BACKGROUND_POOL_SIZE, DB_BACKGROUND_MAX_OVERFLOW, DB_BACKGROUND_STATEMENT_TIMEOUT_MS),
+    "reporting": (DB_REPORTING_POOL_SIZE, DB_REPORTING_MAX_OVERFLOW, DB_REPORTING_STATEMENT_TIMEOUT_MS),
+}
+
+
+class PoolCounters:
+    """Connection lifecycle counters of one pool, fed by pool events"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.connects = 0
+        self.closes = 0
+        self.checkouts = 0
+        self.invalidations = 0
+        self.max_checked_out = 0
+        self.checkins = 0
+        self.total_hold_time = 0.0
+        self.max_hold_time = 0.0
+
+    def attach(self, engine):
+        self._engine = engine  # engine.pool is replaced on dispose()
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "close", self._on_close)
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "invalidate", self._on_invalidate)
+
+    def _on_connect(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.connects += 1
+
+    def _on_close(self, dbapi_connection, connection_record):
+        with self._lock:
+            self.closes += 1
+
+    def _on_checkout(self, dbapi_connection, connection_record, connection_proxy):
+        connection_record.info["checked_out_at"] = time.perf_counter()
+        with self._lock:
+            self.checkouts += 1
+            self.max_checked_out = max(self.max_checked_out, self._engine.pool.checkedout())
+
+    def _on_checkin(self, dbapi_connection, connection_record):
+        checked_out_at = connection_record.info.pop("checked_out_at", None)
+        if checked_out_at is None:
+            return  # invalidated while checked out
+        held = time.perf_counter() - checked_out_at
+        with self._lock:
+            self.checkins += 1
+            self.total_hold_time += held
+            self.max_hold_time = max(self.max_hold_time, held)
+
+    def _on_invalidate(self, dbapi_connection, connection_record, exception):
+        with self._lock:
+            self.invalidations += 1
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "connects": self.connects,
+                "closes": self.closes,
+                "checkouts": self.checkouts,
+                "invalidations": self.invalidations,
+                "max_checked_out": self.max_checked_out,
+                "avg_hold_ms": round(self.total_hold_time / self.checkins * 1000, 2) if self.checkins else 0.0,
+                "max_hold_ms": round(self.max_hold_time * 1000, 2),
+            }
+
+
+class EngineRegistry:
+    """Lazily created engine and sessionmaker per purpose, shared within the process"""
+
+    def __init__(self, database_url: str, purposes: Dict[str, tuple]):
+        self.database_url = database_url
+        self.purposes = purposes
+        self._lock = threading.Lock()
+        self._engines = {}
+        self._session_factories = {}
+        self._counters = {}
+
+    def engine(self, purpose: str = "api"):
+        """Engine of a purpose (created on first use)"""
+        engine = self._engines.get(purpose)
+        if engine is not None:
+            return engine
+        if purpose not in self.purposes:
+            raise ValueError(f"Unknown database pool purpose: {purpose}")
+        with self._lock:
+            if purpose not in self._engines:
+                pool_size, max_overflow, statement_timeout_ms = self.purposes[purpose]
+                engine = create_engine(
+                    self.database_url,
+                    pool_size=pool_size,
+                    max_overflow=max_overflow,
+                    pool_pre_ping=True,
+                    pool_recycle=300,
+                    pool_timeout=30,
+                    echo=False,
+                    connect_args={
+                        "options": f"-c statement_timeout={statement_timeout_ms}",
+                        "application_name": f"sweeping_{purpose}",
+                    }
+                )
+                counters = PoolCounters()
+                counters.attach(engine)
+                self._counters[purpose] = counters
+                self._session_factories[purpose] = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+                self._engines[purpose] = engine
+                logger.info(f"Database pool '{purpose}' created (size {pool_size}, overflow {max_overflow})")
+            return self._engines[purpose]
+
+    def session_factory(self, purpose: str = "api"):
+        """sessionmaker bound to the engine of a purpose"""
+        self.engine(purpose)
+        return self._session_factories[purpose]
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Current usage and lifetime counters of every pool created so far"""
+        stats = {}
+        for purpose, engine in list(self._engines.items()):
+            pool = engine.pool
+            pool_size, max_overflow, _timeout = self.purposes[purpose]
+            stats[purpose] = {
+                "pool_size": pool_size,
+                "max_overflow": max_overflow,
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": pool.overflow(),
+                **self._counters[purpose].get_stats(),
+            }
+        return stats
+
+    def dispose(self, purpose: str):
+        engine = self._engines.get(purpose)
+        if engine is not None:
+            engine.dispose()
+
+    def dispose_all(self):
+        """Close the idle connections of every pool (checked-out ones close on check-in)"""
+        for purpose in list(self._engines):
+            self.dispose(purpose)
+
+
+# Global instance
+db_registry = EngineRegistry(POSTGRES_DATABASE_URL, POOL_PURPOSES)
+
+
+def get_reporting_db():
+    """FastAPI dependency: session on the reporting pool"""
+    db = db_registry.session_factory("reporting")()
+    try:
+        yield db
+    except Exception as e:
+        logger.error(f"Database error: {str(e)}")
+        db.rollback()
+        raise
+    finally:
+        db.close()
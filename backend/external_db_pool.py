@@ -0,0 +1,361 @@
+"""
+Pooled ODBC connections for the external SQL Server databases (Flexo_Db / WMSPROD)
+Keeps a bounded set of live pyodbc connections per connection string and remembers which driver works
+"""
+import os
+import time
+import logging
+import threading
+import weakref
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+import pyodbc
+
+from database_config import (
+    EXTERNAL_DB_POOL_MIN_SIZE, EXTERNAL_DB_POOL_MAX_SIZE,
+    EXTERNAL_DB_POOL_CHECKOUT_TIMEOUT, EXTERNAL_DB_POOL_MAX_IDLE_SECONDS,
+    EXTERNAL_DB_POOL_HEALTH_CHECK_INTERVAL
+)
+
+logger = logging.getLogger(__name__)
+
+ODBC_DRIVERS = ["ODBC Driver 17 for SQL Server", "ODBC Driver 18 for SQL Server"]
+CONNECT_TIMEOUT = 30
+
+# Driver that connected successfully last; tried first by every pool afterwards
+_working_driver: Optional[str] = None
+_driver_lock = threading.Lock()
+
+
+class ConnectionPoolTimeout(Exception):
+    """Raised when no pooled connection becomes available within the checkout timeout"""
+
+
+def _driver_of(connection_string: str) -> Optional[str]:
+    for driver in ODBC_DRIVERS:
+        if driver in connection_string:
+            return driver
+    return None
+
+
+def _connection_string_candidates(connection_string: str) -> List[str]:
+    """Connection strings to try, starting with the driver that worked before"""
+    current_driver = _driver_of(connection_string)
+    if not current_driver:
+        return [connection_string]
+
+    ordered = []
+    for driver in [_working_driver, current_driver] + ODBC_DRIVERS:
+        if driver and driver not in ordered:
+            ordered.append(driver)
+    return [connection_string.replace(current_driver, driver) for driver in ordered]
+
+
+class PooledConnection:
+    """pyodbc connection proxy whose close() hands the connection back to its pool
+
+    A proxy that is garbage-collected without close() has its connection discarded, so the
+    pool slot is not lost.
+    """
+
+    def __init__(self, pool: 'ODBCConnectionPool', connection):
+        object.__setattr__(self, '_pool', pool)
+        object.__setattr__(self, '_connection', connection)
+        object.__setattr__(self, '_broken', False)
+        finalizer = weakref.finalize(self, pool.reclaim, connection)
+        finalizer.atexit = False
+        object.__setattr__(self, '_finalizer', finalizer)
+
+    def __getattr__(self, name):
+        connection = object.__getattribute__(self, '_connection')
+        if connection is None:
+            raise pyodbc.ProgrammingError("Attempt to use a connection that was returned to the pool")
+        return getattr(connection, name)
+
+    def __setattr__(self, name, value):
+        setattr(object.__getattribute__(self, '_connection'), name, value)
+
+    def invalidate(self):
+        """Mark the connection as broken so it is discarded instead of reused"""
+        object.__setattr__(self, '_broken', True)
+
+    def close(self):
+        connection = object.__getattribute__(self, '_connection')
+        if connection is None:
+            return
+        object.__setattr__(self, '_connection', None)
+        object.__getattribute__(self, '_finalizer').detach()
+        self._pool.release(connection, discard=object.__getattribute__(self, '_broken'))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None and isinstance(exc, pyodbc.Error):
+            self.invalidate()
+        self.close()
+        return False
+
+
+class ODBCConnectionPool:
+    """Thread-safe pool of pyodbc connections with liveness checks on checkout"""
+
+    def __init__(self, name: str, connection_string: str,
+                 min_size: int = EXTERNAL_DB_POOL_MIN_SIZE,
+                 max_size: int = EXTERNAL_DB_POOL_MAX_SIZE,
+                 checkout_timeout: float = EXTERNAL_DB_POOL_CHECKOUT_TIMEOUT,
+                 max_idle_seconds: float = EXTERNAL_DB_POOL_MAX_IDLE_SECONDS,
+                 health_check_interval: float = EXTERNAL_DB_POOL_HEALTH_CHECK_INTERVAL):
+        self.name = name
+        self.connection_string = connection_string
+        self.min_size = max(0, min(min_size, max_size))
+        self.max_size = max(1, max_size)
+        self.checkout_timeout = checkout_timeout
+        self.max_idle_seconds = max_idle_seconds
+        self.health_check_interval = health_check_interval
+
+        self._lock = threading.Condition()
+        self._idle = deque()  # (connection, last_used)
+        self._in_use = 0
+        self._opening = 0
+        self._pid = os.getpid()
+        self.stats_counters = {
+            'created': 0,
+            'closed': 0,
+            'checkouts': 0,
+            'waits': 0,
+            'wait_time_total': 0.0,
+            'timeouts': 0,
+            'health_check_failures': 0,
+            'connect_failures': 0,
+            'leaked': 0,
+        }
+
+    def _reset_after_fork(self):
+        if self._pid != os.getpid():
+            # Connections inherited from a parent process must not be shared
+            self._idle.clear()
+            self._in_use = 0
+            self._opening = 0
+            self._pid = os.getpid()
+
+    def _connect(self):
+        """Open a new connection, trying the remembered driver first"""
+        global _working_driver
+        last_error = None
+        for conn_str in _connection_string_candidates(self.connection_string):
+            try:
+                connection = pyodbc.connect(conn_str, timeout=CONNECT_TIMEOUT)
+                driver = _driver_of(conn_str)
+                if driver and driver != _working_driver:
+                    with _driver_lock:
+                        _working_driver = driver
+                    logger.info(f"External DB pool '{self.name}' using {driver}")
+                return connection
+            except Exception as e:
+                last_error = e
+                logger.warning(f"External DB pool '{self.name}' connection attempt failed: {e}")
+        self.stats_counters['connect_failures'] += 1
+        raise last_error if last_error else pyodbc.Error("No connection string candidates")
+
+    def _close_quietly(self, connection):
+        try:
+            connection.close()
+        except Exception:
+            pass
+        with self._lock:
+            self.stats_counters['closed'] += 1
+
+    def _is_alive(self, connection) -> bool:
+        try:
+            cursor = connection.cursor()
+            cursor.execute("SELECT 1")
+            cursor.fetchone()
+            cursor.close()
+            return True
+        except Exception:
+            return False
+
+    def acquire(self, timeout: Optional[float] = None) -> PooledConnection:
+        """Check out a live connection, opening a new one while below max_size"""
+        timeout = self.checkout_timeout if timeout is None else timeout
+        deadline = time.monotonic() + timeout
+        waited = False
+        wait_start = time.monotonic()
+
+        while True:
+            connection = None
+            last_used = None
+            open_new = False
+
+            with self._lock:
+                self._reset_after_fork()
+                while not self._idle and self._in_use + self._opening >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.stats_counters['timeouts'] += 1
+                        raise ConnectionPoolTimeout(
+                            f"No connection available in pool '{self.name}' after {timeout:.0f}s"
+                        )
+                    waited = True
+                    self._lock.wait(remaining)
+
+                if self._idle:
+                    connection, last_used = self._idle.pop()
+                    self._in_use += 1
+                else:
+                    self._opening += 1
+                    open_new = True
+
+            if open_new:
+                try:
+                    connection = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._opening -= 1
+                        self._lock.notify()
+                    raise
+                with self._lock:
+                    self._opening -= 1
+                    self._in_use += 1
+                    self.stats_counters['created'] += 1
+            elif time.monotonic() - last_used > self.health_check_interval and not self._is_alive(connection):
+                # Stale connection (server restart, network drop) - replace it
+                with self._lock:
+                    self._in_use -= 1
+                    self.stats_counters['health_check_failures'] += 1
+                self._close_quietly(connection)
+                continue
+
+            with self._lock:
+                self.stats_counters['checkouts'] += 1
+                if waited:
+                    self.stats_counters['waits'] += 1
+                    self.stats_counters['wait_time_total'] += time.monotonic() - wait_start
+            return PooledConnection(self, connection)
+
+    def release(self, connection, discard: bool = False):
+        """Return a connection to the pool (or close it when broken or surplus)"""
+        if not discard:
+            try:
+                # Drop any open transaction and per-checkout settings before reuse
+                connection.rollback()
+                connection.timeout = 0
+            except Exception:
+                discard = True
+
+        to_close = []
+        with self._lock:
+            self._in_use = max(0, self._in_use - 1)
+            if discard:
+                to_close.append(connection)
+            else:
+                self._idle.append((connection, time.monotonic()))
+                # Trim connections idle for too long, keeping at least min_size open
+                now = time.monotonic()
+                while (len(self._idle) + self._in_use > self.min_size
+                       and self._idle and now - self._idle[0][1] > self.max_idle_seconds):
+                    to_close.append(self._idle.popleft()[0])
+            self._lock.notify()
+
+        for stale in to_close:
+            self._close_quietly(stale)
+
+    def reclaim(self, connection):
+        """Free the slot of a checked-out connection that was dropped without close()"""
+        logger.warning(f"External DB pool '{self.name}': connection garbage-collected without close(), discarding it")
+        with self._lock:
+            self.stats_counters['leaked'] += 1
+        # Its transaction state is unknown, so it is closed rather than reused
+        self.release(connection, discard=True)
+
+    def warm_up(self):
+        """Open connections until min_size are idle or in use"""
+        while True:
+            with self._lock:
+                if len(self._idle) + self._in_use + self._opening >= self.min_size:
+                    return
+                self._opening += 1
+            try:
+                connection = self._connect()
+            except Exception as e:
+                logger.warning(f"External DB pool '{self.name}' warm-up failed: {e}")
+                with self._lock:
+                    self._opening -= 1
+                return
+            with self._lock:
+                self._opening -= 1
+                self.stats_counters['created'] += 1
+                self._idle.append((connection, time.monotonic()))
+                self._lock.notify()
+
+    def close_idle(self) -> int:
+        """Close every idle connection (checked-out connections are closed when returned)"""
+        with self._lock:
+            idle = [connection for connection, _ in self._idle]
+            self._idle.clear()
+        for connection in idle:
+            self._close_quietly(connection)
+        return len(idle)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            checkouts = self.stats_counters['checkouts']
+            waits = self.stats_counters['waits']
+            return {
+                'name': self.name,
+                'min_size': self.min_size,
+                'max_size': self.max_size,
+                'idle': len(self._idle),
+                'in_use': self._in_use,
+                'opening': self._opening,
+                'driver': _working_driver,
+                'utilization': f"{(self._in_use / self.max_size) * 100:.1f}%",
+                'avg_wait_ms': round(self.stats_counters['wait_time_total'] / waits * 1000, 1) if waits else 0,
+                'reuse_rate': f"{(1 - self.stats_counters['created'] / checkouts) * 100:.1f}%" if checkouts else "0.0%",
+                **{key: value for key, value in self.stats_counters.items() if key != 'wait_time_total'}
+            }
+
+
+class ExternalConnectionPools:
+    """Registry of one ODBCConnectionPool per connection string"""
+
+    def __init__(self):
+        self._pools: Dict[str, ODBCConnectionPool] = {}
+        self._lock = threading.Lock()
+
+    def get_pool(self, connection_string: str) -> ODBCConnectionPool:
+        pool = self._pools.get(connection_string)
+        if pool is None:
+            with self._lock:
+                pool = self._pools.get(connection_string)
+                if pool is None:
+                    pool = ODBCConnectionPool(self._pool_name(connection_string), connection_string)
+                    self._pools[connection_string] = pool
+                    if pool.min_size > 0:
+                        threading.Thread(target=pool.warm_up, name=f"odbc-pool-warmup-{pool.name}", daemon=True).start()
+        return pool
+
+    @staticmethod
+    def _pool_name(connection_string: str) -> str:
+        for part in connection_string.split(';'):
+            if part.upper().startswith('DATABASE='):
+                return part.split('=', 1)[1]
+        return 'external'
+
+    def get_connection(self, connection_string: str) -> PooledConnection:
+        return self.get_pool(connection_string).acquire()
+
+    def close_all_idle(self) -> int:
+        return sum(pool.close_idle() for pool in list(self._pools.values()))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            'driver': _working_driver,
+            'pools': [pool.stats() for pool in list(self._pools.values())]
+        }
+
+
+# Global instance
+external_db_pools = ExternalConnectionPools()
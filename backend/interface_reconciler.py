@@ -0,0 +1,324 @@
+"""
+Incremental interface status reconciler
+Re-checks 'Not Yet Interface' orders against the external database, newest uploads first, with per-order backoff
+"""
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional
+
+from psycopg2.extras import execute_values
+from sqlalchemy import text
+
+from database_config import (
+    RECONCILER_ENABLED, RECONCILER_INTERVAL_SECONDS, RECONCILER_BATCH_SIZE,
+    RECONCILER_BASE_BACKOFF_SECONDS, RECONCILER_MAX_BACKOFF_SECONDS, RECONCILER_LOOKBACK_DAYS
+)
+
+logger = logging.getLogger(__name__)
+
+# pg advisory lock key: only one uvicorn worker runs a reconcile cycle at a time
+RECONCILER_LOCK_KEY = 7_311_802
+
+SCHEMA_STATEMENTS = [
+    'ALTER TABLE uploaded_orders ADD COLUMN IF NOT EXISTS "InterfaceNextCheckAt" TIMESTAMP',
+    'ALTER TABLE uploaded_orders ADD COLUMN IF NOT EXISTS "InterfaceCheckAttempts" INTEGER DEFAULT 0',
+    """
+    CREATE INDEX IF NOT EXISTS idx_uploaded_orders_reconcile
+    ON uploaded_orders ("Marketplace", "UploadDate" DESC, "Id" DESC)
+    WHERE "InterfaceStatus" = 'Not Yet Interface'
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS interface_reconcile_state (
+        marketplace VARCHAR PRIMARY KEY,
+        watermark_upload_date TIMESTAMP,
+        watermark_id INTEGER,
+        last_run_at TIMESTAMP,
+        last_pass_completed_at TIMESTAMP,
+        last_checked INTEGER DEFAULT 0,
+        last_updated INTEGER DEFAULT 0,
+        total_checked BIGINT DEFAULT 0,
+        total_updated BIGINT DEFAULT 0
+    )
+    """,
+]
+
+
+class InterfaceReconciler:
+    """Background loop that reconciles InterfaceStatus in small, prioritized batches
+
+    Each cycle takes one batch per marketplace, ordered by UploadDate DESC. The per-marketplace
+    watermark is the (UploadDate, Id) where the current pass stopped; when a pass reaches the end
+    it starts again from the newest orders. Orders that are still not interfaced get an
+    exponentially growing InterfaceNextCheckAt, so old orders are re-checked less and less often.
+    """
+
+    def __init__(self, engine, check_fn: Callable[[List[str], str], Dict[str, Dict[str, Any]]],
+                 now_fn: Callable[[], datetime] = datetime.now,
+                 interval_seconds: float = RECONCILER_INTERVAL_SECONDS,
+                 batch_size: int = RECONCILER_BATCH_SIZE,
+                 base_backoff_seconds: int = RECONCILER_BASE_BACKOFF_SECONDS,
+                 max_backoff_seconds: int = RECONCILER_MAX_BACKOFF_SECONDS,
+                 lookback_days: int = RECONCILER_LOOKBACK_DAYS,
+                 on_change: Optional[Callable[[], None]] = None):
+        self.engine = engine
+        # Must raise when the external lookup fails, so a failed batch is retried instead of backed off
+        self.check_fn = check_fn
+        self.now_fn = now_fn
+        self.interval_seconds = interval_seconds
+        self.batch_size = batch_size
+        self.base_backoff_seconds = int(base_backoff_seconds)
+        self.max_backoff_seconds = int(max_backoff_seconds)
+        self.lookback_days = lookback_days
+        # Called after a cycle that changed any order (e.g. to invalidate cached responses)
+        self.on_change = on_change
+
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.running_cycle = False
+        self.last_cycle: Dict[str, Any] = {}
+
+    def ensure_schema(self):
+        """Add the scheduling columns, candidate index and watermark table if missing"""
+        try:
+            with self.engine.connect() as conn:
+                for statement in SCHEMA_STATEMENTS:
+                    conn.execute(text(statement))
+                conn.commit()
+        except Exception as e:
+            logger.error(f"Interface reconciler schema setup failed: {e}")
+
+    def start(self):
+        if not RECONCILER_ENABLED or (self._thread and self._thread.is_alive()):
+            return
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="interface-reconciler", daemon=True)
+        self._thread.start()
+        logger.info("Interface status reconciler started")
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def trigger(self):
+        """Run a cycle now instead of waiting for the next interval"""
+        self._wake_event.set()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self._wake_event.clear()
+            had_work = False
+            try:
+                had_work = self.run_cycle()
+            except Exception as e:
+                logger.error(f"Interface reconcile cycle failed: {e}")
+            # Keep going while there is a backlog, otherwise wait for the interval or a trigger
+            if not had_work:
+                self._wake_event.wait(self.interval_seconds)
+
+    def run_cycle(self) -> bool:
+        """Reconcile one batch per marketplace; returns True when any batch was full"""
+        with self.engine.connect() as conn:
+            locked = conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": RECONCILER_LOCK_KEY}).scalar()
+            conn.commit()
+            if not locked:
+                return False  # Another worker process is reconciling
+            self.running_cycle = True
+            cycle_start = time.monotonic()
+            checked_total = 0
+            updated_total = 0
+            more_work = False
+            try:
+                for marketplace in self._marketplaces(conn):
+                    checked, updated, full_batch = self._reconcile_marketplace(conn, marketplace)
+                    checked_total += checked
+                    updated_total += updated
+                    more_work = more_work or full_batch
+            finally:
+                self.running_cycle = False
+                conn.rollback()
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": RECONCILER_LOCK_KEY})
+                conn.commit()
+                # Batches are committed one by one, so a failed cycle may still have changed orders
+                if updated_total and self.on_change:
+                    self.on_change()
+
+            self.last_cycle = {
+                "finished_at": self.now_fn().isoformat(),
+                "duration_seconds": round(time.monotonic() - cycle_start, 2),
+                "checked": checked_total,
+                "updated": updated_total,
+            }
+            if checked_total:
+                logger.info(f"Interface reconcile cycle: {updated_total}/{checked_total} orders now interfaced")
+            return more_work
+
+    def _marketplaces(self, conn) -> List[str]:
+        rows = conn.execute(text("""
+            SELECT DISTINCT "Marketplace" FROM uploaded_orders
+            WHERE "InterfaceStatus" = 'Not Yet Interface' AND "Marketplace" IS NOT NULL
+        """)).fetchall()
+        conn.commit()
+        return [row[0] for row in rows]
+
+    def _candidate_filters(self, by_marketplace: bool = True) -> str:
+        """WHERE clause for orders that are due for a re-check"""
+        filters = """
+            "InterfaceStatus" = 'Not Yet Interface'
+            AND NOT "IsCancelled"
+            AND ("InterfaceNextCheckAt" IS NULL OR "InterfaceNextCheckAt" <= :now)
+        """
+        if by_marketplace:
+            filters += ' AND "Marketplace" = :marketplace'
+        if self.lookback_days > 0:
+            filters += ' AND "UploadDate" >= :lookback'
+        return filters
+
+    def _candidate_params(self, now: datetime, marketplace: Optional[str] = None) -> Dict[str, Any]:
+        return {
+            "marketplace": marketplace,
+            "now": now,
+            "lookback": now - timedelta(days=self.lookback_days),
+        }
+
+    def _reconcile_marketplace(self, conn, marketplace: str):
+        now = self.now_fn()
+        state = conn.execute(text("""
+            SELECT watermark_upload_date, watermark_id FROM interface_reconcile_state WHERE marketplace = :marketplace
+        """), {"marketplace": marketplace}).fetchone()
+
+        query = f'SELECT "Id", "OrderNumber", "UploadDate" FROM uploaded_orders WHERE {self._candidate_filters()}'
+        params = self._candidate_params(now, marketplace)
+        if state and state[0] is not None:
+            query += ' AND ("UploadDate", "Id") < (:watermark_upload_date, :watermark_id)'
+            params.update({"watermark_upload_date": state[0], "watermark_id": state[1]})
+        query += ' ORDER BY "UploadDate" DESC, "Id" DESC LIMIT :limit'
+        params["limit"] = self.batch_size
+
+        batch = conn.execute(text(query), params).fetchall()
+        conn.commit()
+
+        updated = 0
+        if batch:
+            order_numbers = [row[1] for row in batch]
+            try:
+                results = self.check_fn(order_numbers, marketplace.lower())
+            except Exception as e:
+                # External database unavailable - leave attempts, backoff and watermark untouched
+                logger.warning(f"Interface reconcile: lookup failed for {marketplace}, retrying later: {e}")
+                return 0, 0, False
+            updated = self._apply_results(conn, order_numbers, results, now)
+
+        pass_complete = len(batch) < self.batch_size
+        last_row = batch[-1] if batch else None
+        conn.execute(text("""
+            INSERT INTO interface_reconcile_state (
+                marketplace, watermark_upload_date, watermark_id, last_run_at,
+                last_pass_completed_at, last_checked, last_updated, total_checked, total_updated
+            ) VALUES (
+                :marketplace, :watermark_upload_date, :watermark_id, :now,
+                :pass_completed_at, :checked, :updated, :checked, :updated
+            )
+            ON CONFLICT (marketplace) DO UPDATE SET
+                watermark_upload_date = EXCLUDED.watermark_upload_date,
+                watermark_id = EXCLUDED.watermark_id,
+                last_run_at = EXCLUDED.last_run_at,
+                last_pass_completed_at = COALESCE(EXCLUDED.last_pass_completed_at, interface_reconcile_state.last_pass_completed_at),
+                last_checked = EXCLUDED.last_checked,
+                last_updated = EXCLUDED.last_updated,
+                total_checked = interface_reconcile_state.total_checked + EXCLUDED.last_checked,
+                total_updated = interface_reconcile_state.total_updated + EXCLUDED.last_updated
+        """), {
+            "marketplace": marketplace,
+            # End of the pass resets the watermark so the next pass starts from the newest uploads
+            "watermark_upload_date": None if pass_complete else last_row[2],
+            "watermark_id": None if pass_complete else last_row[0],
+            "now": now,
+            "pass_completed_at": now if pass_complete else None,
+            "checked": len(batch),
+            "updated": updated,
+        })
+        conn.commit()
+        return len(batch), updated, not pass_complete
+
+    def _apply_results(self, conn, order_numbers: List[str], results: Dict[str, Dict[str, Any]], now: datetime) -> int:
+        """Write one batch of results with a single UPDATE ... FROM (VALUES ...); returns newly interfaced orders"""
+        rows = []
+        for order_number in order_numbers:
+            result = results.get(order_number)
+            if result is None:
+                continue
+            found = bool(result.get('found_in_external'))
+            rows.append((
+                order_number,
+                'Interface' if result.get('status') == 'Interface' else 'Not Yet Interface',
+                found,
+                result.get('system_ref_id') or '',
+                result.get('order_status') or '',
+                result.get('item_id_flexo'),
+            ))
+        if not rows:
+            return 0
+
+        cursor = conn.connection.cursor()
+        try:
+            # execute_values only fills the VALUES placeholder, so the timestamp is inlined ('%' escaped)
+            now_literal = cursor.mogrify('%s::timestamp', (now,)).decode().replace('%', '%%')
+            updated = execute_values(
+                cursor,
+                f"""
+                UPDATE uploaded_orders AS u SET
+                    "InterfaceStatus" = v.interface_status,
+                    "OrderNumberFlexo" = CASE WHEN v.found THEN v.order_number_flexo ELSE u."OrderNumberFlexo" END,
+                    "OrderStatusFlexo" = CASE WHEN v.found THEN v.order_status_flexo ELSE u."OrderStatusFlexo" END,
+                    "ItemIdFlexo" = CASE WHEN v.found THEN v.item_id_flexo ELSE u."ItemIdFlexo" END,
+                    "InterfaceCheckAttempts" = CASE WHEN v.interface_status = 'Interface' THEN 0
+                        ELSE COALESCE(u."InterfaceCheckAttempts", 0) + 1 END,
+                    "InterfaceNextCheckAt" = CASE WHEN v.interface_status = 'Interface' THEN NULL
+                        ELSE {now_literal} + LEAST(
+                            {self.base_backoff_seconds} * power(2, LEAST(COALESCE(u."InterfaceCheckAttempts", 0), 20)),
+                            {self.max_backoff_seconds}
+                        ) * INTERVAL '1 second' END
+                FROM (VALUES %s) AS v(order_number, interface_status, found, order_number_flexo, order_status_flexo, item_id_flexo)
+                WHERE u."OrderNumber" = v.order_number AND u."InterfaceStatus" = 'Not Yet Interface'
+                RETURNING v.interface_status = 'Interface'
+                """,
+                rows,
+                template="(%s, %s, %s::boolean, %s, %s, %s::text)",
+                page_size=len(rows),
+                fetch=True
+            )
+        finally:
+            cursor.close()
+        # Committed together with the watermark update by the caller
+        return sum(1 for (became_interface,) in updated if became_interface)
+
+    def get_status(self) -> Dict[str, Any]:
+        """Reconciler state for monitoring: watermarks, counters and the current due backlog"""
+        now = self.now_fn()
+        with self.engine.connect() as conn:
+            marketplaces = [dict(row._mapping) for row in conn.execute(text("""
+                SELECT marketplace, watermark_upload_date, watermark_id, last_run_at, last_pass_completed_at,
+                       last_checked, last_updated, total_checked, total_updated
+                FROM interface_reconcile_state ORDER BY marketplace
+            """)).fetchall()]
+            due_count = conn.execute(
+                text(f'SELECT COUNT(*) FROM uploaded_orders WHERE {self._candidate_filters(by_marketplace=False)}'),
+                self._candidate_params(now)
+            ).scalar()
+        for state in marketplaces:
+            for key, value in state.items():
+                if isinstance(value, datetime):
+                    state[key] = value.isoformat()
+        return {
+            "enabled": RECONCILER_ENABLED,
+            "thread_alive": bool(self._thread and self._thread.is_alive()),
+            "running_cycle": self.running_cycle,
+            "interval_seconds": self.interval_seconds,
+            "batch_size": self.batch_size,
+            "due_orders": due_count or 0,
+            "last_cycle": self.last_cycle,
+            "marketplaces": marketplaces,
+        }
@@ -0,0 +1,120 @@
+"""
+Interface status result cache
+LRU cache of external (Flexo_Db/WMSPROD) lookup results keyed by (marketplace, order number)
+"""
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from database_config import (
+    INTERFACE_CACHE_MAX_ENTRIES, INTERFACE_CACHE_POSITIVE_TTL, INTERFACE_CACHE_NEGATIVE_TTL
+)
+
+
+class InterfaceStatusCache:
+    """Size-bounded LRU cache with a long TTL for 'Interface' and a short TTL for everything else
+
+    Orders found in ord_line cannot go back to 'Not Yet Interface', so positive results are
+    kept for a long time; negative results expire quickly so new interfaces show up soon.
+    """
+
+    def __init__(self, max_entries: int = INTERFACE_CACHE_MAX_ENTRIES,
+                 positive_ttl: float = INTERFACE_CACHE_POSITIVE_TTL,
+                 negative_ttl: float = INTERFACE_CACHE_NEGATIVE_TTL):
+        self.max_entries = max_entries
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[float, Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.bypassed = 0
+
+    @staticmethod
+    def _key(marketplace: str, order_number) -> Tuple[str, str]:
+        return ((marketplace or '').lower(), str(order_number))
+
+    def get_many(self, marketplace: str, order_numbers: Iterable) -> Tuple[Dict[Any, Dict[str, Any]], List]:
+        """Split order numbers into cached results and the ones that still need a lookup"""
+        cached = {}
+        missing = []
+        now = time.monotonic()
+        with self._lock:
+            for order_number in order_numbers:
+                key = self._key(marketplace, order_number)
+                entry = self._entries.get(key)
+                if entry is None:
+                    self.misses += 1
+                    missing.append(order_number)
+                    continue
+                expires_at, result = entry
+                if expires_at <= now:
+                    del self._entries[key]
+                    self.expired += 1
+                    self.misses += 1
+                    missing.append(order_number)
+                    continue
+                self._entries.move_to_end(key)
+                self.hits += 1
+                cached[order_number] = dict(result)
+        return cached, missing
+
+    def put_many(self, marketplace: str, results: Dict[Any, Dict[str, Any]]):
+        """Store lookup results, choosing the TTL from the interface status"""
+        now = time.monotonic()
+        with self._lock:
+            for order_number, result in results.items():
+                ttl = self.positive_ttl if result.get('status') == 'Interface' else self.negative_ttl
+                if ttl <= 0:
+                    continue
+                key = self._key(marketplace, order_number)
+                self._entries[key] = (now + ttl, dict(result))
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def record_bypass(self, count: int):
+        with self._lock:
+            self.bypassed += count
+
+    def invalidate(self, marketplace: Optional[str] = None, order_numbers: Optional[Iterable] = None) -> int:
+        """Drop specific orders, a whole marketplace, or everything when called without arguments"""
+        with self._lock:
+            if order_numbers is not None:
+                keys = [self._key(marketplace, order_number) for order_number in order_numbers]
+            elif marketplace is not None:
+                marketplace_key = marketplace.lower()
+                keys = [key for key in self._entries if key[0] == marketplace_key]
+            else:
+                removed = len(self._entries)
+                self._entries.clear()
+                return removed
+            removed = 0
+            for key in keys:
+                if self._entries.pop(key, None) is not None:
+                    removed += 1
+            return removed
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'positive_ttl_seconds': self.positive_ttl,
+                'negative_ttl_seconds': self.negative_ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': f"{(self.hits / lookups) * 100:.1f}%" if lookups else "0.0%",
+                'expired': self.expired,
+                'evictions': self.evictions,
+                'bypassed': self.bypassed,
+            }
+
+
+# Global instance
+interface_status_cache = InterfaceStatusCache()
@@ -4,12 +4,13 @@ from fastapi.middleware.cors import CORSMiddleware
 from fastapi.middleware.gzip import GZipMiddleware
 from fastapi.middleware.trustedhost import TrustedHostMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from fastapi.responses import JSONResponse, StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from fastapi_limiter import FastAPILimiter
 from fastapi_limiter.depends import RateLimiter
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text, UniqueConstraint, Index, text, or_, func, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, Text, UniqueConstraint, Index, text, or_, func, Boolean, ForeignKey, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.orm import Session
 from typing import List, Optional
 import pandas as pd
 from collections import defaultdict
@@ -17,6 +18,7 @@ import os
 import io
 import shutil
 import json
+import csv
 from datetime import datetime, timedelta, timezone, time as datetime_time
 import jwt
 import pytz
@@ -27,8 +29,10 @@ import threading
 from threading import Thread
 import uuid
 import time
+import socket
 import logging
-from functools import lru_cache
+from functools import lru_cache, partial
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
 
 # Import the new dashboard views API
 try:
@@ -43,8 +47,28 @@ from passlib.context import CryptContext
 import re
 import schedule
 import uvicorn
-from monitoring import performance_tracker, start_monitoring, stop_monitoring, get_metrics_summary
+from monitoring import performance_tracker, start_monitoring, stop_monitoring, get_metrics_summary, event_loop_monitor, route_template
+from async_db import AsyncSessionLocal, get_async_db, run_blocking, blocking_pool, get_async_pool_stats, bind_datetime
 from multi_user_handler import multi_user_handler
+from upload_ingest import StreamingOrderReader, get_adaptive_chunk_size, prefetch_batches
+from order_cursor import encode_order_cursor, decode_order_cursor
+from upload_log_writer import UploadLogWriter
+from order_writer import upsert_uploaded_orders, apply_interface_results
+from clean_orders import ensure_clean_orders_table, rebuild_clean_orders
+from order_status import ensure_order_status_schema
+from order_rollup import ensure_order_rollup_table, rebuild_order_rollup
+from order_facets import (
+    ensure_order_facets_table, rebuild_order_facets, facet_value_counts, FACET_FIELDS, as_day,
+    split_filter_list, normalize_filter_list
+)
+from order_partitions import ensure_order_partitions, run_partition_maintenance, select_archived_orders
+from not_uploaded_history import ensure_not_uploaded_history_key, snapshot_not_uploaded, has_snapshot, mark_uploaded
+from external_db_pool import external_db_pools
+from interface_status_cache import interface_status_cache
+from interface_reconciler import InterfaceReconciler
+from response_cache import response_cache
+from single_flight import single_flight
+from conditional_get import conditional_get
 
 # Load environment variables from .env file
 load_dotenv()
@@ -98,10 +122,20 @@ async def lifespan(app: FastAPI):
         
         # Start monitoring
         start_monitoring()
+        event_loop_monitor.start()
         
         # Start daily remark reset scheduler
         schedule_daily_reset()
         
+        # Pick up interface checks left unfinished by a restarted worker
+        resume_pending_interface_checks()
+        
+        # Start incremental interface status reconciler
+        interface_reconciler.start()
+        
+        # Upload queue workers inside the API (dedicated processes: upload_worker.py)
+        start_api_upload_workers()
+        
         logger.info("Application started successfully with monitoring enabled")
     except Exception as e:
         logger.error(f"Startup error: {e}")
@@ -111,6 +145,11 @@ async def lifespan(app: FastAPI):
     # Shutdown
     try:
         stop_monitoring()
+        blocking_pool.shutdown()
+        interface_reconciler.stop()
+        upload_worker_stop_event.set()
+        upload_log_writer.flush()
+        db_registry.dispose_all()
         logger.info("Application shutdown gracefully")
     except Exception as e:
         logger.error(f"Shutdown error: {e}")
@@ -158,7 +197,9 @@ async def security_and_performance_middleware(request: Request, call_next):
             response_time=process_time,
             status_code=response.status_code,
             user_agent=request.headers.get("user-agent", ""),
-            ip_address=request.client.host
+            ip_address=request.client.host,
+            # Set by the router on the shared scope once a route matched
+            route=route_template(request.scope)
         )
     except Exception as e:
         logger.error(f"Error tracking performance metrics: {e}")
@@ -224,7 +265,11 @@ os.environ['TZ'] = DEFAULT_TIMEZONE
 # Import database configuration
 from database_config import (
     DB_SERVER, DB_NAME, DB_USERNAME, DB_PASSWORD, DB_TRUSTED_CONNECTION,
-    FLEXO_DB_CONNECTION_STRING, WMSPROD_DB_CONNECTION_STRING
+    FLEXO_DB_CONNECTION_STRING, WMSPROD_DB_CONNECTION_STRING,
+    EXTERNAL_LOOKUP_MODE, EXTERNAL_LOOKUP_FETCH_SIZE,
+    EXTERNAL_LOOKUP_MAX_WORKERS, EXTERNAL_LOOKUP_CONCURRENCY, EXTERNAL_QUERY_TIMEOUT,
+    INTERFACE_CHECK_WORKERS, INTERFACE_CHECK_BATCH_SIZE,
+    UPLOAD_MAX_ATTEMPTS, UPLOAD_HEARTBEAT_INTERVAL, UPLOAD_QUEUE_POLL_INTERVAL, UPLOAD_WORKERS_IN_API
 )
 
 # Alternative connection strings for different ODBC drivers
@@ -275,7 +320,7 @@ def convert_to_naive_wib(dt):
 def get_pic_upload_counts(db, start_datetime=None, end_datetime=None):
     """Get file upload counts per PIC with optional date filtering - using UpdateUploadedOrder to avoid duplicates"""
     try:
-        # Build the base query using clean_orders view
+        # Build the base query using clean_orders table
         base_query = "SELECT \"PIC\", COUNT(*) as count FROM clean_orders WHERE \"PIC\" IS NOT NULL"
         params = {}
         
@@ -303,9 +348,9 @@ def get_pic_upload_counts(db, start_datetime=None, end_datetime=None):
         return []
 
 def get_batch_upload_counts(db, start_datetime=None, end_datetime=None):
-    """Get file upload counts per batch with optional date filtering - using clean_orders view to avoid duplicates"""
+    """Get file upload counts per batch with optional date filtering - using clean_orders table to avoid duplicates"""
     try:
-        # Build the base query using clean_orders view
+        # Build the base query using clean_orders table
         base_query = "SELECT \"Batch\", COUNT(*) as count FROM clean_orders WHERE \"Batch\" IS NOT NULL"
         params = {}
         
@@ -345,6 +390,7 @@ security = HTTPBearer()
 # Database setup with connection pooling and optimization
 # PostgreSQL ONLY - No SQLite fallback
 from database_config import POSTGRES_DATABASE_URL
+from db_registry import db_registry
 
 # Force PostgreSQL mode - no fallback
 POSTGRES_HOST = os.getenv("POSTGRES_HOST", "localhost").strip()
@@ -353,29 +399,14 @@ if not POSTGRES_HOST:
 
 SQLALCHEMY_DATABASE_URL = POSTGRES_DATABASE_URL
 
-# Production vs Development pool settings
-if ENVIRONMENT == "production":
-    # Production: Smaller pool per worker (4 workers total)
-    POOL_SIZE = 5
-    MAX_OVERFLOW = 10
-else:
-    # Development: Larger pool for single worker
-    POOL_SIZE = 10
-    MAX_OVERFLOW = 20
-
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL,
-    pool_size=POOL_SIZE,
-    max_overflow=MAX_OVERFLOW,
-    pool_pre_ping=True,
-    pool_recycle=300,  # Recycle connections after 5 minutes (reduced from 1 hour)
-    pool_timeout=30,  # Reduced timeout for getting connection
-    echo=False,  # Set to True for SQL debugging
-    connect_args={
-        "options": "-c statement_timeout=300000"  # 5 minutes statement timeout
-    }
-)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Engines come from the shared registry: request handlers use the "api" pool, background jobs
+# (upload processing, interface checks, reconciler, scheduler) the "background" pool and
+# heavy reads the "reporting" pool, so one kind of work cannot starve the others of connections
+engine = db_registry.engine("api")
+SessionLocal = db_registry.session_factory("api")
+background_engine = db_registry.engine("background")
+BackgroundSessionLocal = db_registry.session_factory("background")
+reporting_engine = db_registry.engine("reporting")
 Base = declarative_base()
 
 # Models
@@ -395,7 +426,7 @@ class UploadedOrder(Base):
     Id = Column(Integer, primary_key=True, index=True)
     Marketplace = Column(Text, index=True)
     Brand = Column(Text, index=True)
-    OrderNumber = Column(Text, unique=True, index=True)  # Add unique constraint
+    OrderNumber = Column(Text, index=True)  # Unique per order: kept by order_writer (table is partitioned by UploadDate)
     OrderStatus = Column(Text)
     AWB = Column(Text, index=True)
     Transporter = Column(Text)
@@ -411,6 +442,10 @@ class UploadedOrder(Base):
     OrderStatusFlexo = Column(Text)  # Flexo order status field (already exists)
     ItemId = Column(Text)  # Marketplace-specific SKU field
     ItemIdFlexo = Column(Text)  # ItemId from Flexo_Db.dbo.SalesOrderLine
+    InterfaceNextCheckAt = Column(DateTime)  # Next reconciler re-check for 'Not Yet Interface' orders
+    InterfaceCheckAttempts = Column(Integer, default=0)  # Re-checks so far (drives the backoff)
+    NormalizedOrderStatus = Column(Text)  # Set by trigger from order_status_normalization
+    IsCancelled = Column(Boolean, nullable=False, default=False)  # Set by trigger; filter on this instead of status lists
 
 
 class ListBrand(Base):
@@ -505,6 +540,14 @@ class UploadTask(Base):
     processing_time = Column(String)
     external_db_query_time = Column(String)
     error_message = Column(Text)
+    interface_check_status = Column(String)  # pending, running, completed, failed (second upload phase)
+    interface_checked_orders = Column(Integer, default=0)
+    attempts = Column(Integer, default=0)  # Upload queue: claims so far
+    max_attempts = Column(Integer, default=3)
+    worker_id = Column(String)  # Upload queue worker currently holding the task
+    heartbeat_at = Column(DateTime)
+    available_at = Column(DateTime)  # Earliest time a retried task may be claimed again
+    started_at = Column(DateTime)
     created_at = Column(DateTime, default=get_wib_now)
     updated_at = Column(DateTime, default=get_wib_now, onupdate=get_wib_now)
     completed_at = Column(DateTime)
@@ -760,6 +803,14 @@ def create_upload_tasks_table():
                         processing_time VARCHAR,
                         external_db_query_time VARCHAR,
                         error_message TEXT,
+                        interface_check_status VARCHAR,
+                        interface_checked_orders INTEGER DEFAULT 0,
+                        attempts INTEGER DEFAULT 0,
+                        max_attempts INTEGER DEFAULT 3,
+                        worker_id VARCHAR,
+                        heartbeat_at TIMESTAMP WITH TIME ZONE,
+                        available_at TIMESTAMP WITH TIME ZONE,
+                        started_at TIMESTAMP WITH TIME ZONE,
                         created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
                         updated_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP,
                         completed_at TIMESTAMP WITH TIME ZONE
@@ -768,35 +819,80 @@ def create_upload_tasks_table():
                 conn.commit()
                 logger.info("Created upload_tasks table")
             else:
+                # Columns added for the background interface-check phase
+                conn.execute(text("ALTER TABLE upload_tasks ADD COLUMN IF NOT EXISTS interface_check_status VARCHAR"))
+                conn.execute(text("ALTER TABLE upload_tasks ADD COLUMN IF NOT EXISTS interface_checked_orders INTEGER DEFAULT 0"))
+                # Columns used by the upload job queue
+                conn.execute(text("ALTER TABLE upload_tasks ADD COLUMN IF NOT EXISTS attempts INTEGER DEFAULT 0"))
+                conn.execute(text("ALTER TABLE upload_tasks ADD COLUMN IF NOT EXISTS max_attempts INTEGER DEFAULT 3"))
+                conn.execute(text("ALTER TABLE upload_tasks ADD COLUMN IF NOT EXISTS worker_id VARCHAR"))
+                conn.execute(text("ALTER TABLE upload_tasks ADD COLUMN IF NOT EXISTS heartbeat_at TIMESTAMP WITH TIME ZONE"))
+                conn.execute(text("ALTER TABLE upload_tasks ADD COLUMN IF NOT EXISTS available_at TIMESTAMP WITH TIME ZONE"))
+                conn.execute(text("ALTER TABLE upload_tasks ADD COLUMN IF NOT EXISTS started_at TIMESTAMP WITH TIME ZONE"))
+                conn.commit()
                 logger.info("upload_tasks table already exists")
+            
+            # Queue claim scans only runnable tasks
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_upload_tasks_queue
+                ON upload_tasks (created_at, id) WHERE status = 'pending'
+            """))
+            
+            # Upload logs are shared through the database because uploads run in queue workers
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS upload_task_logs (
+                    id BIGSERIAL PRIMARY KEY,
+                    task_id VARCHAR NOT NULL,
+                    level VARCHAR(16),
+                    message TEXT,
+                    created_at TIMESTAMP WITH TIME ZONE DEFAULT CURRENT_TIMESTAMP
+                )
+            """))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_upload_task_logs_task_id ON upload_task_logs (task_id, id)"))
+            conn.commit()
+            
+            # Lets the interface-check phase find the orders of a task that still need checking
+            conn.execute(text("""
+                CREATE INDEX IF NOT EXISTS idx_uploaded_orders_pending_check
+                ON uploaded_orders ("TaskId") WHERE "InterfaceStatus" = 'Pending Check'
+            """))
+            conn.commit()
     except Exception as e:
         logger.info(f"upload_tasks table creation info: {str(e)}")
 
 # Create upload_tasks table
 create_upload_tasks_table()
 
-# In-memory cache for frequently accessed data
-cache = {}
-CACHE_TTL = 300  # 5 minutes
-
-def get_cache_key(*args):
-    """Generate cache key from arguments"""
-    key_string = "|".join(str(arg) for arg in args)
-    return hashlib.md5(key_string.encode()).hexdigest()
-
-def get_cached_data(key):
-    """Get data from cache if not expired"""
-    if key in cache:
-        data, timestamp = cache[key]
-        if time.time() - timestamp < CACHE_TTL:
-            return data
-        else:
-            del cache[key]
-    return None
+# Materialized "NormalizedOrderStatus" / "IsCancelled" (before clean_orders, which copies them)
+ensure_order_status_schema(engine)
+
+# clean_orders: trigger-maintained table with the newest upload per order
+ensure_clean_orders_table(engine)
+
+# Order number keys + upcoming monthly partitions of uploaded_orders (partitioned by migration 0003)
+ensure_order_partitions(engine, get_wib_now().date())
+
+# Dashboard rollup: order counts per day/brand/marketplace/batch/PIC/status, trigger-maintained
+ensure_order_rollup_table(engine)
+
+# Filter facets: per-day co-occurrence counts of the order list filter dimensions, maintained from clean_orders
+ensure_order_facets_table(engine)
+
+# Unique (day, brand, marketplace, batch) key of not_uploaded_history
+ensure_not_uploaded_history_key(engine)
+
+# Tags of the cached datasets each kind of write changes (see response_cache.CACHE_TAGS)
+ORDER_WRITE_TAGS = ("orders", "dashboard")
+BRAND_SHOP_WRITE_TAGS = ("brand_shops",)
+LIST_BRAND_WRITE_TAGS = ("list_brand", "dashboard")
+BRAND_ACCOUNT_WRITE_TAGS = ("brand_accounts",)
 
-def set_cached_data(key, data):
-    """Set data in cache with timestamp"""
-    cache[key] = (data, time.time())
+def invalidate_cache(*tags):
+    """Invalidate cached responses of these datasets after a committed write"""
+    try:
+        response_cache.invalidate(*tags)
+    except Exception as e:
+        logger.warning(f"Response cache invalidation failed for {tags}: {e}")
 
 @lru_cache(maxsize=128)
 def get_marketplace_mapping_cached(sales_channel: str):
@@ -842,29 +938,14 @@ def parse_date_flexible(date_string: str) -> datetime:
     raise ValueError(f"Invalid date format: {date_string}. Expected ISO format or YYYY-MM-DD")
 
 def create_clean_orders_view(db):
-    """Create a view for clean orders data (deduplicated)"""
-    try:
-        # Drop view if exists
-        db.execute(text("DROP VIEW IF EXISTS clean_orders"))
-        
-        # Create view for clean orders (deduplicated)
-        create_view_sql = """
-        CREATE VIEW clean_orders AS
-        SELECT DISTINCT ON ("OrderNumber") 
-            "Id", "Marketplace", "Brand", "OrderNumber", "OrderStatus", "AWB", "Transporter", 
-            "OrderDate", "SLA", "Batch", "PIC", "UploadDate", "Remarks", "InterfaceStatus", "TaskId", 
-            "OrderNumberFlexo", "OrderStatusFlexo"
-        FROM uploaded_orders
-        ORDER BY "OrderNumber", "UploadDate" DESC;
-        """
-        
-        db.execute(text(create_view_sql))
-        db.commit()
-        print("✅ View 'clean_orders' created successfully")
+    """Rebuild the clean_orders table (deduplicated orders) from uploaded_orders"""
+    try:
+        count = rebuild_clean_orders(db)
+        print(f"✅ Table 'clean_orders' rebuilt with {count} orders")
         return True
         
     except Exception as e:
-        print(f"❌ Error creating view: {e}")
+        print(f"❌ Error rebuilding clean_orders: {e}")
         db.rollback()
         return False
 
@@ -884,6 +965,12 @@ def get_db():
         except Exception as close_error:
             logger.error(f"Error closing database connection: {str(close_error)}")
 
+def read_tabular_upload(file_content: bytes, filename: str) -> pd.DataFrame:
+    """Parse an uploaded .xlsx/.csv file (blocking: async handlers call it through run_blocking)"""
+    if filename.endswith('.xlsx'):
+        return pd.read_excel(io.BytesIO(file_content))
+    return pd.read_csv(io.BytesIO(file_content))
+
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
     try:
         payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
@@ -894,9 +981,16 @@ def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(securit
     except jwt.PyJWTError:
         raise HTTPException(status_code=401, detail="Invalid token")
 
+class UploadValidationError(Exception):
+    """Upload problem caused by the file itself; retrying the task cannot fix it"""
+
 # Background processing functions
-def process_upload_background(task_id: str, file_content: bytes, filename: str, current_user: str):
-    """Background function to process upload with user-specific workspace"""
+def process_upload_background(task_id: str, file_source, filename: str, current_user: str, raise_errors: bool = False):
+    """Background function to process upload with user-specific workspace
+
+    file_source is the spooled file path (or the raw bytes). With raise_errors, failures other
+    than UploadValidationError are re-raised instead of failing the task, so the queue can retry.
+    """
     total_start_time = datetime.now()
     db = None  # Initialize to None to prevent UnboundLocalError in finally block
     
@@ -905,7 +999,7 @@ def process_upload_background(task_id: str, file_content: bytes, filename: str,
         add_upload_log(task_id, "info", f"🚀 Starting upload process for file: {filename}")
         
         # Initialize database and setup
-        db = SessionLocal()
+        db = BackgroundSessionLocal()
         task = db.query(UploadTask).filter(UploadTask.task_id == task_id).first()
         if task:
             task.status = "processing"
@@ -919,29 +1013,20 @@ def process_upload_background(task_id: str, file_content: bytes, filename: str,
         filename_info = parse_filename(filename)
         if not filename_info:
             add_upload_log(task_id, "error", "❌ Invalid filename format")
-            raise Exception("Invalid filename format")
+            raise UploadValidationError("Invalid filename format")
         
         add_upload_log(task_id, "info", f"📊 Processing: {filename_info['brand']} - {filename_info['sales_channel']} - Batch {filename_info['batch']}")
         
-        # Read file - ULTRA-OPTIMIZED with fastest engine
-        add_upload_log(task_id, "info", "📖 Reading file...")
-        if filename.endswith('.xlsx'):
-            # Use openpyxl directly for maximum speed
-            df = pd.read_excel(io.BytesIO(file_content), engine='openpyxl')
-        elif filename.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(file_content), encoding='utf-8')
-        else:
-            add_upload_log(task_id, "error", "❌ Unsupported file format")
-            raise Exception("Unsupported file format")
-        
-        add_upload_log(task_id, "info", f"✅ File read successfully: {len(df)} rows")
-        
         # Marketplace mapping and validation
         sales_channel = filename_info['sales_channel']
         marketplace_mapping = get_marketplace_mapping(sales_channel)
         
         if not marketplace_mapping:
-            raise Exception(f"Unsupported sales channel: {sales_channel}")
+            raise UploadValidationError(f"Unsupported sales channel: {sales_channel}")
+        
+        if not filename.endswith(('.xlsx', '.csv')):
+            add_upload_log(task_id, "error", "❌ Unsupported file format")
+            raise UploadValidationError("Unsupported file format")
         
         brand_name = filename_info['brand']
         
@@ -962,34 +1047,46 @@ def process_upload_background(task_id: str, file_content: bytes, filename: str,
         db.add(upload_history)
         db.commit()
         
-        add_upload_log(task_id, "info", f"🔄 Processing {len(df)} rows")
+        # Pre-process date for Tokopedia
+        tokopedia_date = None
+        if sales_channel.lower() == 'tokopedia':
+            try:
+                date_str = filename_info['date']
+                tokopedia_date = datetime.strptime(date_str, '%Y%m%d')
+                tokopedia_date = WIB_TIMEZONE.localize(tokopedia_date)
+            except:
+                tokopedia_date = current_time
         
-        # Field mappings
+        # STREAMING READ: only the columns named in MARKETPLACE_MAPPINGS are parsed,
+        # rows are grouped into order records batch by batch instead of a full DataFrame
+        add_upload_log(task_id, "info", "📖 Reading file...")
+        reader = StreamingOrderReader(
+            file_source,
+            filename,
+            marketplace_mapping,
+            base_record={
+                'Marketplace': sales_channel,
+                'Brand': brand_name,
+                'Batch': batch_name,
+                'PIC': current_user,
+                'UploadDate': current_time,
+                'TaskId': task_id,
+                'InterfaceStatus': PENDING_CHECK_STATUS,
+                'ItemIdFlexo': None
+            },
+            current_time=current_time,
+            default_order_date=tokopedia_date,
+            convert_date=convert_to_wib
+        )
+        available_columns = reader.open()
         order_number_col = marketplace_mapping['order_number']
-        order_status_col = marketplace_mapping['order_status']
-        order_date_col = marketplace_mapping['order_date']
-        warehouse_col = marketplace_mapping['wh_loc']
-        awb_col = marketplace_mapping['awb']
-        transporter_col = marketplace_mapping['transporter']
-        sla_col = marketplace_mapping['sla']
-        sku_col = marketplace_mapping.get('sku_field')
         
         # Check required columns for this marketplace
-        available_columns = list(df.columns)
-        required_columns = {
-            'order_number': marketplace_mapping.get('order_number'),
-            'order_status': marketplace_mapping.get('order_status'),
-            'order_date': marketplace_mapping.get('order_date'),
-            'awb': marketplace_mapping.get('awb')
-        }
-        
-        missing_columns = []
-        for field, expected_name in required_columns.items():
-            if expected_name and expected_name not in df.columns:
-                missing_columns.append(expected_name)
+        missing_columns = reader.missing_columns()
         
         # If missing critical columns, stop processing and show informative error
         if missing_columns:
+            reader.close()
             error_msg = f"❌ Missing required columns in Excel file for {sales_channel.upper()}:"
             add_upload_log(task_id, "error", error_msg)
             for missing_col in missing_columns:
@@ -1008,20 +1105,31 @@ def process_upload_background(task_id: str, file_content: bytes, filename: str,
                 task.completed_at = get_wib_now()
                 db.commit()
             
-            raise Exception(f"Missing required columns for {sales_channel}: {', '.join(missing_columns)}")
+            raise UploadValidationError(f"Missing required columns for {sales_channel}: {', '.join(missing_columns)}")
         
         add_upload_log(task_id, "info", f"✅ All required columns found for {sales_channel.upper()}")
         
-        # Vectorized field extraction
-        order_numbers = df[order_number_col].fillna('').astype(str) if order_number_col in df.columns else pd.Series([''] * len(df))
+        # TWO-PHASE UPLOAD: orders are saved as 'Pending Check' now; the interface check against
+        # SQL Server runs afterwards in run_interface_check_stage and reports on the same task.
+        # BULK WRITE per batch (COPY into a staging table, set-based UPDATE + INSERT) while the
+        # reader thread parses the next one; an order repeated on a later row only adds its SKUs
+        write_start = datetime.now()
+        new_count = 0
+        replaced_count = 0
+        for order_batch in prefetch_batches(reader.iter_batches()):
+            write_result = upsert_uploaded_orders(db, order_batch)
+            new_count += write_result['inserted']
+            replaced_count += write_result['replaced']
+        # One commit for the whole file, so a failed upload leaves no half-written orders behind
+        db.commit()
+        write_time = (datetime.now() - write_start).total_seconds()
+        total_uploaded = new_count + replaced_count
         
-        # Check for empty order numbers
-        non_empty_count = sum(1 for order_num in order_numbers if order_num and order_num != 'nan' and order_num.strip())
-        empty_count = len(order_numbers) - non_empty_count
+        add_upload_log(task_id, "info", f"✅ File read successfully: {reader.rows_read} rows")
         
-        if non_empty_count == 0:
+        if not total_uploaded:
             add_upload_log(task_id, "error", f"❌ No valid order numbers found in '{order_number_col}' column")
-            add_upload_log(task_id, "error", f"📊 Total rows: {len(order_numbers)}, Valid orders: {non_empty_count}, Empty/Invalid: {empty_count}")
+            add_upload_log(task_id, "error", f"📊 Total rows: {reader.rows_read}, Valid orders: 0, Empty/Invalid: {reader.empty_order_rows}")
             add_upload_log(task_id, "error", f"💡 Please ensure the '{order_number_col}' column contains valid order numbers")
             
             # Update task as failed
@@ -1031,368 +1139,35 @@ def process_upload_background(task_id: str, file_content: bytes, filename: str,
                 task.completed_at = get_wib_now()
                 db.commit()
             
-            raise Exception(f"No valid order numbers found in {order_number_col} column")
-        
-        add_upload_log(task_id, "info", f"📊 Found {non_empty_count} valid order numbers out of {len(order_numbers)} rows")
-        order_statuses = df[order_status_col].fillna('').astype(str) if order_status_col in df.columns else pd.Series([''] * len(df))
-        order_dates = df[order_date_col].fillna('') if order_date_col in df.columns else pd.Series([''] * len(df))
-        warehouses = df[warehouse_col].fillna('').astype(str) if warehouse_col in df.columns else pd.Series([''] * len(df))
-        awbs = df[awb_col].fillna('').astype(str) if awb_col in df.columns else pd.Series([''] * len(df))
-        transporters = df[transporter_col].fillna('').astype(str) if transporter_col in df.columns else pd.Series([''] * len(df))
-        slas = df[sla_col].fillna('').astype(str) if sla_col in df.columns else pd.Series([''] * len(df))
-        skus = df[sku_col].fillna('').astype(str) if sku_col and sku_col in df.columns else pd.Series([''] * len(df))
+            raise UploadValidationError(f"No valid order numbers found in {order_number_col} column")
         
-        # Group by OrderNumber to handle multiple items per order (vectorized)
-        order_skus = defaultdict(list)
-        if sku_col and sku_col in df.columns:
-            # Vectorized approach for better performance
-            valid_mask = (order_numbers != '') & (order_numbers != 'nan') & (skus != '') & (skus != 'nan')
-            valid_data = df[valid_mask]
-            if not valid_data.empty:
-                for order_num, sku in zip(valid_data[order_number_col], valid_data[sku_col]):
-                    order_num = str(order_num).strip()
-                    sku = str(sku).strip()
-                    if order_num and sku and sku not in order_skus[order_num]:
-                        order_skus[order_num].append(sku)
-        
-        # Pre-process date for Tokopedia
-        tokopedia_date = None
-        if sales_channel.lower() == 'tokopedia':
-            try:
-                date_str = filename_info['date']
-                tokopedia_date = datetime.strptime(date_str, '%Y%m%d')
-                tokopedia_date = WIB_TIMEZONE.localize(tokopedia_date)
-            except:
-                tokopedia_date = current_time
-        
-        # OPTIMIZED APPROACH: Vectorized operations for maximum performance
-        
-        # Vectorized data preparation - much faster than row-by-row
-        valid_mask = (order_numbers != '') & (order_numbers != 'nan') & (order_numbers.notna())
-        valid_df = df[valid_mask].copy()
-        
-        if len(valid_df) == 0:
-            add_upload_log(task_id, "error", "❌ No valid order numbers found")
-            raise Exception("No valid order numbers found")
-        
-        # Vectorized date processing - OPTIMIZED
-        if sales_channel.lower() == 'tokopedia':
-            # Use tokopedia_date for all orders if no dates provided
-            date_mask = valid_df[order_date_col].isna() | (valid_df[order_date_col] == '')
-            valid_df.loc[date_mask, 'processed_date'] = tokopedia_date
-            valid_df.loc[~date_mask, 'processed_date'] = pd.to_datetime(
-                valid_df.loc[~date_mask, order_date_col], 
-                dayfirst=True, 
-                errors='coerce'
-            ).apply(lambda x: convert_to_wib(x) if pd.notna(x) else current_time)
-        else:
-            # Vectorized date conversion for other marketplaces
-            valid_df['processed_date'] = pd.to_datetime(
-                valid_df[order_date_col], 
-                dayfirst=True, 
-                errors='coerce'
-            ).apply(lambda x: convert_to_wib(x) if pd.notna(x) else current_time)
-        
-        # Vectorized data extraction - OPTIMIZED
-        valid_df['processed_order_number'] = valid_df[order_number_col].astype(str).str.strip()
-        valid_df['processed_order_status'] = valid_df[order_status_col].fillna('').astype(str)
-        valid_df['processed_awb'] = valid_df[awb_col].fillna('').astype(str) if awb_col and awb_col in valid_df.columns else ''
-        valid_df['processed_transporter'] = valid_df[transporter_col].fillna('').astype(str) if transporter_col and transporter_col in valid_df.columns else ''
-        valid_df['processed_sla'] = valid_df[sla_col].fillna('').astype(str) if sla_col and sla_col in valid_df.columns else ''
-        valid_df['processed_sku'] = valid_df[sku_col].fillna('').astype(str) if sku_col and sku_col in valid_df.columns else ''
-        
-        # OPTIMIZED: Use pandas groupby for much faster grouping
-        def aggregate_skus(series):
-            """Aggregate SKUs for the same order number"""
-            valid_skus = series[series != ''].dropna().unique()
-            return ','.join(valid_skus) if len(valid_skus) > 0 else None
-        
-        # Group by OrderNumber and aggregate - VECTORIZED & FAST
-        grouped_df = valid_df.groupby('processed_order_number').agg({
-            'processed_order_status': 'first',
-            'processed_awb': 'first', 
-            'processed_transporter': 'first',
-            'processed_date': 'first',
-            'processed_sla': 'first',
-            'processed_sku': aggregate_skus
-        }).reset_index()
-        
-        # Convert to list of dictionaries - OPTIMIZED
-        all_order_data = []
-        for _, row in grouped_df.iterrows():
-            order_data = {
-                'Marketplace': sales_channel,
-                'Brand': brand_name,
-                'OrderNumber': row['processed_order_number'],
-                'OrderStatus': row['processed_order_status'],
-                'AWB': row['processed_awb'],
-                'Transporter': row['processed_transporter'],
-                'OrderDate': row['processed_date'],
-                'SLA': row['processed_sla'],
-                'Batch': batch_name,
-                'PIC': current_user,
-                'UploadDate': current_time,
-                'TaskId': task_id,
-                'ItemId': row['processed_sku'],
-                'ItemIdFlexo': None
-            }
-            all_order_data.append(order_data)
-        
-        # OPTIMIZED logging - only log once
-        add_upload_log(task_id, "info", f"📊 Processed {len(df)} rows → {len(all_order_data)} unique orders (vectorized)")
-        
-        # STEP 10: Interface checking - OPTIMIZED WITH TIMEOUT PROTECTION
-        add_upload_log(task_id, "info", "🔍 Starting optimized interface status checking...")
-        
-        # OPTIMIZED: Vectorized marketplace grouping
-        marketplace_series = pd.Series([order['Marketplace'] for order in all_order_data])
-        order_number_series = pd.Series([order['OrderNumber'] for order in all_order_data])
-        
-        # Group orders by marketplace - VECTORIZED
-        orders_by_marketplace = {}
-        for marketplace in marketplace_series.unique():
-            mask = marketplace_series == marketplace
-            orders_by_marketplace[marketplace] = [
-                order for i, order in enumerate(all_order_data) if mask.iloc[i]
-            ]
-        
-        # Check interface status for each marketplace with optimized chunking
-        interface_results = {}
-        total_orders = len(all_order_data)
-        
-        # ADAPTIVE: Dynamic chunk size based on total orders
-        if total_orders < 500:
-            EXTERNAL_CHUNK_SIZE = 100
-        elif total_orders < 2000:
-            EXTERNAL_CHUNK_SIZE = 200
-        elif total_orders < 10000:
-            EXTERNAL_CHUNK_SIZE = 500
-        else:
-            EXTERNAL_CHUNK_SIZE = 1000  # Large files: bigger chunks for efficiency
-        
-        add_upload_log(task_id, "info", f"🚀 Processing {total_orders} orders with adaptive chunk size: {EXTERNAL_CHUNK_SIZE}")
-        
-        for marketplace, marketplace_orders in orders_by_marketplace.items():
-            # Extract order numbers for this marketplace
-            order_numbers_list = [order['OrderNumber'] for order in marketplace_orders if order['OrderNumber']]
-            
-            if order_numbers_list:
-                total_chunks = (len(order_numbers_list) + EXTERNAL_CHUNK_SIZE - 1) // EXTERNAL_CHUNK_SIZE
-                
-                # OPTIMIZED: Only log for large datasets or when significant progress
-                if total_chunks > 1:
-                    add_upload_log(task_id, "info", f"📊 Processing {len(order_numbers_list)} orders for {marketplace} in {total_chunks} chunks (chunk size: {EXTERNAL_CHUNK_SIZE})")
-                
-                for i in range(0, len(order_numbers_list), EXTERNAL_CHUNK_SIZE):
-                    chunk_order_numbers = order_numbers_list[i:i + EXTERNAL_CHUNK_SIZE]
-                    chunk_num = (i // EXTERNAL_CHUNK_SIZE) + 1
-                    
-                    # Progress logging for large uploads (every chunk for files >5000 orders)
-                    if total_orders > 5000:
-                        add_upload_log(task_id, "info", f"🔄 {marketplace} - Processing chunk {chunk_num}/{total_chunks} ({len(chunk_order_numbers)} orders)...")
-                    
-                    try:
-                        # Add timeout protection using threading.Timer
-                        import threading
-                        import time
-                        
-                        chunk_interface_results = {}
-                        timeout_occurred = threading.Event()
-                        
-                        def check_with_timeout():
-                            nonlocal chunk_interface_results
-                            try:
-                                chunk_interface_results = check_interface_status(chunk_order_numbers, marketplace, EXTERNAL_CHUNK_SIZE)
-                            except Exception as e:
-                                add_upload_log(task_id, "warning", f"⚠️ Interface check error: {str(e)}")
-                        
-                        def timeout_handler():
-                            timeout_occurred.set()
-                        
-                        # Start timeout timer (30 seconds)
-                        timer = threading.Timer(30.0, timeout_handler)
-                        timer.start()
-                        
-                        # Start interface check in thread (daemon=True to prevent memory leak)
-                        check_thread = threading.Thread(target=check_with_timeout, daemon=True)
-                        check_thread.start()
-                        
-                        # Wait for completion or timeout
-                        check_thread.join(timeout=30)
-                        timer.cancel()
-                        
-                        if timeout_occurred.is_set():
-                            add_upload_log(task_id, "warning", f"⚠️ Interface check timeout for chunk after 30 seconds")
-                            chunk_interface_results = {}
-                        
-                        # Ensure thread cleanup
-                        if check_thread.is_alive():
-                            add_upload_log(task_id, "warning", f"⚠️ Check thread still running after timeout, will be cleaned up automatically")
-                        
-                    except Exception as e:
-                        add_upload_log(task_id, "warning", f"⚠️ Interface check failed for chunk: {str(e)}")
-                        chunk_interface_results = {}
-                    
-                    interface_results.update(chunk_interface_results)
-                    
-                    chunk_num = (i // EXTERNAL_CHUNK_SIZE) + 1
-                    # OPTIMIZED: Further reduce logging frequency for better performance
-                    if total_chunks > 5 and (chunk_num % max(1, total_chunks // 3) == 0 or chunk_num == total_chunks):
-                        add_upload_log(task_id, "info", f"📊 Interface check progress: {marketplace} chunk {chunk_num}/{total_chunks}")
-        
-        add_upload_log(task_id, "success", "✅ Interface checking completed with timeout protection")
-        
-        # OPTIMIZED: Database operations with vectorized processing
-        add_upload_log(task_id, "info", f"🚀 Processing {len(all_order_data)} orders for database operations")
-        
-        # OPTIMIZED: Vectorized interface status assignment
-        all_order_numbers = [order_data['OrderNumber'] for order_data in all_order_data]
-        
-        # OPTIMIZED: Bulk query existing orders with improved filtering
-        existing_orders_dict = {}
-        # Always check for duplicates to prevent race conditions and data integrity issues
-        existing_orders = db.query(UploadedOrder).filter(
-            UploadedOrder.OrderNumber.in_(all_order_numbers)
-        ).all()
-        existing_orders_dict = {order.OrderNumber: order for order in existing_orders}
-        
-        # OPTIMIZED: Vectorized interface status processing
-        orders_to_insert = []
-        orders_to_update = []
-        replaced_count = 0
-        new_count = 0
-        
-        # OPTIMIZED: Batch process interface status assignment
-        for order_data in all_order_data:
-            order_number = order_data['OrderNumber']
-            
-            # OPTIMIZED: Simplified interface status assignment
-            if order_number in interface_results:
-                interface_result = interface_results[order_number]
-                interface_status = interface_result.get('status') or interface_result.get('interface_status')
-                
-                # Batch assign interface data
-                order_data.update({
-                    'InterfaceStatus': 'Interface' if interface_status == 'Interface' else 'Not Yet Interface',
-                    'OrderNumberFlexo': interface_result.get('system_ref_id', ''),
-                    'OrderStatusFlexo': interface_result.get('order_status', ''),
-                    'ItemIdFlexo': interface_result.get('item_id_flexo')
-                })
-            else:
-                # Batch assign default values
-                order_data.update({
-                    'InterfaceStatus': 'Not Yet Interface',
-                    'OrderNumberFlexo': '',
-                    'OrderStatusFlexo': '',
-                    'ItemIdFlexo': None
-                })
-            
-            # OPTIMIZED: Categorize for bulk operations
-            if order_number in existing_orders_dict:
-                orders_to_update.append((existing_orders_dict[order_number], order_data))
-                replaced_count += 1
-            else:
-                orders_to_insert.append(order_data)
-                new_count += 1
-        
-        
-        # Bulk insert new orders - OPTIMIZED with single commit
-        if orders_to_insert:
-            try:
-                db.bulk_insert_mappings(UploadedOrder, orders_to_insert)
-                db.commit()  # Single commit for all inserts
-            except Exception as bulk_error:
-                # Fallback to individual inserts for unique constraint violations
-                add_upload_log(task_id, "warning", f"⚠️ Bulk insert failed, falling back to individual inserts: {str(bulk_error)}")
-                db.rollback()
-                failed_orders = []
-                success_count = 0
-                for order_data in orders_to_insert:
-                    try:
-                        new_order = UploadedOrder(**order_data)
-                        db.add(new_order)
-                        db.commit()
-                        success_count += 1
-                    except Exception as e:
-                        db.rollback()
-                        failed_orders.append(order_data['OrderNumber'])
-                        continue
-                
-                # Log summary of fallback results
-                if failed_orders:
-                    add_upload_log(task_id, "warning", f"⚠️ {len(failed_orders)} orders failed to insert (likely duplicates): {', '.join(failed_orders[:5])}{'...' if len(failed_orders) > 5 else ''}")
-                if success_count > 0:
-                    add_upload_log(task_id, "info", f"✅ Successfully inserted {success_count} orders via fallback method")
-        
-        # Bulk update existing orders
-        if orders_to_update:
-            for existing_order, new_data in orders_to_update:
-                existing_order.Marketplace = new_data['Marketplace']
-                existing_order.Brand = new_data['Brand']
-                existing_order.OrderStatus = new_data['OrderStatus']
-                existing_order.AWB = new_data['AWB']
-                existing_order.Transporter = new_data['Transporter']
-                existing_order.OrderDate = new_data['OrderDate']
-                existing_order.SLA = new_data['SLA']
-                existing_order.Batch = new_data['Batch']
-                existing_order.PIC = new_data['PIC']
-                existing_order.UploadDate = new_data['UploadDate']
-                existing_order.InterfaceStatus = new_data['InterfaceStatus']
-                existing_order.TaskId = new_data['TaskId']
-                existing_order.Remarks = new_data.get('Remarks', '')
-                existing_order.OrderNumberFlexo = new_data.get('OrderNumberFlexo') or ''
-                existing_order.OrderStatusFlexo = new_data.get('OrderStatusFlexo') or ''
-                existing_order.ItemId = new_data.get('ItemId')  # ✅ Update ItemId
-                existing_order.ItemIdFlexo = new_data.get('ItemIdFlexo')  # ✅ Update ItemIdFlexo
-                
-        
-        # Commit all operations
-        db.commit()
+        invalidate_cache(*ORDER_WRITE_TAGS)
+        add_upload_log(task_id, "info", f"📊 Processed {reader.rows_read} rows → {total_uploaded} unique orders (streamed)")
+        add_upload_log(task_id, "info", f"💾 Saved {total_uploaded} orders in {write_time:.2f}s ({new_count} new, {replaced_count} replaced)")
         
         # Calculate processing time
         processing_time = (datetime.now() - total_start_time).total_seconds()
         
-        # Count interface vs not interface orders - only for this upload session
-        
-        # Only get orders from this specific upload task
-        uploaded_orders = db.query(UploadedOrder).filter(
-            UploadedOrder.TaskId == task_id
-        ).all()
-        
-        interface_count = sum(1 for order in uploaded_orders if order.InterfaceStatus == 'Interface')
-        not_interface_count = len(uploaded_orders) - interface_count
-        
-        
-        # Initialize result dictionary for response
-        result = {
-            "interface_count": interface_count,
-            "not_interface_count": not_interface_count,
-            "total_orders": len(uploaded_orders),
-            "new_orders": new_count,
-            "replaced_orders": replaced_count
-        }
-        
         # PERFORMANCE OPTIMIZATION: Skip orderlist generation during upload
         # Orderlist will be generated later via manual action or scheduled job
         add_upload_log(task_id, "info", "⚡ Skipping orderlist generation for faster upload...")
         
-        # Set default result for orderlist
-        orderlist_result = {"success": True, "skipped": True}
-        result["orderlist_skipped"] = True
-        
         # Skip auto-run marketplace app since orderlist is not generated
         add_upload_log(task_id, "info", "ℹ️ Auto-run skipped - orderlist generation disabled for performance")
         
-        # Update task as completed
+        # Update task as completed; the interface check is queued as the second phase
         if task:
             task.status = "completed"
-            task.total_orders = len(uploaded_orders)
-            task.processed_orders = len(uploaded_orders)
+            task.total_orders = total_uploaded
+            task.processed_orders = total_uploaded
             task.processing_time = f"{processing_time:.2f}s"
-            task.external_db_query_time = "0.00s"  # Interface check time
+            task.interface_check_status = "pending"
+            task.interface_checked_orders = 0
             task.completed_at = get_wib_now()
             db.commit()
-            add_upload_log(task_id, "success", f"🎉 Upload process completed successfully! {len(uploaded_orders)} orders processed in {processing_time:.2f}s")
+            add_upload_log(task_id, "success", f"🎉 Upload process completed successfully! {total_uploaded} orders processed in {processing_time:.2f}s")
+            add_upload_log(task_id, "info", f"🔍 Interface check queued for {total_uploaded} orders (status: {PENDING_CHECK_STATUS})")
+            start_interface_check(task_id)
         
         # Performance summary
         total_time = (datetime.now() - total_start_time).total_seconds()
@@ -1400,8 +1175,8 @@ def process_upload_background(task_id: str, file_content: bytes, filename: str,
         
         # Update Not Uploaded Items history immediately after successful background upload
         try:
-            save_not_uploaded_history()
-            logger.info(f"Not uploaded items history updated after background upload: {filename_info['brand']}-{filename_info['sales_channel']}-{filename_info['batch']}")
+            refresh_not_uploaded_history(brand_name, sales_channel, batch_name)
+            logger.info(f"Not uploaded items history updated after background upload: {brand_name}-{sales_channel}-{batch_name}")
         except Exception as history_error:
             logger.error(f"Failed to update not uploaded items history after background upload: {str(history_error)}")
             # Don't fail the upload if history update fails
@@ -1413,8 +1188,15 @@ def process_upload_background(task_id: str, file_content: bytes, filename: str,
         add_upload_log(task_id, "error", f"❌ Upload process failed: {str(e)}")
         add_upload_log(task_id, "error", f"🔍 Error details: {error_traceback}")
         
-        # Update task as failed
+        # Transient failures (database, I/O) are left to the upload queue to retry
+        if raise_errors and not isinstance(e, UploadValidationError):
+            if db is not None:
+                db.rollback()
+            raise
+        
+        # Update task as failed (roll back first in case the bulk write left the transaction aborted)
         if 'task' in locals() and task:
+            db.rollback()
             task.status = "failed"
             task.error_message = str(e)
             task.completed_at = get_wib_now()
@@ -1427,6 +1209,99 @@ def process_upload_background(task_id: str, file_content: bytes, filename: str,
                 add_upload_log(task_id, "info", "🔒 Database connection closed properly")
             except Exception as close_error:
                 add_upload_log(task_id, "error", f"❌ Error closing database connection: {str(close_error)}")
+        upload_log_writer.flush()
+
+# Upload job queue workers (dedicated upload_worker.py processes or threads inside the API)
+UPLOAD_LOG_RETENTION_DAYS = 7
+
+def process_queued_upload(job: dict, worker_id: str):
+    """Run one claimed upload task with a heartbeat, then retry, fail or clean up its spool file"""
+    task_id = job['task_id']
+    stop_heartbeat = threading.Event()
+    
+    def send_heartbeats():
+        while not stop_heartbeat.wait(UPLOAD_HEARTBEAT_INTERVAL):
+            heartbeat_db = BackgroundSessionLocal()
+            try:
+                if not multi_user_handler.heartbeat_upload(heartbeat_db, task_id, worker_id, get_wib_now()):
+                    logger.warning(f"Upload task {task_id} is no longer owned by worker {worker_id}")
+            except Exception as e:
+                logger.error(f"Heartbeat failed for upload task {task_id}: {str(e)}")
+            finally:
+                heartbeat_db.close()
+    
+    heartbeat_thread = threading.Thread(target=send_heartbeats, name=f"upload-heartbeat-{task_id}", daemon=True)
+    heartbeat_thread.start()
+    
+    finished = False
+    try:
+        add_upload_log(task_id, "info", f"🧵 Claimed by upload worker {worker_id} (attempt {job['attempts']}/{job['max_attempts']})")
+        if not job['file_path'] or not os.path.exists(job['file_path']):
+            raise FileNotFoundError(f"Spooled upload file not found: {job['file_path']}")
+        
+        process_upload_background(job['task_id'], job['file_path'], job['task_name'], job['pic'], raise_errors=True)
+        finished = True
+    except Exception as e:
+        db = BackgroundSessionLocal()
+        try:
+            retryable = not isinstance(e, FileNotFoundError)
+            finished = multi_user_handler.retry_or_fail_upload(db, task_id, str(e), get_wib_now(), retryable=retryable)
+            if finished:
+                add_upload_log(task_id, "error", f"❌ Upload failed after {job['attempts']} attempt(s): {str(e)}")
+            else:
+                add_upload_log(task_id, "warning", f"🔁 Upload attempt {job['attempts']} failed, task re-queued: {str(e)}")
+        except Exception as queue_error:
+            logger.error(f"Failed to update queue state of upload task {task_id}: {str(queue_error)}")
+        finally:
+            db.close()
+    finally:
+        stop_heartbeat.set()
+        heartbeat_thread.join(timeout=5)
+        if finished:
+            multi_user_handler.remove_spooled_file(job['file_path'])
+
+def run_upload_queue_worker(worker_id: str, stop_event: threading.Event):
+    """Claim and process queued uploads from upload_tasks until stop_event is set"""
+    print(f"🚀 Upload queue worker {worker_id} started")
+    last_maintenance = 0.0
+    while not stop_event.is_set():
+        job = None
+        db = BackgroundSessionLocal()
+        try:
+            # Stale-task reaping is idempotent, so every worker may run it
+            if time.monotonic() - last_maintenance > UPLOAD_HEARTBEAT_INTERVAL:
+                multi_user_handler.requeue_stale_uploads(db, get_wib_now())
+                db.execute(text("DELETE FROM upload_task_logs WHERE created_at < :cutoff"),
+                           {"cutoff": get_wib_now() - timedelta(days=UPLOAD_LOG_RETENTION_DAYS)})
+                db.commit()
+                last_maintenance = time.monotonic()
+            job = multi_user_handler.claim_next_upload(db, worker_id, get_wib_now())
+        except Exception as e:
+            db.rollback()
+            logger.error(f"Upload queue worker {worker_id} could not claim a task: {str(e)}")
+        finally:
+            db.close()
+        
+        if job is None:
+            stop_event.wait(UPLOAD_QUEUE_POLL_INTERVAL)
+            continue
+        process_queued_upload(job, worker_id)
+    # Worker processes exit without running atexit hooks, so queued log lines are written here
+    upload_log_writer.flush()
+    print(f"🛑 Upload queue worker {worker_id} stopped")
+
+upload_worker_stop_event = threading.Event()
+
+def start_api_upload_workers():
+    """Run UPLOAD_WORKERS_IN_API queue worker threads in this API process"""
+    for index in range(UPLOAD_WORKERS_IN_API):
+        worker_id = f"{socket.gethostname()}-{os.getpid()}-api{index}"
+        threading.Thread(
+            target=run_upload_queue_worker,
+            args=(worker_id, upload_worker_stop_event),
+            name=f"upload-queue-{index}",
+            daemon=True
+        ).start()
 
 # Utility functions
 def verify_password(plain_password, hashed_password):
@@ -2521,30 +2396,118 @@ def auto_run_marketplace_app(sales_channel, brand_name, batch_name, user_id=None
             add_marketplace_log(task_id, "error", f"❌ Error auto-running {marketplace} app: {str(e)}")
 
 def get_database_connection(connection_string):
-    """Get database connection with retry logic and multiple connection strings"""
-    connection_strings = [
-        connection_string,
-        connection_string.replace("ODBC Driver 17", "ODBC Driver 18"),
-        connection_string.replace("ODBC Driver 18", "ODBC Driver 17"),
-    ]
-    
-    for i, conn_str in enumerate(connection_strings):
-        try:
-            # Silent connection attempt for better performance
-            conn = pyodbc.connect(conn_str, timeout=30)
-            # Silent connection success for better performance
-            return conn
-        except Exception as e:
-            print(f"❌ Connection attempt {i+1} failed: {str(e)}")
-            if i == len(connection_strings) - 1:  # Last attempt
-                print(f"All connection attempts failed for: {connection_string}")
-                return None
-            continue
+    """Get a pooled database connection (close() returns it to the pool)
+
+    The pool remembers which ODBC driver connected successfully and checks
+    idle connections for liveness before handing them out.
+    """
+    try:
+        return external_db_pools.get_connection(connection_string)
+    except Exception as e:
+        print(f"❌ Could not get pooled connection: {str(e)}")
+        return None
+
+def _collect_external_rows(all_results, rows):
+    """Merge SalesOrder/SalesOrderLine rows into per-order results keyed by the marketplace order number"""
+    for result in rows:
+        merchant_name, system_id, system_ref_id, order_status, order_date, awb, transporter_code, order_number, item_id_flexo, interface_status = result
     
-    return None
+        # Use the original order ID (from Excel) as the key
+        if order_number not in all_results:
+            all_results[order_number] = {
+                'system_id': system_id,
+                'merchant_name': merchant_name,
+                'system_ref_id': system_ref_id,
+                'order_status': order_status,
+                'order_date': order_date,
+                'awb': awb,
+                'transporter_code': transporter_code,
+                'item_id_flexo': [],  # ✅ Collect as list
+                'interface_status': interface_status
+            }
+        
+        if item_id_flexo and item_id_flexo not in all_results[order_number]['item_id_flexo']:
+            all_results[order_number]['item_id_flexo'].append(item_id_flexo)
 
-def check_external_database_status(order_numbers, marketplace, chunk_size=100):
-    """Check order status in external database - OPTIMIZED VERSION with adaptive chunking"""
+def _lookup_external_in_list(cursor, order_numbers, field_mapping, chunk_size, all_results):
+    """IN-list lookup: one round trip per chunk of up to chunk_size parameters"""
+    MAX_PARAMS_PER_QUERY = min(chunk_size, len(order_numbers))  # Adaptive chunk size
+    
+    for i in range(0, len(order_numbers), MAX_PARAMS_PER_QUERY):
+        chunk_order_numbers = order_numbers[i:i + MAX_PARAMS_PER_QUERY]
+        print(f"  Processing chunk {i//MAX_PARAMS_PER_QUERY + 1}: {len(chunk_order_numbers)} orders")
+        
+        # Create placeholders for this chunk
+        placeholders = ','.join(['?' for _ in chunk_order_numbers])
+        
+        # Query external database with both Flexo_Db and WMSPROD, including ItemIdFlexo
+        # All marketplaces use alphanumeric order numbers - no numeric validation needed
+        query = f"""
+        SELECT so.MerchantName, so.SystemId, so.SystemRefId, so.OrderStatus, 
+                   so.OrderDate, so.Awb, so.TransporterCode, so.{field_mapping} as order_number,
+               sol.ItemId as item_id_flexo,
+               CASE WHEN ol.ordnum IS NOT NULL THEN 'Interface' ELSE 'Not Yet Interface' END as interface_status
+        FROM Flexo_Db.dbo.SalesOrder so
+            LEFT JOIN Flexo_Db.dbo.SalesOrderLine sol ON sol.SystemRefId = so.SystemRefId
+            LEFT JOIN WMSPROD.dbo.ord_line ol ON ol.ordnum = so.SystemRefId
+                WHERE so.{field_mapping} IN ({placeholders})
+        """
+    
+        # Execute query for this chunk
+        cursor.execute(query, chunk_order_numbers)
+        _collect_external_rows(all_results, cursor.fetchall())
+
+def _lookup_external_temp_table(cursor, order_numbers, field_mapping, all_results):
+    """Temp-table lookup: bulk-load order numbers into #order_lookup and run a single join
+
+    One plan regardless of how many orders are checked, and rows are streamed back
+    with fetchmany instead of one IN-list query per chunk.
+    """
+    unique_order_numbers = list(dict.fromkeys(str(order_number) for order_number in order_numbers if order_number))
+    
+    cursor.execute("IF OBJECT_ID('tempdb..#order_lookup') IS NOT NULL DROP TABLE #order_lookup")
+    cursor.execute("CREATE TABLE #order_lookup (order_number VARCHAR(255) COLLATE DATABASE_DEFAULT PRIMARY KEY)")
+    try:
+        cursor.fast_executemany = True
+        cursor.executemany(
+            "INSERT INTO #order_lookup (order_number) VALUES (?)",
+            [(order_number,) for order_number in unique_order_numbers]
+        )
+        cursor.fast_executemany = False
+        
+        # ord_line is probed with EXISTS so multiple WMS lines do not multiply the result rows
+        cursor.execute(f"""
+        SELECT so.MerchantName, so.SystemId, so.SystemRefId, so.OrderStatus,
+               so.OrderDate, so.Awb, so.TransporterCode, so.{field_mapping} as order_number,
+               sol.ItemId as item_id_flexo,
+               CASE WHEN EXISTS (SELECT 1 FROM WMSPROD.dbo.ord_line ol WHERE ol.ordnum = so.SystemRefId)
+                    THEN 'Interface' ELSE 'Not Yet Interface' END as interface_status
+        FROM #order_lookup lk
+            JOIN Flexo_Db.dbo.SalesOrder so ON so.{field_mapping} = lk.order_number
+            LEFT JOIN Flexo_Db.dbo.SalesOrderLine sol ON sol.SystemRefId = so.SystemRefId
+        """)
+        
+        while True:
+            rows = cursor.fetchmany(EXTERNAL_LOOKUP_FETCH_SIZE)
+            if not rows:
+                break
+            _collect_external_rows(all_results, rows)
+    finally:
+        # A failed drop must not hide the lookup error; the next lookup drops the table before creating it
+        try:
+            cursor.execute("IF OBJECT_ID('tempdb..#order_lookup') IS NOT NULL DROP TABLE #order_lookup")
+        except pyodbc.Error as drop_error:
+            logger.warning(f"Could not drop #order_lookup: {drop_error}")
+
+def check_external_database_status(order_numbers, marketplace, chunk_size=100, lookup_mode=None, query_timeout=None,
+                                   raise_errors=False):
+    """Check order status in external database - OPTIMIZED VERSION
+
+    lookup_mode 'temp_table' (default, see EXTERNAL_LOOKUP_MODE) joins against a session temp
+    table holding all order numbers; 'in_list' runs one IN (?, ...) query per chunk_size orders.
+    query_timeout (seconds) is enforced by the driver, so a slow query is cancelled server-side.
+    With raise_errors, connection and query failures are raised instead of returning partial results.
+    """
     try:
         # Get the appropriate field mapping for the marketplace
         field_mapping = MARKETPLACE_FIELD_MAPPING.get(marketplace.lower())
@@ -2552,76 +2515,45 @@ def check_external_database_status(order_numbers, marketplace, chunk_size=100):
             print(f"⚠️ No field mapping found for marketplace: {marketplace}")
             return {}
         
-        # Minimize console logs for better performance
-        # Removed external database logging
+        if not order_numbers:
+            return {}
         
-        # ADAPTIVE: Use dynamic chunk size based on upload size
-        MAX_PARAMS_PER_QUERY = min(chunk_size, len(order_numbers))  # Adaptive chunk size
+        lookup_mode = lookup_mode or EXTERNAL_LOOKUP_MODE
         all_results = {}
         
         # Get single connection for all chunks (connection pooling) - OPTIMIZED
         conn = get_database_connection(WMSPROD_DB_CONNECTION_STRING)
         if not conn:
+            if raise_errors:
+                raise ConnectionError("No connection to WMSPROD")
             return {}  # Silent failure for better performance
         
         # Use connection timeout optimization
-        conn.timeout = 10  # Further reduced timeout for faster failure detection
+        conn.timeout = query_timeout or 10  # Further reduced timeout for faster failure detection
         
+        cursor = None
         try:
             cursor = conn.cursor()
             
-            # Process in optimized chunks
-            for i in range(0, len(order_numbers), MAX_PARAMS_PER_QUERY):
-                chunk_order_numbers = order_numbers[i:i + MAX_PARAMS_PER_QUERY]
-                print(f"  Processing chunk {i//MAX_PARAMS_PER_QUERY + 1}: {len(chunk_order_numbers)} orders")
-                
-                # Create placeholders for this chunk
-                placeholders = ','.join(['?' for _ in chunk_order_numbers])
-                
-                # Query external database with both Flexo_Db and WMSPROD, including ItemIdFlexo
-                # All marketplaces use alphanumeric order numbers - no numeric validation needed
-                query = f"""
-                SELECT so.MerchantName, so.SystemId, so.SystemRefId, so.OrderStatus, 
-                           so.OrderDate, so.Awb, so.TransporterCode, so.{field_mapping} as order_number,
-                       sol.ItemId as item_id_flexo,
-                       CASE WHEN ol.ordnum IS NOT NULL THEN 'Interface' ELSE 'Not Yet Interface' END as interface_status
-                FROM Flexo_Db.dbo.SalesOrder so
-                    LEFT JOIN Flexo_Db.dbo.SalesOrderLine sol ON sol.SystemRefId = so.SystemRefId
-                    LEFT JOIN WMSPROD.dbo.ord_line ol ON ol.ordnum = so.SystemRefId
-                        WHERE so.{field_mapping} IN ({placeholders})
-                """
-            
-                # Execute query for this chunk
-                cursor.execute(query, chunk_order_numbers)
-                chunk_results = cursor.fetchall()
-                
-                # Process results for this chunk
-                for result in chunk_results:
-                    merchant_name, system_id, system_ref_id, order_status, order_date, awb, transporter_code, order_number, item_id_flexo, interface_status = result
-                
-                    # Use the original order ID (from Excel) as the key
-                    if order_number not in all_results:
-                        all_results[order_number] = {
-                            'system_id': system_id,
-                            'merchant_name': merchant_name,
-                            'system_ref_id': system_ref_id,
-                            'order_status': order_status,
-                            'order_date': order_date,
-                            'awb': awb,
-                            'transporter_code': transporter_code,
-                            'item_id_flexo': [],  # ✅ Collect as list
-                            'interface_status': interface_status
-                        }
-                    
-                    if item_id_flexo and item_id_flexo not in all_results[order_number]['item_id_flexo']:
-                        all_results[order_number]['item_id_flexo'].append(item_id_flexo)
-                
-                # Silent database query result for better performance
+            if lookup_mode == 'temp_table':
+                try:
+                    _lookup_external_temp_table(cursor, order_numbers, field_mapping, all_results)
+                except pyodbc.Error as temp_table_error:
+                    # e.g. missing tempdb permissions - fall back to chunked IN-list queries
+                    print(f"  ⚠️ Temp-table lookup failed, falling back to IN-list: {temp_table_error}")
+                    conn.rollback()
+                    all_results.clear()
+                    _lookup_external_in_list(cursor, order_numbers, field_mapping, chunk_size, all_results)
+            else:
+                _lookup_external_in_list(cursor, order_numbers, field_mapping, chunk_size, all_results)
                 
         except Exception as e:
             print(f"  ❌ Error processing chunks: {e}")
+            if raise_errors:
+                raise
         finally:
-            cursor.close()
+            if cursor is not None:
+                cursor.close()
             conn.close()
         
         # Convert item_id_flexo lists to comma-separated strings
@@ -2639,6 +2571,8 @@ def check_external_database_status(order_numbers, marketplace, chunk_size=100):
         
     except Exception as e:
         print(f"❌ Error checking external database: {e}")
+        if raise_errors:
+            raise
         return {}
 
 def check_ord_line_status(order_numbers, marketplace):
@@ -2706,19 +2640,43 @@ def check_ord_line_status(order_numbers, marketplace):
         print(f"❌ Error checking ord_line: {str(e)}")
         return {}
 
-def check_interface_status(order_numbers, marketplace, chunk_size=100):
-    """Check interface status by combining external database and ord_line checks - ULTRA-OPTIMIZED with adaptive chunking"""
+def check_interface_status(order_numbers, marketplace, chunk_size=100, query_timeout=None, use_cache=True,
+                           raise_errors=False):
+    """Check interface status by combining external database and ord_line checks - ULTRA-OPTIMIZED with adaptive chunking
+
+    Results are served from interface_status_cache where possible; use_cache=False skips the
+    cache lookup (force refresh) but still stores the fresh results. With raise_errors, a failed
+    external lookup is raised instead of reporting the orders as not interfaced.
+    """
     try:
-        # Minimize console logs for better performance
-        # Removed interface check logging
+        # OPTIMIZED: Only orders without a fresh cached result go to the external database
+        if use_cache:
+            cached_results, lookup_numbers = interface_status_cache.get_many(marketplace, order_numbers)
+        else:
+            cached_results, lookup_numbers = {}, list(order_numbers)
+            interface_status_cache.record_bypass(len(lookup_numbers))
+        
+        if not lookup_numbers:
+            return cached_results
         
         # ULTRA-OPTIMIZATION: Single query with LEFT JOIN (no separate ord_line query needed)
-        external_results = check_external_database_status(order_numbers, marketplace, chunk_size)
+        lookup_failed = False
+        try:
+            external_results = check_external_database_status(
+                lookup_numbers, marketplace, chunk_size, query_timeout=query_timeout, raise_errors=True
+            )
+        except Exception as e:
+            if raise_errors:
+                raise
+            # Keep the old behaviour (orders reported as not interfaced) but never cache a failed lookup
+            print(f"❌ External lookup failed, results will not be cached: {e}")
+            external_results = {}
+            lookup_failed = True
         
         # Process results (ord_line status already included in external_results via LEFT JOIN)
         all_results = {}
         
-        for order_id in order_numbers:
+        for order_id in lookup_numbers:
             external_data = external_results.get(order_id, {})
             
             if external_data:
@@ -2748,15 +2706,243 @@ def check_interface_status(order_numbers, marketplace, chunk_size=100):
                     "ordnum": None
                 }
         
-        # Minimize console logs for better performance
-        # Removed interface check completion logging
+        if not lookup_failed:
+            interface_status_cache.put_many(marketplace, all_results)
+        
+        all_results.update(cached_results)
         return all_results
         
     except Exception as e:
         print(f"❌ Error checking interface status: {str(e)}")
+        if raise_errors:
+            raise
         return {}
 
-def get_interface_status_summary(orders, db):
+# Shared, bounded executor for external SQL Server lookups in this worker process
+external_lookup_executor = ThreadPoolExecutor(max_workers=EXTERNAL_LOOKUP_MAX_WORKERS, thread_name_prefix="external-lookup")
+
+class InterfaceCheckFanOut:
+    """Run interface-status chunks for one marketplace in parallel on the shared executor
+
+    At most max_concurrency chunks of this caller are in flight at once; results are
+    collected (and on_chunk_done is called) as each future finishes. Slow queries are
+    cancelled by the pyodbc query timeout instead of being abandoned in a thread.
+    """
+    
+    def __init__(self, marketplace, chunk_size, max_concurrency=EXTERNAL_LOOKUP_CONCURRENCY,
+                 query_timeout=EXTERNAL_QUERY_TIMEOUT, on_chunk_done=None):
+        self.marketplace = marketplace
+        self.chunk_size = chunk_size
+        self.max_concurrency = max(1, max_concurrency)
+        self.query_timeout = query_timeout
+        self.on_chunk_done = on_chunk_done
+        self.results = {}
+        self.errors = []
+        self.submitted = 0
+        self.completed = 0
+        self._pending = set()
+    
+    def submit(self, order_numbers):
+        """Queue order numbers in chunks, waiting for a free slot when the limit is reached"""
+        for i in range(0, len(order_numbers), self.chunk_size):
+            while len(self._pending) >= self.max_concurrency:
+                self._collect(FIRST_COMPLETED)
+            # A failed chunk is recorded in errors and its orders are left out of the results
+            future = external_lookup_executor.submit(
+                check_interface_status,
+                order_numbers[i:i + self.chunk_size],
+                self.marketplace,
+                self.chunk_size,
+                self.query_timeout,
+                raise_errors=True
+            )
+            self._pending.add(future)
+            self.submitted += 1
+    
+    def _collect(self, return_when):
+        done, self._pending = wait(self._pending, return_when=return_when)
+        for future in done:
+            try:
+                self.results.update(future.result())
+            except Exception as e:
+                self.errors.append(str(e))
+            self.completed += 1
+            if self.on_chunk_done:
+                try:
+                    self.on_chunk_done(self)
+                except Exception as callback_error:
+                    logger.error(f"Interface check progress callback failed: {callback_error}")
+    
+    def finish(self):
+        """Wait for every submitted chunk and return the merged results"""
+        while self._pending:
+            self._collect(FIRST_COMPLETED)
+        return self.results
+
+# Second upload phase: interface checks run after the orders are committed
+PENDING_CHECK_STATUS = 'Pending Check'
+INTERFACE_CHECK_STALE_MINUTES = 10
+interface_check_executor = ThreadPoolExecutor(max_workers=INTERFACE_CHECK_WORKERS, thread_name_prefix="interface-check")
+
+def start_interface_check(task_id):
+    """Queue the interface-check phase of an upload on the background executor"""
+    interface_check_executor.submit(run_interface_check_stage, task_id)
+
+def run_interface_check_stage(task_id: str):
+    """Fill InterfaceStatus and the Flexo fields of a task's 'Pending Check' orders in batches"""
+    stage_start = datetime.now()
+    db = BackgroundSessionLocal()
+    try:
+        # Claim the stage so a duplicate submission (e.g. resumed by another worker) skips it
+        claimed = db.execute(text("""
+            UPDATE upload_tasks
+            SET interface_check_status = 'running', updated_at = :now
+            WHERE task_id = :task_id AND interface_check_status = 'pending'
+            RETURNING id
+        """), {"task_id": task_id, "now": get_wib_now()}).fetchone()
+        db.commit()
+        if not claimed:
+            return
+        
+        pending_total = db.execute(text("""
+            SELECT COUNT(*) FROM uploaded_orders
+            WHERE "TaskId" = :task_id AND "InterfaceStatus" = :pending
+        """), {"task_id": task_id, "pending": PENDING_CHECK_STATUS}).scalar() or 0
+        chunk_size = get_adaptive_chunk_size(pending_total)
+        add_upload_log(task_id, "info", f"🔍 Interface check started for {pending_total} orders (chunk size {chunk_size})")
+        
+        checked_count = 0
+        interface_count = 0
+        failed_count = 0
+        last_id = 0
+        while True:
+            batch = db.execute(text("""
+                SELECT "Id", "OrderNumber", "Marketplace"
+                FROM uploaded_orders
+                WHERE "TaskId" = :task_id AND "InterfaceStatus" = :pending AND "Id" > :last_id
+                ORDER BY "Id"
+                LIMIT :limit
+            """), {
+                "task_id": task_id,
+                "pending": PENDING_CHECK_STATUS,
+                "last_id": last_id,
+                "limit": INTERFACE_CHECK_BATCH_SIZE
+            }).fetchall()
+            if not batch:
+                break
+            last_id = batch[-1][0]
+            
+            order_numbers_by_marketplace = {}
+            for _, order_number, marketplace in batch:
+                order_numbers_by_marketplace.setdefault((marketplace or 'unknown').lower(), []).append(order_number)
+            
+            updates = []
+            for marketplace, order_numbers in order_numbers_by_marketplace.items():
+                fan_out = InterfaceCheckFanOut(marketplace, chunk_size)
+                fan_out.submit(order_numbers)
+                interface_results = fan_out.finish()
+                if fan_out.errors:
+                    add_upload_log(task_id, "warning", f"⚠️ Interface check failed for {len(fan_out.errors)} chunk(s): {fan_out.errors[0]}")
+                
+                for order_number in order_numbers:
+                    interface_result = interface_results.get(order_number)
+                    if interface_result is None:
+                        # Lookup failed: the order stays 'Pending Check' for the next run of the stage
+                        failed_count += 1
+                        continue
+                    is_interface = interface_result.get('status') == 'Interface'
+                    interface_count += 1 if is_interface else 0
+                    updates.append({
+                        'OrderNumber': order_number,
+                        'InterfaceStatus': 'Interface' if is_interface else 'Not Yet Interface',
+                        'OrderNumberFlexo': interface_result.get('system_ref_id'),
+                        'OrderStatusFlexo': interface_result.get('order_status'),
+                        'ItemIdFlexo': interface_result.get('item_id_flexo')
+                    })
+            
+            # Only rows still pending for this task are written (a newer upload may own the order now)
+            apply_interface_results(db, updates, task_id=task_id, expected_status=PENDING_CHECK_STATUS)
+            checked_count += len(updates)
+            db.execute(text("""
+                UPDATE upload_tasks
+                SET interface_checked_orders = :checked, updated_at = :now
+                WHERE task_id = :task_id
+            """), {"task_id": task_id, "checked": checked_count, "now": get_wib_now()})
+            db.commit()
+            invalidate_cache(*ORDER_WRITE_TAGS)
+            add_upload_log(task_id, "info", f"📊 Interface check progress: {checked_count}/{pending_total} orders ({interface_count} interface)")
+        
+        stage_time = (datetime.now() - stage_start).total_seconds()
+        db.execute(text("""
+            UPDATE upload_tasks
+            SET interface_check_status = :status, external_db_query_time = :stage_time, updated_at = :now
+            WHERE task_id = :task_id
+        """), {
+            "task_id": task_id,
+            "status": "failed" if failed_count else "completed",
+            "stage_time": f"{stage_time:.2f}s",
+            "now": get_wib_now()
+        })
+        db.commit()
+        if failed_count:
+            add_upload_log(task_id, "warning", f"⚠️ Interface check incomplete: {failed_count} orders left as {PENDING_CHECK_STATUS}, retried in {INTERFACE_CHECK_STALE_MINUTES} minutes")
+        else:
+            add_upload_log(task_id, "success", f"✅ Interface check completed: {interface_count} interface, {checked_count - interface_count} not yet interface ({stage_time:.2f}s)")
+        
+    except Exception as e:
+        # Orders stay 'Pending Check'; resume_pending_interface_checks (scheduled) retries the stage later
+        db.rollback()
+        add_upload_log(task_id, "error", f"❌ Interface check failed: {str(e)}")
+        try:
+            db.execute(text("""
+                UPDATE upload_tasks SET interface_check_status = 'failed', updated_at = :now
+                WHERE task_id = :task_id
+            """), {"task_id": task_id, "now": get_wib_now()})
+            db.commit()
+        except Exception as status_error:
+            db.rollback()
+            logger.error(f"Failed to mark interface check of {task_id} as failed: {status_error}")
+    finally:
+        db.close()
+        upload_log_writer.flush()
+
+def resume_pending_interface_checks():
+    """Re-queue interface checks that were never started or stopped without finishing"""
+    db = BackgroundSessionLocal()
+    try:
+        # 'running' without progress for a while means the worker that owned it is gone
+        db.execute(text("""
+            UPDATE upload_tasks
+            SET interface_check_status = 'pending'
+            WHERE interface_check_status IN ('running', 'failed') AND updated_at < :stale_before
+        """), {"stale_before": get_wib_now() - timedelta(minutes=INTERFACE_CHECK_STALE_MINUTES)})
+        db.commit()
+        
+        task_ids = [row[0] for row in db.execute(text("""
+            SELECT task_id FROM upload_tasks
+            WHERE status = 'completed' AND interface_check_status = 'pending'
+            ORDER BY completed_at
+        """)).fetchall()]
+        for task_id in task_ids:
+            start_interface_check(task_id)
+        if task_ids:
+            logger.info(f"Resumed interface check for {len(task_ids)} upload task(s)")
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error resuming pending interface checks: {e}")
+    finally:
+        db.close()
+
+# Background reconciler for orders that are still 'Not Yet Interface' after their upload
+interface_reconciler = InterfaceReconciler(
+    background_engine,
+    partial(check_interface_status, raise_errors=True),
+    now_fn=lambda: get_wib_now().replace(tzinfo=None),
+    on_change=lambda: invalidate_cache(*ORDER_WRITE_TAGS)
+)
+interface_reconciler.ensure_schema()
+
+def get_interface_status_summary(orders, db, use_cache=True):
     """Get interface status summary for uploaded orders using real database queries"""
     try:
         interface_orders = []
@@ -2794,7 +2980,7 @@ def get_interface_status_summary(orders, db):
                 continue
             
             # Query database for interface status
-            interface_results = check_interface_status(order_numbers, marketplace)
+            interface_results = check_interface_status(order_numbers, marketplace, use_cache=use_cache)
             
             # Process results
             for order in marketplace_orders:
@@ -2951,11 +3137,47 @@ def get_system_metrics():
         logger.error(f"System metrics error: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to get system metrics: {str(e)}")
 
+@app.get("/metrics/event-loop")
+def get_event_loop_metrics():
+    """Event-loop stall time, blocking thread pool usage and async DB pool usage"""
+    try:
+        return {
+            "event_loop": event_loop_monitor.get_stats(),
+            "blocking_pool": blocking_pool.get_stats(),
+            "async_db_pool": get_async_pool_stats()
+        }
+    except Exception as e:
+        logger.error(f"Event loop metrics error: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get event loop metrics: {str(e)}")
+
+@app.get("/metrics/db-pools")
+def get_db_pool_metrics():
+    """Usage of this process' PostgreSQL pools per purpose (api, background, reporting) and the upload log queue"""
+    try:
+        return {
+            "pools": db_registry.get_stats(),
+            "async_db_pool": get_async_pool_stats(),
+            "upload_log_writer": upload_log_writer.get_stats()
+        }
+    except Exception as e:
+        logger.error(f"DB pool metrics error: {e}")
+        raise HTTPException(status_code=500, detail=f"Failed to get DB pool metrics: {str(e)}")
+
+@app.get("/metrics/cache")
+def get_cache_metrics():
+    """Hit rates, local LRU usage and tag versions of this process' response cache, plus single-flight counts"""
+    return {
+        **response_cache.get_stats(),
+        "single_flight": single_flight.get_stats()
+    }
+
 @app.get("/metrics/api")
-def get_api_metrics():
-    """Get API performance metrics"""
+def get_api_metrics(format: str = Query("json", description="json, or prometheus for the text exposition format")):
+    """Get API performance metrics per route template (latency percentiles in seconds, counts per status)"""
     try:
         from monitoring import metrics_collector
+        if format == "prometheus":
+            return PlainTextResponse(metrics_collector.to_prometheus(), media_type="text/plain; version=0.0.4")
         return {
             "endpoint_stats": dict(metrics_collector.endpoint_stats),
             "error_counts": dict(metrics_collector.error_counts),
@@ -3526,28 +3748,10 @@ def upload_file(
         print("🚀 ULTRA-FAST: Bulk processing with optimized duplicate handling...")
         save_start = datetime.now()
         
-        # Get all order numbers for bulk duplicate check
-        all_order_numbers = [order_data['OrderNumber'] for order_data in all_order_data]
-        
-        # Bulk query existing orders
-        existing_orders_dict = {}
-        if all_order_numbers:
-            existing_orders = db.query(UploadedOrder).filter(
-                UploadedOrder.OrderNumber.in_(all_order_numbers)
-            ).all()
-            existing_orders_dict = {order.OrderNumber: order for order in existing_orders}
-        
-        # Prepare bulk operations
-        orders_to_insert = []
-        orders_to_update = []
-        replaced_count = 0
-        new_count = 0
-        
-        # Categorize orders
+        # Set interface status and Flexo data based on external database check
         for order_data in all_order_data:
             order_number = order_data['OrderNumber']
             
-            # Set interface status and Flexo data based on external database check
             if order_number in interface_results:
                 interface_result = interface_results[order_number]
                 interface_status = interface_result.get('status') or interface_result.get('interface_status')  # ✅ Fix: Handle both keys
@@ -3568,59 +3772,15 @@ def upload_file(
                 order_data['OrderNumberFlexo'] = ''
                 order_data['OrderStatusFlexo'] = ''
                 order_data['ItemIdFlexo'] = None  # ✅ ItemIdFlexo tetap None jika tidak ada
-            
-            if order_number in existing_orders_dict:
-                # Prepare for update
-                existing_order = existing_orders_dict[order_number]
-                orders_to_update.append((existing_order, order_data))
-                replaced_count += 1
-            else:
-                # Prepare for insert
-                orders_to_insert.append(order_data)
-                new_count += 1
-        
-        
-        # Bulk insert new orders - OPTIMIZED with single commit
-        if orders_to_insert:
-            try:
-                db.bulk_insert_mappings(UploadedOrder, orders_to_insert)
-                db.commit()  # Single commit for all inserts
-            except Exception:
-                # Fallback to individual inserts for unique constraint violations
-                db.rollback()
-                for order_data in orders_to_insert:
-                    try:
-                        new_order = UploadedOrder(**order_data)
-                        db.add(new_order)
-                        db.commit()
-                    except Exception:
-                        db.rollback()
-                        continue
         
-        # Bulk update existing orders
-        if orders_to_update:
-            for existing_order, new_data in orders_to_update:
-                existing_order.Marketplace = new_data['Marketplace']
-                existing_order.Brand = new_data['Brand']
-                existing_order.OrderStatus = new_data['OrderStatus']
-                existing_order.AWB = new_data['AWB']
-                existing_order.Transporter = new_data['Transporter']
-                existing_order.OrderDate = new_data['OrderDate']
-                existing_order.SLA = new_data['SLA']
-                existing_order.Batch = new_data['Batch']
-                existing_order.PIC = new_data['PIC']
-                existing_order.UploadDate = new_data['UploadDate']
-                existing_order.InterfaceStatus = new_data['InterfaceStatus']
-                existing_order.TaskId = new_data['TaskId']
-                existing_order.Remarks = new_data.get('Remarks', '')
-                existing_order.OrderNumberFlexo = new_data.get('OrderNumberFlexo') or ''
-                existing_order.OrderStatusFlexo = new_data.get('OrderStatusFlexo') or ''
-                existing_order.ItemId = new_data.get('ItemId')  # ✅ Update ItemId
-                existing_order.ItemIdFlexo = new_data.get('ItemIdFlexo')  # ✅ Update ItemIdFlexo
-                
+        # Bulk upsert: COPY into staging table + set-based UPDATE + INSERT
+        write_result = upsert_uploaded_orders(db, all_order_data)
+        new_count = write_result['inserted']
+        replaced_count = write_result['replaced']
         
         # Commit all operations
         db.commit()
+        invalidate_cache(*ORDER_WRITE_TAGS)
         
         save_time = (datetime.now() - save_start).total_seconds()
         
@@ -3714,7 +3874,7 @@ def upload_file(
         
         # Update Not Uploaded Items history immediately after successful upload
         try:
-            save_not_uploaded_history()
+            refresh_not_uploaded_history(brand_name, sales_channel, batch_name)
             logger.info(f"Not uploaded items history updated after upload: {brand_name}-{sales_channel}-{batch_name}")
         except Exception as history_error:
             logger.error(f"Failed to update not uploaded items history: {str(history_error)}")
@@ -3731,12 +3891,12 @@ def upload_file(
 
 @app.post("/api/upload-background")
 def upload_file_background(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     current_user: str = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
-    """Background upload endpoint - returns immediately with task ID"""
+    """Background upload endpoint - spools the file to disk, queues it and returns immediately with task ID"""
+    spool_path = None
     try:
         # Consolidated validation
         validation_result = validate_upload_request(file, db)
@@ -3745,13 +3905,13 @@ def upload_file_background(
         brand_name = validation_result['brand_name']
         shop_id = validation_result['shop_id']
         
-        # Read file content
-        file_content = file.file.read()
-        
         # Generate unique task ID with user info and microsecond precision
         import uuid
         task_id = f"upload_{current_user}_{int(time.time())}_{str(uuid.uuid4())[:8]}"
         
+        # Spool the upload to disk (chunked copy) so the queue worker does not need it in memory
+        spool_path = multi_user_handler.spool_upload(file.file, current_user, task_id, file.filename)
+        
         # PERFORMANCE OPTIMIZATION: Skip workspace creation during upload
         # Workspace will be created only when needed for orderlist generation
         # user_workspace = multi_user_handler.create_user_workspace(current_user)
@@ -3760,7 +3920,7 @@ def upload_file_background(
         marketplace_mapping = get_marketplace_mapping(sales_channel)
         marketplace_name = marketplace_mapping.get('brand', sales_channel.upper()) if marketplace_mapping else sales_channel.upper()
         
-        # Create task record
+        # Create task record - 'pending' tasks are claimed by the upload queue workers
         task = UploadTask(
             task_id=task_id,
             task_name=file.filename,  # Use filename as task_name
@@ -3769,23 +3929,16 @@ def upload_file_background(
             brand=filename_info['brand'],
             batch=filename_info['batch'],
             pic=current_user,
-            file_path=f"uploads/{current_user}/{file.filename}"
+            file_path=spool_path,
+            attempts=0,
+            max_attempts=UPLOAD_MAX_ATTEMPTS
         )
         db.add(task)
         db.commit()
         
-        # Start background processing
-        background_tasks.add_task(
-            process_upload_background,
-            task_id=task_id,
-            file_content=file_content,
-            filename=file.filename,
-            current_user=current_user
-        )
-        
         return {
             "success": True,
-            "message": "Upload started in background",
+            "message": "Upload queued for processing",
             "task_id": task_id,
             "status": "pending",
             "brand": filename_info['brand'],
@@ -3797,6 +3950,7 @@ def upload_file_background(
         
     except Exception as e:
         db.rollback()
+        multi_user_handler.remove_spooled_file(spool_path)
         print(f"Background upload error for file {file.filename}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Background upload failed: {str(e)}")
 
@@ -4016,6 +4170,7 @@ def add_brand_shop(
         
         db.add(new_brand_shop)
         db.commit()
+        invalidate_cache(*BRAND_SHOP_WRITE_TAGS)
         db.refresh(new_brand_shop)
         
         return {
@@ -4043,6 +4198,7 @@ def fix_deardoer(db: Session = Depends(get_db)):
             eblo_record.brand = "DEARDOER"
             eblo_record.shop_name = "DEARDOER Shopee Store"
             db.commit()
+            invalidate_cache(*BRAND_SHOP_WRITE_TAGS)
             db.refresh(eblo_record)
             
             return {
@@ -4088,6 +4244,7 @@ def add_deardoer(
         
         db.add(new_brand_shop)
         db.commit()
+        invalidate_cache(*BRAND_SHOP_WRITE_TAGS)
         db.refresh(new_brand_shop)
         
         return {
@@ -4134,7 +4291,8 @@ def get_upload_status(
             ).all()
             
             interface_count = sum(1 for order in uploaded_orders if order.InterfaceStatus == 'Interface')
-            not_interface_count = len(uploaded_orders) - interface_count
+            pending_check_count = sum(1 for order in uploaded_orders if order.InterfaceStatus == PENDING_CHECK_STATUS)
+            not_interface_count = len(uploaded_orders) - interface_count - pending_check_count
             
             # Prepare detailed order data for modals
             interface_orders = []
@@ -4154,7 +4312,7 @@ def get_upload_status(
                 
                 if order.InterfaceStatus == 'Interface':
                     interface_orders.append(order_data)
-                else:
+                elif order.InterfaceStatus != PENDING_CHECK_STATUS:
                     not_interface_orders.append(order_data)
             
             response.update({
@@ -4164,24 +4322,33 @@ def get_upload_status(
                 "external_db_query_time": task.external_db_query_time,
                 "interface_count": interface_count,
                 "not_interface_count": not_interface_count,
+                "pending_check_count": pending_check_count,
+                "interface_check_status": task.interface_check_status,
+                "interface_checked_orders": task.interface_checked_orders or 0,
                 "interface_orders": interface_orders,
                 "not_interface_orders": not_interface_orders,
-                "message": "Upload completed successfully"
+                "message": "Upload completed successfully" if pending_check_count == 0 else "Upload completed, interface check in progress..."
             })
         elif task.status == "failed":
             response.update({
                 "error_message": task.error_message,
                 "message": "Upload failed",
-                "logs": upload_logs.get(task_id, [])  # Include logs for better error reporting
+                "logs": get_task_upload_logs(task_id)  # Include logs for better error reporting
             })
         elif task.status == "processing":
             response.update({
+                "attempts": task.attempts or 0,
                 "message": "Upload is being processed..."
             })
         else:
             response.update({
-                "message": "Upload is pending..."
+                "attempts": task.attempts or 0,
+                "max_attempts": task.max_attempts,
+                "message": "Upload is pending..." if not task.attempts else f"Upload will be retried (attempt {task.attempts} failed: {task.error_message})"
             })
+            queue_position = multi_user_handler.get_queue_position(db, task_id, get_wib_now())
+            if queue_position:
+                response.update(queue_position)
         
         return response
         
@@ -4217,14 +4384,38 @@ async def get_connection_pool_status():
         logger.error(f"Error getting connection pool status: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/external-connection-pool-status")
+async def get_external_connection_pool_status():
+    """Get SQL Server (Flexo_Db/WMSPROD) connection pool status"""
+    try:
+        return external_db_pools.get_stats()
+    except Exception as e:
+        logger.error(f"Error getting external connection pool status: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/interface-status-cache")
+async def get_interface_status_cache_stats():
+    """Get interface status cache hit/miss metrics"""
+    return interface_status_cache.get_stats()
+
+@app.delete("/api/interface-status-cache")
+async def clear_interface_status_cache(
+    marketplace: Optional[str] = Query(None, description="Only drop entries for this marketplace"),
+    current_user: str = Depends(get_current_user)
+):
+    """Drop cached interface status results"""
+    removed = interface_status_cache.invalidate(marketplace=marketplace)
+    return {"message": f"Removed {removed} cached interface status results", "removed": removed}
+
 @app.post("/api/cleanup-connections")
 async def cleanup_connections():
     """Force cleanup of database connections"""
     try:
-        # Dispose and recreate engine to clear all connections
-        engine.dispose()
-        logger.info("Database connections cleaned up successfully")
-        return {"message": "Database connections cleaned up successfully"}
+        # Dispose every pool (api, background, reporting) to clear all idle connections
+        db_registry.dispose_all()
+        closed_external = external_db_pools.close_all_idle()
+        logger.info(f"Database connections cleaned up successfully ({closed_external} idle SQL Server connections closed)")
+        return {"message": "Database connections cleaned up successfully", "external_connections_closed": closed_external}
     except Exception as e:
         logger.error(f"Error cleaning up connections: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -4241,26 +4432,16 @@ def get_orders(
 ):
     try:
         # Check cache first
-        cache_key = get_cache_key("orders", current_user, page, page_size)
-        cached_result = get_cached_data(cache_key)
+        cache_key = response_cache.key("orders", current_user, page, page_size, tags=("orders",))
+        cached_result = response_cache.get(cache_key)
         if cached_result:
             return cached_result
         
         # Calculate offset for pagination
         offset = (page - 1) * page_size
         
-        # Apply default filter: Exclude cancelled/batal orders
-        cancelled_statuses = [
-            'batal', 'cancel', 'cancellation', 'BATAL', 'CANCEL', 'CANCELLATION', 
-            'Cancellations', 'Dibatalkan', 'Batal', 'CANCELED', 'Cancelled', 'canceled', 
-            'Pembatalan diajukan', 'Order Batal', 'CANCELLED'
-        ]
-        
-        # Create base query with default filter (using OrderStatusFlexo only, case-insensitive)
-        base_query = db.query(UploadedOrder)
-        for status in cancelled_statuses:
-            # Use OrderStatusFlexo only, case-insensitive
-            base_query = base_query.filter(db.func.upper(UploadedOrder.OrderStatusFlexo) != status.upper())
+        # Create base query with default filter: exclude cancelled/batal orders
+        base_query = db.query(UploadedOrder).filter(~UploadedOrder.IsCancelled)
         
         # Get total count with filter
         total_count = base_query.count()
@@ -4301,7 +4482,7 @@ def get_orders(
         }
         
         # Cache the result
-        set_cached_data(cache_key, result)
+        response_cache.set(cache_key, result)
         
         return result
         
@@ -4342,9 +4523,12 @@ def get_orders_stats(
         ).count()
         
         # Get today's orders - using WIB timezone
+        # Half-open datetime ranges instead of date("UploadDate") so partitions are pruned
         today = get_wib_now().date()
+        today_start = datetime.combine(today, datetime_time.min)
         today_orders = db.query(UploadedOrder).filter(
-            func.date(UploadedOrder.UploadDate) == today
+            UploadedOrder.UploadDate >= today_start,
+            UploadedOrder.UploadDate < today_start + timedelta(days=1)
         ).count()
         
         # Get marketplace distribution
@@ -4363,8 +4547,10 @@ def get_orders_stats(
         daily_orders = []
         for i in range(7):
             date = get_wib_now().date() - timedelta(days=i)
+            day_start = datetime.combine(date, datetime_time.min)
             count = db.query(UploadedOrder).filter(
-                func.date(UploadedOrder.UploadDate) == date
+                UploadedOrder.UploadDate >= day_start,
+                UploadedOrder.UploadDate < day_start + timedelta(days=1)
             ).count()
             daily_orders.append({
                 'date': date.isoformat(),
@@ -4495,6 +4681,7 @@ def fix_interface_status(
         
         # Commit all changes
         db.commit()
+        invalidate_cache(*ORDER_WRITE_TAGS)
         
         return {
             "message": f"Fixed interface status for {updated_count} orders",
@@ -4749,6 +4936,7 @@ def refresh_interface_status_for_batch(
                     
                     # Commit chunk
                     db.commit()
+                    invalidate_cache(*ORDER_WRITE_TAGS)
                     print(f"Processed chunk {i//CHUNK_SIZE + 1} for {marketplace}")
             
             return {
@@ -4798,8 +4986,9 @@ def force_refresh_interface_status(
         
         print(f"Force refresh: Running external database query for {len(orders)} orders...")
         
-        # Always run external database query regardless of dataset size
-        interface_summary = get_interface_status_summary(orders, db)
+        # Always run external database query regardless of dataset size (cache bypassed; the fresh
+        # results are written back to the cache and reused by the update loop below)
+        interface_summary = get_interface_status_summary(orders, db, use_cache=False)
         
         # Update InterfaceStatus field in database based on external query results
         updated_count = 0
@@ -4848,6 +5037,7 @@ def force_refresh_interface_status(
                 
                 # Commit chunk
                 db.commit()
+                invalidate_cache(*ORDER_WRITE_TAGS)
                 print(f"Force refresh: Processed chunk {i//CHUNK_SIZE + 1} for {marketplace}")
         
         return {
@@ -4885,6 +5075,7 @@ def update_order_remarks(
         # Update remarks
         order.Remarks = remarks
         db.commit()
+        invalidate_cache(*ORDER_WRITE_TAGS)
 
         return {
             "message": "Remarks updated successfully",
@@ -4928,18 +5119,7 @@ def get_orders_sorted_by_interface_status_v2(
                 raise HTTPException(status_code=400, detail="Invalid date format. Use YYYY-MM-DD")
         
         # Default filter: Exclude cancelled orders
-        cancelled_statuses = [
-            'cancel', 'cancelled', 'canceled', 'dibatalkan', 'batal', 
-            'refund', 'return', 'rejected', 'failed', 'expired',
-            'void', 'invalid', 'declined', 'denied'
-        ]
-        
-        # Create filter to exclude cancelled orders
-        cancelled_filter = ~UpdateUploadedOrder.OrderStatus.ilike(f"%{cancelled_statuses[0]}%")
-        for status in cancelled_statuses[1:]:
-            cancelled_filter = cancelled_filter & ~UpdateUploadedOrder.OrderStatus.ilike(f"%{status}%")
-        
-        query = query.filter(cancelled_filter)
+        query = query.filter(~UploadedOrder.IsCancelled)
         
         orders = query.all()
         
@@ -5072,7 +5252,7 @@ def get_unique_values(
     field: str = Query(..., description="Field name to get unique values for"),
     db: Session = Depends(get_db)
 ):
-    """Get unique values for a specific field from clean_orders view"""
+    """Get unique values for a specific field from clean_orders table"""
     try:
         # Map field names to actual column names
         field_mapping = {
@@ -5091,26 +5271,25 @@ def get_unique_values(
         if field not in field_mapping:
             raise HTTPException(status_code=400, detail=f"Invalid field: {field}")
         
-        # Get unique values for the field using SQL query from clean_orders view
+        # Get unique values for the field using SQL query from clean_orders table
         column_name = field_mapping[field]
         
-        # Try clean_orders view first, fallback to uploaded_orders if view doesn't exist
-        try:
-            query = f'SELECT DISTINCT "{column_name}" FROM clean_orders WHERE "{column_name}" IS NOT NULL AND "{column_name}" != \'\' ORDER BY "{column_name}"'
-            unique_results = db.execute(text(query)).fetchall()
+        # Facet fields come from the order_facets counts; remarks and Flexo order numbers are read from clean_orders
+        if field in FACET_FIELDS:
+            value_counts = facet_value_counts(db, field)
+            table_used = "order_facets"
+        else:
+            query = f'SELECT "{column_name}", COUNT(*) FROM clean_orders WHERE "{column_name}" IS NOT NULL AND "{column_name}" != \'\' GROUP BY "{column_name}" ORDER BY "{column_name}"'
+            value_counts = [(row[0], row[1]) for row in db.execute(text(query)).fetchall() if row[0]]
             table_used = "clean_orders"
-        except Exception as view_error:
-            print(f"⚠️ clean_orders view not available, falling back to uploaded_orders: {view_error}")
-            query = f'SELECT DISTINCT "{column_name}" FROM uploaded_orders WHERE "{column_name}" IS NOT NULL AND "{column_name}" != \'\' ORDER BY "{column_name}"'
-            unique_results = db.execute(text(query)).fetchall()
-            table_used = "uploaded_orders"
         
         # Flatten the results
-        result = [row[0] for row in unique_results if row[0]]
+        result = [value for value, _count in value_counts]
         
         return {
             "field": field,
             "values": result,
+            "counts": dict(value_counts),
             "count": len(result),
             "table_used": table_used
         }
@@ -5131,10 +5310,43 @@ def get_cascading_filter_values(
     remarks_filters: Optional[str] = Query(None, description="Comma-separated remarks filters"),
     interface_status: Optional[str] = Query(None, description="Filter by interface status"),
     start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
-    end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
-    db: Session = Depends(get_db)
+    end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)")
 ):
     """Get unique values for a specific field with cascading filters applied"""
+    # Filter lists are order-insensitive, so "A,B" and "B, A" share one cached computation
+    params = {
+        "field": field,
+        "marketplace_filters": normalize_filter_list(marketplace_filters),
+        "brand_filters": normalize_filter_list(brand_filters),
+        "order_status_filters": normalize_filter_list(order_status_filters),
+        "transporter_filters": normalize_filter_list(transporter_filters),
+        "batch_filters": normalize_filter_list(batch_filters),
+        "pic_filters": normalize_filter_list(pic_filters),
+        "remarks_filters": normalize_filter_list(remarks_filters),
+        "interface_status": (interface_status or "").strip() or None,
+        "start_date": (start_date or "").strip() or None,
+        "end_date": (end_date or "").strip() or None,
+    }
+    return single_flight.run(
+        "cascading_filters", params, ("orders",),
+        lambda db: compute_cascading_filter_values(db, **params)
+    )
+
+def compute_cascading_filter_values(
+    db: Session,
+    field: str,
+    marketplace_filters: Optional[str] = None,
+    brand_filters: Optional[str] = None,
+    order_status_filters: Optional[str] = None,
+    transporter_filters: Optional[str] = None,
+    batch_filters: Optional[str] = None,
+    pic_filters: Optional[str] = None,
+    remarks_filters: Optional[str] = None,
+    interface_status: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None
+):
+    """Unique values of a field with cascading filters applied (uncached computation behind the endpoint)"""
     try:
         # Map field names to actual column names
         field_mapping = {
@@ -5155,7 +5367,7 @@ def get_cascading_filter_values(
         
         # Build the base query with cascading filters
         base_query = """
-        SELECT DISTINCT "{field_column}" 
+        SELECT "{field_column}", COUNT(*)
         FROM clean_orders 
         WHERE "{field_column}" IS NOT NULL AND "{field_column}" != ''
         """
@@ -5164,11 +5376,11 @@ def get_cascading_filter_values(
         conditions = []
         params = {}
         
-        # Date range filter
+        # Date range filter (whole days, like the facet index)
         if start_date and end_date:
-            conditions.append('"OrderDate" >= :start_date AND "OrderDate" <= :end_date')
-            params['start_date'] = start_date
-            params['end_date'] = end_date
+            conditions.append('"OrderDate" >= :start_date AND "OrderDate" < :end_date')
+            params['start_date'] = as_day(start_date)
+            params['end_date'] = as_day(end_date) + timedelta(days=1)
         
         # Interface status filter
         if interface_status:
@@ -5245,17 +5457,31 @@ def get_cascading_filter_values(
         if conditions:
             query += ' AND ' + ' AND '.join(conditions)
         
-        query += f' ORDER BY "{field_column}"'
-        
-        # Execute query
-        unique_results = db.execute(text(query), params).fetchall()
+        query += f' GROUP BY "{field_column}" ORDER BY "{field_column}"'
+        
+        # Facet fields are answered from order_facets unless remarks (not a facet dimension) are filtered
+        if field in FACET_FIELDS and not remarks_filters:
+            value_counts = facet_value_counts(db, field, {
+                'marketplace': split_filter_list(marketplace_filters),
+                'brand': split_filter_list(brand_filters),
+                'order_status': split_filter_list(order_status_filters),
+                'transporter': split_filter_list(transporter_filters),
+                'batch': split_filter_list(batch_filters),
+                'pic': split_filter_list(pic_filters),
+                'interface_status': [interface_status] if interface_status else [],
+            }, start_date, end_date)
+            table_used = "order_facets"
+        else:
+            value_counts = [(row[0], row[1]) for row in db.execute(text(query), params).fetchall() if row[0]]
+            table_used = "clean_orders"
         
         # Flatten the results
-        result = [row[0] for row in unique_results if row[0]]
+        result = [value for value, _count in value_counts]
         
         return {
             "field": field,
             "values": result,
+            "counts": dict(value_counts),
             "count": len(result),
             "filters_applied": {
                 "marketplace": marketplace_filters,
@@ -5268,17 +5494,256 @@ def get_cascading_filter_values(
                 "interface_status": interface_status,
                 "date_range": f"{start_date} to {end_date}" if start_date and end_date else None
             },
-            "table_used": "clean_orders"
+            "table_used": table_used
         }
         
     except Exception as e:
         print(f"Error getting cascading filter values for {field}: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get cascading filter values: {str(e)}")
 
+def build_orders_list_filters(
+    start_date=None, end_date=None, order_numbers=None, interface_status=None, order_status=None,
+    pic=None, remarks=None, marketplace=None, brand=None, marketplace_filters=None, brand_filters=None,
+    order_status_filters=None, transporter_filters=None, batch_filters=None, pic_filters=None,
+    remarks_filters=None
+):
+    """Build the WHERE conditions and bind params shared by the order list (paged and streamed)"""
+    conditions = []
+    params = {}
+    
+    # Apply default filter: Exclude cancelled/batal orders (only if no order status filters are applied)
+    # Only apply default filter if no order status filters are specified
+    has_order_status_filter = (order_status and order_status.strip()) or (order_status_filters and order_status_filters.strip())
+    
+    print(f"🔍 DEBUG - Filter Status Check:")
+    print(f"  - order_status: '{order_status}'")
+    print(f"  - order_status_filters: '{order_status_filters}'")
+    print(f"  - has_order_status_filter: {has_order_status_filter}")
+    
+    if not has_order_status_filter:
+        print(f"  - Applying default filter to exclude cancelled orders")
+        # Materialized flag (see order_status.py), served by the partial index on non-cancelled orders
+        conditions.append('NOT "IsCancelled"')
+    else:
+        print(f"  - Skipping default filter, user has specified order status filters")
+    
+    # Apply date filters - only apply if dates are explicitly provided and not empty
+    if (start_date and start_date.strip()) or (end_date and end_date.strip()):
+        # Parse provided dates (supports both ISO and YYYY-MM-DD format)
+        if start_date and start_date.strip():
+            try:
+                start_datetime = parse_date_flexible(start_date)
+                start_naive = convert_to_naive_wib(start_datetime)
+                conditions.append('"UploadDate" >= :start_date')
+                params['start_date'] = start_naive
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Invalid start_date format: {str(e)}")
+            
+        if end_date and end_date.strip():
+            try:
+                end_datetime_temp = parse_date_flexible(end_date)
+                # For end date, set to end of day in WIB timezone
+                if end_datetime_temp:
+                    end_datetime = WIB_TIMEZONE.localize(datetime.combine(end_datetime_temp.date(), datetime_time.max))
+                    end_naive = convert_to_naive_wib(end_datetime)
+                    conditions.append('"UploadDate" <= :end_date')
+                    params['end_date'] = end_naive
+            except ValueError as e:
+                raise HTTPException(status_code=400, detail=f"Invalid end_date format: {str(e)}")
+    
+    # Apply other filters - only apply if values are provided and not empty
+    if order_numbers and order_numbers.strip():
+        # Split comma-separated order numbers and filter
+        order_list = [order.strip() for order in order_numbers.split(',') if order.strip()]
+        if order_list:
+            placeholders = ','.join([f':order_{i}' for i in range(len(order_list))])
+            conditions.append(f'"OrderNumber" IN ({placeholders})')
+            for i, order in enumerate(order_list):
+                params[f'order_{i}'] = order
+    
+    if interface_status and interface_status.strip():
+        conditions.append('"InterfaceStatus" ILIKE :interface_status')
+        params['interface_status'] = f"%{interface_status.strip()}%"
+    
+    if order_status and order_status.strip():
+        # Split comma-separated order statuses and filter
+        status_list = [status.strip() for status in order_status.split(',') if status.strip()]
+        print(f"🔍 DEBUG - order_status filter:")
+        print(f"  - Raw order_status: '{order_status}'")
+        print(f"  - Parsed status_list: {status_list}")
+        if status_list:
+            placeholders = ','.join([f':status_{i}' for i in range(len(status_list))])
+            conditions.append(f'UPPER("OrderStatusFlexo") IN ({placeholders})')
+            for i, status in enumerate(status_list):
+                params[f'status_{i}'] = status.upper()
+            print(f"  - Applied filter: UPPER(\"OrderStatusFlexo\") IN ({placeholders})")
+            print(f"  - Parameters: {[params[f'status_{i}'] for i in range(len(status_list))]}")
+    
+    if pic and pic.strip():
+        conditions.append('"PIC" ILIKE :pic')
+        params['pic'] = f"%{pic.strip()}%"
+    
+    if remarks and remarks.strip():
+        conditions.append('"Remarks" ILIKE :remarks')
+        params['remarks'] = f"%{remarks.strip()}%"
+    
+    # Apply column filters (single value filters)
+    if marketplace and marketplace.strip():
+        conditions.append('"Marketplace" ILIKE :marketplace')
+        params['marketplace'] = f"%{marketplace.strip()}%"
+    
+    if brand and brand.strip():
+        conditions.append('"Brand" ILIKE :brand')
+        params['brand'] = f"%{brand.strip()}%"
+    
+    # Apply column filters (multiple value filters)
+    if marketplace_filters and marketplace_filters.strip():
+        marketplace_list = [mp.strip() for mp in marketplace_filters.split(',') if mp.strip()]
+        if marketplace_list:
+            placeholders = ','.join([f':mp_{i}' for i in range(len(marketplace_list))])
+            conditions.append(f'"Marketplace" IN ({placeholders})')
+            for i, mp in enumerate(marketplace_list):
+                params[f'mp_{i}'] = mp
+    
+    if brand_filters and brand_filters.strip():
+        brand_list = [brand.strip() for brand in brand_filters.split(',') if brand.strip()]
+        if brand_list:
+            placeholders = ','.join([f':brand_{i}' for i in range(len(brand_list))])
+            conditions.append(f'"Brand" IN ({placeholders})')
+            for i, brand in enumerate(brand_list):
+                params[f'brand_{i}'] = brand
+    
+    if order_status_filters and order_status_filters.strip():
+        status_list = [status.strip() for status in order_status_filters.split(',') if status.strip()]
+        print(f"🔍 DEBUG - order_status_filters filter:")
+        print(f"  - Raw order_status_filters: '{order_status_filters}'")
+        print(f"  - Parsed status_list: {status_list}")
+        if status_list:
+            placeholders = ','.join([f':ostatus_{i}' for i in range(len(status_list))])
+            conditions.append(f'UPPER("OrderStatusFlexo") IN ({placeholders})')
+            for i, status in enumerate(status_list):
+                params[f'ostatus_{i}'] = status.upper()
+            print(f"  - Applied filter: UPPER(\"OrderStatusFlexo\") IN ({placeholders})")
+            print(f"  - Parameters: {[params[f'ostatus_{i}'] for i in range(len(status_list))]}")
+    
+    if transporter_filters and transporter_filters.strip():
+        transporter_list = [trans.strip() for trans in transporter_filters.split(',') if trans.strip()]
+        if transporter_list:
+            placeholders = ','.join([f':trans_{i}' for i in range(len(transporter_list))])
+            conditions.append(f'"Transporter" IN ({placeholders})')
+            for i, trans in enumerate(transporter_list):
+                params[f'trans_{i}'] = trans
+    
+    if batch_filters and batch_filters.strip():
+        batch_list = [batch.strip() for batch in batch_filters.split(',') if batch.strip()]
+        if batch_list:
+            placeholders = ','.join([f':batch_{i}' for i in range(len(batch_list))])
+            conditions.append(f'"Batch" IN ({placeholders})')
+            for i, batch in enumerate(batch_list):
+                params[f'batch_{i}'] = batch
+    
+    if pic_filters and pic_filters.strip():
+        pic_list = [pic.strip() for pic in pic_filters.split(',') if pic.strip()]
+        if pic_list:
+            placeholders = ','.join([f':pic_{i}' for i in range(len(pic_list))])
+            conditions.append(f'"PIC" IN ({placeholders})')
+            for i, pic in enumerate(pic_list):
+                params[f'pic_{i}'] = pic
+    
+    if remarks_filters and remarks_filters.strip():
+        remarks_list = [remark.strip() for remark in remarks_filters.split(',') if remark.strip()]
+        if remarks_list:
+            placeholders = ','.join([f':remark_{i}' for i in range(len(remarks_list))])
+            conditions.append(f'"Remarks" IN ({placeholders})')
+            for i, remark in enumerate(remarks_list):
+                params[f'remark_{i}'] = remark
+    
+    return conditions, params
+
+def order_list_row_to_dict(row):
+    """Convert a clean_orders list row (ORDERS_LIST_SELECT column order) to the API order dict"""
+    # Fallback logic: Use OrderNumberFlexo if available, otherwise use original OrderNumber
+    order_number_flexo = row[15]  # OrderNumberFlexo
+    original_order_number = row[3]  # OrderNumber
+    display_order_number = order_number_flexo if order_number_flexo and order_number_flexo.strip() else original_order_number
+    
+    return {
+        "id": row[0],  # Id
+        "marketplace": row[1],  # Marketplace
+        "brand": row[2],  # Brand
+        "order_number": display_order_number,  # Fallback: OrderNumberFlexo or OrderNumber
+        "order_status": row[16],  # OrderStatusFlexo
+        "awb": row[5],  # AWB
+        "transporter": row[6],  # Transporter
+        "order_date": row[7].strftime("%Y-%m-%d") if row[7] else None,  # OrderDate
+        "sla": row[8],  # SLA
+        "batch": row[9],  # Batch
+        "pic": row[10],  # PIC
+        "upload_date": row[11].strftime("%Y-%m-%d") if row[11] else None,  # UploadDate
+        "remarks": row[12],  # Remarks
+        "interface_status": row[13],  # InterfaceStatus
+        "task_id": row[14],  # TaskId
+        "order_number_flexo": row[15],  # OrderNumberFlexo
+        "order_status_flexo": row[16]  # OrderStatusFlexo
+    }
+
+ORDERS_LIST_SELECT = """
+        SELECT "Id", "Marketplace", "Brand", "OrderNumber", "OrderStatus", "AWB", "Transporter", 
+               "OrderDate", "SLA", "Batch", "PIC", "UploadDate", "Remarks", "InterfaceStatus", "TaskId", 
+               "OrderNumberFlexo", "OrderStatusFlexo"
+        FROM clean_orders
+        """
+
+ORDERS_LIST_STREAM_FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+ORDERS_STREAM_BATCH_SIZE = 2000
+ORDERS_LIST_FIELDS = (
+    "id", "marketplace", "brand", "order_number", "order_status", "awb", "transporter", "order_date", "sla",
+    "batch", "pic", "upload_date", "remarks", "interface_status", "task_id", "order_number_flexo", "order_status_flexo"
+)
+
+def stream_orders_list(query: str, params: dict, output_format: str):
+    """Yield orders as NDJSON lines or CSV, reading a server-side cursor in fixed-size batches"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if output_format == "csv" else None
+    if writer is not None:
+        writer.writerow(ORDERS_LIST_FIELDS)
+        # Send the header right away so the client sees the first byte before the query finishes
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    
+    with reporting_engine.connect() as conn:
+        result = conn.execution_options(stream_results=True, yield_per=ORDERS_STREAM_BATCH_SIZE).execute(text(query), params)
+        for rows in result.partitions():
+            for row in rows:
+                order = order_list_row_to_dict(row)
+                if writer is None:
+                    buffer.write(json.dumps(order))
+                    buffer.write("\n")
+                else:
+                    writer.writerow(order.values())
+            
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+ORDERS_LIST_COUNT_MODES = ("exact", "estimate", "none")
+
+def estimate_query_rows(db, query: str, params: dict) -> int:
+    """Planner row estimate for a query (EXPLAIN, no execution)"""
+    plan = db.execute(text(f"EXPLAIN (FORMAT JSON) {query}"), params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
 @app.get("/api/orders/list")
 def get_orders_list(
-    page: int = Query(1, ge=1, description="Page number"),
+    page: int = Query(1, ge=1, description="Page number (offset pagination)"),
     page_size: int = Query(100, ge=1, le=100000, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page; switches to keyset pagination"),
+    pagination_mode: str = Query("offset", description="offset or cursor (keyset on UploadDate, Id)"),
+    count_mode: str = Query("exact", description="Total count: exact, estimate (planner) or none"),
+    output_format: Optional[str] = Query(None, description="ndjson or csv: stream every matching order instead of one page"),
     start_date: Optional[str] = Query(None, description="Start date (YYYY-MM-DD)"),
     end_date: Optional[str] = Query(None, description="End date (YYYY-MM-DD)"),
     order_numbers: Optional[str] = Query(None, description="Comma-separated order numbers"),
@@ -5297,17 +5762,49 @@ def get_orders_list(
     pic_filters: Optional[str] = Query(None, description="Comma-separated PIC filters"),
     remarks_filters: Optional[str] = Query(None, description="Comma-separated remarks filters"),
     current_user: str = Depends(get_current_user),
+    not_modified: None = Depends(conditional_get("orders")),
     db: Session = Depends(get_db)
 ):
     """Get uploaded orders with filtering and pagination for the orders list page"""
     try:
+        if count_mode not in ORDERS_LIST_COUNT_MODES:
+            raise HTTPException(status_code=400, detail=f"Invalid count_mode: {count_mode}")
+        use_cursor = pagination_mode == "cursor" or bool(cursor)
+        if not use_cursor and pagination_mode != "offset":
+            raise HTTPException(status_code=400, detail=f"Invalid pagination_mode: {pagination_mode}")
+        if output_format and output_format not in ORDERS_LIST_STREAM_FORMATS:
+            raise HTTPException(status_code=400, detail=f"Invalid output_format: {output_format}")
+        
+        conditions, params = build_orders_list_filters(
+            start_date=start_date, end_date=end_date, order_numbers=order_numbers,
+            interface_status=interface_status, order_status=order_status, pic=pic, remarks=remarks,
+            marketplace=marketplace, brand=brand, marketplace_filters=marketplace_filters,
+            brand_filters=brand_filters, order_status_filters=order_status_filters,
+            transporter_filters=transporter_filters, batch_filters=batch_filters,
+            pic_filters=pic_filters, remarks_filters=remarks_filters
+        )
         
-        # Use clean_orders view for deduplicated data
+        if output_format:
+            # Streaming mode: every matching order, no count, constant memory
+            stream_query = ORDERS_LIST_SELECT
+            if conditions:
+                stream_query += " WHERE " + " AND ".join(conditions)
+            stream_query += ' ORDER BY "UploadDate" DESC, "Id" DESC'
+            headers = {"Cache-Control": "no-cache"}
+            if output_format == "csv":
+                headers["Content-Disposition"] = f"attachment; filename=orders_{get_wib_now().strftime('%Y%m%d_%H%M%S')}.csv"
+            return StreamingResponse(
+                stream_orders_list(stream_query, params, output_format),
+                media_type=ORDERS_LIST_STREAM_FORMATS[output_format],
+                headers=headers
+            )
+        
+        # Use clean_orders table for deduplicated data
         try:
-            # Check if clean_orders view exists and has data
-            clean_count = db.execute(text("SELECT COUNT(*) FROM clean_orders")).scalar()
+            # Check if clean_orders exists and has data (without counting the whole table)
+            has_orders = db.execute(text("SELECT 1 FROM clean_orders LIMIT 1")).first() is not None
             
-            if clean_count == 0:
+            if not has_orders:
                 return {
                     "orders": [],
                     "pagination": {
@@ -5318,13 +5815,11 @@ def get_orders_list(
                         "has_next": False,
                         "has_prev": False
                     },
-                    "message": "No data available. Please create clean_orders view first."
+                    "message": "No data available."
                 }
             
-            print(f"📊 Using clean_orders view ({clean_count} records)")
-            
         except Exception as e:
-            print(f"❌ Error accessing clean_orders view: {e}")
+            print(f"❌ Error accessing clean_orders table: {e}")
             return {
                 "orders": [],
                 "pagination": {
@@ -5334,181 +5829,13 @@ def get_orders_list(
                     "total_pages": 0,
                     "has_next": False,
                     "has_prev": False
-                },
-                "message": "Clean orders view not available. Please create it first."
-            }
-        
-        # Initialize date variables
-        start_datetime = None
-        end_datetime = None
-        
-        # Build SQL query using clean_orders view
-        base_query = """
-        SELECT "Id", "Marketplace", "Brand", "OrderNumber", "OrderStatus", "AWB", "Transporter", 
-               "OrderDate", "SLA", "Batch", "PIC", "UploadDate", "Remarks", "InterfaceStatus", "TaskId", 
-               "OrderNumberFlexo", "OrderStatusFlexo"
-        FROM clean_orders
-        """
-        
-        count_query = "SELECT COUNT(*) FROM clean_orders"
-        conditions = []
-        params = {}
-        
-        # Apply default filter: Exclude cancelled/batal orders (only if no order status filters are applied)
-        cancelled_statuses = [
-            'batal', 'cancel', 'cancellation', 'BATAL', 'CANCEL', 'CANCELLATION', 
-            'Cancellations', 'Dibatalkan', 'Batal', 'CANCELED', 'Cancelled', 'canceled', 
-            'Pembatalan diajukan', 'Order Batal', 'CANCELLED'
-        ]
-        
-        # Only apply default filter if no order status filters are specified
-        has_order_status_filter = (order_status and order_status.strip()) or (order_status_filters and order_status_filters.strip())
-        
-        print(f"🔍 DEBUG - Filter Status Check:")
-        print(f"  - order_status: '{order_status}'")
-        print(f"  - order_status_filters: '{order_status_filters}'")
-        print(f"  - has_order_status_filter: {has_order_status_filter}")
-        
-        if not has_order_status_filter:
-            print(f"  - Applying default filter to exclude cancelled orders")
-            # Create filter to exclude cancelled orders (using OrderStatusFlexo only, case-insensitive)
-            cancelled_placeholders = ','.join([f':cancelled_{i}' for i in range(len(cancelled_statuses))])
-            conditions.append(f'UPPER("OrderStatusFlexo") NOT IN ({cancelled_placeholders})')
-            for i, status in enumerate(cancelled_statuses):
-                params[f'cancelled_{i}'] = status.upper()
-        else:
-            print(f"  - Skipping default filter, user has specified order status filters")
-        
-        # Apply date filters - only apply if dates are explicitly provided and not empty
-        if (start_date and start_date.strip()) or (end_date and end_date.strip()):
-            # Parse provided dates (supports both ISO and YYYY-MM-DD format)
-            if start_date and start_date.strip():
-                try:
-                    start_datetime = parse_date_flexible(start_date)
-                    start_naive = convert_to_naive_wib(start_datetime)
-                    conditions.append('"UploadDate" >= :start_date')
-                    params['start_date'] = start_naive
-                except ValueError as e:
-                    raise HTTPException(status_code=400, detail=f"Invalid start_date format: {str(e)}")
-                
-            if end_date and end_date.strip():
-                try:
-                    end_datetime_temp = parse_date_flexible(end_date)
-                    # For end date, set to end of day in WIB timezone
-                    if end_datetime_temp:
-                        end_datetime = WIB_TIMEZONE.localize(datetime.combine(end_datetime_temp.date(), datetime_time.max))
-                        end_naive = convert_to_naive_wib(end_datetime)
-                        conditions.append('"UploadDate" <= :end_date')
-                        params['end_date'] = end_naive
-                except ValueError as e:
-                    raise HTTPException(status_code=400, detail=f"Invalid end_date format: {str(e)}")
-        
-        # Apply other filters - only apply if values are provided and not empty
-        if order_numbers and order_numbers.strip():
-            # Split comma-separated order numbers and filter
-            order_list = [order.strip() for order in order_numbers.split(',') if order.strip()]
-            if order_list:
-                placeholders = ','.join([f':order_{i}' for i in range(len(order_list))])
-                conditions.append(f'"OrderNumber" IN ({placeholders})')
-                for i, order in enumerate(order_list):
-                    params[f'order_{i}'] = order
-        
-        if interface_status and interface_status.strip():
-            conditions.append('"InterfaceStatus" ILIKE :interface_status')
-            params['interface_status'] = f"%{interface_status.strip()}%"
-        
-        if order_status and order_status.strip():
-            # Split comma-separated order statuses and filter
-            status_list = [status.strip() for status in order_status.split(',') if status.strip()]
-            print(f"🔍 DEBUG - order_status filter:")
-            print(f"  - Raw order_status: '{order_status}'")
-            print(f"  - Parsed status_list: {status_list}")
-            if status_list:
-                placeholders = ','.join([f':status_{i}' for i in range(len(status_list))])
-                conditions.append(f'UPPER("OrderStatusFlexo") IN ({placeholders})')
-                for i, status in enumerate(status_list):
-                    params[f'status_{i}'] = status.upper()
-                print(f"  - Applied filter: UPPER(\"OrderStatusFlexo\") IN ({placeholders})")
-                print(f"  - Parameters: {[params[f'status_{i}'] for i in range(len(status_list))]}")
-        
-        if pic and pic.strip():
-            conditions.append('"PIC" ILIKE :pic')
-            params['pic'] = f"%{pic.strip()}%"
-        
-        if remarks and remarks.strip():
-            conditions.append('"Remarks" ILIKE :remarks')
-            params['remarks'] = f"%{remarks.strip()}%"
-        
-        # Apply column filters (single value filters)
-        if marketplace and marketplace.strip():
-            conditions.append('"Marketplace" ILIKE :marketplace')
-            params['marketplace'] = f"%{marketplace.strip()}%"
-        
-        if brand and brand.strip():
-            conditions.append('"Brand" ILIKE :brand')
-            params['brand'] = f"%{brand.strip()}%"
-        
-        # Apply column filters (multiple value filters)
-        if marketplace_filters and marketplace_filters.strip():
-            marketplace_list = [mp.strip() for mp in marketplace_filters.split(',') if mp.strip()]
-            if marketplace_list:
-                placeholders = ','.join([f':mp_{i}' for i in range(len(marketplace_list))])
-                conditions.append(f'"Marketplace" IN ({placeholders})')
-                for i, mp in enumerate(marketplace_list):
-                    params[f'mp_{i}'] = mp
-        
-        if brand_filters and brand_filters.strip():
-            brand_list = [brand.strip() for brand in brand_filters.split(',') if brand.strip()]
-            if brand_list:
-                placeholders = ','.join([f':brand_{i}' for i in range(len(brand_list))])
-                conditions.append(f'"Brand" IN ({placeholders})')
-                for i, brand in enumerate(brand_list):
-                    params[f'brand_{i}'] = brand
-        
-        if order_status_filters and order_status_filters.strip():
-            status_list = [status.strip() for status in order_status_filters.split(',') if status.strip()]
-            print(f"🔍 DEBUG - order_status_filters filter:")
-            print(f"  - Raw order_status_filters: '{order_status_filters}'")
-            print(f"  - Parsed status_list: {status_list}")
-            if status_list:
-                placeholders = ','.join([f':ostatus_{i}' for i in range(len(status_list))])
-                conditions.append(f'UPPER("OrderStatusFlexo") IN ({placeholders})')
-                for i, status in enumerate(status_list):
-                    params[f'ostatus_{i}'] = status.upper()
-                print(f"  - Applied filter: UPPER(\"OrderStatusFlexo\") IN ({placeholders})")
-                print(f"  - Parameters: {[params[f'ostatus_{i}'] for i in range(len(status_list))]}")
-        
-        if transporter_filters and transporter_filters.strip():
-            transporter_list = [trans.strip() for trans in transporter_filters.split(',') if trans.strip()]
-            if transporter_list:
-                placeholders = ','.join([f':trans_{i}' for i in range(len(transporter_list))])
-                conditions.append(f'"Transporter" IN ({placeholders})')
-                for i, trans in enumerate(transporter_list):
-                    params[f'trans_{i}'] = trans
-        
-        if batch_filters and batch_filters.strip():
-            batch_list = [batch.strip() for batch in batch_filters.split(',') if batch.strip()]
-            if batch_list:
-                placeholders = ','.join([f':batch_{i}' for i in range(len(batch_list))])
-                conditions.append(f'"Batch" IN ({placeholders})')
-                for i, batch in enumerate(batch_list):
-                    params[f'batch_{i}'] = batch
-        
-        if pic_filters and pic_filters.strip():
-            pic_list = [pic.strip() for pic in pic_filters.split(',') if pic.strip()]
-            if pic_list:
-                placeholders = ','.join([f':pic_{i}' for i in range(len(pic_list))])
-                conditions.append(f'"PIC" IN ({placeholders})')
-                for i, pic in enumerate(pic_list):
-                    params[f'pic_{i}'] = pic
+                },
+                "message": "Clean orders table not available. Please rebuild it first."
+            }
         
-        if remarks_filters and remarks_filters.strip():
-            remarks_list = [remark.strip() for remark in remarks_filters.split(',') if remark.strip()]
-            if remarks_list:
-                placeholders = ','.join([f':remark_{i}' for i in range(len(remarks_list))])
-                conditions.append(f'"Remarks" IN ({placeholders})')
-                for i, remark in enumerate(remarks_list):
-                    params[f'remark_{i}'] = remark
+        # Build SQL query using clean_orders table
+        base_query = ORDERS_LIST_SELECT
+        count_query = "SELECT COUNT(*) FROM clean_orders"
         
         # Add WHERE clause if there are conditions
         if conditions:
@@ -5521,51 +5848,55 @@ def get_orders_list(
         print(f"  - WHERE clause: {where_clause if conditions else 'None'}")
         print(f"  - Parameters: {params}")
         
-        # Get total count for pagination
-        total_count = db.execute(text(count_query), params).scalar()
-        print(f"  - Total count result: {total_count}")
-        
-        # Calculate offset for pagination
-        offset = (page - 1) * page_size
-        
-        # Add ORDER BY, LIMIT, OFFSET to main query
-        base_query += ' ORDER BY "UploadDate" DESC LIMIT :limit OFFSET :offset'
-        params['limit'] = page_size
-        params['offset'] = offset
+        # Get total count for pagination (the count costs as much as the page on large ranges)
+        total_count = None
+        if count_mode == "exact":
+            total_count = db.execute(text(count_query), params).scalar()
+        elif count_mode == "estimate":
+            total_count = estimate_query_rows(db, count_query.replace("COUNT(*)", "1", 1), params)
+        print(f"  - Total count result ({count_mode}): {total_count}")
+        
+        if use_cursor:
+            # Keyset pagination: continue after the (UploadDate, Id) of the previous page's last row.
+            # NULL UploadDates sort first under DESC, so they are paged by Id before the dated rows.
+            if cursor:
+                cursor_upload_date, cursor_id = decode_order_cursor(cursor)
+                if cursor_upload_date is None:
+                    keyset_condition = '(("UploadDate" IS NULL AND "Id" < :cursor_id) OR "UploadDate" IS NOT NULL)'
+                else:
+                    keyset_condition = '("UploadDate", "Id") < (:cursor_upload_date, :cursor_id)'
+                    params['cursor_upload_date'] = cursor_upload_date
+                params['cursor_id'] = cursor_id
+                base_query += (" AND " if conditions else " WHERE ") + keyset_condition
+            
+            # One extra row tells whether there is a next page
+            base_query += ' ORDER BY "UploadDate" DESC, "Id" DESC LIMIT :limit'
+            params['limit'] = page_size + 1
+        else:
+            # Calculate offset for pagination
+            offset = (page - 1) * page_size
+            
+            # Add ORDER BY, LIMIT, OFFSET to main query
+            base_query += ' ORDER BY "UploadDate" DESC, "Id" DESC LIMIT :limit OFFSET :offset'
+            params['limit'] = page_size
+            params['offset'] = offset
         
         # Execute query
         result = db.execute(text(base_query), params).fetchall()
         print(f"  - Query returned {len(result)} rows")
         
-        # Convert to response format - no need for deduplication since using clean_orders view
+        next_cursor = None
+        if use_cursor:
+            has_next = len(result) > page_size
+            result = result[:page_size]
+            if has_next:
+                next_cursor = encode_order_cursor(result[-1][11], result[-1][0])
+        
+        # Convert to response format - no need for deduplication since using clean_orders table
         orders_data = []
         
         for row in result:
-            # Fallback logic: Use OrderNumberFlexo if available, otherwise use original OrderNumber
-            order_number_flexo = row[15]  # OrderNumberFlexo
-            original_order_number = row[3]  # OrderNumber
-            display_order_number = order_number_flexo if order_number_flexo and order_number_flexo.strip() else original_order_number
-            
-            order_dict = {
-                "id": row[0],  # Id
-                "marketplace": row[1],  # Marketplace
-                "brand": row[2],  # Brand
-                "order_number": display_order_number,  # Fallback: OrderNumberFlexo or OrderNumber
-                "order_status": row[16],  # OrderStatusFlexo
-                "awb": row[5],  # AWB
-                "transporter": row[6],  # Transporter
-                "order_date": row[7].strftime("%Y-%m-%d") if row[7] else None,  # OrderDate
-                "sla": row[8],  # SLA
-                "batch": row[9],  # Batch
-                "pic": row[10],  # PIC
-                "upload_date": row[11].strftime("%Y-%m-%d") if row[11] else None,  # UploadDate
-                "remarks": row[12],  # Remarks
-                "interface_status": row[13],  # InterfaceStatus
-                "task_id": row[14],  # TaskId
-                "order_number_flexo": row[15],  # OrderNumberFlexo
-                "order_status_flexo": row[16]  # OrderStatusFlexo
-            }
-            orders_data.append(order_dict)
+            orders_data.append(order_list_row_to_dict(row))
         
         # Debug: Show sample of returned data
         if orders_data:
@@ -5580,17 +5911,22 @@ def get_orders_list(
                 print(f"    - Filter should match: OrderStatus = '{order['order_status']}'")
         
         # Calculate pagination info
-        total_pages = (total_count + page_size - 1) // page_size
+        total_pages = (total_count + page_size - 1) // page_size if total_count is not None else None
+        if not use_cursor:
+            has_next = page < total_pages if total_pages is not None else len(result) == page_size
         
         return {
             "orders": orders_data,
             "pagination": {
+                "mode": "cursor" if use_cursor else "offset",
                 "current_page": page,
                 "page_size": page_size,
                 "total_count": total_count,
+                "count_mode": count_mode,
                 "total_pages": total_pages,
-                "has_next": page < total_pages,
-                "has_prev": page > 1
+                "has_next": has_next,
+                "has_prev": bool(cursor) if use_cursor else page > 1,
+                "next_cursor": next_cursor
             },
             "filters": {
                 "start_date": start_date,
@@ -5639,6 +5975,7 @@ async def update_order_remarks(
         remarks = body.get('remarks', '')
         order.Remarks = remarks
         db.commit()
+        await run_blocking(invalidate_cache, *ORDER_WRITE_TAGS)
         
         
         return {
@@ -5675,6 +6012,7 @@ async def update_order_remark_by_number(
         # Update remarks
         order.Remarks = remark
         db.commit()
+        await run_blocking(invalidate_cache, *ORDER_WRITE_TAGS)
         
         
         return {
@@ -5693,10 +6031,17 @@ async def update_order_remark_by_number(
 @app.get("/api/listbrand")
 async def get_list_brand(
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    not_modified: None = Depends(conditional_get("list_brand")),
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        brands = db.query(ListBrand).all()
+        # Redis lookups block, so the cache is read and written off the event loop
+        cache_key = await run_blocking(response_cache.key, "list_brand", tags=("list_brand",))
+        cached_result = await run_blocking(response_cache.get, cache_key)
+        if cached_result:
+            return cached_result
+
+        brands = (await db.execute(select(ListBrand))).scalars().all()
         
         # Convert datetime objects to ISO format strings
         brands_data = []
@@ -5710,17 +6055,19 @@ async def get_list_brand(
             }
             brands_data.append(brand_dict)
         
-        return {"brands": brands_data}
+        result = {"brands": brands_data}
+        await run_blocking(response_cache.set, cache_key, result)
+        return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/listbrand/brands")
 async def get_unique_brands(
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        brands = db.query(ListBrand.brand).distinct().all()
+        brands = (await db.execute(select(ListBrand.brand).distinct())).all()
         unique_brands = [brand[0] for brand in brands]
         return {"brands": unique_brands}
     except Exception as e:
@@ -5729,10 +6076,10 @@ async def get_unique_brands(
 @app.get("/api/listbrand/marketplaces")
 async def get_unique_marketplaces(
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     try:
-        marketplaces = db.query(ListBrand.marketplace).distinct().all()
+        marketplaces = (await db.execute(select(ListBrand.marketplace).distinct())).all()
         unique_marketplaces = [marketplace[0] for marketplace in marketplaces]
         return {"marketplaces": unique_marketplaces}
     except Exception as e:
@@ -5746,17 +6093,25 @@ async def get_brand_shops(
     marketplace_id: Optional[int] = None,
     search: Optional[str] = None,
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    not_modified: None = Depends(conditional_get("brand_shops")),
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get brand shops with optional filtering and global search"""
     try:
-        query = db.query(BrandShop)
+        cache_key = await run_blocking(
+            response_cache.key, "brand_shops", skip, limit, brand, marketplace_id, search, tags=("brand_shops",)
+        )
+        cached_result = await run_blocking(response_cache.get, cache_key)
+        if cached_result:
+            return cached_result
+
+        query = select(BrandShop)
         
         # Global search across multiple fields
         if search and search.strip():
             search_term = search.strip()
             # Use exact match for shop_name to prevent incorrect shop_key_1 retrieval
-            query = query.filter(
+            query = query.where(
                 or_(
                     BrandShop.shop_name.ilike(search_term),  # Exact match for shop_name
                     BrandShop.brand.ilike(f"%{search_term}%"),  # Partial match for other fields
@@ -5771,31 +6126,33 @@ async def get_brand_shops(
             )
         
         if brand:
-            query = query.filter(BrandShop.brand.ilike(f"%{brand}%"))
+            query = query.where(BrandShop.brand.ilike(f"%{brand}%"))
         
         if marketplace_id:
-            query = query.filter(BrandShop.marketplace_id == marketplace_id)
+            query = query.where(BrandShop.marketplace_id == marketplace_id)
         
-        total = query.count()
-        brand_shops = query.offset(skip).limit(limit).all()
+        total = await db.scalar(select(func.count()).select_from(query.subquery()))
+        brand_shops = (await db.execute(query.offset(skip).limit(limit))).scalars().all()
         
-        return {
+        result = {
             "total": total,
             "data": brand_shops,
             "skip": skip,
             "limit": limit
         }
+        await run_blocking(response_cache.set, cache_key, result)
+        return result
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/brandshops/brands")
 async def get_unique_brands_from_shops(
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get unique brands from brand_shops table"""
     try:
-        brands = db.query(BrandShop.brand).filter(BrandShop.brand.isnot(None)).distinct().all()
+        brands = (await db.execute(select(BrandShop.brand).where(BrandShop.brand.isnot(None)).distinct())).all()
         unique_brands = [brand[0] for brand in brands if brand[0]]
         return {"brands": unique_brands}
     except Exception as e:
@@ -5804,11 +6161,13 @@ async def get_unique_brands_from_shops(
 @app.get("/api/brandshops/marketplaces")
 async def get_unique_marketplace_ids(
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get unique marketplace IDs from brand_shops table"""
     try:
-        marketplaces = db.query(BrandShop.marketplace_id).filter(BrandShop.marketplace_id.isnot(None)).distinct().all()
+        marketplaces = (await db.execute(
+            select(BrandShop.marketplace_id).where(BrandShop.marketplace_id.isnot(None)).distinct()
+        )).all()
         unique_marketplace_ids = [marketplace[0] for marketplace in marketplaces if marketplace[0]]
         return {"marketplace_ids": unique_marketplace_ids}
     except Exception as e:
@@ -5825,6 +6184,7 @@ async def create_brand_shop(
         new_shop = BrandShop(**shop_data)
         db.add(new_shop)
         db.commit()
+        await run_blocking(invalidate_cache, *BRAND_SHOP_WRITE_TAGS)
         db.refresh(new_shop)
         return new_shop
     except Exception as e:
@@ -5849,6 +6209,7 @@ async def update_brand_shop(
                 setattr(shop, key, value)
         
         db.commit()
+        await run_blocking(invalidate_cache, *BRAND_SHOP_WRITE_TAGS)
         db.refresh(shop)
         return shop
     except HTTPException:
@@ -5871,6 +6232,7 @@ async def delete_brand_shop(
         
         db.delete(shop)
         db.commit()
+        await run_blocking(invalidate_cache, *BRAND_SHOP_WRITE_TAGS)
         return {"message": "Shop deleted successfully"}
     except HTTPException:
         raise
@@ -5878,11 +6240,27 @@ async def delete_brand_shop(
         db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
+def coerce_brand_shop_value(column_name, value):
+    """Plain Python value for a BrandShop column; asyncpg rejects numpy and float values on text and integer columns"""
+    if value is None or (not isinstance(value, (list, dict)) and pd.isna(value)):
+        return None
+    column_type = BrandShop.__table__.columns[column_name].type
+    if isinstance(column_type, Integer):
+        return int(float(value)) if value != '' else None
+    if isinstance(column_type, String):
+        # Excel stores numeric keys as floats (12345.0)
+        if isinstance(value, float) and value.is_integer():
+            value = int(value)
+        return str(value)
+    if isinstance(column_type, DateTime):
+        return pd.Timestamp(value).to_pydatetime()
+    return value
+
 @app.post("/api/brandshops/bulk-create")
 async def bulk_create_brand_shops(
     file: UploadFile = File(...),
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Bulk create brand shops from Excel/CSV file"""
     try:
@@ -5890,15 +6268,12 @@ async def bulk_create_brand_shops(
         errors = []
         
         # Read file content
-        file_content = file.file.read()
+        file_content = await file.read()
         
-        # Parse file based on extension
-        if file.filename.endswith('.xlsx'):
-            df = pd.read_excel(io.BytesIO(file_content))
-        elif file.filename.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(file_content))
-        else:
+        # Parse file based on extension (pandas runs on the blocking pool, not the event loop)
+        if not file.filename.endswith(('.xlsx', '.csv')):
             raise HTTPException(status_code=400, detail="Unsupported file format. Please use .xlsx or .csv")
+        df = await run_blocking(read_tabular_upload, file_content, file.filename)
         
         # Validate required columns
         required_columns = ['brand', 'marketplace_id']
@@ -5909,19 +6284,12 @@ async def bulk_create_brand_shops(
         # Process each row
         for i, row in df.iterrows():
             try:
-                shop_data = row.to_dict()
-                
-                # Clean NaN values and convert types
-                for key, value in shop_data.items():
-                    if pd.isna(value):
-                        shop_data[key] = None
-                    elif key in ['marketplace_id', 'client_id', 'client_shop_id'] and value is not None:
-                        try:
-                            shop_data[key] = int(float(value)) if value != '' else None
-                        except (ValueError, TypeError):
-                            shop_data[key] = None
-                    elif isinstance(value, (int, float)) and (value == float('inf') or value == float('-inf') or pd.isna(value)):
-                        shop_data[key] = None
+                # Clean NaN values and convert types (unknown columns are ignored)
+                shop_data = {
+                    key: coerce_brand_shop_value(key, value)
+                    for key, value in row.to_dict().items()
+                    if key in BrandShop.__table__.columns
+                }
                 
                 # Validate required fields
                 if not shop_data.get('brand') or not shop_data.get('marketplace_id'):
@@ -5929,10 +6297,10 @@ async def bulk_create_brand_shops(
                     continue
                 
                 # Check if shop already exists (brand + marketplace_id combination)
-                existing = db.query(BrandShop).filter(
+                existing = (await db.execute(select(BrandShop).where(
                     BrandShop.brand == shop_data['brand'],
                     BrandShop.marketplace_id == shop_data['marketplace_id']
-                ).first()
+                ))).scalars().first()
                 
                 if existing:
                     errors.append(f"Row {i+2}: Shop already exists for brand {shop_data['brand']} in marketplace {shop_data['marketplace_id']}")
@@ -5952,8 +6320,10 @@ async def bulk_create_brand_shops(
                     is_open=shop_data.get('is_open', 1)
                 )
                 
-                db.add(new_shop)
-                db.flush()  # Get the ID without committing
+                # Savepoint per row: a rejected row is rolled back alone instead of failing the whole upload
+                async with db.begin_nested():
+                    db.add(new_shop)
+                    await db.flush()  # Get the ID without committing
                 
                 created_shops.append({
                     "id": int(new_shop.id),
@@ -5969,7 +6339,8 @@ async def bulk_create_brand_shops(
             except Exception as e:
                 errors.append(f"Row {i+2}: {str(e)}")
         
-        db.commit()
+        await db.commit()
+        await run_blocking(invalidate_cache, *BRAND_SHOP_WRITE_TAGS)
         
         return {
             "message": f"Bulk operation completed. {len(created_shops)} shops created, {len(errors)} errors.",
@@ -5980,14 +6351,14 @@ async def bulk_create_brand_shops(
         }
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/brandshops/bulk-update")
 async def bulk_update_brand_shops(
     updates_data: List[dict],
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Bulk update brand shops"""
     try:
@@ -6001,15 +6372,17 @@ async def bulk_update_brand_shops(
                     errors.append(f"Row {i+1}: ID is required for updates")
                     continue
                 
-                shop = db.query(BrandShop).filter(BrandShop.id == shop_id).first()
+                shop = (await db.execute(select(BrandShop).where(BrandShop.id == shop_id))).scalars().first()
                 if not shop:
                     errors.append(f"Row {i+1}: Shop with ID {shop_id} not found")
                     continue
                 
-                # Update fields
-                for key, value in update_data.items():
-                    if key != 'id' and hasattr(shop, key):
-                        setattr(shop, key, value)
+                # Update fields (JSON numbers and strings converted to the column types)
+                async with db.begin_nested():
+                    for key, value in update_data.items():
+                        if key != 'id' and key in BrandShop.__table__.columns:
+                            setattr(shop, key, coerce_brand_shop_value(key, value))
+                    await db.flush()
                 
                 updated_shops.append({
                     "id": shop.id,
@@ -6025,7 +6398,8 @@ async def bulk_update_brand_shops(
             except Exception as e:
                 errors.append(f"Row {i+1}: {str(e)}")
         
-        db.commit()
+        await db.commit()
+        await run_blocking(invalidate_cache, *BRAND_SHOP_WRITE_TAGS)
         
         return {
             "message": f"Bulk update completed. {len(updated_shops)} shops updated, {len(errors)} errors.",
@@ -6036,14 +6410,14 @@ async def bulk_update_brand_shops(
         }
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/brandshops/bulk-delete")
 async def bulk_delete_brand_shops(
     ids: List[int],
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Bulk delete brand shops"""
     try:
@@ -6052,16 +6426,17 @@ async def bulk_delete_brand_shops(
         
         for shop_id in ids:
             try:
-                shop = db.query(BrandShop).filter(BrandShop.id == shop_id).first()
+                shop = (await db.execute(select(BrandShop).where(BrandShop.id == shop_id))).scalars().first()
                 if shop:
-                    db.delete(shop)
+                    await db.delete(shop)
                     deleted_count += 1
                 else:
                     errors.append(f"Shop with ID {shop_id} not found")
             except Exception as e:
                 errors.append(f"Error deleting shop ID {shop_id}: {str(e)}")
         
-        db.commit()
+        await db.commit()
+        await run_blocking(invalidate_cache, *BRAND_SHOP_WRITE_TAGS)
         
         return {
             "message": f"Bulk delete completed. {deleted_count} shops deleted, {len(errors)} errors.",
@@ -6071,7 +6446,7 @@ async def bulk_delete_brand_shops(
         }
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/listbrand")
@@ -6099,6 +6474,7 @@ async def create_list_brand(
         
         db.add(new_brand)
         db.commit()
+        await run_blocking(invalidate_cache, *LIST_BRAND_WRITE_TAGS)
         db.refresh(new_brand)
         
         return {
@@ -6120,7 +6496,7 @@ async def create_list_brand(
 async def bulk_create_marketplace_info(
     file: UploadFile = File(...),
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Bulk create marketplace info entries from Excel/CSV file"""
     try:
@@ -6128,15 +6504,12 @@ async def bulk_create_marketplace_info(
         errors = []
         
         # Read file content
-        file_content = file.file.read()
+        file_content = await file.read()
         
-        # Parse file based on extension
-        if file.filename.endswith('.xlsx'):
-            df = pd.read_excel(io.BytesIO(file_content))
-        elif file.filename.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(file_content))
-        else:
+        # Parse file based on extension (pandas runs on the blocking pool, not the event loop)
+        if not file.filename.endswith(('.xlsx', '.csv')):
             raise HTTPException(status_code=400, detail="Unsupported file format. Please use .xlsx or .csv")
+        df = await run_blocking(read_tabular_upload, file_content, file.filename)
         
         # Validate required columns
         required_columns = ['brand', 'marketplace']
@@ -6164,11 +6537,11 @@ async def bulk_create_marketplace_info(
                     continue
                 
                 # Check if brand-marketplace-batch combination already exists
-                existing = db.query(ListBrand).filter(
+                existing = (await db.execute(select(ListBrand).where(
                     ListBrand.brand == brand_data['brand'],
                     ListBrand.marketplace == brand_data['marketplace'],
                     ListBrand.batch == brand_data.get('batch', '1')
-                ).first()
+                ))).scalars().first()
                 
                 if existing:
                     errors.append(f"Row {i+2}: Brand-marketplace-batch combination already exists")
@@ -6178,11 +6551,12 @@ async def bulk_create_marketplace_info(
                     brand=brand_data['brand'],
                     marketplace=brand_data['marketplace'],
                     batch=brand_data.get('batch', '1'),
-                    remark=brand_data.get('remark', '')
+                    remark=brand_data.get('remark', ''),
+                    created_at=convert_to_naive_wib(get_wib_now())  # asyncpg rejects aware datetimes for DateTime columns
                 )
                 
                 db.add(new_brand)
-                db.flush()  # Get the ID without committing
+                await db.flush()  # Get the ID without committing
                 
                 created_brands.append({
                     "id": int(new_brand.id),
@@ -6195,7 +6569,8 @@ async def bulk_create_marketplace_info(
             except Exception as e:
                 errors.append(f"Row {i+2}: {str(e)}")
         
-        db.commit()
+        await db.commit()
+        await run_blocking(invalidate_cache, *LIST_BRAND_WRITE_TAGS)
         
         return {
             "message": f"Bulk operation completed. {len(created_brands)} entries created, {len(errors)} errors.",
@@ -6206,14 +6581,14 @@ async def bulk_create_marketplace_info(
         }
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/listbrand/bulk-update")
 async def bulk_update_marketplace_info(
     file: UploadFile = File(...),
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Bulk update marketplace info entries from Excel/CSV file"""
     try:
@@ -6221,15 +6596,12 @@ async def bulk_update_marketplace_info(
         errors = []
         
         # Read file content
-        file_content = file.file.read()
+        file_content = await file.read()
         
-        # Parse file based on extension
-        if file.filename.endswith('.xlsx'):
-            df = pd.read_excel(io.BytesIO(file_content))
-        elif file.filename.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(file_content))
-        else:
+        # Parse file based on extension (pandas runs on the blocking pool, not the event loop)
+        if not file.filename.endswith(('.xlsx', '.csv')):
             raise HTTPException(status_code=400, detail="Unsupported file format. Please use .xlsx or .csv")
+        df = await run_blocking(read_tabular_upload, file_content, file.filename)
         
         # Validate required columns
         required_columns = ['id']
@@ -6247,20 +6619,20 @@ async def bulk_update_marketplace_info(
                     errors.append(f"Row {i+2}: ID is required for updates")
                     continue
                 
-                brand = db.query(ListBrand).filter(ListBrand.id == brand_id).first()
+                brand = (await db.execute(select(ListBrand).where(ListBrand.id == int(brand_id)))).scalars().first()
                 if not brand:
                     errors.append(f"Row {i+2}: Brand with ID {brand_id} not found")
                     continue
                 
-                # Update fields
+                # Update fields (asyncpg needs the text columns as str, Excel cells may be numbers)
                 if 'brand' in update_data and update_data['brand']:
-                    brand.brand = update_data['brand']
+                    brand.brand = str(update_data['brand'])
                 if 'marketplace' in update_data and update_data['marketplace']:
-                    brand.marketplace = update_data['marketplace']
+                    brand.marketplace = str(update_data['marketplace'])
                 if 'batch' in update_data and update_data['batch']:
-                    brand.batch = update_data['batch']
+                    brand.batch = str(update_data['batch'])
                 if 'remark' in update_data:
-                    brand.remark = update_data['remark']
+                    brand.remark = None if pd.isna(update_data['remark']) else str(update_data['remark'])
                 
                 updated_brands.append({
                     "id": brand.id,
@@ -6273,7 +6645,8 @@ async def bulk_update_marketplace_info(
             except Exception as e:
                 errors.append(f"Row {i+2}: {str(e)}")
         
-        db.commit()
+        await db.commit()
+        await run_blocking(invalidate_cache, *LIST_BRAND_WRITE_TAGS)
         
         return {
             "message": f"Bulk update completed. {len(updated_brands)} entries updated, {len(errors)} errors.",
@@ -6284,14 +6657,14 @@ async def bulk_update_marketplace_info(
         }
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/listbrand/bulk-delete")
 async def bulk_delete_marketplace_info(
     ids: List[int],
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Bulk delete marketplace info entries"""
     try:
@@ -6300,16 +6673,17 @@ async def bulk_delete_marketplace_info(
         
         for brand_id in ids:
             try:
-                brand = db.query(ListBrand).filter(ListBrand.id == brand_id).first()
+                brand = (await db.execute(select(ListBrand).where(ListBrand.id == brand_id))).scalars().first()
                 if brand:
-                    db.delete(brand)
+                    await db.delete(brand)
                     deleted_count += 1
                 else:
                     errors.append(f"Brand with ID {brand_id} not found")
             except Exception as e:
                 errors.append(f"Error deleting brand ID {brand_id}: {str(e)}")
         
-        db.commit()
+        await db.commit()
+        await run_blocking(invalidate_cache, *LIST_BRAND_WRITE_TAGS)
         
         return {
             "message": f"Bulk delete completed. {deleted_count} entries deleted, {len(errors)} errors.",
@@ -6319,7 +6693,7 @@ async def bulk_delete_marketplace_info(
         }
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.put("/api/listbrand/remark")
@@ -6348,6 +6722,7 @@ async def update_list_brand_remark(
         # Update the remark in list_brand table (for backward compatibility)
         brand_record.remark = remark
         db.commit()
+        await run_blocking(invalidate_cache, *LIST_BRAND_WRITE_TAGS)
         db.refresh(brand_record)
         
         # Also update remark in history table for today's records
@@ -6368,6 +6743,7 @@ async def update_list_brand_remark(
             history_record.remark = remark
         
         db.commit()
+        await run_blocking(invalidate_cache, *LIST_BRAND_WRITE_TAGS)
         
         return {
             "message": "Remark updated successfully",
@@ -6414,6 +6790,7 @@ async def update_not_uploaded_history_remark(
         # Update the remark
         history_record.remark = remark
         db.commit()
+        await run_blocking(invalidate_cache, "dashboard")
         db.refresh(history_record)
         
         return {
@@ -6471,6 +6848,7 @@ async def update_not_interfaced_order_remark(
         # Update the remark
         order.Remarks = remark
         db.commit()
+        await run_blocking(invalidate_cache, *ORDER_WRITE_TAGS)
         db.refresh(order)
         
         return {
@@ -6516,6 +6894,7 @@ async def update_list_brand(
             brand.batch = brand_data['batch']
         
         db.commit()
+        await run_blocking(invalidate_cache, *LIST_BRAND_WRITE_TAGS)
         db.refresh(brand)
         
         return {
@@ -6546,6 +6925,7 @@ async def delete_list_brand(
         
         db.delete(brand)
         db.commit()
+        await run_blocking(invalidate_cache, *LIST_BRAND_WRITE_TAGS)
         
         return {"message": "Brand deleted successfully"}
     except HTTPException:
@@ -6574,6 +6954,7 @@ async def create_upload_history(
         
         db.add(new_history)
         db.commit()
+        await run_blocking(invalidate_cache, "dashboard")
         db.refresh(new_history)
         
         return {
@@ -6701,6 +7082,7 @@ async def delete_upload_history(
         
         db.delete(history)
         db.commit()
+        await run_blocking(invalidate_cache, "dashboard")
         
         return {"message": "Upload history deleted successfully"}
     except HTTPException:
@@ -7174,16 +7556,12 @@ def run_all_marketplace_apps(current_user: str = Depends(get_current_user)):
                 for brand_info in marketplace_brands:
                     brand_name = brand_info['brand']
                     
-                    # Query orders: InterfaceStatus = 'Not Yet Interface' AND OrderStatus NOT IN cancelled statuses
-                    cancelled_statuses = ['batal', 'cancel', 'cancellation', 'BATAL', 'CANCEL', 'CANCELLATION', 
-                                        'Cancellations', 'Dibatalkan', 'Batal', 'CANCELED', 'Cancelled', 
-                                        'canceled', 'Pembatalan diajukan', 'Order Batal', 'CANCELLED']
-                    
+                    # Query orders: InterfaceStatus = 'Not Yet Interface' AND not cancelled
                     not_interfaced_orders = db.query(UploadedOrder).filter(
                         UploadedOrder.Marketplace == marketplace.upper(),
                         UploadedOrder.Brand == brand_name,
                         UploadedOrder.InterfaceStatus == 'Not Yet Interface',
-                        ~UploadedOrder.OrderStatusFlexo.in_(cancelled_statuses)
+                        ~UploadedOrder.IsCancelled
                     ).all()
                     
                     if not_interfaced_orders:
@@ -7892,25 +8270,25 @@ async def debug_table_counts():
 
 @app.get("/api/create-clean-orders-view")
 async def create_view_endpoint():
-    """Create clean_orders view for deduplicated data"""
+    """Rebuild the clean_orders table for deduplicated data (kept in sync by triggers otherwise)"""
     try:
         db = SessionLocal()
         
-        # Create the view
+        # Rebuild the table
         success = create_clean_orders_view(db)
         
         if success:
-            # Check view creation
+            # Check rebuilt table
             view_count = db.execute(text("SELECT COUNT(*) FROM clean_orders")).scalar()
             
             return {
-                "message": "Clean orders view created successfully",
+                "message": "Clean orders table rebuilt successfully",
                 "view_record_count": view_count,
                 "status": "success"
             }
         else:
             return {
-                "error": "Failed to create view",
+                "error": "Failed to rebuild clean_orders table",
                 "status": "error"
             }
             
@@ -7922,246 +8300,84 @@ async def create_view_endpoint():
     finally:
         db.close()
 
-@app.post("/api/refresh-interface-status-simple")
-async def refresh_interface_status_simple(current_user: str = Depends(get_current_user)):
-    """Simple refresh interface status - works with 1 table + 1 view approach"""
+@app.post("/api/rebuild-order-rollup")
+def rebuild_order_rollup_endpoint(current_user: str = Depends(get_current_user)):
+    """Rebuild the dashboard rollup (order_daily_rollup) from uploaded_orders (kept in sync by triggers otherwise)"""
+    db = SessionLocal()
     try:
-        print(f"🔄 Starting simple interface status refresh for user: {current_user}")
-        
-        db = SessionLocal()
-        try:
-            # Get orders that need to be refreshed (where InterfaceStatus = 'Not Yet Interface')
-            missing_orders_result = db.execute(text("""
-                SELECT "OrderNumber", "Marketplace", "Brand", "OrderStatus"
-                FROM uploaded_orders 
-                WHERE "InterfaceStatus" = 'Not Yet Interface'
-                AND "OrderStatus" NOT IN ('batal', 'cancel', 'cancellation', 'BATAL', 'CANCEL', 'CANCELLATION', 'Cancellations', 'Dibatalkan', 'Batal', 'CANCELED', 'Cancelled', 'canceled', 'Pembatalan diajukan', 'Order Batal', 'CANCELLED')
-                ORDER BY "UploadDate" DESC
-            """))
-            
-            missing_orders = missing_orders_result.fetchall()
-            print(f"📊 Found {len(missing_orders)} orders that need external database sync")
-            
-            if missing_orders:
-                # Group orders by marketplace
-                orders_by_marketplace = {}
-                for order in missing_orders:
-                    order_number, marketplace, brand, order_status = order
-                    marketplace_key = marketplace.lower() if marketplace else 'unknown'
-                    if marketplace_key not in orders_by_marketplace:
-                        orders_by_marketplace[marketplace_key] = []
-                    orders_by_marketplace[marketplace_key].append({
-                        'order_number': order_number,
-                        'marketplace': marketplace,
-                        'brand': brand
-                    })
-                
-                # Process each marketplace
-                updated_count = 0
-                for marketplace, orders_list in orders_by_marketplace.items():
-                    print(f"🔄 Processing {len(orders_list)} orders for marketplace: {marketplace}")
-                    
-                    # Get order numbers for this marketplace
-                    order_numbers = [order['order_number'] for order in orders_list]
-                    
-                    # Query external database
-                    external_results = check_external_database_status(order_numbers, marketplace)
-                    print(f"📊 External database returned {len(external_results)} results for {marketplace}")
-                    
-                    # Update uploaded_orders with external data
-                    for order in orders_list:
-                        order_number = order['order_number']
-                        if order_number in external_results:
-                            external_data = external_results[order_number]
-                            
-                            # Update uploaded_orders directly
-                            db.execute(text("""
-                                UPDATE uploaded_orders 
-                                SET 
-                                    "OrderNumberFlexo" = :order_number_flexo,
-                                    "OrderStatusFlexo" = :order_status_flexo,
-                                    "InterfaceStatus" = :interface_status
-                                WHERE "OrderNumber" = :order_number
-                            """), {
-                                "order_number_flexo": external_data.get('system_ref_id', ''),
-                                "order_status_flexo": external_data.get('order_status', ''),
-                                "interface_status": external_data.get('interface_status', 'Not Yet Interface'),
-                                "order_number": order_number
-                            })
-                            
-                            updated_count += 1
-                
-                db.commit()
-                print(f"✅ Successfully updated {updated_count} orders with external database data")
-                
-                return {
-                    "success": True,
-                    "message": f"Interface status refreshed for {updated_count} orders",
-                    "updated_count": updated_count,
-                    "total_processed": len(missing_orders),
-                    "marketplaces_processed": len(orders_by_marketplace)
-                }
-            else:
-                return {
-                    "success": True,
-                    "message": "No orders need refresh - all orders already have external data",
-                    "updated_count": 0,
-                    "total_processed": 0
-                }
-                
-        except Exception as e:
-            print(f"❌ Error in simple refresh: {e}")
-            db.rollback()
-            return {
-                "success": False,
-                "message": f"Error refreshing interface status: {str(e)}",
-                "updated_count": 0
-            }
-        finally:
-            db.close()
-            
+        count = rebuild_order_rollup(db)
+        invalidate_cache("dashboard")
+        logger.info(f"order_daily_rollup rebuilt by {current_user}: {count} rollup rows")
+        return {"message": "Order rollup rebuilt successfully", "rollup_rows": count, "status": "success"}
     except Exception as e:
-        print(f"❌ Error in refresh interface status: {e}")
-        return {
-            "success": False,
-            "message": f"Error: {str(e)}",
-            "updated_count": 0
-        }
+        db.rollback()
+        logger.error(f"Error rebuilding order rollup: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to rebuild order rollup: {str(e)}")
+    finally:
+        db.close()
+
+@app.post("/api/rebuild-order-facets")
+def rebuild_order_facets_endpoint(current_user: str = Depends(get_current_user)):
+    """Rebuild the filter facets (order_facets) from clean_orders (kept in sync by triggers otherwise)"""
+    db = SessionLocal()
+    try:
+        count = rebuild_order_facets(db)
+        invalidate_cache("orders")
+        logger.info(f"order_facets rebuilt by {current_user}: {count} facet rows")
+        return {"message": "Order facets rebuilt successfully", "facet_rows": count, "status": "success"}
+    except Exception as e:
+        db.rollback()
+        logger.error(f"Error rebuilding order facets: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"Failed to rebuild order facets: {str(e)}")
+    finally:
+        db.close()
 
 @app.post("/api/refresh-interface-status")
-async def refresh_interface_status(current_user: str = Depends(get_current_user)):
-    """Refresh interface status - simplified version"""
+def refresh_interface_status(current_user: str = Depends(get_current_user)):
+    """Trigger the background interface status reconciler and return its current state"""
     try:
-        print(f"🔄 Starting interface status refresh for user: {current_user}")
+        print(f"🔄 Interface status refresh requested by user: {current_user}")
+        interface_reconciler.trigger()
+        status = interface_reconciler.get_status()
+        last_cycle = status.get("last_cycle") or {}
         
-        db = SessionLocal()
-        try:
-            # Get orders that need to be refreshed
-            missing_orders_result = db.execute(text("""
-                SELECT "OrderNumber", "Marketplace", "Brand", "OrderStatus"
-                FROM uploaded_orders 
-                WHERE "InterfaceStatus" = 'Not Yet Interface'
-                AND "OrderStatus" NOT IN ('batal', 'cancel', 'cancellation', 'BATAL', 'CANCEL', 'CANCELLATION', 'Cancellations', 'Dibatalkan', 'Batal', 'CANCELED', 'Cancelled', 'canceled', 'Pembatalan diajukan', 'Order Batal', 'CANCELLED')
-                ORDER BY "UploadDate" DESC
-            """))
-            
-            missing_orders = missing_orders_result.fetchall()
-            print(f"📊 Found {len(missing_orders)} orders that need external database sync")
-            
-            if not missing_orders:
-                return {
-                    "success": True,
-                    "message": "No orders need refresh - all orders already have external data",
-                    "updated_count": 0
-                }
-            
-            # Process in batches to avoid timeout and memory issues
-            BATCH_SIZE = 1000  # Process 1000 orders at a time
-            total_orders = len(missing_orders)
-            total_updated = 0
-            
-            print(f"🔄 Processing {total_orders} orders in batches of {BATCH_SIZE}")
-            
-            for batch_start in range(0, total_orders, BATCH_SIZE):
-                batch_end = min(batch_start + BATCH_SIZE, total_orders)
-                batch_orders = missing_orders[batch_start:batch_end]
-                
-                print(f"📦 Processing batch {batch_start//BATCH_SIZE + 1}: orders {batch_start + 1}-{batch_end} of {total_orders}")
-                
-                # Group orders by marketplace for this batch
-                orders_by_marketplace = {}
-                for order in batch_orders:
-                    order_number, marketplace, brand, order_status = order
-                    marketplace_key = marketplace.lower() if marketplace else 'unknown'
-                    if marketplace_key not in orders_by_marketplace:
-                        orders_by_marketplace[marketplace_key] = []
-                    orders_by_marketplace[marketplace_key].append({
-                        'order_number': order_number,
-                        'marketplace': marketplace,
-                        'brand': brand
-                    })
-                
-                # Process each marketplace in this batch
-                batch_updated = 0
-                batch_external_orders = 0
-                
-                for marketplace, orders_list in orders_by_marketplace.items():
-                    print(f"🔄 Processing {len(orders_list)} orders for marketplace: {marketplace}")
-                    
-                    # Get order numbers for this marketplace
-                    order_numbers = [order['order_number'] for order in orders_list]
-                    
-                    # Query external database
-                    external_results = check_external_database_status(order_numbers, marketplace)
-                    print(f"📊 External database returned {len(external_results)} results for {marketplace}")
-                    batch_external_orders += len(external_results)
-                    
-                    # Update uploaded_orders with external data
-                    for order in orders_list:
-                        order_number = order['order_number']
-                        if order_number in external_results:
-                            external_data = external_results[order_number]
-                            
-                            # Update uploaded_orders directly
-                            db.execute(text("""
-                                UPDATE uploaded_orders 
-                                SET 
-                                    "OrderNumberFlexo" = :order_number_flexo,
-                                    "OrderStatusFlexo" = :order_status_flexo,
-                                    "InterfaceStatus" = :interface_status
-                                WHERE "OrderNumber" = :order_number
-                            """), {
-                                "order_number_flexo": external_data.get('system_ref_id', ''),
-                                "order_status_flexo": external_data.get('order_status', ''),
-                                "interface_status": external_data.get('interface_status', 'Not Yet Interface'),
-                                "order_number": order_number
-                            })
-                            
-                            batch_updated += 1
-                            print(f"  ✅ Updated order {order_number}: FlexoNumber={external_data.get('system_ref_id', '')}, FlexoStatus={external_data.get('order_status', '')}")
-                
-                # Commit this batch
-                db.commit()
-                total_updated += batch_updated
-                print(f"✅ Batch {batch_start//BATCH_SIZE + 1} completed: {batch_updated} orders updated (Total: {total_updated}/{total_orders})")
-            
-            print(f"🎉 All batches completed! Successfully updated {total_updated} orders out of {total_orders} checked")
-                
-            return {
-                "success": True,
-                "message": f"Interface status refreshed successfully! {total_updated} orders updated from {total_orders} orders processed.",
-                "updated_count": total_updated,
-                "total_orders_processed": total_orders
-            }
-                
-        except Exception as e:
-            print(f"❌ Error in refresh: {e}")
-            db.rollback()
-            return {
-                "success": False,
-                "message": f"Error refreshing interface status: {str(e)}",
-                "updated_count": 0
-            }
-        finally:
-            db.close()
-            
+        return {
+            "success": True,
+            "message": f"Interface status refresh triggered, {status['due_orders']} orders due for a check",
+            "updated_count": last_cycle.get("updated", 0),
+            "total_external_orders": last_cycle.get("checked", 0),
+            "reconciler": status
+        }
     except Exception as e:
-        print(f"❌ Error in refresh interface status: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        print(f"❌ Error triggering interface status refresh: {str(e)}")
         return {
             "success": False,
             "message": f"Error: {str(e)}",
             "updated_count": 0
         }
 
+@app.post("/api/refresh-interface-status-simple")
+def refresh_interface_status_simple(current_user: str = Depends(get_current_user)):
+    """Kept for older clients: same as /api/refresh-interface-status (triggers the reconciler)"""
+    return refresh_interface_status(current_user)
 
+@app.get("/api/refresh-interface-status/status")
+def get_refresh_interface_status(current_user: str = Depends(get_current_user)):
+    """Monitor the interface status reconciler (watermarks, last cycle, due backlog)"""
+    try:
+        return interface_reconciler.get_status()
+    except Exception as e:
+        logger.error(f"Error getting reconciler status: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/queue-status")
-async def get_queue_status():
+def get_queue_status(task_id: Optional[str] = Query(None, description="Also return this task's queue position")):
     """Get current upload queue status without authentication for dashboard"""
+    db = SessionLocal()
     try:
-        queue_status = multi_user_handler.get_queue_status()
+        queue_status = multi_user_handler.get_queue_status(db)
+        if task_id:
+            queue_status['task'] = multi_user_handler.get_queue_position(db, task_id, get_wib_now())
         return {
             "success": True,
             "queue_status": queue_status,
@@ -8170,6 +8386,8 @@ async def get_queue_status():
     except Exception as e:
         logger.error(f"Error getting queue status: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to get queue status: {str(e)}")
+    finally:
+        db.close()
 
 @app.post("/cleanup-user-workspace")
 async def cleanup_user_workspace(
@@ -8235,30 +8453,29 @@ async def manual_reset_remarks(db: Session = Depends(get_db)):
 async def get_not_uploaded_items(
     start_date: Optional[str] = Query(None, description="Start date (ISO format)"),
     end_date: Optional[str] = Query(None, description="End date (ISO format)"),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Get list of brand+marketplace+batch combinations that haven't been uploaded yet"""
     try:
         # Always use history table, but filter by date if provided
-        query = db.query(NotUploadedHistory).filter(NotUploadedHistory.status == 'not_uploaded')
+        query = select(NotUploadedHistory).where(NotUploadedHistory.status == 'not_uploaded')
         
         if start_date and end_date:
             # Filter by date range
             start_dt = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
             end_dt = datetime.fromisoformat(end_date.replace('Z', '+00:00'))
-            query = query.filter(
-                NotUploadedHistory.check_date >= start_dt,
-                NotUploadedHistory.check_date <= end_dt
+            query = query.where(
+                NotUploadedHistory.check_date >= bind_datetime(start_dt),
+                NotUploadedHistory.check_date <= bind_datetime(end_dt)
             )
         else:
-            # If no date filter, get today's data (use string comparison to avoid timezone issues)
+            # If no date filter, get today's data (WIB calendar date)
             current_time = get_wib_now()
-            today_str = current_time.strftime('%Y-%m-%d')
-            query = query.filter(
-                func.date(NotUploadedHistory.check_date) == today_str
+            query = query.where(
+                func.date(NotUploadedHistory.check_date) == current_time.date()
             )
         
-        history_items = query.all()
+        history_items = (await db.execute(query)).scalars().all()
         
         not_uploaded = []
         for item in history_items:
@@ -9070,6 +9287,7 @@ class BrandAccountResponse(BrandAccountBase):
 def get_brand_accounts(
     skip: int = 0,
     limit: int = 100,
+    not_modified: None = Depends(conditional_get("brand_accounts")),
     db: Session = Depends(get_db)
 ):
     """Get all brand accounts"""
@@ -9126,6 +9344,7 @@ def create_brand_account(
         """
         
         db.commit()
+        invalidate_cache(*BRAND_ACCOUNT_WRITE_TAGS)
         
         # Get the inserted record using PostgreSQL RETURNING clause
         insert_query_with_returning = """
@@ -9206,6 +9425,7 @@ def update_brand_account(
         
         db.execute(text(update_query), params)
         db.commit()
+        invalidate_cache(*BRAND_ACCOUNT_WRITE_TAGS)
         
         # Get updated record
         select_query = "SELECT * FROM brand_accounts WHERE id = $1"
@@ -9253,6 +9473,7 @@ def delete_brand_account(
         delete_query = "DELETE FROM brand_accounts WHERE id = $1"
         db.execute(text(delete_query), [account_id])
         db.commit()
+        invalidate_cache(*BRAND_ACCOUNT_WRITE_TAGS)
         
         return {"message": "Brand account deleted successfully"}
         
@@ -9392,6 +9613,7 @@ def update_brand_account(uid: str, brand_account: dict, db: Session = Depends(ge
         })
         
         db.commit()
+        invalidate_cache(*BRAND_ACCOUNT_WRITE_TAGS)
         
         return {"message": "Brand account updated successfully"}
         
@@ -9417,6 +9639,7 @@ def delete_brand_account(uid: str, db: Session = Depends(get_db)):
         db.execute(text(delete_query), {"uid": uid})
         
         db.commit()
+        invalidate_cache(*BRAND_ACCOUNT_WRITE_TAGS)
         
         return {"message": "Brand account deleted successfully"}
         
@@ -9457,6 +9680,7 @@ def create_brand_account(brand_account: dict, db: Session = Depends(get_db)):
         })
         
         db.commit()
+        invalidate_cache(*BRAND_ACCOUNT_WRITE_TAGS)
         
         return {"message": "Brand account created successfully"}
         
@@ -9504,7 +9728,7 @@ def get_brand_accounts_stats(
 async def bulk_create_brand_accounts(
     file: UploadFile = File(...),
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Bulk create brand accounts from Excel/CSV file"""
     try:
@@ -9512,15 +9736,12 @@ async def bulk_create_brand_accounts(
         errors = []
         
         # Read file content
-        file_content = file.file.read()
+        file_content = await file.read()
         
-        # Parse file based on extension
-        if file.filename.endswith('.xlsx'):
-            df = pd.read_excel(io.BytesIO(file_content))
-        elif file.filename.endswith('.csv'):
-            df = pd.read_csv(io.BytesIO(file_content))
-        else:
+        # Parse file based on extension (pandas runs on the blocking pool, not the event loop)
+        if not file.filename.endswith(('.xlsx', '.csv')):
             raise HTTPException(status_code=400, detail="Unsupported file format. Please use .xlsx or .csv")
+        df = await run_blocking(read_tabular_upload, file_content, file.filename)
         
         # Validate required columns
         required_columns = ['brand', 'platform']
@@ -9551,7 +9772,7 @@ async def bulk_create_brand_accounts(
                 uid = account_data.get('uid')
                 if uid:
                     check_query = "SELECT COUNT(*) FROM brand_accounts WHERE brand = :brand AND platform = :platform AND uid = :uid"
-                    result = db.execute(text(check_query), {
+                    result = await db.execute(text(check_query), {
                         "brand": account_data['brand'],
                         "platform": account_data['platform'],
                         "uid": uid
@@ -9567,7 +9788,7 @@ async def bulk_create_brand_accounts(
                     RETURNING id, brand, platform, uid, password, status_account, created_at
                 """
                 
-                result = db.execute(text(insert_query), {
+                result = await db.execute(text(insert_query), {
                     "brand": account_data['brand'],
                     "platform": account_data['platform'],
                     "uid": account_data.get('uid', ''),
@@ -9590,7 +9811,8 @@ async def bulk_create_brand_accounts(
             except Exception as e:
                 errors.append(f"Row {i+2}: {str(e)}")
         
-        db.commit()
+        await db.commit()
+        await run_blocking(invalidate_cache, *BRAND_ACCOUNT_WRITE_TAGS)
         
         return {
             "message": f"Bulk operation completed. {len(created_accounts)} accounts created, {len(errors)} errors.",
@@ -9601,14 +9823,14 @@ async def bulk_create_brand_accounts(
         }
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/brand-accounts/bulk-update")
 async def bulk_update_brand_accounts(
     updates_data: List[dict],
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Bulk update brand accounts"""
     try:
@@ -9624,7 +9846,7 @@ async def bulk_update_brand_accounts(
                 
                 # Check if account exists
                 check_query = "SELECT COUNT(*) FROM brand_accounts WHERE uid = :uid"
-                result = db.execute(text(check_query), {"uid": uid})
+                result = await db.execute(text(check_query), {"uid": uid})
                 if result.fetchone()[0] == 0:
                     errors.append(f"Row {i+1}: Account with UID {uid} not found")
                     continue
@@ -9640,7 +9862,7 @@ async def bulk_update_brand_accounts(
                 
                 if update_fields:
                     update_query = f"UPDATE brand_accounts SET {', '.join(update_fields)} WHERE uid = :uid RETURNING id, brand, platform, uid, password, status_account, created_at"
-                    result = db.execute(text(update_query), update_values)
+                    result = await db.execute(text(update_query), update_values)
                     row = result.fetchone()
                     
                     updated_accounts.append({
@@ -9656,7 +9878,8 @@ async def bulk_update_brand_accounts(
             except Exception as e:
                 errors.append(f"Row {i+1}: {str(e)}")
         
-        db.commit()
+        await db.commit()
+        await run_blocking(invalidate_cache, *BRAND_ACCOUNT_WRITE_TAGS)
         
         return {
             "message": f"Bulk update completed. {len(updated_accounts)} accounts updated, {len(errors)} errors.",
@@ -9667,14 +9890,14 @@ async def bulk_update_brand_accounts(
         }
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/brand-accounts/bulk-delete")
 async def bulk_delete_brand_accounts(
     uids: List[str],
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Bulk delete brand accounts"""
     try:
@@ -9685,20 +9908,21 @@ async def bulk_delete_brand_accounts(
             try:
                 # Check if account exists
                 check_query = "SELECT COUNT(*) FROM brand_accounts WHERE uid = :uid"
-                result = db.execute(text(check_query), {"uid": uid})
+                result = await db.execute(text(check_query), {"uid": uid})
                 if result.fetchone()[0] == 0:
                     errors.append(f"Account with UID {uid} not found")
                     continue
                 
                 # Delete account
                 delete_query = "DELETE FROM brand_accounts WHERE uid = :uid"
-                db.execute(text(delete_query), {"uid": uid})
+                await db.execute(text(delete_query), {"uid": uid})
                 deleted_count += 1
                 
             except Exception as e:
                 errors.append(f"Error deleting account UID {uid}: {str(e)}")
         
-        db.commit()
+        await db.commit()
+        await run_blocking(invalidate_cache, *BRAND_ACCOUNT_WRITE_TAGS)
         
         return {
             "message": f"Bulk delete completed. {deleted_count} accounts deleted, {len(errors)} errors.",
@@ -9708,7 +9932,7 @@ async def bulk_delete_brand_accounts(
         }
         
     except Exception as e:
-        db.rollback()
+        await db.rollback()
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.get("/api/listbrand/template")
@@ -9917,8 +10141,9 @@ async def export_dashboard_data(
     start_date: Optional[str] = Query(None, description="Start date (ISO format)"),
     end_date: Optional[str] = Query(None, description="End date (ISO format)"),
     order_status: Optional[str] = Query(None, description="Comma-separated order statuses to filter"),
+    include_archive: bool = Query(False, description="Also export orders from archived (past retention) partitions"),
     current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_async_db)
 ):
     """Export all dashboard data to Excel file"""
     try:
@@ -9956,9 +10181,9 @@ async def export_dashboard_data(
         
         # Get all dashboard data
         # 1. Orders Stats
-        orders_query = db.query(UploadedOrder)
+        orders_query = select(UploadedOrder)
         if start_dt and end_dt:
-            orders_query = orders_query.filter(
+            orders_query = orders_query.where(
             UploadedOrder.UploadDate >= start_dt,
             UploadedOrder.UploadDate <= end_dt
             )
@@ -9967,38 +10192,42 @@ async def export_dashboard_data(
         if order_status:
             order_statuses = [status.strip() for status in order_status.split(',') if status.strip()]
             if order_statuses:
-                orders_query = orders_query.filter(
+                orders_query = orders_query.where(
                     UploadedOrder.OrderStatus.in_(order_statuses)
                 )
         
-        orders_stats = orders_query.all()
+        orders_stats = (await db.execute(orders_query)).scalars().all()
+        
+        # Archived rows expose the same attribute names, so they go through the same sheet code
+        export_statuses = [status.strip() for status in order_status.split(',') if status.strip()] if order_status else None
+        if include_archive:
+            orders_stats += await db.run_sync(select_archived_orders, start_dt, end_dt, export_statuses)
         logger.info(f"Export found {len(orders_stats)} orders after filtering")
         
         # 2. Upload History (use same logic as dashboard - no date filtering, get recent records)
-        upload_history_query = db.query(UploadHistory).order_by(UploadHistory.upload_date.desc()).limit(100)
-        upload_history = upload_history_query.all()
+        upload_history_query = select(UploadHistory).order_by(UploadHistory.upload_date.desc()).limit(100)
+        upload_history = (await db.execute(upload_history_query)).scalars().all()
         
         # 3. Not Uploaded Items (use same logic as dashboard endpoint)
-        query = db.query(NotUploadedHistory).filter(NotUploadedHistory.status == 'not_uploaded')
+        query = select(NotUploadedHistory).where(NotUploadedHistory.status == 'not_uploaded')
         
         if start_dt and end_dt:
             # Filter by date range (convert to timezone-aware for comparison)
             wib = pytz.timezone('Asia/Jakarta')
             start_dt_tz = wib.localize(start_dt)
             end_dt_tz = wib.localize(end_dt)
-            query = query.filter(
-                NotUploadedHistory.check_date >= start_dt_tz,
-                NotUploadedHistory.check_date <= end_dt_tz
+            query = query.where(
+                NotUploadedHistory.check_date >= bind_datetime(start_dt_tz),
+                NotUploadedHistory.check_date <= bind_datetime(end_dt_tz)
             )
         else:
             # If no date filter, get today's data
             current_time = get_wib_now()
-            today_str = current_time.strftime('%Y-%m-%d')
-            query = query.filter(
-                func.date(NotUploadedHistory.check_date) == today_str
+            query = query.where(
+                func.date(NotUploadedHistory.check_date) == current_time.date()
             )
         
-        history_items = query.all()
+        history_items = (await db.execute(query)).scalars().all()
         
         not_uploaded = []
         for item in history_items:
@@ -10014,11 +10243,11 @@ async def export_dashboard_data(
         not_uploaded.sort(key=lambda x: (x["brand"], x["marketplace"], x["batch"]))
         
         # 4. Not Interfaced Orders
-        not_interfaced_query = db.query(UploadedOrder).filter(
+        not_interfaced_query = select(UploadedOrder).where(
             UploadedOrder.InterfaceStatus != 'Interface'
         )
         if start_dt and end_dt:
-            not_interfaced_query = not_interfaced_query.filter(
+            not_interfaced_query = not_interfaced_query.where(
             UploadedOrder.UploadDate >= start_dt,
             UploadedOrder.UploadDate <= end_dt
             )
@@ -10027,91 +10256,101 @@ async def export_dashboard_data(
         if order_status:
             order_statuses = [status.strip() for status in order_status.split(',') if status.strip()]
             if order_statuses:
-                not_interfaced_query = not_interfaced_query.filter(
+                not_interfaced_query = not_interfaced_query.where(
                     UploadedOrder.OrderStatus.in_(order_statuses)
                 )
         
-        not_interfaced_orders = not_interfaced_query.all()
+        not_interfaced_orders = (await db.execute(not_interfaced_query)).scalars().all()
+        if include_archive:
+            not_interfaced_orders += await db.run_sync(
+                select_archived_orders, start_dt, end_dt, export_statuses, not_interfaced_only=True
+            )
         
-        # Create Excel file - OPTIMIZED with xlsxwriter for faster performance
-        output = io.BytesIO()
+        # Workbook building is CPU-bound pandas/xlsxwriter work: run it on the blocking pool
+        def write_workbook():
+            # Create Excel file - OPTIMIZED with xlsxwriter for faster performance
+            output = io.BytesIO()
+        
+            # Use xlsxwriter engine (faster than openpyxl)
+            with pd.ExcelWriter(output, engine='xlsxwriter', engine_kwargs={'options': {'strings_to_numbers': False}}) as writer:
+                # Sheet 1: Orders Statistics - VECTORIZED
+                if orders_stats:
+                    orders_df = pd.DataFrame({
+                        'Marketplace': [order.Marketplace for order in orders_stats],
+                        'Brand': [order.Brand for order in orders_stats],
+                        'Order Number': [order.OrderNumber for order in orders_stats],
+                        'Batch': [order.Batch for order in orders_stats],
+                        'Interface Status': [order.InterfaceStatus for order in orders_stats],
+                        'Upload Date': [make_timezone_naive(order.UploadDate) for order in orders_stats],
+                        'PIC': [order.PIC for order in orders_stats]
+                    })
+                else:
+                    orders_df = pd.DataFrame(columns=['Marketplace', 'Brand', 'Order Number', 'Batch', 'Interface Status', 'Upload Date', 'PIC'])
+                orders_df.to_excel(writer, sheet_name='Orders Statistics', index=False)
+            
+                # Sheet 2: Upload History - VECTORIZED
+                if upload_history:
+                    upload_df = pd.DataFrame({
+                        'Marketplace': [history.marketplace for history in upload_history],
+                        'Brand': [history.brand for history in upload_history],
+                        'PIC': [history.pic for history in upload_history],
+                        'Batch': [history.batch for history in upload_history],
+                        'Upload Date': [make_timezone_naive(history.upload_date) for history in upload_history]
+                    })
+                else:
+                    upload_df = pd.DataFrame(columns=['Marketplace', 'Brand', 'PIC', 'Batch', 'Upload Date'])
+                upload_df.to_excel(writer, sheet_name='Upload History', index=False)
+            
+                # Sheet 3: Not Uploaded Items - DIRECT from list (already optimized)
+                not_uploaded_df = pd.DataFrame(not_uploaded) if not_uploaded else pd.DataFrame(columns=['marketplace', 'brand', 'batch', 'remark', 'created_at'])
+                not_uploaded_df.to_excel(writer, sheet_name='Not Uploaded Items', index=False)
+            
+                # Sheet 4: Not Interfaced Orders - VECTORIZED
+                if not_interfaced_orders:
+                    not_interfaced_df = pd.DataFrame({
+                        'Marketplace': [order.Marketplace for order in not_interfaced_orders],
+                        'Brand': [order.Brand for order in not_interfaced_orders],
+                        'Order Number': [order.OrderNumber for order in not_interfaced_orders],
+                        'Batch': [order.Batch for order in not_interfaced_orders],
+                        'Order Status': [order.OrderStatus for order in not_interfaced_orders],
+                        'Interface Status': [order.InterfaceStatus for order in not_interfaced_orders],
+                        'Remark': [order.Remarks for order in not_interfaced_orders],
+                        'Upload Date': [make_timezone_naive(order.UploadDate) for order in not_interfaced_orders],
+                        'PIC': [order.PIC for order in not_interfaced_orders]
+                    })
+                else:
+                    not_interfaced_df = pd.DataFrame(columns=['Marketplace', 'Brand', 'Order Number', 'Batch', 'Order Status', 'Interface Status', 'Remark', 'Upload Date', 'PIC'])
+                not_interfaced_df.to_excel(writer, sheet_name='Not Interfaced Orders', index=False)
+            
+                # Sheet 5: Summary Statistics
+                summary_data = {
+                    'Metric': [
+                        'Total Orders',
+                        'Total Upload History Records',
+                        'Not Uploaded Items',
+                        'Not Interfaced Orders',
+                        'Export Date Range',
+                        'Applied Filters',
+                        'Generated By',
+                        'Generated At'
+                    ],
+                    'Value': [
+                        len(orders_stats),
+                        len(upload_history),
+                        len(not_uploaded),
+                        len(not_interfaced_orders),
+                        f"{start_dt.strftime('%Y-%m-%d %H:%M:%S')} to {end_dt.strftime('%Y-%m-%d %H:%M:%S')}" if start_dt and end_dt else "All data",
+                        (f"Order Status Filter: {order_status}" if order_status else "No order status filter")
+                        + (" (including archived orders)" if include_archive else ""),
+                        current_user,
+                        make_timezone_naive(datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
+                    ]
+                }
+                summary_df = pd.DataFrame(summary_data)
+                summary_df.to_excel(writer, sheet_name='Summary', index=False)
+            return output
         
-        # Use xlsxwriter engine (faster than openpyxl)
-        with pd.ExcelWriter(output, engine='xlsxwriter', engine_kwargs={'options': {'strings_to_numbers': False}}) as writer:
-            # Sheet 1: Orders Statistics - VECTORIZED
-            if orders_stats:
-                orders_df = pd.DataFrame({
-                    'Marketplace': [order.Marketplace for order in orders_stats],
-                    'Brand': [order.Brand for order in orders_stats],
-                    'Order Number': [order.OrderNumber for order in orders_stats],
-                    'Batch': [order.Batch for order in orders_stats],
-                    'Interface Status': [order.InterfaceStatus for order in orders_stats],
-                    'Upload Date': [make_timezone_naive(order.UploadDate) for order in orders_stats],
-                    'PIC': [order.PIC for order in orders_stats]
-                })
-            else:
-                orders_df = pd.DataFrame(columns=['Marketplace', 'Brand', 'Order Number', 'Batch', 'Interface Status', 'Upload Date', 'PIC'])
-            orders_df.to_excel(writer, sheet_name='Orders Statistics', index=False)
-            
-            # Sheet 2: Upload History - VECTORIZED
-            if upload_history:
-                upload_df = pd.DataFrame({
-                    'Marketplace': [history.marketplace for history in upload_history],
-                    'Brand': [history.brand for history in upload_history],
-                    'PIC': [history.pic for history in upload_history],
-                    'Batch': [history.batch for history in upload_history],
-                    'Upload Date': [make_timezone_naive(history.upload_date) for history in upload_history]
-                })
-            else:
-                upload_df = pd.DataFrame(columns=['Marketplace', 'Brand', 'PIC', 'Batch', 'Upload Date'])
-            upload_df.to_excel(writer, sheet_name='Upload History', index=False)
-            
-            # Sheet 3: Not Uploaded Items - DIRECT from list (already optimized)
-            not_uploaded_df = pd.DataFrame(not_uploaded) if not_uploaded else pd.DataFrame(columns=['marketplace', 'brand', 'batch', 'remark', 'created_at'])
-            not_uploaded_df.to_excel(writer, sheet_name='Not Uploaded Items', index=False)
-            
-            # Sheet 4: Not Interfaced Orders - VECTORIZED
-            if not_interfaced_orders:
-                not_interfaced_df = pd.DataFrame({
-                    'Marketplace': [order.Marketplace for order in not_interfaced_orders],
-                    'Brand': [order.Brand for order in not_interfaced_orders],
-                    'Order Number': [order.OrderNumber for order in not_interfaced_orders],
-                    'Batch': [order.Batch for order in not_interfaced_orders],
-                    'Order Status': [order.OrderStatus for order in not_interfaced_orders],
-                    'Interface Status': [order.InterfaceStatus for order in not_interfaced_orders],
-                    'Remark': [order.Remarks for order in not_interfaced_orders],
-                    'Upload Date': [make_timezone_naive(order.UploadDate) for order in not_interfaced_orders],
-                    'PIC': [order.PIC for order in not_interfaced_orders]
-                })
-            else:
-                not_interfaced_df = pd.DataFrame(columns=['Marketplace', 'Brand', 'Order Number', 'Batch', 'Order Status', 'Interface Status', 'Remark', 'Upload Date', 'PIC'])
-            not_interfaced_df.to_excel(writer, sheet_name='Not Interfaced Orders', index=False)
-            
-            # Sheet 5: Summary Statistics
-            summary_data = {
-                'Metric': [
-                    'Total Orders',
-                    'Total Upload History Records',
-                    'Not Uploaded Items',
-                    'Not Interfaced Orders',
-                    'Export Date Range',
-                    'Applied Filters',
-                    'Generated By',
-                    'Generated At'
-                ],
-                'Value': [
-                    len(orders_stats),
-                    len(upload_history),
-                    len(not_uploaded),
-                    len(not_interfaced_orders),
-                    f"{start_dt.strftime('%Y-%m-%d %H:%M:%S')} to {end_dt.strftime('%Y-%m-%d %H:%M:%S')}" if start_dt and end_dt else "All data",
-                    f"Order Status Filter: {order_status}" if order_status else "No order status filter",
-                    current_user,
-                    make_timezone_naive(datetime.now()).strftime('%Y-%m-%d %H:%M:%S')
-                ]
-            }
-            summary_df = pd.DataFrame(summary_data)
-            summary_df.to_excel(writer, sheet_name='Summary', index=False)
+        output = await run_blocking(write_workbook)
         
         output.seek(0)
         
@@ -10134,80 +10373,50 @@ async def export_dashboard_data(
 # Daily reset scheduler for remarks
 def reset_remarks_daily():
     """Reset all remarks in list_brand table daily at 23:59:59"""
+    db = BackgroundSessionLocal()
     try:
-        # Create a new database session for this operation
-        engine = create_engine(SQLALCHEMY_DATABASE_URL)
-        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-        db = SessionLocal()
-        
         # Use raw SQL to avoid trigger issues
-        from sqlalchemy import text
         db.execute(text("UPDATE list_brand SET remark = NULL"))
         db.commit()
+        invalidate_cache(*LIST_BRAND_WRITE_TAGS)
         
         logger.info("Daily remark reset completed - all remarks cleared")
-        db.close()
         
     except Exception as e:
+        db.rollback()
         logger.error(f"Error during daily remark reset: {str(e)}")
+    finally:
+        db.close()
 
 def save_not_uploaded_history():
-    """Save current not uploaded items to history table"""
+    """Save current not uploaded items to history table (one anti-join insert, at most one row per combination and day)"""
     try:
-        engine = create_engine(SQLALCHEMY_DATABASE_URL)
-        SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-        db = SessionLocal()
-        
-        # Get current not uploaded items (real-time)
-        expected_combinations = db.query(ListBrand).all()
-        uploaded_combinations = db.query(
-            UploadedOrder.Brand,
-            UploadedOrder.Marketplace,
-            UploadedOrder.Batch
-        ).distinct().all()
-        
-        # Convert uploaded combinations to set for faster lookup
-        uploaded_set = set()
-        for combo in uploaded_combinations:
-            brand = combo.Brand.strip().upper() if combo.Brand else ""
-            marketplace = combo.Marketplace.strip().upper() if combo.Marketplace else ""
-            batch = combo.Batch.strip().upper() if combo.Batch else ""
-            uploaded_set.add((brand, marketplace, batch))
-        
-        # Save not uploaded items to history
-        current_time = get_wib_now()
-        for expected in expected_combinations:
-            brand = expected.brand.strip().upper() if expected.brand else ""
-            marketplace = expected.marketplace.strip().upper() if expected.marketplace else ""
-            batch = expected.batch.strip().upper() if expected.batch else ""
-            
-            if (brand, marketplace, batch) not in uploaded_set:
-                # Check if this combination already exists in history for today
-                existing = db.query(NotUploadedHistory).filter(
-                    NotUploadedHistory.brand == expected.brand,
-                    NotUploadedHistory.marketplace == expected.marketplace,
-                    NotUploadedHistory.batch == expected.batch,
-                    NotUploadedHistory.check_date >= current_time.replace(hour=0, minute=0, second=0, microsecond=0),
-                    NotUploadedHistory.check_date < current_time.replace(hour=23, minute=59, second=59, microsecond=999999)
-                ).first()
-                
-                if not existing:
-                    history_item = NotUploadedHistory(
-                        brand=expected.brand,
-                        marketplace=expected.marketplace,
-                        batch=expected.batch,
-                        remark=expected.remark,
-                        status='not_uploaded',
-                        check_date=current_time
-                    )
-                    db.add(history_item)
-        
-        db.commit()
-        logger.info("Not uploaded items history saved successfully")
-        db.close()
+        with background_engine.begin() as conn:
+            # check_date is a naive WIB timestamp; an aware value would be shifted to the server timezone
+            saved = snapshot_not_uploaded(conn, convert_to_naive_wib(get_wib_now()))
+        invalidate_cache("dashboard")
+        logger.info(f"Not uploaded items history saved successfully ({saved} new items)")
     except Exception as e:
         logger.error(f"Error saving not uploaded history: {str(e)}")
 
+def refresh_not_uploaded_history(brand: str, marketplace: str, batch: str):
+    """After an upload: only the uploaded combination changes, so only its row of today is updated"""
+    # check_date is a naive WIB timestamp; an aware value would be shifted to the server timezone
+    current_time = convert_to_naive_wib(get_wib_now())
+    with background_engine.begin() as conn:
+        # Today's snapshot is taken by the first upload of the day (and again by the 23:58 job)
+        if not has_snapshot(conn, current_time.date()):
+            snapshot_not_uploaded(conn, current_time)
+        mark_uploaded(conn, brand, marketplace, batch, current_time.date())
+    invalidate_cache("dashboard")
+
+def partition_maintenance_daily():
+    """Create upcoming uploaded_orders partitions and archive the ones past retention"""
+    archived = run_partition_maintenance(background_engine, get_wib_now().date())
+    if archived:
+        invalidate_cache(*ORDER_WRITE_TAGS)
+        logger.info(f"Archived uploaded_orders partitions: {', '.join(archived)}")
+
 def schedule_daily_reset():
     """Schedule daily reset at 23:59:59"""
     
@@ -10220,6 +10429,12 @@ def schedule_daily_reset():
     # Schedule history save to run daily at 23:58:00 (before reset)
     schedule.every().day.at("23:58:00").do(save_not_uploaded_history)
     
+    # Create next months' partitions and archive partitions past retention
+    schedule.every().day.at("02:00:00").do(partition_maintenance_daily)
+    
+    # Retry interface checks that failed (e.g. SQL Server unavailable) or whose worker died
+    schedule.every(INTERFACE_CHECK_STALE_MINUTES).minutes.do(resume_pending_interface_checks)
+    
     def run_scheduler():
         logger.info("Scheduler thread started")
         while True:
@@ -10239,6 +10454,8 @@ def schedule_daily_reset():
     logger.info(f"Daily remark reset and history save scheduler started at {current_time}")
     logger.info("- History save: 23:58:00 daily")
     logger.info("- Remark reset: 23:59:59 daily")
+    logger.info("- Partition maintenance: 02:00:00 daily")
+    logger.info(f"- Interface check retry: every {INTERFACE_CHECK_STALE_MINUTES} minutes")
     
     # Log next scheduled jobs
     jobs = schedule.get_jobs()
@@ -10246,8 +10463,9 @@ def schedule_daily_reset():
         logger.info(f"Next scheduled job: {job.job_func.__name__} at {job.next_run}")
 
 
-# Upload log storage (in-memory for now, can be moved to database later)
+# Upload log storage: in-memory per process, persisted to upload_task_logs in batches
 upload_logs = {}
+upload_log_writer = UploadLogWriter(background_engine)
 marketplace_logs = {}
 global_marketplace_logs = []  # Global logs for all marketplace apps without task_id
 
@@ -10269,6 +10487,28 @@ def add_upload_log(task_id: str, level: str, message: str):
     # Keep only last 1000 logs per task to prevent memory issues
     if len(upload_logs[task_id]) > 1000:
         upload_logs[task_id] = upload_logs[task_id][-1000:]
+    
+    # Persist so every API process can serve logs of uploads run by queue workers (batched, off the upload thread)
+    upload_log_writer.add(task_id, level, message, get_wib_now())
+
+def get_task_upload_logs(task_id: str):
+    """Upload logs of a task from upload_task_logs (falls back to this process' memory)"""
+    try:
+        with engine.connect() as conn:
+            rows = conn.execute(text("""
+                SELECT created_at, level, message FROM upload_task_logs
+                WHERE task_id = :task_id
+                ORDER BY id DESC
+                LIMIT 1000
+            """), {"task_id": task_id}).fetchall()
+        if rows:
+            return [
+                {"timestamp": convert_to_wib(created_at).isoformat() if created_at else None, "level": level, "message": message}
+                for created_at, level, message in reversed(rows)
+            ]
+    except Exception as e:
+        logger.warning(f"Could not read upload logs for {task_id}: {str(e)}")
+    return upload_logs.get(task_id, [])
 
 def add_marketplace_log(task_id: str, level: str, message: str):
     """Add a log entry for marketplace app execution"""
@@ -10302,7 +10542,7 @@ def get_upload_logs(
             raise HTTPException(status_code=404, detail="Task not found")
         
         # Get logs for this task
-        logs = upload_logs.get(task_id, [])
+        logs = get_task_upload_logs(task_id)
         
         # Determine current step based on task status
         current_step = 0
@@ -10542,10 +10782,22 @@ async def upload_finalize(
 def get_itemid_comparison(
     start_date: Optional[str] = Query(None, description="Start date (ISO format with timezone)"),
     end_date: Optional[str] = Query(None, description="End date (ISO format with timezone)"),
-    current_user: str = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: str = Depends(get_current_user)
 ):
     """Get ItemId vs ItemIdFlexo comparison statistics with optional date filter"""
+    params = {
+        "start_date": (start_date or "").strip() or None,
+        "end_date": (end_date or "").strip() or None,
+    }
+    # Failures are returned as success=False payloads; those are not cached
+    return single_flight.run(
+        "itemid_comparison", params, ("orders",),
+        lambda db: compute_itemid_comparison(db, **params),
+        cacheable=lambda result: result.get("success", False)
+    )
+
+def compute_itemid_comparison(db: Session, start_date: Optional[str] = None, end_date: Optional[str] = None):
+    """ItemId vs ItemIdFlexo comparison statistics (uncached computation behind /api/itemid-comparison)"""
     try:
         # Build WHERE clause for date filter
         date_filter = ""
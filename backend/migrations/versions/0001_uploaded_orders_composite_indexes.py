@@ -0,0 +1,37 @@
+"""uploaded_orders composite indexes for the hot query paths
+
+Revision ID: 0001_composite_indexes
+Revises:
+Create Date: 2026-10-16 09:00:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0001_composite_indexes'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+# (index name, table, column list) - built CONCURRENTLY so uploads keep writing during the migration
+INDEXES = [
+    # PIC dashboards / get_pic_upload_counts: PIC filter + UploadDate range
+    ('idx_uploaded_orders_pic_upload_date', 'uploaded_orders', '"PIC", "UploadDate"'),
+    # by-brand-batch, interface summaries and not-uploaded checks: Brand + Batch (+ PIC)
+    ('idx_uploaded_orders_brand_batch_pic', 'uploaded_orders', '"Brand", "Batch", "PIC"'),
+    # Interface status counts over a date range
+    ('idx_uploaded_orders_interface_status_upload_date', 'uploaded_orders', '"InterfaceStatus", "UploadDate"'),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({columns})')
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _table, _columns in reversed(INDEXES):
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
@@ -0,0 +1,36 @@
+"""expression indexes for date("UploadDate") and lower(brand) lookups
+
+Revision ID: 0002_expression_indexes
+Revises: 0001_composite_indexes
+Create Date: 2026-10-16 09:05:00.000000
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '0002_expression_indexes'
+down_revision = '0001_composite_indexes'
+branch_labels = None
+depends_on = None
+
+# Expressions must match the queries exactly for the planner to use them
+INDEXES = [
+    # get_orders_stats: func.date(UploadedOrder.UploadDate) == today (UploadDate is a naive WIB timestamp)
+    ('idx_uploaded_orders_upload_day', 'uploaded_orders', 'date("UploadDate")'),
+    # get_shop_id_from_brand_shops: func.lower(BrandShop.brand) == ... AND marketplace_id == ...
+    ('idx_brand_shops_lower_brand_marketplace', 'brand_shops', 'lower(brand), marketplace_id'),
+]
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, table, expression in INDEXES:
+            op.execute(f'CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {table} ({expression})')
+            op.execute(f'ANALYZE {table}')
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name, _table, _expression in reversed(INDEXES):
+            op.execute(f'DROP INDEX CONCURRENTLY IF EXISTS {name}')
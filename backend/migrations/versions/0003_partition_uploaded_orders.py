@@ -0,0 +1,151 @@
+"""partition uploaded_orders by month on UploadDate
+
+Revision ID: 0003_partition_uploaded_orders
+Revises: 0002_expression_indexes
+Create Date: 2026-10-16 10:30:00.000000
+
+"""
+from datetime import date
+
+from alembic import op
+from sqlalchemy import text
+
+from database_config import ORDER_PARTITION_MONTHS_AHEAD
+from order_partitions import (
+    DEFAULT_PARTITION, add_months, create_partitions, ensure_order_numbers_table, is_partitioned, month_start
+)
+
+
+# revision identifiers, used by Alembic.
+revision = '0003_partition_uploaded_orders'
+down_revision = '0002_expression_indexes'
+branch_labels = None
+depends_on = None
+
+OLD_TABLE = 'uploaded_orders_old'
+
+# Views on uploaded_orders (and views on those views) with their depth, so they can be recreated in order
+DEPENDENT_VIEWS_SQL = """
+    WITH RECURSIVE deps(oid, depth) AS (
+        SELECT DISTINCT r.ev_class, 1
+        FROM pg_depend d JOIN pg_rewrite r ON r.oid = d.objid
+        WHERE d.classid = 'pg_rewrite'::regclass AND d.refobjid = 'uploaded_orders'::regclass
+          AND r.ev_class <> 'uploaded_orders'::regclass
+        UNION
+        SELECT r.ev_class, deps.depth + 1
+        FROM deps JOIN pg_depend d ON d.refobjid = deps.oid JOIN pg_rewrite r ON r.oid = d.objid
+        WHERE d.classid = 'pg_rewrite'::regclass AND r.ev_class <> deps.oid
+    )
+    SELECT format('%I.%I', n.nspname, c.relname), c.relkind, pg_get_viewdef(c.oid), MAX(deps.depth) AS depth
+    FROM deps JOIN pg_class c ON c.oid = deps.oid JOIN pg_namespace n ON n.oid = c.relnamespace
+    GROUP BY c.oid, n.nspname, c.relname, c.relkind
+    ORDER BY depth, c.oid
+"""
+
+INDEXES_SQL = """
+    SELECT i.relname, pg_get_indexdef(i.oid)
+    FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+    WHERE x.indrelid = 'uploaded_orders'::regclass AND NOT x.indisprimary
+"""
+
+TRIGGERS_SQL = """
+    SELECT pg_get_triggerdef(oid) FROM pg_trigger
+    WHERE tgrelid = 'uploaded_orders'::regclass AND NOT tgisinternal AND tgparentid = 0
+"""
+
+
+def _swap_uploaded_orders(conn, partition_clause, primary_key, adjust_index, before_copy=None):
+    """Recreate uploaded_orders with a new layout, keeping its rows, Id sequence, indexes, triggers and views"""
+    conn.execute(text('LOCK TABLE uploaded_orders IN ACCESS EXCLUSIVE MODE'))
+
+    # Definitions are captured before the rename, so they still name uploaded_orders
+    views = conn.execute(text(DEPENDENT_VIEWS_SQL)).fetchall()
+    indexes = conn.execute(text(INDEXES_SQL)).fetchall()
+    triggers = [row[0] for row in conn.execute(text(TRIGGERS_SQL))]
+    sequence = conn.execute(text("""SELECT pg_get_serial_sequence('uploaded_orders', 'Id')""")).scalar()
+    primary_key_name = conn.execute(text("""
+        SELECT conname FROM pg_constraint WHERE conrelid = 'uploaded_orders'::regclass AND contype = 'p'
+    """)).scalar()
+
+    for name, relkind, _definition, _depth in reversed(views):
+        conn.execute(text(f"DROP {'MATERIALIZED VIEW' if relkind == 'm' else 'VIEW'} {name}"))
+
+    conn.execute(text(f'ALTER TABLE uploaded_orders RENAME TO {OLD_TABLE}'))
+    if primary_key_name:
+        conn.execute(text(f'ALTER TABLE {OLD_TABLE} RENAME CONSTRAINT "{primary_key_name}" TO {OLD_TABLE}_pkey'))
+
+    conn.execute(text(f'CREATE TABLE uploaded_orders (LIKE {OLD_TABLE} INCLUDING DEFAULTS) {partition_clause}'))
+    conn.execute(text(f'ALTER TABLE uploaded_orders ADD PRIMARY KEY ({primary_key})'))
+    if sequence:
+        conn.execute(text(f'ALTER SEQUENCE {sequence} OWNED BY uploaded_orders."Id"'))
+    if before_copy:
+        before_copy(conn)
+
+    # Triggers are recreated after the copy: clean_orders and the status flags are already in sync
+    conn.execute(text(f'INSERT INTO uploaded_orders SELECT * FROM {OLD_TABLE}'))
+    conn.execute(text(f'DROP TABLE {OLD_TABLE}'))
+
+    # Captured definitions go to the driver as-is (no bind parameter parsing of their literals)
+    for name, definition in indexes:
+        conn.exec_driver_sql(adjust_index(name, definition))
+    for definition in triggers:
+        conn.exec_driver_sql(definition)
+    for name, relkind, definition, _depth in views:
+        conn.exec_driver_sql(f"CREATE {'MATERIALIZED VIEW' if relkind == 'm' else 'VIEW'} {name} AS {definition}")
+    conn.execute(text('ANALYZE uploaded_orders'))
+
+
+def _create_initial_partitions(conn):
+    first, last = conn.execute(text(f'SELECT MIN("UploadDate"), MAX("UploadDate") FROM {OLD_TABLE}')).fetchone()
+    current = month_start(date.today())
+    first_month = month_start(first.date()) if first else current
+    last_month = max(month_start(last.date()) if last else current, add_months(current, ORDER_PARTITION_MONTHS_AHEAD))
+    create_partitions(conn, first_month, last_month)
+    conn.execute(text(f'CREATE TABLE {DEFAULT_PARTITION} PARTITION OF uploaded_orders DEFAULT'))
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+    if is_partitioned(conn):
+        return
+
+    # The partition key is part of the primary key, so it cannot be NULL
+    conn.execute(text("""
+        UPDATE uploaded_orders SET "UploadDate" = COALESCE("OrderDate", now() AT TIME ZONE 'Asia/Jakarta')
+        WHERE "UploadDate" IS NULL
+    """))
+    conn.execute(text('ALTER TABLE uploaded_orders ALTER COLUMN "UploadDate" SET NOT NULL'))
+    conn.execute(text("""ALTER TABLE uploaded_orders ALTER COLUMN "UploadDate" SET DEFAULT (now() AT TIME ZONE 'Asia/Jakarta')"""))
+
+    # A unique index on OrderNumber alone is not allowed on a partitioned table; uniqueness is kept
+    # by order_writer through uploaded_order_numbers instead
+    _swap_uploaded_orders(
+        conn,
+        partition_clause='PARTITION BY RANGE ("UploadDate")',
+        primary_key='"Id", "UploadDate"',
+        adjust_index=lambda name, definition: definition.replace('CREATE UNIQUE INDEX', 'CREATE INDEX', 1),
+        before_copy=_create_initial_partitions,
+    )
+    ensure_order_numbers_table(conn)
+
+
+def _unpartitioned_index(name, definition):
+    # Partitioned parent indexes are reported as "ON ONLY"; the OrderNumber index becomes unique again
+    definition = definition.replace(' ON ONLY ', ' ON ', 1)
+    if name == 'ix_uploaded_orders_OrderNumber':
+        definition = definition.replace('CREATE INDEX', 'CREATE UNIQUE INDEX', 1)
+    return definition
+
+
+def downgrade() -> None:
+    conn = op.get_bind()
+    if not is_partitioned(conn):
+        return
+
+    # Archived partitions stay in uploaded_orders_archive
+    _swap_uploaded_orders(
+        conn,
+        partition_clause='',
+        primary_key='"Id"',
+        adjust_index=_unpartitioned_index,
+    )
@@ -2,15 +2,18 @@
 Monitoring and observability module for SweepingApps
 """
 import time
+import asyncio
 import logging
 import psutil
 import threading
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from dataclasses import dataclass, asdict
 from collections import defaultdict, deque
 import json
 
+from database_config import EVENT_LOOP_MONITOR_INTERVAL, EVENT_LOOP_STALL_THRESHOLD_MS
+
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -23,6 +26,20 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
+# Route label of requests that matched no route (404s for arbitrary URLs must not add keys)
+UNMATCHED_ROUTE = "<unmatched>"
+
+def _labels(**labels: str) -> str:
+    """Prometheus label set with escaped values"""
+    def escape(value: str) -> str:
+        return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return ",".join(f'{name}="{escape(value)}"' for name, value in labels.items())
+
+def route_template(scope: Dict[str, Any]) -> str:
+    """Path template of the route that handled the request, e.g. /api/orders/{order_id}/remarks"""
+    route = scope.get("route")
+    return getattr(route, "path_format", None) or getattr(route, "path", None) or UNMATCHED_ROUTE
+
 @dataclass
 class SystemMetrics:
     """System performance metrics"""
@@ -47,6 +64,84 @@ class APIMetrics:
     timestamp: datetime
     user_agent: str
     ip_address: str
+    route: str = UNMATCHED_ROUTE
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is everything above
+LATENCY_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.15, 0.25, 0.35, 0.5, 0.75,
+    1.0, 1.5, 2.5, 5.0, 7.5, 10.0, 15.0, 30.0, 60.0, 120.0
+)
+
+class LatencyHistogram:
+    """Fixed-bucket latency histogram: constant memory, percentiles interpolated within a bucket"""
+    
+    def __init__(self, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+    
+    def observe(self, seconds: float):
+        index = 0
+        while index < len(self.buckets) and seconds > self.buckets[index]:
+            index += 1
+        self.counts[index] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+    
+    def percentile(self, p: float) -> float:
+        """Estimated p-quantile in seconds (0 when empty)"""
+        if not self.count:
+            return 0.0
+        rank = p * self.count
+        seen = 0
+        for index, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                lower = self.buckets[index - 1] if index else 0.0
+                # The overflow bucket has no upper bound; the largest observation stands in for it
+                upper = self.buckets[index] if index < len(self.buckets) else self.max
+                return min(lower + (upper - lower) * (rank - seen) / bucket_count, self.max)
+            seen += bucket_count
+        return self.max
+    
+    def cumulative_counts(self) -> List[Tuple[str, int]]:
+        """(le, count of observations <= le) per bucket, Prometheus style"""
+        result = []
+        running = 0
+        for bound, bucket_count in zip(list(self.buckets) + [float("inf")], self.counts):
+            running += bucket_count
+            result.append(("+Inf" if bound == float("inf") else repr(bound), running))
+        return result
+
+class RouteStats:
+    """Request counts per status code and a latency histogram for one method + route template"""
+    
+    def __init__(self):
+        self.latency = LatencyHistogram()
+        self.status_counts = defaultdict(int)
+        self.errors = 0
+    
+    def record(self, response_time: float, status_code: int):
+        self.latency.observe(response_time)
+        self.status_counts[status_code] += 1
+        if status_code >= 400:
+            self.errors += 1
+    
+    def to_dict(self) -> Dict[str, Any]:
+        latency = self.latency
+        return {
+            'count': latency.count,
+            'total_time': latency.total,
+            'errors': self.errors,
+            'avg_time': latency.total / latency.count if latency.count else 0,
+            'p50_time': latency.percentile(0.50),
+            'p95_time': latency.percentile(0.95),
+            'p99_time': latency.percentile(0.99),
+            'max_time': latency.max,
+            'status_counts': {str(status): count for status, count in sorted(self.status_counts.items())}
+        }
 
 class MetricsCollector:
     """Collects and stores application metrics"""
@@ -56,28 +151,50 @@ class MetricsCollector:
         self.api_metrics = deque(maxlen=max_history)
         self.system_metrics = deque(maxlen=max_history)
         self.error_counts = defaultdict(int)
-        self.endpoint_stats = defaultdict(lambda: {
-            'count': 0,
-            'total_time': 0,
-            'errors': 0,
-            'avg_time': 0
-        })
+        # Keyed by (method, route template): bounded by the number of routes, not by distinct URLs
+        self.route_stats: Dict[Tuple[str, str], RouteStats] = defaultdict(RouteStats)
+        self._lock = threading.Lock()
         self.start_time = time.time()
         
     def record_api_call(self, metrics: APIMetrics):
         """Record API call metrics"""
         self.api_metrics.append(metrics)
         
-        # Update endpoint statistics
-        endpoint_key = f"{metrics.method} {metrics.endpoint}"
-        stats = self.endpoint_stats[endpoint_key]
-        stats['count'] += 1
-        stats['total_time'] += metrics.response_time
-        stats['avg_time'] = stats['total_time'] / stats['count']
-        
-        if metrics.status_code >= 400:
-            stats['errors'] += 1
-            self.error_counts[metrics.status_code] += 1
+        with self._lock:
+            self.route_stats[(metrics.method, metrics.route)].record(metrics.response_time, metrics.status_code)
+            if metrics.status_code >= 400:
+                self.error_counts[metrics.status_code] += 1
+    
+    @property
+    def endpoint_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per "METHOD /route/{template}" counts, mean and p50/p95/p99 latency (seconds) and status counts"""
+        with self._lock:
+            return {f"{method} {route}": stats.to_dict() for (method, route), stats in sorted(self.route_stats.items())}
+    
+    def to_prometheus(self) -> str:
+        """Request counters and latency histograms in the Prometheus text exposition format"""
+        lines = [
+            "# HELP sweeping_http_requests_total HTTP requests by method, route template and status code.",
+            "# TYPE sweeping_http_requests_total counter",
+        ]
+        with self._lock:
+            routes = sorted(self.route_stats.items())
+            for (method, route), stats in routes:
+                for status, count in sorted(stats.status_counts.items()):
+                    lines.append(
+                        f'sweeping_http_requests_total{{{_labels(method=method, route=route, status=str(status))}}} {count}'
+                    )
+            lines += [
+                "# HELP sweeping_http_request_duration_seconds HTTP request latency by method and route template.",
+                "# TYPE sweeping_http_request_duration_seconds histogram",
+            ]
+            for (method, route), stats in routes:
+                labels = _labels(method=method, route=route)
+                for le, count in stats.latency.cumulative_counts():
+                    lines.append(f'sweeping_http_request_duration_seconds_bucket{{{labels},le="{le}"}} {count}')
+                lines.append(f"sweeping_http_request_duration_seconds_sum{{{labels}}} {stats.latency.total}")
+                lines.append(f"sweeping_http_request_duration_seconds_count{{{labels}}} {stats.latency.count}")
+        return "\n".join(lines) + "\n"
     
     def record_system_metrics(self, metrics: SystemMetrics):
         """Record system metrics"""
@@ -88,8 +205,9 @@ class MetricsCollector:
         uptime = time.time() - self.start_time
         
         # Calculate error rate
-        total_requests = sum(stats['count'] for stats in self.endpoint_stats.values())
-        total_errors = sum(stats['errors'] for stats in self.endpoint_stats.values())
+        endpoint_stats = self.endpoint_stats
+        total_requests = sum(stats['count'] for stats in endpoint_stats.values())
+        total_errors = sum(stats['errors'] for stats in endpoint_stats.values())
         error_rate = (total_errors / total_requests * 100) if total_requests > 0 else 0
         
         # Get latest system metrics
@@ -102,7 +220,7 @@ class MetricsCollector:
             'total_requests': total_requests,
             'error_rate': round(error_rate, 2),
             'system_metrics': asdict(latest_system) if latest_system else None,
-            'endpoint_stats': dict(self.endpoint_stats),
+            'endpoint_stats': endpoint_stats,
             'error_counts': dict(self.error_counts)
         }
     
@@ -204,8 +322,8 @@ class PerformanceTracker:
         self.metrics_collector = metrics_collector
     
     def track_request(self, endpoint: str, method: str, response_time: float, 
-                     status_code: int, user_agent: str, ip_address: str):
-        """Track a single request"""
+                     status_code: int, user_agent: str, ip_address: str, route: str = UNMATCHED_ROUTE):
+        """Track a single request (aggregated by its route template, see route_template)"""
         metrics = APIMetrics(
             endpoint=endpoint,
             method=method,
@@ -213,14 +331,78 @@ class PerformanceTracker:
             status_code=status_code,
             timestamp=datetime.now(),
             user_agent=user_agent,
-            ip_address=ip_address
+            ip_address=ip_address,
+            route=route
         )
         self.metrics_collector.record_api_call(metrics)
 
+class EventLoopMonitor:
+    """Measures event-loop stalls: how late a fixed-interval sleep wakes up is time the loop was blocked"""
+    
+    def __init__(self, interval: float = 0.25, stall_threshold: float = 0.1, window: int = 1200):
+        self.interval = interval
+        self.stall_threshold = stall_threshold
+        self.recent_lags = deque(maxlen=window)
+        self.samples = 0
+        self.stalls = 0
+        self.total_stall_seconds = 0.0
+        self.max_lag = 0.0
+        self.last_stall_at = None
+        self._task = None
+    
+    def start(self):
+        """Start probing the running event loop (call from the lifespan startup)"""
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._probe_loop())
+            logger.info("Event loop monitoring started")
+    
+    def stop(self):
+        if self._task:
+            self._task.cancel()
+            self._task = None
+    
+    async def _probe_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            started = loop.time()
+            await asyncio.sleep(self.interval)
+            self.record_lag(max(0.0, loop.time() - started - self.interval))
+    
+    def record_lag(self, lag: float):
+        self.samples += 1
+        self.recent_lags.append(lag)
+        self.max_lag = max(self.max_lag, lag)
+        if lag >= self.stall_threshold:
+            self.stalls += 1
+            self.total_stall_seconds += lag
+            self.last_stall_at = datetime.now()
+            logger.warning(f"Event loop stalled for {lag * 1000:.0f} ms")
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """Lag percentiles over the recent window plus lifetime stall totals"""
+        lags = sorted(self.recent_lags)
+        
+        def percentile(p: float) -> float:
+            return round(lags[min(len(lags) - 1, int(len(lags) * p))] * 1000, 2) if lags else 0.0
+        
+        return {
+            'active': self._task is not None and not self._task.done(),
+            'interval_ms': self.interval * 1000,
+            'stall_threshold_ms': self.stall_threshold * 1000,
+            'samples': self.samples,
+            'lag_p50_ms': percentile(0.50),
+            'lag_p99_ms': percentile(0.99),
+            'lag_max_ms': round(self.max_lag * 1000, 2),
+            'stalls': self.stalls,
+            'total_stall_seconds': round(self.total_stall_seconds, 3),
+            'last_stall_at': self.last_stall_at.isoformat() if self.last_stall_at else None
+        }
+
 # Global instances
 metrics_collector = MetricsCollector()
 system_monitor = SystemMonitor(metrics_collector)
 performance_tracker = PerformanceTracker(metrics_collector)
+event_loop_monitor = EventLoopMonitor(EVENT_LOOP_MONITOR_INTERVAL, EVENT_LOOP_STALL_THRESHOLD_MS / 1000)
 
 def get_metrics_summary() -> Dict[str, Any]:
     """Get a summary of all metrics"""
@@ -228,7 +410,8 @@ def get_metrics_summary() -> Dict[str, Any]:
         'health': metrics_collector.get_health_status(),
         'api_metrics_count': len(metrics_collector.api_metrics),
         'system_metrics_count': len(metrics_collector.system_metrics),
-        'monitoring_active': system_monitor.monitoring
+        'monitoring_active': system_monitor.monitoring,
+        'event_loop': event_loop_monitor.get_stats()
     }
 
 def start_monitoring():
@@ -239,4 +422,5 @@ def start_monitoring():
 def stop_monitoring():
     """Stop all monitoring services"""
     system_monitor.stop_monitoring()
+    event_loop_monitor.stop()
     logger.info("All monitoring services stopped")
@@ -1,17 +1,51 @@
 import os
 import time
+import shutil
 import threading
-from datetime import datetime
+from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import sqlite3
 from pathlib import Path
 
+from sqlalchemy import text
+
+from database_config import (
+    UPLOAD_SPOOL_DIR, UPLOAD_HEARTBEAT_TIMEOUT, UPLOAD_RETRY_DELAY_SECONDS,
+    UPLOAD_MAX_CONCURRENT, UPLOAD_MAX_PER_USER
+)
+
+# Bytes copied per read when spooling an upload to disk
+SPOOL_CHUNK_SIZE = 1024 * 1024
+
+# Advisory lock serialising claims so the concurrency caps hold across workers
+UPLOAD_QUEUE_LOCK_KEY = 7_311_803
+
+# Used for start estimates until there is upload history
+DEFAULT_UPLOAD_SECONDS = 60.0
+
+# Pending tasks in fair-share order: a PIC's n-th queued file runs in round (in-flight + n),
+# so every PIC gets one file per round regardless of how many they queued
+FAIR_QUEUE_SQL = """
+    WITH in_flight AS (
+        SELECT COALESCE(pic, '') AS pic, COUNT(*) AS running
+        FROM upload_tasks
+        WHERE status = 'processing'
+        GROUP BY COALESCE(pic, '')
+    )
+    SELECT t.id, t.task_id, COALESCE(t.pic, '') AS pic, t.created_at, t.available_at,
+           COALESCE(f.running, 0) AS running,
+           COALESCE(f.running, 0) + ROW_NUMBER() OVER (
+               PARTITION BY COALESCE(t.pic, '') ORDER BY t.created_at, t.id
+           ) AS fair_round
+    FROM upload_tasks t
+    LEFT JOIN in_flight f ON f.pic = COALESCE(t.pic, '')
+    WHERE t.status = 'pending'
+"""
+
 class MultiUserHandler:
     """Handle multiple users uploading files simultaneously"""
     
     def __init__(self):
-        self.upload_queue = []
-        self.processing_queue = []
         self.user_workspaces = {}
         self.lock = threading.Lock()
         self.current_dir = os.path.dirname(os.path.abspath(__file__))
@@ -23,6 +57,10 @@ class MultiUserHandler:
         else:
             # Running locally
             self.project_root = os.path.dirname(self.current_dir)
+        
+        self.spool_dir = UPLOAD_SPOOL_DIR or os.path.join(self.current_dir, 'uploads', 'spool')
+        self.max_concurrent = max(1, UPLOAD_MAX_CONCURRENT)
+        self.max_per_user = max(1, UPLOAD_MAX_PER_USER)
     
     def create_user_workspace(self, user_id: str) -> str:
         """Create isolated workspace for user"""
@@ -85,63 +123,118 @@ class MultiUserHandler:
                 if not os.path.exists(dest_file):
                     shutil.copy2(source_file, dest_file)
     
-    def add_to_upload_queue(self, user_id: str, filename: str, file_data: bytes) -> str:
-        """Add upload to queue and return task ID"""
-        task_id = f"upload_{user_id}_{int(time.time())}"
+    def spool_upload(self, fileobj, user_id: str, task_id: str, filename: str) -> str:
+        """Copy an uploaded file to the on-disk spool in chunks and return its path"""
+        user_spool_dir = os.path.join(self.spool_dir, user_id)
+        os.makedirs(user_spool_dir, exist_ok=True)
+        spool_path = os.path.join(user_spool_dir, f"{task_id}_{os.path.basename(filename)}")
         
-        with self.lock:
-            self.upload_queue.append({
-                'task_id': task_id,
-                'user_id': user_id,
-                'filename': filename,
-                'file_data': file_data,
-                'status': 'queued',
-                'created_at': datetime.now()
-            })
-        
-        print(f"📋 Added upload to queue: {task_id} for user {user_id}")
-        return task_id
-    
-    def process_upload_queue(self):
-        """Process upload queue sequentially"""
-        while True:
-            with self.lock:
-                if not self.upload_queue:
-                    time.sleep(1)
-                    continue
-                
-                # Get next upload from queue
-                upload_task = self.upload_queue.pop(0)
-            
-            try:
-                print(f"🔄 Processing upload: {upload_task['task_id']}")
-                upload_task['status'] = 'processing'
-                
-                # Process the upload (this would call the actual upload processing logic)
-                # For now, just simulate processing
-                time.sleep(2)
-                
-                upload_task['status'] = 'completed'
-                print(f"✅ Completed upload: {upload_task['task_id']}")
-                
-            except Exception as e:
-                upload_task['status'] = 'failed'
-                upload_task['error'] = str(e)
-                print(f"❌ Failed upload: {upload_task['task_id']} - {str(e)}")
+        fileobj.seek(0)
+        with open(spool_path, 'wb') as spool_file:
+            shutil.copyfileobj(fileobj, spool_file, SPOOL_CHUNK_SIZE)
+        return spool_path
     
-    def get_upload_status(self, task_id: str) -> Optional[Dict]:
-        """Get upload status by task ID"""
-        with self.lock:
-            for upload in self.upload_queue:
-                if upload['task_id'] == task_id:
-                    return upload
+    def remove_spooled_file(self, spool_path: Optional[str]):
+        """Delete a spooled upload once its task is finished"""
+        if not spool_path or not os.path.abspath(spool_path).startswith(os.path.abspath(self.spool_dir)):
+            return
+        try:
+            os.remove(spool_path)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print(f"⚠️ Could not remove spooled upload {spool_path}: {str(e)}")
+    
+    def claim_next_upload(self, db, worker_id: str, now: datetime) -> Optional[Dict]:
+        """Claim the next runnable upload in fair-share order, respecting the global and per-user caps"""
+        db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": UPLOAD_QUEUE_LOCK_KEY})
         
-        # Check processing queue
-        for upload in self.processing_queue:
-            if upload['task_id'] == task_id:
-                return upload
+        running = db.execute(text("SELECT COUNT(*) FROM upload_tasks WHERE status = 'processing'")).scalar() or 0
+        if running >= self.max_concurrent:
+            db.commit()
+            return None
         
-        return None
+        next_id = db.execute(text(f"""
+            SELECT id FROM ({FAIR_QUEUE_SQL}) queue
+            WHERE running < :max_per_user
+              AND (available_at IS NULL OR available_at <= :now)
+            ORDER BY fair_round, created_at, id
+            LIMIT 1
+        """), {"max_per_user": self.max_per_user, "now": now}).scalar()
+        if next_id is None:
+            db.commit()
+            return None
+        
+        row = db.execute(text("""
+            UPDATE upload_tasks
+            SET status = 'processing',
+                worker_id = :worker_id,
+                heartbeat_at = :now,
+                started_at = :now,
+                attempts = COALESCE(attempts, 0) + 1,
+                updated_at = :now
+            WHERE id = :id AND status = 'pending'
+            RETURNING task_id, task_name, file_path, pic, attempts, max_attempts
+        """), {"id": next_id, "worker_id": worker_id, "now": now}).fetchone()
+        db.commit()
+        return dict(row._mapping) if row else None
+    
+    def heartbeat_upload(self, db, task_id: str, worker_id: str, now: datetime) -> bool:
+        """Refresh the heartbeat of a task this worker is processing"""
+        result = db.execute(text("""
+            UPDATE upload_tasks SET heartbeat_at = :now
+            WHERE task_id = :task_id AND worker_id = :worker_id AND status = 'processing'
+        """), {"task_id": task_id, "worker_id": worker_id, "now": now})
+        db.commit()
+        return result.rowcount > 0
+    
+    def retry_or_fail_upload(self, db, task_id: str, error: str, now: datetime, retryable: bool = True) -> bool:
+        """Put a failed task back in the queue with a delay, or fail it for good; returns True when final"""
+        row = db.execute(text("""
+            UPDATE upload_tasks
+            SET status = CASE WHEN :retryable AND COALESCE(attempts, 0) < COALESCE(max_attempts, 1)
+                              THEN 'pending' ELSE 'failed' END,
+                available_at = :now + (COALESCE(attempts, 1) * :retry_delay) * INTERVAL '1 second',
+                completed_at = CASE WHEN :retryable AND COALESCE(attempts, 0) < COALESCE(max_attempts, 1)
+                                    THEN NULL ELSE :now END,
+                worker_id = NULL,
+                error_message = :error,
+                updated_at = :now
+            WHERE task_id = :task_id
+            RETURNING status
+        """), {
+            "task_id": task_id,
+            "error": error,
+            "now": now,
+            "retryable": retryable,
+            "retry_delay": UPLOAD_RETRY_DELAY_SECONDS
+        }).fetchone()
+        db.commit()
+        return not row or row[0] == 'failed'
+    
+    def requeue_stale_uploads(self, db, now: datetime) -> List[str]:
+        """Re-queue (or fail) tasks whose worker stopped sending heartbeats
+
+        Tasks that never sent one (claimed by older code, or the worker died before its first
+        heartbeat) are judged by their last update instead.
+        """
+        rows = db.execute(text("""
+            UPDATE upload_tasks
+            SET status = CASE WHEN COALESCE(attempts, 0) < COALESCE(max_attempts, 1) THEN 'pending' ELSE 'failed' END,
+                completed_at = CASE WHEN COALESCE(attempts, 0) < COALESCE(max_attempts, 1) THEN NULL ELSE :now END,
+                error_message = 'Upload worker stopped responding (worker ' || COALESCE(worker_id, '?') || ')',
+                worker_id = NULL,
+                available_at = :now,
+                updated_at = :now
+            WHERE status = 'processing'
+              AND COALESCE(heartbeat_at, updated_at, started_at, created_at) < :stale_before
+            RETURNING task_id
+        """), {"now": now, "stale_before": now - timedelta(seconds=UPLOAD_HEARTBEAT_TIMEOUT)}).fetchall()
+        db.commit()
+        task_ids = [row[0] for row in rows]
+        if task_ids:
+            print(f"♻️ Re-queued {len(task_ids)} stale upload task(s): {', '.join(task_ids)}")
+        return task_ids
     
     def cleanup_user_workspace(self, user_id: str, older_than_hours: int = 24):
         """Clean up old files in user workspace"""
@@ -160,25 +253,93 @@ class MultiUserHandler:
         except Exception as e:
             print(f"❌ Error cleaning up workspace for user {user_id}: {str(e)}")
     
-    def get_queue_status(self) -> Dict:
-        """Get current queue status"""
+    def get_average_upload_seconds(self, db) -> float:
+        """Average run time of the most recent completed uploads"""
+        average = db.execute(text("""
+            SELECT AVG(EXTRACT(EPOCH FROM (completed_at - started_at)))
+            FROM (
+                SELECT started_at, completed_at FROM upload_tasks
+                WHERE status = 'completed' AND started_at IS NOT NULL AND completed_at IS NOT NULL
+                ORDER BY completed_at DESC
+                LIMIT 50
+            ) recent
+        """)).scalar()
+        return float(average) if average else DEFAULT_UPLOAD_SECONDS
+    
+    def estimate_wait_seconds(self, position: int, running: int, average_seconds: float) -> float:
+        """Rough wait before the task at this queue position starts: full rounds of busy slots ahead of it"""
+        rounds_ahead = (running + position - 1) // self.max_concurrent
+        return rounds_ahead * average_seconds
+    
+    def get_queue_position(self, db, task_id: str, now: datetime) -> Optional[Dict]:
+        """Queue position and estimated start of a pending task, None when it is not queued"""
+        row = db.execute(text(f"""
+            SELECT position, queue_length, available_at FROM (
+                SELECT task_id, available_at,
+                       ROW_NUMBER() OVER (ORDER BY fair_round, created_at, id) AS position,
+                       COUNT(*) OVER () AS queue_length
+                FROM ({FAIR_QUEUE_SQL}) queue
+            ) ranked
+            WHERE task_id = :task_id
+        """), {"task_id": task_id}).fetchone()
+        if not row:
+            return None
+        
+        running = db.execute(text("SELECT COUNT(*) FROM upload_tasks WHERE status = 'processing'")).scalar() or 0
+        wait_seconds = self.estimate_wait_seconds(row.position, running, self.get_average_upload_seconds(db))
+        estimated_start = now + timedelta(seconds=wait_seconds)
+        available_at = row.available_at
+        if available_at is not None:
+            if available_at.tzinfo is None and now.tzinfo is not None:
+                available_at = available_at.replace(tzinfo=now.tzinfo)
+            estimated_start = max(estimated_start, available_at)
+        
+        return {
+            'queue_position': row.position,
+            'queue_length': row.queue_length,
+            'estimated_wait_seconds': round((estimated_start - now).total_seconds()),
+            'estimated_start_at': estimated_start.isoformat()
+        }
+    
+    def get_queue_status(self, db=None) -> Dict:
+        """Get current queue status (queue counts come from upload_tasks when a session is given)"""
         with self.lock:
-            return {
-                'upload_queue_length': len(self.upload_queue),
-                'processing_queue_length': len(self.processing_queue),
+            status = {
                 'active_users': len(self.user_workspaces),
                 'user_workspaces': list(self.user_workspaces.keys())
             }
+        
+        if db is not None:
+            rows = db.execute(text("""
+                SELECT COALESCE(pic, '') AS pic,
+                       COUNT(*) FILTER (WHERE status = 'pending') AS pending,
+                       COUNT(*) FILTER (WHERE status = 'processing') AS processing,
+                       COUNT(DISTINCT worker_id) FILTER (WHERE status = 'processing') AS workers
+                FROM upload_tasks
+                WHERE status IN ('pending', 'processing')
+                GROUP BY COALESCE(pic, '')
+                ORDER BY COALESCE(pic, '')
+            """)).fetchall()
+            pending = sum(row.pending for row in rows)
+            processing = sum(row.processing for row in rows)
+            average_seconds = self.get_average_upload_seconds(db)
+            status.update({
+                'upload_queue_length': pending,
+                'processing_queue_length': processing,
+                'busy_workers': sum(row.workers for row in rows),
+                'max_concurrent_uploads': self.max_concurrent,
+                'max_uploads_per_user': self.max_per_user,
+                'average_upload_seconds': round(average_seconds, 1),
+                'users': [
+                    {'pic': row.pic, 'pending': row.pending, 'processing': row.processing}
+                    for row in rows
+                ],
+                # A file queued now by a PIC with nothing queued goes into the first round
+                'estimated_wait_seconds_new_user': round(self.estimate_wait_seconds(
+                    sum(1 for row in rows if row.pending) + 1, processing, average_seconds
+                ))
+            })
+        return status
 
 # Global instance
 multi_user_handler = MultiUserHandler()
-
-# Start queue processor in background thread
-def start_queue_processor():
-    """Start the upload queue processor"""
-    processor_thread = threading.Thread(target=multi_user_handler.process_upload_queue, daemon=True)
-    processor_thread.start()
-    print("🚀 Started upload queue processor")
-
-# Start the processor when module is imported
-start_queue_processor()
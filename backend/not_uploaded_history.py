@@ -0,0 +1,98 @@
+"""
+not_uploaded_history maintenance
+Set-based daily snapshot of list_brand combinations with no uploaded orders, plus the per-upload update of one combination
+"""
+import logging
+from datetime import date, datetime
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# pg advisory lock key: only one uvicorn worker creates the daily key at a time
+NOT_UPLOADED_HISTORY_LOCK_KEY = 7_311_807
+
+# One history row per combination and day; readers filter on date(check_date) too
+DAILY_KEY_INDEX = "uq_not_uploaded_history_day"
+DAILY_KEY_COLUMNS = "date(check_date), brand, marketplace, batch"
+
+# Combinations are matched the way uploads name them: trimmed, case-insensitive, NULL as ''
+_KEY = "UPPER(BTRIM(COALESCE({column}, '')))"
+
+SNAPSHOT_STATEMENT = f"""
+    INSERT INTO not_uploaded_history (brand, marketplace, batch, remark, status, check_date, created_at)
+    SELECT lb.brand, lb.marketplace, lb.batch, lb.remark, 'not_uploaded', :now, :now
+    FROM list_brand lb
+    WHERE lb.brand IS NOT NULL AND lb.marketplace IS NOT NULL AND lb.batch IS NOT NULL
+      AND NOT EXISTS (
+          SELECT 1 FROM uploaded_orders u
+          WHERE {_KEY.format(column='u."Brand"')} = {_KEY.format(column='lb.brand')}
+            AND {_KEY.format(column='u."Marketplace"')} = {_KEY.format(column='lb.marketplace')}
+            AND {_KEY.format(column='u."Batch"')} = {_KEY.format(column='lb.batch')}
+      )
+      AND NOT EXISTS (
+          SELECT 1 FROM not_uploaded_history h
+          WHERE date(h.check_date) = :day
+            AND h.brand = lb.brand AND h.marketplace = lb.marketplace AND h.batch = lb.batch
+      )
+    ON CONFLICT DO NOTHING
+"""
+
+MARK_UPLOADED_STATEMENT = f"""
+    UPDATE not_uploaded_history
+    SET status = 'uploaded'
+    WHERE date(check_date) = :day AND status = 'not_uploaded'
+      AND {_KEY.format(column='brand')} = :brand
+      AND {_KEY.format(column='marketplace')} = :marketplace
+      AND {_KEY.format(column='batch')} = :batch
+"""
+
+
+def _normalize(value) -> str:
+    return str(value or "").strip().upper()
+
+
+def ensure_not_uploaded_history_key(engine):
+    """Drop same-day duplicates and create the unique daily key of not_uploaded_history"""
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": NOT_UPLOADED_HISTORY_LOCK_KEY})
+            if conn.execute(text("SELECT to_regclass(:name)"), {"name": DAILY_KEY_INDEX}).scalar():
+                return
+            removed = conn.execute(text("""
+                DELETE FROM not_uploaded_history h
+                USING not_uploaded_history keep
+                WHERE date(h.check_date) = date(keep.check_date)
+                  AND h.brand = keep.brand AND h.marketplace = keep.marketplace AND h.batch = keep.batch
+                  AND h.id > keep.id
+            """)).rowcount
+            conn.execute(text(
+                f"CREATE UNIQUE INDEX {DAILY_KEY_INDEX} ON not_uploaded_history ({DAILY_KEY_COLUMNS})"
+            ))
+            print(f"✅ {DAILY_KEY_INDEX} created ({removed} duplicate history rows removed)")
+    except Exception as e:
+        logger.error(f"not_uploaded_history daily key setup failed: {e}")
+
+
+def snapshot_not_uploaded(conn, now: datetime) -> int:
+    """Record every list_brand combination without uploaded orders that is not in today's history yet
+
+    now must be naive WIB (check_date has no timezone), so its date is the WIB day.
+    """
+    return conn.execute(text(SNAPSHOT_STATEMENT), {"now": now, "day": now.date()}).rowcount
+
+
+def has_snapshot(conn, day: date) -> bool:
+    return conn.execute(
+        text("SELECT EXISTS (SELECT 1 FROM not_uploaded_history WHERE date(check_date) = :day)"), {"day": day}
+    ).scalar()
+
+
+def mark_uploaded(conn, brand: str, marketplace: str, batch: str, day: date) -> int:
+    """Flip today's not_uploaded row of one combination to 'uploaded' (only today's rows are read, via the daily key)"""
+    return conn.execute(text(MARK_UPLOADED_STATEMENT), {
+        "day": day,
+        "brand": _normalize(brand),
+        "marketplace": _normalize(marketplace),
+        "batch": _normalize(batch),
+    }).rowcount
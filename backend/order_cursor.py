@@ -0,0 +1,25 @@
+"""
+Keyset cursors for /api/orders/list
+Opaque, URL-safe encoding of the (UploadDate, Id) position of the last row returned
+"""
+import json
+import base64
+from datetime import datetime
+
+from fastapi import HTTPException
+
+
+def encode_order_cursor(upload_date, order_id) -> str:
+    """Opaque keyset cursor for /api/orders/list: the (UploadDate, Id) of the last row returned"""
+    payload = json.dumps({"u": upload_date.isoformat() if upload_date else None, "i": order_id})
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_order_cursor(cursor: str):
+    """Decode a cursor from encode_order_cursor into (UploadDate, Id)"""
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        upload_date = datetime.fromisoformat(payload["u"]) if payload["u"] else None
+        return upload_date, int(payload["i"])
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
@@ -0,0 +1,219 @@
+"""
+order_facets table maintenance and queries
+Per-day co-occurrence counts of the order filter dimensions over clean_orders, kept in sync through statement-level triggers on clean_orders
+"""
+import logging
+from datetime import date, datetime
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# pg advisory lock key: only one uvicorn worker sets up / rebuilds the facets at a time
+ORDER_FACETS_LOCK_KEY = 7_311_809
+
+FACETS_TABLE = "order_facets"
+
+# field name (as used by the filter endpoints) -> (facet column, expression over clean_orders rows).
+# Text keys are never NULL ('' stands for NULL, and the filter endpoints never list '');
+# orders without an OrderDate are counted under day -infinity, which no date range includes.
+FACET_DIMENSIONS = {
+    "day": ("day", "COALESCE(date(\"OrderDate\"), '-infinity'::date)"),
+    "marketplace": ("marketplace", 'COALESCE("Marketplace", \'\')'),
+    "brand": ("brand", 'COALESCE("Brand", \'\')'),
+    "order_status": ("order_status", 'COALESCE("OrderStatusFlexo", \'\')'),
+    "transporter": ("transporter", 'COALESCE("Transporter", \'\')'),
+    "batch": ("batch", 'COALESCE("Batch", \'\')'),
+    "pic": ("pic", 'COALESCE("PIC", \'\')'),
+    "interface_status": ("interface_status", 'COALESCE("InterfaceStatus", \'\')'),
+}
+
+# Filter fields the facets can answer (order_status_flexo is the same column as order_status)
+FACET_FIELDS = {
+    "marketplace": "marketplace",
+    "brand": "brand",
+    "order_status": "order_status",
+    "order_status_flexo": "order_status",
+    "transporter": "transporter",
+    "batch": "batch",
+    "pic": "pic",
+    "interface_status": "interface_status",
+}
+
+_KEY_LIST = ", ".join(column for column, _expression in FACET_DIMENSIONS.values())
+_KEY_EXPRESSIONS = ", ".join(f"{expression} AS {column}" for column, expression in FACET_DIMENSIONS.values())
+
+CREATE_TABLE = f"""
+    CREATE TABLE IF NOT EXISTS {FACETS_TABLE} (
+        day DATE NOT NULL,
+        marketplace TEXT NOT NULL,
+        brand TEXT NOT NULL,
+        order_status TEXT NOT NULL,
+        transporter TEXT NOT NULL,
+        batch TEXT NOT NULL,
+        pic TEXT NOT NULL,
+        interface_status TEXT NOT NULL,
+        order_count BIGINT NOT NULL DEFAULT 0,
+        PRIMARY KEY ({_KEY_LIST})
+    )
+"""
+
+# +1 per row of new_rows, -1 per row of old_rows
+_ADDED = f"SELECT {_KEY_EXPRESSIONS}, 1 AS delta FROM new_rows"
+_REMOVED = f"SELECT {_KEY_EXPRESSIONS}, -1 AS delta FROM old_rows"
+
+# Keys are upserted in sorted order so concurrent writes lock facet rows in the same order.
+# Rows that drop to zero stay (readers only list values whose counts sum above zero)
+_APPLY_CHANGES = f"""
+    INSERT INTO {FACETS_TABLE} ({_KEY_LIST}, order_count)
+    SELECT {_KEY_LIST}, SUM(delta)
+    FROM ({{changes}}) changes
+    GROUP BY {_KEY_LIST}
+    HAVING SUM(delta) <> 0
+    ORDER BY {_KEY_LIST}
+    ON CONFLICT ({_KEY_LIST}) DO UPDATE SET order_count = {FACETS_TABLE}.order_count + EXCLUDED.order_count
+"""
+
+# One function for all triggers; each trigger exposes only the transition tables its event has
+SYNC_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION sync_order_facets() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        TRUNCATE {FACETS_TABLE};
+    ELSIF TG_OP = 'INSERT' THEN
+        {_APPLY_CHANGES.format(changes=_ADDED)};
+    ELSIF TG_OP = 'DELETE' THEN
+        {_APPLY_CHANGES.format(changes=_REMOVED)};
+    ELSE
+        -- Updates that touch no dimension (remarks, Flexo order numbers) net out to zero and write nothing
+        {_APPLY_CHANGES.format(changes=f"{_ADDED} UNION ALL {_REMOVED}")};
+    END IF;
+    RETURN NULL;
+END;
+$$
+"""
+
+TRIGGER_STATEMENTS = {
+    "trg_order_facets_insert": """
+        CREATE TRIGGER trg_order_facets_insert AFTER INSERT ON clean_orders
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION sync_order_facets()
+    """,
+    "trg_order_facets_update": """
+        CREATE TRIGGER trg_order_facets_update AFTER UPDATE ON clean_orders
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION sync_order_facets()
+    """,
+    "trg_order_facets_delete": """
+        CREATE TRIGGER trg_order_facets_delete AFTER DELETE ON clean_orders
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION sync_order_facets()
+    """,
+    "trg_order_facets_truncate": """
+        CREATE TRIGGER trg_order_facets_truncate AFTER TRUNCATE ON clean_orders
+        FOR EACH STATEMENT EXECUTE FUNCTION sync_order_facets()
+    """,
+}
+
+
+def _fill_order_facets(conn) -> int:
+    result = conn.execute(text(f"""
+        INSERT INTO {FACETS_TABLE} ({_KEY_LIST}, order_count)
+        SELECT {_KEY_EXPRESSIONS}, COUNT(*)
+        FROM clean_orders
+        GROUP BY {", ".join(str(position) for position in range(1, len(FACET_DIMENSIONS) + 1))}
+    """))
+    return result.rowcount
+
+
+def ensure_order_facets_table(engine):
+    """Create the facet table and its triggers on clean_orders (backfilled once)"""
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": ORDER_FACETS_LOCK_KEY})
+            created = conn.execute(text("SELECT to_regclass(:name)"), {"name": FACETS_TABLE}).scalar() is None
+            conn.execute(text(CREATE_TABLE))
+
+            conn.execute(text(SYNC_FUNCTION))
+            existing = {row[0] for row in conn.execute(text("""
+                SELECT tgname FROM pg_trigger
+                WHERE tgrelid = 'clean_orders'::regclass AND NOT tgisinternal
+            """))}
+            for name, statement in TRIGGER_STATEMENTS.items():
+                if name not in existing:
+                    conn.execute(text(statement))
+
+            # The triggers hold a lock on clean_orders until commit, so no write is missed
+            if created:
+                filled = _fill_order_facets(conn)
+                print(f"✅ {FACETS_TABLE} table created and backfilled with {filled} facet rows")
+    except Exception as e:
+        logger.error(f"{FACETS_TABLE} table setup failed: {e}")
+
+
+def rebuild_order_facets(db: Session) -> int:
+    """Rebuild the facets from clean_orders (repair tool, also drops zero-count rows; the triggers keep them in sync normally)"""
+    db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": ORDER_FACETS_LOCK_KEY})
+    db.execute(text("LOCK TABLE clean_orders IN SHARE MODE"))
+    db.execute(text(f"TRUNCATE {FACETS_TABLE}"))
+    filled = _fill_order_facets(db)
+    db.commit()
+    return filled
+
+
+def split_filter_list(value: Optional[str]) -> List[str]:
+    """Values of a comma-separated filter, trimmed"""
+    return [item.strip() for item in (value or "").split(',') if item.strip()]
+
+
+def normalize_filter_list(value: Optional[str]) -> Optional[str]:
+    """Comma-separated filter values, trimmed, de-duplicated and sorted (None when empty)"""
+    return ",".join(sorted(set(split_filter_list(value)))) or None
+
+
+def as_day(value: str) -> date:
+    """Date part of a YYYY-MM-DD or ISO datetime filter value"""
+    value = value.strip()
+    try:
+        return date.fromisoformat(value[:10])
+    except ValueError:
+        return datetime.fromisoformat(value.replace('Z', '+00:00')).date()
+
+
+def facet_value_counts(db, field: str, filters: Optional[Dict[str, List[str]]] = None,
+                       start_date: Optional[str] = None, end_date: Optional[str] = None) -> List[Tuple[str, int]]:
+    """(value, order count) of one field over the orders matching the other filters, ordered by value
+
+    filters maps field names to the accepted values (any of them); order status values match
+    case-insensitively like the order list does. The date range covers whole OrderDate days.
+    """
+    column = FACET_FIELDS[field]
+    conditions = [f"{column} <> ''"]
+    params = {}
+    if start_date and end_date:
+        conditions.append("day BETWEEN :start_day AND :end_day")
+        params.update(start_day=as_day(start_date), end_day=as_day(end_date))
+    for filter_field, values in (filters or {}).items():
+        if not values:
+            continue
+        filter_column = FACET_FIELDS[filter_field]
+        names = [f"{filter_column}_{i}" for i in range(len(values))]
+        placeholders = ", ".join(f":{name}" for name in names)
+        if filter_column == "order_status":
+            conditions.append(f"UPPER(order_status) IN ({placeholders})")
+            params.update({name: value.upper() for name, value in zip(names, values)})
+        else:
+            conditions.append(f"{filter_column} IN ({placeholders})")
+            params.update(dict(zip(names, values)))
+    rows = db.execute(text(f"""
+        SELECT {column}, SUM(order_count)::bigint
+        FROM {FACETS_TABLE}
+        WHERE {" AND ".join(conditions)}
+        GROUP BY {column}
+        HAVING SUM(order_count) > 0
+        ORDER BY {column}
+    """), params).fetchall()
+    return [(row[0], row[1]) for row in rows]
@@ -0,0 +1,222 @@
+"""
+uploaded_orders partition maintenance
+Monthly range partitions on "UploadDate" created ahead of time; partitions past retention are detached into uploaded_orders_archive
+"""
+import re
+import logging
+from datetime import date
+from typing import List, Optional
+
+from sqlalchemy import text
+
+from database_config import ORDER_PARTITION_MONTHS_AHEAD, ORDER_RETENTION_MONTHS
+
+logger = logging.getLogger(__name__)
+
+# pg advisory lock key: only one process creates / archives partitions at a time
+ORDER_PARTITIONS_LOCK_KEY = 7_311_806
+
+PARTITION_PREFIX = "uploaded_orders_p"
+PARTITION_NAME_PATTERN = re.compile(r"^uploaded_orders_p(\d{4})(\d{2})$")
+DEFAULT_PARTITION = "uploaded_orders_default"
+ARCHIVE_TABLE = "uploaded_orders_archive"
+
+# One row per order number ever uploaded. A partitioned table cannot have a unique index without the
+# partition key, so order_writer row-locks these keys to keep OrderNumber unique across partitions.
+ORDER_NUMBERS_TABLE = "uploaded_order_numbers"
+
+
+def month_start(day: date) -> date:
+    return date(day.year, day.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{PARTITION_PREFIX}{month:%Y%m}"
+
+
+def is_partitioned(conn) -> bool:
+    """True once migration 0003 has converted uploaded_orders into a partitioned table"""
+    relkind = conn.execute(text(
+        "SELECT relkind FROM pg_class WHERE oid = to_regclass('uploaded_orders')"
+    )).scalar()
+    return relkind == 'p'
+
+
+def list_month_partitions(conn, parent: str = "uploaded_orders") -> List[date]:
+    """Months that have a partition attached to parent, oldest first"""
+    rows = conn.execute(text("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(:parent)
+    """), {"parent": parent})
+    months = []
+    for (name,) in rows:
+        match = PARTITION_NAME_PATTERN.match(name)
+        if match:
+            months.append(date(int(match.group(1)), int(match.group(2)), 1))
+    return sorted(months)
+
+
+def create_month_partition(conn, month: date) -> bool:
+    """Create the partition for one month; rows that landed in the default partition are moved into it"""
+    name = partition_name(month)
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar():
+        return False
+
+    bounds = {"start": month, "end": add_months(month, 1)}
+    in_range = '"UploadDate" >= :start AND "UploadDate" < :end'
+    has_default = conn.execute(text("SELECT to_regclass(:name)"), {"name": DEFAULT_PARTITION}).scalar() is not None
+    stray = has_default and conn.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE {in_range})"), bounds
+    ).scalar()
+
+    # A new partition cannot overlap rows in the default partition, so those are moved partition-to-partition
+    # (Ids and clean_orders stay as they are; the parent's statement triggers do not fire)
+    if stray:
+        conn.execute(text(f"ALTER TABLE uploaded_orders DETACH PARTITION {DEFAULT_PARTITION}"))
+    conn.execute(text(
+        f"CREATE TABLE {name} PARTITION OF uploaded_orders "
+        f"FOR VALUES FROM ('{bounds['start']}') TO ('{bounds['end']}')"
+    ))
+    if stray:
+        conn.execute(text(f"INSERT INTO {name} SELECT * FROM {DEFAULT_PARTITION} WHERE {in_range}"), bounds)
+        conn.execute(text(f"DELETE FROM {DEFAULT_PARTITION} WHERE {in_range}"), bounds)
+        conn.execute(text(f"ALTER TABLE uploaded_orders ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT"))
+    return True
+
+
+def create_partitions(conn, first_month: date, last_month: date) -> int:
+    """Create every missing month partition from first_month to last_month (inclusive)"""
+    created = 0
+    month = month_start(first_month)
+    while month <= last_month:
+        created += create_month_partition(conn, month)
+        month = add_months(month, 1)
+    return created
+
+
+def ensure_order_numbers_table(conn) -> bool:
+    """Create and backfill the order number key table; returns True when it was just created"""
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": ORDER_NUMBERS_TABLE}).scalar():
+        return False
+    conn.execute(text(f'CREATE TABLE {ORDER_NUMBERS_TABLE} ("OrderNumber" TEXT PRIMARY KEY)'))
+    conn.execute(text(f"""
+        INSERT INTO {ORDER_NUMBERS_TABLE} ("OrderNumber")
+        SELECT DISTINCT "OrderNumber" FROM uploaded_orders WHERE "OrderNumber" IS NOT NULL
+    """))
+    return True
+
+
+def ensure_order_partitions(engine, today: Optional[date] = None):
+    """Create the order number key table and the partitions for the coming months"""
+    today = today or date.today()
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": ORDER_PARTITIONS_LOCK_KEY})
+            if ensure_order_numbers_table(conn):
+                print(f"✅ {ORDER_NUMBERS_TABLE} table created")
+            if not is_partitioned(conn):
+                return
+            current = month_start(today)
+            created = create_partitions(conn, current, add_months(current, ORDER_PARTITION_MONTHS_AHEAD))
+            if created:
+                print(f"✅ Created {created} uploaded_orders partitions")
+    except Exception as e:
+        logger.error(f"uploaded_orders partition setup failed: {e}")
+
+
+def _ensure_archive_table(conn):
+    """Create the archive table, adding columns uploaded_orders gained since (ATTACH needs equal columns)"""
+    conn.execute(text(f"""
+        CREATE TABLE IF NOT EXISTS {ARCHIVE_TABLE} (LIKE uploaded_orders) PARTITION BY RANGE ("UploadDate")
+    """))
+    missing = conn.execute(text("""
+        SELECT a.attname, format_type(a.atttypid, a.atttypmod)
+        FROM pg_attribute a
+        WHERE a.attrelid = 'uploaded_orders'::regclass AND a.attnum > 0 AND NOT a.attisdropped
+          AND NOT EXISTS (
+              SELECT 1 FROM pg_attribute b
+              WHERE b.attrelid = to_regclass(:archive) AND b.attname = a.attname AND NOT b.attisdropped
+          )
+        ORDER BY a.attnum
+    """), {"archive": ARCHIVE_TABLE}).fetchall()
+    for column, column_type in missing:
+        conn.execute(text(f'ALTER TABLE {ARCHIVE_TABLE} ADD COLUMN "{column}" {column_type}'))
+
+
+def archive_old_partitions(engine, retention_months: int = ORDER_RETENTION_MONTHS,
+                           today: Optional[date] = None) -> List[str]:
+    """Move month partitions older than the retention window from uploaded_orders to the archive table
+
+    DETACH/ATTACH only changes catalog entries, so no order rows are copied. Archived orders are removed
+    from clean_orders, the dashboard rollup and the order number keys (a re-upload then starts a new live order).
+    """
+    if retention_months <= 0:
+        return []
+    cutoff = add_months(month_start(today or date.today()), -retention_months)
+
+    with engine.connect() as conn:
+        if not is_partitioned(conn):
+            return []
+        months = [month for month in list_month_partitions(conn) if month < cutoff]
+
+    archived = []
+    for month in months:
+        name = partition_name(month)
+        # One transaction per partition keeps the lock on uploaded_orders short
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": ORDER_PARTITIONS_LOCK_KEY})
+            if month not in list_month_partitions(conn):
+                continue  # archived by another process meanwhile
+            conn.execute(text(f"ALTER TABLE uploaded_orders DETACH PARTITION {name}"))
+            conn.execute(text(f'DELETE FROM clean_orders c USING {name} p WHERE c."Id" = p."Id"'))
+            conn.execute(text(
+                f'DELETE FROM {ORDER_NUMBERS_TABLE} n USING {name} p WHERE n."OrderNumber" = p."OrderNumber"'
+            ))
+            # DETACH fires no triggers, so the month's dashboard rollup rows are dropped here
+            if conn.execute(text("SELECT to_regclass('order_daily_rollup')")).scalar():
+                conn.execute(text("DELETE FROM order_daily_rollup WHERE day >= :start AND day < :end"), {
+                    "start": month, "end": add_months(month, 1)
+                })
+            _ensure_archive_table(conn)
+            conn.execute(text(
+                f"ALTER TABLE {ARCHIVE_TABLE} ATTACH PARTITION {name} "
+                f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+            ))
+        archived.append(name)
+        logger.info(f"Archived uploaded_orders partition {name}")
+    return archived
+
+
+def run_partition_maintenance(engine, today: Optional[date] = None) -> List[str]:
+    """Daily job: create the upcoming partitions, then archive the ones past retention"""
+    ensure_order_partitions(engine, today)
+    try:
+        return archive_old_partitions(engine, today=today)
+    except Exception as e:
+        logger.error(f"uploaded_orders partition archiving failed: {e}")
+        return []
+
+
+def select_archived_orders(conn, start=None, end=None, order_statuses=None, not_interfaced_only=False):
+    """Archived orders for exports, filtered like the live export queries (pruned by the date range)"""
+    if conn.execute(text("SELECT to_regclass(:name)"), {"name": ARCHIVE_TABLE}).scalar() is None:
+        return []
+    conditions = ["TRUE"]
+    params = {}
+    if start and end:
+        conditions.append('"UploadDate" >= :start AND "UploadDate" <= :end')
+        params.update(start=start, end=end)
+    if order_statuses:
+        placeholders = ", ".join(f":status_{i}" for i in range(len(order_statuses)))
+        conditions.append(f'"OrderStatus" IN ({placeholders})')
+        params.update({f"status_{i}": status for i, status in enumerate(order_statuses)})
+    if not_interfaced_only:
+        conditions.append('"InterfaceStatus" != \'Interface\'')
+    return conn.execute(
+        text(f'SELECT * FROM {ARCHIVE_TABLE} WHERE {" AND ".join(conditions)} ORDER BY "UploadDate"'), params
+    ).fetchall()
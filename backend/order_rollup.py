@@ -0,0 +1,155 @@
+"""
+order_daily_rollup table maintenance
+Order counts per (day, brand, marketplace, batch, PIC, interface status, cancelled flag), kept in sync with uploaded_orders through statement-level triggers
+"""
+import logging
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger(__name__)
+
+# pg advisory lock key: only one uvicorn worker sets up / rebuilds the rollup at a time
+ORDER_ROLLUP_LOCK_KEY = 7_311_808
+
+ROLLUP_TABLE = "order_daily_rollup"
+
+# (rollup column, expression over uploaded_orders rows). Text keys are never NULL ('' stands for NULL)
+# so they can be part of the primary key. hour and order_status are extra dimensions the dashboard
+# breaks down by (hourly evolution, order status summary).
+ROLLUP_KEYS = [
+    ("day", 'date("UploadDate")'),
+    ("brand", 'COALESCE("Brand", \'\')'),
+    ("marketplace", 'COALESCE("Marketplace", \'\')'),
+    ("batch", 'COALESCE("Batch", \'\')'),
+    ("pic", 'COALESCE("PIC", \'\')'),
+    ("interface_status", 'COALESCE("InterfaceStatus", \'\')'),
+    ("is_cancelled", 'COALESCE("IsCancelled", FALSE)'),
+    ("hour", 'EXTRACT(HOUR FROM "UploadDate")::smallint'),
+    ("order_status", 'COALESCE("OrderStatus", \'\')'),
+]
+
+_KEY_LIST = ", ".join(column for column, _expression in ROLLUP_KEYS)
+_KEY_EXPRESSIONS = ", ".join(f"{expression} AS {column}" for column, expression in ROLLUP_KEYS)
+
+CREATE_TABLE = f"""
+    CREATE TABLE IF NOT EXISTS {ROLLUP_TABLE} (
+        day DATE NOT NULL,
+        brand TEXT NOT NULL,
+        marketplace TEXT NOT NULL,
+        batch TEXT NOT NULL,
+        pic TEXT NOT NULL,
+        interface_status TEXT NOT NULL,
+        is_cancelled BOOLEAN NOT NULL,
+        hour SMALLINT NOT NULL,
+        order_status TEXT NOT NULL,
+        order_count BIGINT NOT NULL DEFAULT 0,
+        last_upload_at TIMESTAMP,
+        PRIMARY KEY ({_KEY_LIST})
+    )
+"""
+
+# +1 per row of new_rows, -1 per row of old_rows
+_ADDED = f'SELECT {_KEY_EXPRESSIONS}, 1 AS delta, "UploadDate" AS upload_date FROM new_rows WHERE "UploadDate" IS NOT NULL'
+_REMOVED = f'SELECT {_KEY_EXPRESSIONS}, -1 AS delta, NULL::timestamp AS upload_date FROM old_rows WHERE "UploadDate" IS NOT NULL'
+
+# Keys are upserted in sorted order so concurrent uploads lock rollup rows in the same order
+_APPLY_CHANGES = f"""
+    INSERT INTO {ROLLUP_TABLE} ({_KEY_LIST}, order_count, last_upload_at)
+    SELECT {_KEY_LIST}, SUM(delta), MAX(upload_date)
+    FROM ({{changes}}) changes
+    GROUP BY {_KEY_LIST}
+    HAVING SUM(delta) <> 0
+    ORDER BY {_KEY_LIST}
+    ON CONFLICT ({_KEY_LIST}) DO UPDATE SET
+        order_count = {ROLLUP_TABLE}.order_count + EXCLUDED.order_count,
+        last_upload_at = GREATEST({ROLLUP_TABLE}.last_upload_at, EXCLUDED.last_upload_at)
+"""
+
+# One function for all triggers; each trigger exposes only the transition tables its event has
+SYNC_FUNCTION = f"""
+CREATE OR REPLACE FUNCTION sync_order_daily_rollup() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'TRUNCATE' THEN
+        TRUNCATE {ROLLUP_TABLE};
+    ELSIF TG_OP = 'INSERT' THEN
+        {_APPLY_CHANGES.format(changes=_ADDED)};
+    ELSIF TG_OP = 'DELETE' THEN
+        {_APPLY_CHANGES.format(changes=_REMOVED)};
+    ELSE
+        -- Updates that touch no rollup key (remarks, Flexo order numbers) net out to zero and write nothing
+        {_APPLY_CHANGES.format(changes=f"{_ADDED} UNION ALL {_REMOVED}")};
+    END IF;
+    RETURN NULL;
+END;
+$$
+"""
+
+TRIGGER_STATEMENTS = {
+    "trg_order_rollup_insert": """
+        CREATE TRIGGER trg_order_rollup_insert AFTER INSERT ON uploaded_orders
+        REFERENCING NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION sync_order_daily_rollup()
+    """,
+    "trg_order_rollup_update": """
+        CREATE TRIGGER trg_order_rollup_update AFTER UPDATE ON uploaded_orders
+        REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION sync_order_daily_rollup()
+    """,
+    "trg_order_rollup_delete": """
+        CREATE TRIGGER trg_order_rollup_delete AFTER DELETE ON uploaded_orders
+        REFERENCING OLD TABLE AS old_rows
+        FOR EACH STATEMENT EXECUTE FUNCTION sync_order_daily_rollup()
+    """,
+    "trg_order_rollup_truncate": """
+        CREATE TRIGGER trg_order_rollup_truncate AFTER TRUNCATE ON uploaded_orders
+        FOR EACH STATEMENT EXECUTE FUNCTION sync_order_daily_rollup()
+    """,
+}
+
+
+def _fill_order_rollup(conn) -> int:
+    result = conn.execute(text(f"""
+        INSERT INTO {ROLLUP_TABLE} ({_KEY_LIST}, order_count, last_upload_at)
+        SELECT {_KEY_EXPRESSIONS}, COUNT(*), MAX("UploadDate")
+        FROM uploaded_orders
+        WHERE "UploadDate" IS NOT NULL
+        GROUP BY {", ".join(str(position) for position in range(1, len(ROLLUP_KEYS) + 1))}
+    """))
+    return result.rowcount
+
+
+def ensure_order_rollup_table(engine):
+    """Create the rollup table and its triggers on uploaded_orders (backfilled once)"""
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": ORDER_ROLLUP_LOCK_KEY})
+            created = conn.execute(text("SELECT to_regclass(:name)"), {"name": ROLLUP_TABLE}).scalar() is None
+            conn.execute(text(CREATE_TABLE))
+
+            conn.execute(text(SYNC_FUNCTION))
+            existing = {row[0] for row in conn.execute(text("""
+                SELECT tgname FROM pg_trigger
+                WHERE tgrelid = 'uploaded_orders'::regclass AND NOT tgisinternal
+            """))}
+            for name, statement in TRIGGER_STATEMENTS.items():
+                if name not in existing:
+                    conn.execute(text(statement))
+
+            # The triggers hold a lock on uploaded_orders until commit, so no write is missed
+            if created:
+                filled = _fill_order_rollup(conn)
+                print(f"✅ {ROLLUP_TABLE} table created and backfilled with {filled} rollup rows")
+    except Exception as e:
+        logger.error(f"{ROLLUP_TABLE} table setup failed: {e}")
+
+
+def rebuild_order_rollup(db: Session) -> int:
+    """Rebuild the rollup from uploaded_orders (repair tool; the triggers keep it in sync normally)"""
+    db.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": ORDER_ROLLUP_LOCK_KEY})
+    db.execute(text("LOCK TABLE uploaded_orders IN SHARE MODE"))
+    db.execute(text(f"TRUNCATE {ROLLUP_TABLE}"))
+    filled = _fill_order_rollup(db)
+    db.commit()
+    return filled
@@ -0,0 +1,148 @@
+"""
+Order status normalization
+Canonical status table behind the materialized "NormalizedOrderStatus" / "IsCancelled" columns of uploaded_orders
+"""
+import logging
+
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# pg advisory lock key: only one uvicorn worker sets up / backfills the status columns at a time
+ORDER_STATUS_LOCK_KEY = 7_311_805
+
+# Rows updated per statement when (re)computing the flags of existing orders
+STATUS_BACKFILL_BATCH_SIZE = 50000
+
+# Raw status (matched on UPPER(TRIM(...))) -> normalized status; every variant here counts as cancelled.
+# This replaces the cancelled-status lists that used to be repeated in each endpoint.
+CANCELLED_STATUS_VARIANTS = {
+    'BATAL': 'CANCELLED',
+    'CANCEL': 'CANCELLED',
+    'CANCELLATION': 'CANCELLED',
+    'CANCELLATIONS': 'CANCELLED',
+    'DIBATALKAN': 'CANCELLED',
+    'CANCELED': 'CANCELLED',
+    'CANCELLED': 'CANCELLED',
+    'PEMBATALAN DIAJUKAN': 'CANCELLED',
+    'ORDER BATAL': 'CANCELLED',
+}
+
+# The effective status is the Flexo status when there is one, otherwise the marketplace file status
+STATUS_KEY_SQL = 'UPPER(TRIM(COALESCE(NULLIF(TRIM({alias}"OrderStatusFlexo"), \'\'), {alias}"OrderStatus", \'\')))'
+
+SCHEMA_STATEMENTS = [
+    """
+    CREATE TABLE IF NOT EXISTS order_status_normalization (
+        status_key TEXT PRIMARY KEY,
+        normalized_status TEXT NOT NULL,
+        is_cancelled BOOLEAN NOT NULL DEFAULT FALSE
+    )
+    """,
+    'ALTER TABLE uploaded_orders ADD COLUMN IF NOT EXISTS "NormalizedOrderStatus" TEXT',
+    'ALTER TABLE uploaded_orders ADD COLUMN IF NOT EXISTS "IsCancelled" BOOLEAN NOT NULL DEFAULT FALSE',
+    f"""
+    CREATE OR REPLACE FUNCTION set_order_status_flags() RETURNS trigger
+    LANGUAGE plpgsql AS $$
+    DECLARE
+        v_key TEXT := {STATUS_KEY_SQL.format(alias='NEW.')};
+    BEGIN
+        SELECT n.normalized_status, n.is_cancelled
+        INTO NEW."NormalizedOrderStatus", NEW."IsCancelled"
+        FROM order_status_normalization n
+        WHERE n.status_key = v_key;
+        IF NOT FOUND THEN
+            NEW."NormalizedOrderStatus" := NULLIF(v_key, '');
+            NEW."IsCancelled" := FALSE;
+        END IF;
+        RETURN NEW;
+    END;
+    $$
+    """,
+    # Most list and dashboard queries only look at non-cancelled orders, newest first
+    """
+    CREATE INDEX IF NOT EXISTS idx_uploaded_orders_not_cancelled
+    ON uploaded_orders ("UploadDate" DESC, "Id" DESC) WHERE NOT "IsCancelled"
+    """,
+]
+
+STATUS_TRIGGER = """
+    CREATE TRIGGER trg_uploaded_orders_status_flags
+    BEFORE INSERT OR UPDATE OF "OrderStatus", "OrderStatusFlexo" ON uploaded_orders
+    FOR EACH ROW EXECUTE FUNCTION set_order_status_flags()
+"""
+
+_KEY = STATUS_KEY_SQL.format(alias='u.')
+_FLAGS_UPDATE = f"""
+    UPDATE uploaded_orders u SET
+        "NormalizedOrderStatus" = COALESCE(
+            (SELECT n.normalized_status FROM order_status_normalization n WHERE n.status_key = {_KEY}),
+            NULLIF({_KEY}, '')
+        ),
+        "IsCancelled" = COALESCE(
+            (SELECT n.is_cancelled FROM order_status_normalization n WHERE n.status_key = {_KEY}),
+            FALSE
+        )
+"""
+BACKFILL_STATEMENT = _FLAGS_UPDATE + '    WHERE u."Id" > :from_id AND u."Id" <= :to_id'
+# Orders stored while "IsCancelled" was still a nullable column without a default
+NULL_FLAGS_STATEMENT = _FLAGS_UPDATE + '    WHERE u."IsCancelled" IS NULL'
+
+
+def recompute_order_status_flags(engine) -> int:
+    """Recompute the flags of every order, in Id ranges (after the normalization table changed)"""
+    with engine.connect() as conn:
+        max_id = conn.execute(text('SELECT COALESCE(MAX("Id"), 0) FROM uploaded_orders')).scalar()
+    updated = 0
+    for from_id in range(0, max_id, STATUS_BACKFILL_BATCH_SIZE):
+        with engine.begin() as conn:
+            result = conn.execute(text(BACKFILL_STATEMENT), {
+                "from_id": from_id, "to_id": from_id + STATUS_BACKFILL_BATCH_SIZE
+            })
+            updated += result.rowcount
+    return updated
+
+
+def ensure_order_status_schema(engine):
+    """Create the normalization table, status columns and trigger; backfill when the mapping changed"""
+    try:
+        with engine.begin() as conn:
+            conn.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": ORDER_STATUS_LOCK_KEY})
+            for statement in SCHEMA_STATEMENTS:
+                conn.execute(text(statement))
+
+            seeded = 0
+            for status_key, normalized_status in CANCELLED_STATUS_VARIANTS.items():
+                seeded += conn.execute(text("""
+                    INSERT INTO order_status_normalization (status_key, normalized_status, is_cancelled)
+                    VALUES (:status_key, :normalized_status, TRUE)
+                    ON CONFLICT (status_key) DO NOTHING
+                """), {"status_key": status_key, "normalized_status": normalized_status}).rowcount
+
+            # NOT "IsCancelled" silently drops NULL rows, so fill them and enforce NOT NULL (once per database)
+            nullable = conn.execute(text("""
+                SELECT is_nullable = 'YES' FROM information_schema.columns
+                WHERE table_name = 'uploaded_orders' AND column_name = 'IsCancelled'
+            """)).scalar()
+            if nullable:
+                filled = conn.execute(text(NULL_FLAGS_STATEMENT)).rowcount
+                conn.execute(text("""
+                    ALTER TABLE uploaded_orders
+                        ALTER COLUMN "IsCancelled" SET DEFAULT FALSE,
+                        ALTER COLUMN "IsCancelled" SET NOT NULL
+                """))
+                print(f"✅ IsCancelled filled for {filled} orders and made NOT NULL")
+
+            has_trigger = conn.execute(text("""
+                SELECT 1 FROM pg_trigger
+                WHERE tgrelid = 'uploaded_orders'::regclass AND tgname = 'trg_uploaded_orders_status_flags'
+            """)).first() is not None
+            if not has_trigger:
+                conn.execute(text(STATUS_TRIGGER))
+
+        # New variants (or the first install) change the flags of existing orders
+        if seeded:
+            updated = recompute_order_status_flags(engine)
+            print(f"✅ Order status flags recomputed for {updated} orders ({seeded} new status variants)")
+    except Exception as e:
+        logger.error(f"Order status schema setup failed: {e}")
@@ -0,0 +1,238 @@
+"""
+Bulk write stage for uploaded_orders
+COPYs grouped order records into a temporary staging table and merges them with a set-based UPDATE + INSERT;
+interface-check results are written back with set-based UPDATE ... FROM (VALUES ...)
+"""
+import io
+import logging
+from datetime import datetime, date
+from typing import Any, Dict, Iterable, List, Optional
+
+from psycopg2.extras import execute_values
+from sqlalchemy.orm import Session
+
+from order_partitions import ORDER_NUMBERS_TABLE
+
+logger = logging.getLogger(__name__)
+
+# Rows written to the staging table per COPY call
+COPY_BATCH_SIZE = 10000
+
+# Columns written by an upload, in COPY order. Timestamps are staged as timestamptz so
+# naive and WIB-aware datetimes are converted exactly like psycopg2 parameters were.
+STAGING_COLUMNS = [
+    ('Marketplace', 'text'),
+    ('Brand', 'text'),
+    ('OrderNumber', 'text'),
+    ('OrderStatus', 'text'),
+    ('AWB', 'text'),
+    ('Transporter', 'text'),
+    ('OrderDate', 'timestamptz'),
+    ('SLA', 'text'),
+    ('Batch', 'text'),
+    ('PIC', 'text'),
+    ('UploadDate', 'timestamptz'),
+    ('Remarks', 'text'),
+    ('InterfaceStatus', 'text'),
+    ('TaskId', 'text'),
+    ('OrderNumberFlexo', 'text'),
+    ('OrderStatusFlexo', 'text'),
+    ('ItemId', 'text'),
+    ('ItemIdFlexo', 'text'),
+]
+
+STAGING_TABLE = "uploaded_orders_staging"
+
+
+def _quote(column: str) -> str:
+    return f'"{column}"'
+
+
+def _copy_value(value: Any) -> str:
+    """Format a value as a CSV field for COPY (unquoted \\N is NULL)"""
+    if value is None:
+        return r'\N'
+    if isinstance(value, (datetime, date)):
+        value = value.isoformat()
+    else:
+        value = str(value)
+    return '"' + value.replace('"', '""') + '"'
+
+
+def _staging_row(order: Dict[str, Any]) -> List[Any]:
+    row = []
+    for column, _ in STAGING_COLUMNS:
+        value = order.get(column)
+        if column == 'Remarks':
+            value = value or ''
+        elif column in ('OrderNumberFlexo', 'OrderStatusFlexo'):
+            value = value or ''
+        row.append(value)
+    return row
+
+
+def _copy_batch(cursor, orders: List[Dict[str, Any]]):
+    buffer = io.StringIO()
+    for order in orders:
+        buffer.write(','.join(_copy_value(value) for value in _staging_row(order)))
+        buffer.write('\n')
+    buffer.seek(0)
+
+    column_list = ', '.join(_quote(column) for column, _ in STAGING_COLUMNS)
+    cursor.copy_expert(
+        f"COPY {STAGING_TABLE} ({column_list}) FROM STDIN WITH (FORMAT csv, NULL '\\N')",
+        buffer
+    )
+
+
+# SKUs of the existing row followed by the staged SKUs it does not have yet, in first-seen order
+_MERGED_ITEM_IDS = """(
+    SELECT string_agg(sku, ',' ORDER BY position)
+    FROM (
+        SELECT sku, MIN(position) AS position
+        FROM (
+            SELECT sku, ordinality AS position
+            FROM unnest(string_to_array(NULLIF(u."ItemId", ''), ',')) WITH ORDINALITY AS existing(sku, ordinality)
+            UNION ALL
+            SELECT sku, 1000000 + ordinality
+            FROM unnest(string_to_array(NULLIF(s."ItemId", ''), ',')) WITH ORDINALITY AS added(sku, ordinality)
+        ) skus
+        GROUP BY sku
+    ) merged
+)"""
+
+
+def upsert_uploaded_orders(db: Session, orders: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+    """Write order records into uploaded_orders, replacing rows with the same OrderNumber
+
+    A record for an order that the same TaskId already wrote (an upload written batch by batch,
+    where the order shows up again on a later row) only adds its SKUs to that row.
+    Runs inside the session's current transaction; the caller commits.
+    Returns {'inserted': n, 'replaced': m, 'merged': k}.
+    """
+    orders = list(orders)
+    if not orders:
+        return {'inserted': 0, 'replaced': 0, 'merged': 0}
+
+    # Raw psycopg2 connection bound to the session transaction (COPY is not exposed by SQLAlchemy)
+    dbapi_connection = db.connection().connection
+    cursor = dbapi_connection.cursor()
+
+    try:
+        column_definitions = ', '.join(f'{_quote(column)} {sql_type}' for column, sql_type in STAGING_COLUMNS)
+        cursor.execute(f"CREATE TEMP TABLE {STAGING_TABLE} ({column_definitions}) ON COMMIT DROP")
+
+        for i in range(0, len(orders), COPY_BATCH_SIZE):
+            _copy_batch(cursor, orders[i:i + COPY_BATCH_SIZE])
+
+        column_list = ', '.join(_quote(column) for column, _ in STAGING_COLUMNS)
+        select_list = ', '.join(
+            f'{_quote(column)}::timestamp AS {_quote(column)}' if sql_type == 'timestamptz' else _quote(column)
+            for column, sql_type in STAGING_COLUMNS
+        )
+        update_list = ', '.join(
+            f'{_quote(column)} = s.{_quote(column)}'
+            for column, _ in STAGING_COLUMNS if column != 'OrderNumber'
+        )
+        # A re-uploaded order starts a fresh reconciler backoff
+        update_list += ', "InterfaceCheckAttempts" = 0, "InterfaceNextCheckAt" = NULL'
+        staged_orders = f'(SELECT DISTINCT ON ("OrderNumber") {select_list} FROM {STAGING_TABLE} ORDER BY "OrderNumber") s'
+
+        # uploaded_orders is partitioned by UploadDate, so OrderNumber cannot have a unique index there.
+        # Row-locking the order number keys (in a fixed order, so uploads cannot deadlock) serializes
+        # concurrent writers of the same order; the update/insert below then cannot create duplicates.
+        cursor.execute(f"""
+            INSERT INTO {ORDER_NUMBERS_TABLE} ("OrderNumber")
+            SELECT DISTINCT "OrderNumber" FROM {STAGING_TABLE} WHERE "OrderNumber" IS NOT NULL
+            ORDER BY "OrderNumber"
+            ON CONFLICT ("OrderNumber") DO UPDATE SET "OrderNumber" = EXCLUDED."OrderNumber"
+        """)
+
+        # Later rows of an order this upload already wrote: keep the first row's fields, add the SKUs
+        cursor.execute(f"""
+            UPDATE uploaded_orders u SET "ItemId" = {_MERGED_ITEM_IDS}
+            FROM {staged_orders}
+            WHERE u."OrderNumber" = s."OrderNumber" AND u."TaskId" = s."TaskId"
+        """)
+        merged_count = cursor.rowcount
+
+        # Replace orders of earlier uploads; a newer UploadDate moves the row into its month's partition
+        cursor.execute(f"""
+            UPDATE uploaded_orders u SET {update_list}
+            FROM {staged_orders}
+            WHERE u."OrderNumber" = s."OrderNumber" AND u."TaskId" IS DISTINCT FROM s."TaskId"
+        """)
+        replaced_count = cursor.rowcount
+
+        cursor.execute(f"""
+            INSERT INTO uploaded_orders ({column_list})
+            SELECT {column_list} FROM {staged_orders}
+            WHERE NOT EXISTS (SELECT 1 FROM uploaded_orders u WHERE u."OrderNumber" = s."OrderNumber")
+        """)
+        inserted_count = cursor.rowcount
+
+        # Drop now so a second write in the same transaction can recreate the staging table
+        cursor.execute(f"DROP TABLE IF EXISTS {STAGING_TABLE}")
+    finally:
+        cursor.close()
+
+    logger.info(f"uploaded_orders upsert: {inserted_count} inserted, {replaced_count} replaced, {merged_count} merged")
+    return {'inserted': inserted_count or 0, 'replaced': replaced_count or 0, 'merged': merged_count or 0}
+
+
+# Orders per UPDATE ... FROM (VALUES ...) statement when writing interface-check results
+INTERFACE_UPDATE_PAGE_SIZE = 1000
+
+
+def apply_interface_results(db: Session, updates: Iterable[Dict[str, Any]],
+                            task_id: Optional[str] = None,
+                            expected_status: Optional[str] = None) -> int:
+    """Write interface-check results with set-based UPDATE ... FROM (VALUES ...) statements
+
+    updates are dicts with OrderNumber, InterfaceStatus, OrderNumberFlexo, OrderStatusFlexo and
+    ItemIdFlexo. task_id / expected_status restrict the update to rows still owned by that upload
+    and still in that status. Runs inside the session's transaction; returns the rows updated.
+    """
+    rows = [
+        (
+            update['OrderNumber'],
+            update['InterfaceStatus'],
+            update.get('OrderNumberFlexo') or '',
+            update.get('OrderStatusFlexo') or '',
+            update.get('ItemIdFlexo'),
+        )
+        for update in updates
+    ]
+    if not rows:
+        return 0
+
+    cursor = db.connection().connection.cursor()
+    try:
+        conditions = ['u."OrderNumber" = v.order_number']
+        # Literals are inlined (and '%' escaped) because execute_values only fills the VALUES placeholder
+        if task_id is not None:
+            conditions.append(cursor.mogrify('u."TaskId" = %s', (task_id,)).decode().replace('%', '%%'))
+        if expected_status is not None:
+            conditions.append(cursor.mogrify('u."InterfaceStatus" = %s', (expected_status,)).decode().replace('%', '%%'))
+
+        updated = execute_values(
+            cursor,
+            f"""
+            UPDATE uploaded_orders AS u SET
+                "InterfaceStatus" = v.interface_status,
+                "OrderNumberFlexo" = v.order_number_flexo,
+                "OrderStatusFlexo" = v.order_status_flexo,
+                "ItemIdFlexo" = v.item_id_flexo
+            FROM (VALUES %s) AS v(order_number, interface_status, order_number_flexo, order_status_flexo, item_id_flexo)
+            WHERE {' AND '.join(conditions)}
+            RETURNING u."Id"
+            """,
+            rows,
+            template="(%s, %s, %s, %s, %s::text)",
+            page_size=INTERFACE_UPDATE_PAGE_SIZE,
+            fetch=True
+        )
+    finally:
+        cursor.close()
+
+    return len(updated)
@@ -0,0 +1,351 @@
+"""
+Two-tier response cache for read endpoints
+Per-process LRU with a byte budget in front of a shared tier (Redis, or an in-process stand-in), invalidated by dataset tags
+"""
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+from database_config import (
+    REDIS_URL, RESPONSE_CACHE_TTL, RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_TAG_CHECK_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+# Datasets cached entries depend on; writers invalidate the tags of the data they changed
+CACHE_TAGS = ("orders", "brand_shops", "list_brand", "dashboard", "brand_accounts")
+
+KEY_PREFIX = "sweeping:cache:"
+TAG_PREFIX = "sweeping:cache-tag:"
+
+
+def initial_tag_version() -> int:
+    """Starting version of a tag counter that does not exist (yet, or again after a Redis flush)
+
+    Versions also make up ETags, so a recreated counter starts at the current time in ms rather
+    than at 0 and never repeats a version a client may still hold.
+    """
+    return time.time_ns() // 1_000_000
+
+
+class CacheKey:
+    """Cache key bound to the tag versions seen when it was made
+
+    A result computed after the key was made is stored under these versions, so a write that
+    lands during the computation (and bumps a tag) can never leave a stale entry reachable.
+    """
+
+    __slots__ = ("key", "tags", "versions")
+
+    def __init__(self, key: str, tags: Tuple[str, ...], versions: Dict[str, int]):
+        self.key = key
+        self.tags = tags
+        self.versions = versions
+
+
+class LocalLRU:
+    """In-process LRU of serialized entries, bounded by total payload bytes"""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        # Single entries above a quarter of the budget would evict most of the cache
+        self.max_entry_bytes = max_bytes // 4
+        self._entries: "OrderedDict[str, Tuple[bytes, float, Tuple[str, ...]]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            payload, expires_at, _tags = entry
+            if expires_at <= time.monotonic():
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return payload
+
+    def set(self, key: str, payload: bytes, ttl: float, tags: Tuple[str, ...]):
+        if len(payload) > self.max_entry_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (payload, time.monotonic() + ttl, tags)
+            self._bytes += len(payload)
+            while self._bytes > self.max_bytes and self._entries:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def drop_tags(self, tags: Iterable[str]) -> int:
+        """Remove entries depending on any of the tags (they are unreachable anyway; this frees the bytes)"""
+        tags = set(tags)
+        with self._lock:
+            keys = [key for key, (_payload, _expires_at, entry_tags) in self._entries.items() if tags & set(entry_tags)]
+            for key in keys:
+                self._remove(key)
+            return len(keys)
+
+    def _remove(self, key: str):
+        payload, _expires_at, _tags = self._entries.pop(key)
+        self._bytes -= len(payload)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "evictions": self.evictions,
+            }
+
+
+class MemorySharedTier:
+    """In-process stand-in for the shared tier (tests, single-process development)"""
+
+    name = "memory"
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[bytes, float]] = {}
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= time.monotonic():
+                del self._values[key]
+                return None
+            return entry[0]
+
+    def set(self, key: str, payload: bytes, ttl: float):
+        with self._lock:
+            self._values[key] = (payload, time.monotonic() + ttl)
+
+    def get_versions(self, tags: List[str]) -> Optional[Dict[str, int]]:
+        with self._lock:
+            return {tag: self._versions.setdefault(tag, initial_tag_version()) for tag in tags}
+
+    def bump_versions(self, tags: List[str]) -> Optional[Dict[str, int]]:
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, initial_tag_version()) + 1
+            return {tag: self._versions[tag] for tag in tags}
+
+
+class RedisSharedTier:
+    """Shared tier on Redis: values with a TTL, one INCR counter per tag"""
+
+    name = "redis"
+
+    # After a failure Redis is skipped for this long, so an outage does not add a timeout to every request
+    RETRY_AFTER_SECONDS = 30
+
+    def __init__(self, url: str):
+        import redis
+        self._errors = (redis.RedisError, OSError)
+        self._client = redis.Redis.from_url(url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        self._down_until = 0.0
+        self.errors = 0
+
+    def _available(self) -> bool:
+        return time.monotonic() >= self._down_until
+
+    def _failed(self, operation: str, error: Exception):
+        # Lookups are misses (and writes local only) until Redis is retried
+        self.errors += 1
+        self._down_until = time.monotonic() + self.RETRY_AFTER_SECONDS
+        logger.warning(f"Response cache Redis {operation} failed, retrying in {self.RETRY_AFTER_SECONDS}s: {error}")
+
+    def get(self, key: str) -> Optional[bytes]:
+        if not self._available():
+            return None
+        try:
+            return self._client.get(KEY_PREFIX + key)
+        except self._errors as e:
+            self._failed("get", e)
+            return None
+
+    def set(self, key: str, payload: bytes, ttl: float):
+        if not self._available():
+            return
+        try:
+            self._client.set(KEY_PREFIX + key, payload, ex=max(1, int(ttl)))
+        except self._errors as e:
+            self._failed("set", e)
+
+    def get_versions(self, tags: List[str]) -> Optional[Dict[str, int]]:
+        if not self._available():
+            return None
+        try:
+            values = self._client.mget([TAG_PREFIX + tag for tag in tags])
+            missing = [tag for tag, value in zip(tags, values) if value is None]
+            if missing:
+                pipeline = self._client.pipeline(transaction=False)
+                for tag in missing:
+                    pipeline.set(TAG_PREFIX + tag, initial_tag_version(), nx=True)
+                pipeline.execute()
+                values = self._client.mget([TAG_PREFIX + tag for tag in tags])
+        except self._errors as e:
+            self._failed("get_versions", e)
+            return None
+        return {tag: int(value or 0) for tag, value in zip(tags, values)}
+
+    def bump_versions(self, tags: List[str]) -> Optional[Dict[str, int]]:
+        # Tried even while marked down: a lost invalidation would keep other workers stale
+        try:
+            pipeline = self._client.pipeline(transaction=False)
+            for tag in tags:
+                pipeline.set(TAG_PREFIX + tag, initial_tag_version(), nx=True)
+                pipeline.incr(TAG_PREFIX + tag)
+            # Replies alternate SET NX / INCR; the INCR replies are the new versions
+            return dict(zip(tags, (int(value) for value in pipeline.execute()[1::2])))
+        except self._errors as e:
+            self._failed("bump_versions", e)
+            return None
+
+
+class ResponseCache:
+    """Get/set JSON-able results by key and dataset tags; invalidate(tag) makes every entry of that tag unreachable
+
+    Entries are stored under a key that includes the current version of each of their tags, so an
+    invalidation is one counter increment per tag, shared by every worker through the shared tier.
+    """
+
+    def __init__(self, shared_tier, max_bytes: int = RESPONSE_CACHE_MAX_BYTES,
+                 ttl: float = RESPONSE_CACHE_TTL, tag_check_seconds: float = RESPONSE_CACHE_TAG_CHECK_SECONDS):
+        self.shared = shared_tier
+        self.local = LocalLRU(max_bytes)
+        self.ttl = ttl
+        self.tag_check_seconds = tag_check_seconds
+        self._versions: Dict[str, int] = {}
+        self._versions_checked_at: Dict[str, float] = {}
+        # Invalidations the shared tier missed (it was unreachable); replayed once it answers again
+        self._pending_bumps: set = set()
+        self._lock = threading.Lock()
+        self._counters = {"local_hits": 0, "shared_hits": 0, "misses": 0, "sets": 0, "invalidations": 0}
+
+    def _count(self, counter: str):
+        with self._lock:
+            self._counters[counter] += 1
+
+    def tag_versions(self, tags: Iterable[str]) -> Dict[str, int]:
+        """Current version of each tag (re-read from the shared tier at most every tag_check_seconds)"""
+        tags = list(tags)
+        now = time.monotonic()
+        with self._lock:
+            stale = [tag for tag in tags if now - self._versions_checked_at.get(tag, float("-inf")) >= self.tag_check_seconds]
+        if stale:
+            with self._lock:
+                pending = list(self._pending_bumps)
+            if pending and self.shared.bump_versions(pending) is not None:
+                with self._lock:
+                    self._pending_bumps.difference_update(pending)
+            fresh = self.shared.get_versions(stale)
+            with self._lock:
+                for tag in stale:
+                    if fresh is not None:
+                        self._versions[tag] = fresh[tag]  # the shared tier is authoritative
+                    elif tag not in self._versions:
+                        self._versions[tag] = initial_tag_version()
+                    self._versions_checked_at[tag] = now
+        with self._lock:
+            return {tag: self._versions[tag] for tag in tags}
+
+    def key(self, namespace: str, *parts: Any, tags: Iterable[str]) -> CacheKey:
+        """Key for a result of namespace(*parts) that depends on the given dataset tags"""
+        tags = tuple(sorted(set(tags)))
+        versions = self.tag_versions(tags)
+        raw = "|".join([namespace, *(str(part) for part in parts), *(f"{tag}={versions[tag]}" for tag in tags)])
+        return CacheKey(f"{namespace}:{hashlib.md5(raw.encode()).hexdigest()}", tags, versions)
+
+    def get(self, cache_key: CacheKey) -> Optional[Any]:
+        payload = self.local.get(cache_key.key)
+        if payload is not None:
+            self._count("local_hits")
+            return json.loads(payload)
+        payload = self.shared.get(cache_key.key)
+        if payload is not None:
+            self._count("shared_hits")
+            self.local.set(cache_key.key, payload, self.ttl, cache_key.tags)
+            return json.loads(payload)
+        self._count("misses")
+        return None
+
+    @staticmethod
+    def encode(value: Any) -> bytes:
+        # Serialized the way FastAPI would encode the response, so a hit returns the same JSON
+        return json.dumps(jsonable_encoder(value), separators=(",", ":")).encode()
+
+    def set(self, cache_key: CacheKey, value: Any, ttl: Optional[float] = None):
+        self.set_payload(cache_key, self.encode(value), ttl)
+
+    def set_payload(self, cache_key: CacheKey, payload: bytes, ttl: Optional[float] = None):
+        ttl = ttl or self.ttl
+        self.local.set(cache_key.key, payload, ttl, cache_key.tags)
+        self.shared.set(cache_key.key, payload, ttl)
+        self._count("sets")
+
+    def invalidate(self, *tags: str):
+        """Call after committing a write to the datasets behind these tags"""
+        unknown = set(tags) - set(CACHE_TAGS)
+        if unknown:
+            raise ValueError(f"Unknown cache tags: {', '.join(sorted(unknown))}")
+        bumped = self.shared.bump_versions(list(tags))
+        now = time.monotonic()
+        with self._lock:
+            for tag in tags:
+                if bumped is not None:
+                    self._versions[tag] = bumped[tag]
+                else:
+                    # Without the shared tier this process still stops serving its own stale entries; a
+                    # time-based version cannot collide with the shared counter once it is back
+                    self._versions[tag] = max(initial_tag_version(), self._versions.get(tag, 0) + 1)
+                    self._pending_bumps.add(tag)
+                self._versions_checked_at[tag] = now
+            self._counters["invalidations"] += 1
+        self.local.drop_tags(tags)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            versions = dict(self._versions)
+        lookups = counters["local_hits"] + counters["shared_hits"] + counters["misses"]
+        hits = counters["local_hits"] + counters["shared_hits"]
+        return {
+            "shared_tier": self.shared.name,
+            "shared_errors": getattr(self.shared, "errors", 0),
+            **counters,
+            "hit_rate": round(hits / lookups * 100, 2) if lookups else 0.0,
+            "tag_versions": versions,
+            "local": self.local.get_stats(),
+        }
+
+
+def create_shared_tier():
+    """Redis when REDIS_URL is set and the client is installed, otherwise the in-process stand-in"""
+    if REDIS_URL:
+        try:
+            return RedisSharedTier(REDIS_URL)
+        except ImportError:
+            logger.warning("redis package not installed - response cache uses the in-process shared tier")
+    return MemorySharedTier()
+
+
+# Global instance
+response_cache = ResponseCache(create_shared_tier())
@@ -0,0 +1,119 @@
+"""
+Single-flight execution of expensive read endpoints
+Concurrent identical requests share one computation; after an invalidation the previous result is served while one request recomputes it
+"""
+import json
+import hashlib
+import logging
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, Optional
+
+from database_config import (
+    SINGLE_FLIGHT_STALE_SECONDS, SINGLE_FLIGHT_STALE_MAX_BYTES, SINGLE_FLIGHT_REFRESH_WORKERS
+)
+from db_registry import db_registry
+from response_cache import CacheKey, LocalLRU, ResponseCache, response_cache
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ("hits", "stale_hits", "misses", "coalesced", "refreshes", "errors")
+
+
+class SingleFlight:
+    """Fresh results come from the response cache; misses are computed once per process and key
+
+    A computation is keyed by the tag versions seen when it started, so requests arriving after an
+    invalidation never join a computation that may have read the old data.
+    """
+
+    def __init__(self, cache: ResponseCache, stale_seconds: float = SINGLE_FLIGHT_STALE_SECONDS,
+                 stale_max_bytes: int = SINGLE_FLIGHT_STALE_MAX_BYTES,
+                 refresh_workers: int = SINGLE_FLIGHT_REFRESH_WORKERS):
+        self.cache = cache
+        self.stale_seconds = stale_seconds
+        # Last result per request, whatever the tag versions; survives invalidations until stale_seconds
+        self.stale = LocalLRU(stale_max_bytes)
+        self.refresh_executor = ThreadPoolExecutor(max_workers=refresh_workers, thread_name_prefix="single-flight")
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, Future] = {}
+        self._counters: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, namespace: str, counter: str):
+        with self._lock:
+            counters = self._counters.setdefault(namespace, dict.fromkeys(COUNTERS, 0))
+            counters[counter] += 1
+
+    def run(self, namespace: str, params: Dict[str, Any], tags: Iterable[str], compute: Callable[[Any], Any],
+            session_factory: Optional[Callable[[], Any]] = None,
+            cacheable: Callable[[Any], bool] = lambda result: True) -> Any:
+        """Result of compute(db) for these params: cached, shared with an identical running request, or computed
+
+        params should already be normalized (equal requests give equal params). compute gets its own
+        session from session_factory (the reporting pool by default), since it may run after the request
+        that started it has finished.
+        """
+        parts = [f"{name}={params[name]}" for name in sorted(params)]
+        cache_key = self.cache.key(namespace, *parts, tags=tags)
+        cached = self.cache.get(cache_key)
+        if cached is not None:
+            self._count(namespace, "hits")
+            return cached
+
+        call = (namespace, cache_key, compute, session_factory or db_registry.session_factory("reporting"), cacheable)
+        stale_key = f"{namespace}:{hashlib.md5('|'.join(parts).encode()).hexdigest()}"
+        stale = self.stale.get(stale_key)
+        if stale is not None:
+            self._count(namespace, "stale_hits")
+            flight, leader = self._join(cache_key)
+            if leader:
+                self._count(namespace, "refreshes")
+                self.refresh_executor.submit(self._compute, flight, stale_key, *call)
+            return json.loads(stale)
+
+        flight, leader = self._join(cache_key)
+        if not leader:
+            self._count(namespace, "coalesced")
+            return flight.result()
+        self._count(namespace, "misses")
+        self._compute(flight, stale_key, *call)
+        return flight.result()
+
+    def _join(self, cache_key: CacheKey):
+        """(future of the computation for this key, True when the caller has to run it)"""
+        with self._lock:
+            flight = self._in_flight.get(cache_key.key)
+            if flight is not None:
+                return flight, False
+            flight = self._in_flight[cache_key.key] = Future()
+            return flight, True
+
+    def _compute(self, flight: Future, stale_key: str, namespace: str, cache_key: CacheKey,
+                 compute: Callable[[Any], Any], session_factory: Callable[[], Any], cacheable: Callable[[Any], bool]):
+        db = session_factory()
+        try:
+            result = compute(db)
+            if cacheable(result):
+                payload = self.cache.encode(result)
+                self.cache.set_payload(cache_key, payload)
+                self.stale.set(stale_key, payload, self.stale_seconds, cache_key.tags)
+            flight.set_result(result)
+        except BaseException as e:
+            self._count(namespace, "errors")
+            logger.warning(f"Single-flight computation of {namespace} failed: {e}")
+            db.rollback()
+            flight.set_exception(e)
+        finally:
+            db.close()
+            with self._lock:
+                self._in_flight.pop(cache_key.key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = {namespace: dict(values) for namespace, values in self._counters.items()}
+            in_flight = len(self._in_flight)
+        return {"in_flight": in_flight, "stale": self.stale.get_stats(), "endpoints": counters}
+
+
+# Global instance
+single_flight = SingleFlight(response_cache)
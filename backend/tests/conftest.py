@@ -0,0 +1,13 @@
+"""
+Shared pytest setup for the backend tests
+Backend modules are imported by name (as main.py does), so the backend directory goes on sys.path
+"""
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+# monitoring.py opens logs/app.log relative to the working directory at import
+os.makedirs("logs", exist_ok=True)
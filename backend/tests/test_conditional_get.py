@@ -0,0 +1,19 @@
+import pytest
+
+from conditional_get import etag_matches
+
+ETAG = 'W/"0123abcd"'
+
+
+@pytest.mark.parametrize("if_none_match, expected", [
+    ("", False),
+    (None, False),
+    ('W/"0123abcd"', True),
+    ('"0123abcd"', True),
+    ('W/"other"', False),
+    ('W/"other", W/"0123abcd"', True),
+    ('W/"other",W/"0123abcd"', True),
+    ("*", True),
+])
+def test_etag_matches(if_none_match, expected):
+    assert etag_matches(if_none_match, ETAG) is expected
@@ -0,0 +1,61 @@
+import pytest
+
+import interface_status_cache as cache_module
+from interface_status_cache import InterfaceStatusCache
+
+INTERFACE = {"status": "Interface", "system_ref_id": "SO-1"}
+NOT_YET = {"status": "Not Yet Interface", "system_ref_id": None}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(cache_module.time, "monotonic", lambda: now[0])
+    return now
+
+
+def test_positive_results_outlive_negative_ones(clock):
+    cache = InterfaceStatusCache(max_entries=100, positive_ttl=3600, negative_ttl=60)
+    cache.put_many("Shopee", {"A": INTERFACE, "B": NOT_YET})
+
+    clock[0] += 59
+    cached, missing = cache.get_many("shopee", ["A", "B"])
+    assert cached == {"A": INTERFACE, "B": NOT_YET}
+    assert missing == []
+
+    clock[0] += 2
+    cached, missing = cache.get_many("shopee", ["A", "B"])
+    assert cached == {"A": INTERFACE}
+    assert missing == ["B"]
+    assert cache.get_stats()["expired"] == 1
+
+    clock[0] += 3600
+    cached, missing = cache.get_many("shopee", ["A"])
+    assert cached == {}
+    assert missing == ["A"]
+
+
+def test_zero_ttl_disables_caching_of_that_kind(clock):
+    cache = InterfaceStatusCache(max_entries=100, positive_ttl=3600, negative_ttl=0)
+    cache.put_many("lazada", {"A": INTERFACE, "B": NOT_YET})
+    assert cache.get_stats()["entries"] == 1
+    _cached, missing = cache.get_many("lazada", ["A", "B"])
+    assert missing == ["B"]
+
+
+def test_cached_results_are_copies(clock):
+    cache = InterfaceStatusCache(max_entries=100, positive_ttl=3600, negative_ttl=60)
+    cache.put_many("tiktok", {"A": dict(INTERFACE)})
+    cached, _missing = cache.get_many("tiktok", ["A"])
+    cached["A"]["status"] = "changed"
+    assert cache.get_many("tiktok", ["A"])[0]["A"]["status"] == "Interface"
+
+
+def test_oldest_entries_are_evicted(clock):
+    cache = InterfaceStatusCache(max_entries=2, positive_ttl=3600, negative_ttl=60)
+    cache.put_many("shopee", {"A": INTERFACE, "B": INTERFACE})
+    cache.get_many("shopee", ["A"])
+    cache.put_many("shopee", {"C": INTERFACE})
+    _cached, missing = cache.get_many("shopee", ["A", "B", "C"])
+    assert missing == ["B"]
+    assert cache.get_stats()["evictions"] == 1
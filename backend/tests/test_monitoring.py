@@ -0,0 +1,42 @@
+import pytest
+
+from monitoring import LATENCY_BUCKETS, LatencyHistogram
+
+
+def test_empty_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.percentile(0.5) == 0.0
+    assert histogram.cumulative_counts()[-1] == ("+Inf", 0)
+
+
+def test_percentiles_fall_in_the_bucket_of_the_exact_value():
+    histogram = LatencyHistogram()
+    samples = [i / 1000 for i in range(1, 2001)]  # uniform over (0, 2] seconds
+    for seconds in samples:
+        histogram.observe(seconds)
+
+    for p in (0.5, 0.95, 0.99):
+        exact = samples[int(p * len(samples)) - 1]
+        upper = next(bound for bound in LATENCY_BUCKETS if bound >= exact)
+        lower = max((bound for bound in LATENCY_BUCKETS if bound < exact), default=0.0)
+        assert lower <= histogram.percentile(p) <= upper
+
+
+def test_percentile_never_exceeds_the_largest_observation():
+    histogram = LatencyHistogram()
+    for _ in range(10):
+        histogram.observe(0.2)
+    assert histogram.percentile(0.99) == pytest.approx(0.2)
+
+    histogram.observe(500.0)  # beyond the last bucket
+    assert histogram.percentile(1.0) == 500.0
+
+
+def test_cumulative_counts():
+    histogram = LatencyHistogram(buckets=(0.1, 1.0))
+    for seconds in (0.05, 0.1, 0.5, 3.0):
+        histogram.observe(seconds)
+    assert histogram.cumulative_counts() == [("0.1", 2), ("1.0", 3), ("+Inf", 4)]
+    assert histogram.count == 4
+    assert histogram.total == pytest.approx(3.65)
+    assert histogram.max == 3.0
@@ -0,0 +1,34 @@
+import base64
+import json
+from datetime import datetime
+
+import pytest
+from fastapi import HTTPException
+
+from order_cursor import encode_order_cursor, decode_order_cursor
+
+
+def test_cursor_round_trip():
+    upload_date = datetime(2026, 10, 16, 8, 30, 15, 123456)
+    assert decode_order_cursor(encode_order_cursor(upload_date, 42)) == (upload_date, 42)
+
+
+def test_cursor_without_upload_date():
+    assert decode_order_cursor(encode_order_cursor(None, 7)) == (None, 7)
+
+
+def test_cursor_is_url_safe_and_unpadded():
+    cursor = encode_order_cursor(datetime(2026, 1, 1), 1)
+    assert not set(cursor) & set("=+/")
+
+
+@pytest.mark.parametrize("cursor", [
+    "",
+    "not-a-cursor",
+    base64.urlsafe_b64encode(json.dumps({"u": None}).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps({"u": "yesterday", "i": 1}).encode()).decode(),
+])
+def test_invalid_cursor_is_rejected_with_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_order_cursor(cursor)
+    assert error.value.status_code == 400
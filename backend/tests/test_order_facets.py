@@ -0,0 +1,36 @@
+from datetime import date
+
+import pytest
+
+from order_facets import as_day, normalize_filter_list, split_filter_list
+
+
+def test_split_filter_list_trims_and_skips_empty_values():
+    assert split_filter_list(" Shopee, Lazada ,,  ") == ["Shopee", "Lazada"]
+    assert split_filter_list(None) == []
+
+
+@pytest.mark.parametrize("value, expected", [
+    (None, None),
+    ("", None),
+    (" , ,", None),
+    ("Shopee", "Shopee"),
+    ("Tokopedia, Shopee ,Shopee", "Shopee,Tokopedia"),
+])
+def test_normalize_filter_list(value, expected):
+    assert normalize_filter_list(value) == expected
+
+
+def test_equal_filters_normalize_to_the_same_key():
+    assert normalize_filter_list("b,a") == normalize_filter_list(" a , b, a")
+
+
+@pytest.mark.parametrize("value", [
+    "2026-10-16",
+    " 2026-10-16 ",
+    "2026-10-16T23:59:59",
+    "2026-10-16T08:00:00Z",
+    "2026-10-16 00:00:00.000",
+])
+def test_as_day(value):
+    assert as_day(value) == date(2026, 10, 16)
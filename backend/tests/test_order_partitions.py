@@ -0,0 +1,26 @@
+from datetime import date
+
+import pytest
+
+from order_partitions import add_months, month_start, partition_name
+
+
+@pytest.mark.parametrize("month, months, expected", [
+    (date(2026, 10, 1), 0, date(2026, 10, 1)),
+    (date(2026, 10, 1), 1, date(2026, 11, 1)),
+    (date(2026, 10, 1), 3, date(2027, 1, 1)),
+    (date(2026, 12, 1), 1, date(2027, 1, 1)),
+    (date(2026, 1, 1), -1, date(2025, 12, 1)),
+    (date(2026, 3, 1), -14, date(2025, 1, 1)),
+    (date(2026, 10, 1), 24, date(2028, 10, 1)),
+])
+def test_add_months(month, months, expected):
+    assert add_months(month, months) == expected
+
+
+def test_add_months_from_mid_month_day():
+    assert add_months(month_start(date(2026, 1, 31)), 1) == date(2026, 2, 1)
+
+
+def test_partition_name():
+    assert partition_name(date(2026, 2, 1)).endswith("202602")
@@ -0,0 +1,124 @@
+import time
+
+import pytest
+
+from response_cache import LocalLRU, MemorySharedTier, ResponseCache
+
+
+class FlakySharedTier(MemorySharedTier):
+    """Memory tier that can be switched off like an unreachable Redis"""
+
+    def __init__(self):
+        super().__init__()
+        self.down = False
+
+    def get(self, key):
+        return None if self.down else super().get(key)
+
+    def set(self, key, payload, ttl):
+        if not self.down:
+            super().set(key, payload, ttl)
+
+    def get_versions(self, tags):
+        return None if self.down else super().get_versions(tags)
+
+    def bump_versions(self, tags):
+        return None if self.down else super().bump_versions(tags)
+
+
+def test_local_lru_get_set_and_expiry():
+    lru = LocalLRU(max_bytes=1000)
+    lru.set("a", b"payload", ttl=60, tags=("orders",))
+    assert lru.get("a") == b"payload"
+    assert lru.get("missing") is None
+
+    lru.set("b", b"payload", ttl=0, tags=("orders",))
+    assert lru.get("b") is None
+
+
+def test_local_lru_evicts_least_recently_used_over_budget():
+    lru = LocalLRU(max_bytes=100)
+    for key in "abcde":
+        lru.set(key, b"x" * 20, ttl=60, tags=())
+    lru.get("a")
+    lru.set("f", b"x" * 20, ttl=60, tags=())
+
+    assert lru.get("b") is None
+    assert all(lru.get(key) is not None for key in "acdef")
+    assert lru.get_stats()["bytes"] == 100
+    assert lru.get_stats()["evictions"] == 1
+
+
+def test_local_lru_skips_entries_above_a_quarter_of_the_budget():
+    lru = LocalLRU(max_bytes=100)
+    lru.set("big", b"x" * 26, ttl=60, tags=())
+    assert lru.get("big") is None
+
+
+def test_local_lru_drop_tags():
+    lru = LocalLRU(max_bytes=1000)
+    lru.set("orders", b"1", ttl=60, tags=("orders", "dashboard"))
+    lru.set("brands", b"2", ttl=60, tags=("list_brand",))
+    assert lru.drop_tags(["dashboard"]) == 1
+    assert lru.get("orders") is None
+    assert lru.get("brands") == b"2"
+
+
+def test_response_cache_hit_after_set():
+    cache = ResponseCache(MemorySharedTier())
+    key = cache.key("orders", "user", 1, tags=("orders",))
+    assert cache.get(key) is None
+    cache.set(key, {"rows": [1, 2]})
+    assert cache.get(cache.key("orders", "user", 1, tags=("orders",))) == {"rows": [1, 2]}
+
+
+def test_invalidate_only_affects_entries_with_that_tag():
+    cache = ResponseCache(MemorySharedTier())
+    orders_key = cache.key("orders", "user", tags=("orders",))
+    brands_key = cache.key("list_brand", tags=("list_brand",))
+    cache.set(orders_key, "orders")
+    cache.set(brands_key, "brands")
+
+    cache.invalidate("orders")
+
+    new_orders_key = cache.key("orders", "user", tags=("orders",))
+    assert new_orders_key.key != orders_key.key
+    assert cache.get(new_orders_key) is None
+    assert cache.get(cache.key("list_brand", tags=("list_brand",))) == "brands"
+
+
+def test_invalidation_is_seen_by_other_processes_through_the_shared_tier():
+    shared = MemorySharedTier()
+    worker_a = ResponseCache(shared, tag_check_seconds=0)
+    worker_b = ResponseCache(shared, tag_check_seconds=0)
+    worker_a.set(worker_a.key("orders", tags=("orders",)), "old")
+    assert worker_b.get(worker_b.key("orders", tags=("orders",))) == "old"
+
+    worker_a.invalidate("orders")
+
+    assert worker_b.get(worker_b.key("orders", tags=("orders",))) is None
+
+
+def test_unknown_tag_is_rejected():
+    cache = ResponseCache(MemorySharedTier())
+    with pytest.raises(ValueError):
+        cache.invalidate("no_such_dataset")
+
+
+def test_invalidation_while_shared_tier_is_down_is_replayed():
+    shared = FlakySharedTier()
+    writer = ResponseCache(shared, tag_check_seconds=0)
+    reader = ResponseCache(shared, tag_check_seconds=0)
+    writer.set(writer.key("brand_shops", tags=("brand_shops",)), "old")
+    before = writer.tag_versions(["brand_shops"])["brand_shops"]
+
+    shared.down = True
+    writer.invalidate("brand_shops")
+    # The writer stops serving its own entry at once
+    assert writer.tag_versions(["brand_shops"])["brand_shops"] != before
+    assert writer.get(writer.key("brand_shops", tags=("brand_shops",))) is None
+
+    shared.down = False
+    time.sleep(0.001)
+    writer.tag_versions(["brand_shops"])  # replays the missed bump
+    assert reader.get(reader.key("brand_shops", tags=("brand_shops",))) is None
@@ -0,0 +1,133 @@
+import threading
+import time
+
+import pytest
+
+from response_cache import MemorySharedTier, ResponseCache
+from single_flight import SingleFlight
+
+
+class FakeSession:
+    def __init__(self):
+        self.rolled_back = False
+        self.closed = False
+
+    def rollback(self):
+        self.rolled_back = True
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def cache():
+    return ResponseCache(MemorySharedTier())
+
+
+@pytest.fixture
+def flight(cache):
+    single_flight = SingleFlight(cache, stale_seconds=60, stale_max_bytes=1024 * 1024, refresh_workers=1)
+    yield single_flight
+    single_flight.refresh_executor.shutdown(wait=True)
+
+
+def counters(single_flight, namespace="stats"):
+    return single_flight.get_stats()["endpoints"].get(namespace, {})
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not reached in time"
+        time.sleep(0.005)
+
+
+def test_concurrent_identical_requests_share_one_computation(flight):
+    release = threading.Event()
+    calls = []
+
+    def compute(db):
+        calls.append(db)
+        release.wait(5)
+        return {"total": 10}
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(
+            flight.run("stats", {"day": "2026-10-16"}, ("orders",), compute, session_factory=FakeSession)
+        ))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    wait_until(lambda: counters(flight).get("coalesced") == 4)
+    release.set()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(calls) == 1
+    assert results == [{"total": 10}] * 5
+    assert calls[0].closed
+
+
+def test_second_request_is_a_cache_hit(flight):
+    calls = []
+
+    def compute(db):
+        calls.append(1)
+        return [1, 2, 3]
+
+    assert flight.run("stats", {"a": 1}, ("orders",), compute, session_factory=FakeSession) == [1, 2, 3]
+    assert flight.run("stats", {"a": 1}, ("orders",), compute, session_factory=FakeSession) == [1, 2, 3]
+    assert flight.run("stats", {"a": 2}, ("orders",), compute, session_factory=FakeSession) == [1, 2, 3]
+    assert len(calls) == 2
+    assert counters(flight)["hits"] == 1
+
+
+def test_invalidated_result_is_served_stale_while_it_is_recomputed(cache, flight):
+    values = iter(["old", "new"])
+
+    def compute(db):
+        return next(values)
+
+    assert flight.run("stats", {}, ("orders",), compute, session_factory=FakeSession) == "old"
+    cache.invalidate("orders")
+
+    assert flight.run("stats", {}, ("orders",), compute, session_factory=FakeSession) == "old"
+    wait_until(lambda: flight.get_stats()["in_flight"] == 0)
+    assert flight.run("stats", {}, ("orders",), compute, session_factory=FakeSession) == "new"
+    assert counters(flight)["stale_hits"] == 1
+    assert counters(flight)["refreshes"] == 1
+
+
+def test_failed_computation_is_raised_and_not_cached(flight):
+    sessions = []
+
+    def session_factory():
+        sessions.append(FakeSession())
+        return sessions[-1]
+
+    def compute(db):
+        raise RuntimeError("database unavailable")
+
+    for _ in range(2):
+        with pytest.raises(RuntimeError):
+            flight.run("stats", {}, ("orders",), compute, session_factory=session_factory)
+
+    assert len(sessions) == 2
+    assert all(session.rolled_back and session.closed for session in sessions)
+    assert counters(flight)["errors"] == 2
+    assert flight.get_stats()["in_flight"] == 0
+
+
+def test_uncacheable_results_are_recomputed(flight):
+    calls = []
+
+    def compute(db):
+        calls.append(1)
+        return {"success": False}
+
+    for _ in range(2):
+        flight.run("stats", {}, ("orders",), compute, session_factory=FakeSession,
+                   cacheable=lambda result: result["success"])
+    assert len(calls) == 2
@@ -0,0 +1,179 @@
+from datetime import datetime
+
+import pytest
+
+from upload_ingest import StreamingOrderReader, get_adaptive_chunk_size, prefetch_batches
+
+NOW = datetime(2026, 5, 1, 12, 0)
+MAPPING = {
+    'order_number': 'Order No',
+    'order_status': 'Status',
+    'order_date': 'Created',
+    'awb': 'AWB',
+    'sku_field': 'SKU',
+}
+HEADER = 'Order No,Status,Created,AWB,SKU,Buyer Note'
+
+
+def make_reader(*rows, header=HEADER, mapping=MAPPING, **kwargs):
+    content = '\n'.join((header,) + rows) + '\n'
+    return StreamingOrderReader(
+        content.encode('utf-8'), 'orders.csv', mapping,
+        base_record={'Marketplace': 'SHOPEE', 'TaskId': 'task-1'},
+        current_time=NOW, **kwargs
+    )
+
+
+def read_all(reader):
+    return [record for batch in reader.iter_batches() for record in batch]
+
+
+@pytest.mark.parametrize("order_count, expected", [
+    (0, 100),
+    (499, 100),
+    (500, 200),
+    (1999, 200),
+    (2000, 500),
+    (9999, 500),
+    (10000, 1000),
+    (250000, 1000),
+])
+def test_get_adaptive_chunk_size(order_count, expected):
+    assert get_adaptive_chunk_size(order_count) == expected
+
+
+def test_reader_keeps_only_mapped_columns():
+    reader = make_reader('A1,READY,03/04/2026,AWB1,SKU-1,leave at door')
+
+    assert reader.open() == ['Order No', 'Status', 'Created', 'AWB', 'SKU', 'Buyer Note']
+    [record] = read_all(reader)
+
+    assert record['OrderNumber'] == 'A1'
+    assert record['OrderStatus'] == 'READY'
+    assert record['AWB'] == 'AWB1'
+    assert record['ItemId'] == 'SKU-1'
+    assert 'leave at door' not in record.values()
+    assert 'Buyer Note' not in record
+
+
+def test_missing_columns_lists_required_mapped_columns():
+    reader = make_reader('A1,READY', header='Order No,Status')
+    reader.open()
+
+    assert reader.missing_columns() == ['Created', 'AWB']
+
+
+def test_rows_of_one_order_merge_their_skus():
+    reader = make_reader(
+        'A1,READY,03/04/2026,AWB1,SKU-1,',
+        'A1,CANCELLED,04/04/2026,AWB9,SKU-2,',
+        'A1,READY,03/04/2026,AWB1,SKU-1,',
+        'B2,READY,03/04/2026,AWB2,,',
+    )
+
+    records = read_all(reader)
+
+    assert [r['OrderNumber'] for r in records] == ['A1', 'B2']
+    # First row's fields, every row's SKUs (without duplicates)
+    assert records[0]['OrderStatus'] == 'READY'
+    assert records[0]['AWB'] == 'AWB1'
+    assert records[0]['ItemId'] == 'SKU-1,SKU-2'
+    assert records[1]['ItemId'] is None
+    assert reader.rows_read == 4
+
+
+def test_order_repeated_after_its_batch_comes_out_again():
+    reader = make_reader(
+        'A1,READY,03/04/2026,AWB1,SKU-1,',
+        'B2,READY,03/04/2026,AWB2,SKU-2,',
+        'A1,READY,03/04/2026,AWB1,SKU-3,',
+        batch_size=2,
+    )
+
+    batches = list(reader.iter_batches())
+
+    assert [[r['OrderNumber'] for r in batch] for batch in batches] == [['A1', 'B2'], ['A1']]
+    # The writer merges the later SKUs into the row written for the same TaskId
+    assert batches[1][0]['ItemId'] == 'SKU-3'
+    assert batches[1][0]['TaskId'] == 'task-1'
+
+
+def test_rows_without_order_number_are_counted():
+    reader = make_reader(
+        ',READY,03/04/2026,AWB1,SKU-1,',
+        '   ,READY,03/04/2026,AWB2,SKU-2,',
+        'A1,READY,03/04/2026,AWB3,SKU-3,',
+    )
+
+    records = read_all(reader)
+
+    assert [r['OrderNumber'] for r in records] == ['A1']
+    assert reader.empty_order_rows == 2
+    assert reader.rows_read == 3
+
+
+def test_order_dates_are_parsed_dayfirst():
+    default_date = datetime(2026, 1, 1)
+    reader = make_reader(
+        'A1,READY,03/04/2026 08:30,AWB1,,',
+        'B2,READY,,AWB2,,',
+        'C3,READY,not a date,AWB3,,',
+        default_order_date=default_date,
+    )
+
+    dates = {r['OrderNumber']: r['OrderDate'] for r in read_all(reader)}
+
+    assert dates['A1'] == datetime(2026, 4, 3, 8, 30)
+    assert dates['B2'] == default_date
+    assert dates['C3'] == NOW
+
+
+def test_convert_date_is_applied_to_parsed_dates():
+    reader = make_reader('A1,READY,03/04/2026,AWB1,,', convert_date=lambda dt: dt.replace(hour=7))
+
+    [record] = read_all(reader)
+
+    assert record['OrderDate'] == datetime(2026, 4, 3, 7, 0)
+
+
+def test_base_record_fields_are_on_every_record():
+    reader = make_reader(
+        'A1,READY,03/04/2026,AWB1,,',
+        'B2,READY,03/04/2026,AWB2,,',
+        'C3,READY,03/04/2026,AWB3,,',
+        batch_size=2,
+    )
+
+    records = read_all(reader)
+
+    assert len(records) == 3
+    assert all(r['Marketplace'] == 'SHOPEE' and r['TaskId'] == 'task-1' for r in records)
+    # Each record gets its own copy of the base fields
+    records[0]['Marketplace'] = 'LAZADA'
+    assert records[1]['Marketplace'] == 'SHOPEE'
+
+
+def test_unsupported_file_format():
+    reader = StreamingOrderReader(b'', 'orders.txt', MAPPING, base_record={}, current_time=NOW)
+
+    with pytest.raises(ValueError):
+        reader.open()
+
+
+def test_prefetch_batches_keeps_order():
+    batches = [[{'n': i}] for i in range(10)]
+
+    assert list(prefetch_batches(iter(batches), depth=2)) == batches
+
+
+def test_prefetch_batches_reraises_reader_errors():
+    def failing():
+        yield [1]
+        raise ValueError("bad row")
+
+    consumed = []
+    with pytest.raises(ValueError, match="bad row"):
+        for batch in prefetch_batches(failing()):
+            consumed.append(batch)
+
+    assert consumed == [[1]]
@@ -0,0 +1,270 @@
+"""
+Streaming upload ingestion for SweepingApps
+Reads marketplace XLSX/CSV exports row by row and turns them into batches of order records
+"""
+import csv
+import io
+import queue
+import threading
+import logging
+from datetime import datetime
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+import pandas as pd
+from openpyxl import load_workbook
+
+logger = logging.getLogger(__name__)
+
+# Orders handed to the next stage per batch
+DEFAULT_BATCH_SIZE = 1000
+# Batches parsed ahead of the consumer (bounds memory while parsing overlaps the write)
+PREFETCH_BATCHES = 2
+
+# Mapping keys that are read from the file; everything else is skipped while parsing
+MAPPED_FIELDS = ('order_number', 'order_status', 'order_date', 'awb', 'transporter', 'sla', 'sku_field')
+REQUIRED_FIELDS = ('order_number', 'order_status', 'order_date', 'awb')
+
+
+def _cell_text(value) -> str:
+    """Normalize a cell value to the text stored in uploaded_orders"""
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        if value != value:  # NaN
+            return ''
+        if value.is_integer():
+            return str(int(value))
+    return str(value)
+
+
+def get_adaptive_chunk_size(order_count: int) -> int:
+    """External lookup chunk size for the number of orders being checked"""
+    if order_count < 500:
+        return 100
+    elif order_count < 2000:
+        return 200
+    elif order_count < 10000:
+        return 500
+    return 1000  # Large uploads: bigger chunks for efficiency
+
+
+class StreamingOrderReader:
+    """Stream grouped order records out of an upload without loading the whole sheet
+
+    Only the current batch is held in memory. An order seen again after its batch was yielded
+    comes out once more in a later batch; the writer merges its SKUs into the row already
+    written for the same TaskId (see order_writer.upsert_uploaded_orders).
+    """
+
+    def __init__(self, source, filename: str, marketplace_mapping: Dict[str, Any],
+                 base_record: Dict[str, Any], current_time: datetime,
+                 default_order_date: Optional[datetime] = None,
+                 convert_date: Optional[Callable] = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE):
+        self.source = source
+        self.filename = filename
+        self.mapping = marketplace_mapping
+        self.base_record = base_record
+        self.current_time = current_time
+        self.default_order_date = default_order_date or current_time
+        self.convert_date = convert_date or (lambda dt: dt)
+        self.batch_size = batch_size
+
+        self.header: List[str] = []
+        self.estimated_rows: Optional[int] = None
+        self.rows_read = 0
+        self.empty_order_rows = 0
+        # Orders of the batch being built (reset after every yield)
+        self._orders: Dict[str, Dict[str, Any]] = {}
+        self._skus: Dict[str, List[str]] = {}
+        self._rows: Optional[Iterator] = None
+        self._workbook = None
+        self._column_index: Dict[str, int] = {}
+
+    def _open_source(self):
+        if isinstance(self.source, (bytes, bytearray)):
+            return io.BytesIO(self.source)
+        if isinstance(self.source, str):
+            return open(self.source, 'rb')
+        return self.source
+
+    def open(self) -> List[str]:
+        """Open the file and read the header row, returning the available column names"""
+        fileobj = self._open_source()
+        lower_name = self.filename.lower()
+
+        if lower_name.endswith('.xlsx'):
+            # read_only mode streams rows from the sheet XML instead of building the full workbook
+            self._workbook = load_workbook(fileobj, read_only=True, data_only=True)
+            worksheet = self._workbook.worksheets[0]
+            if worksheet.max_row:
+                self.estimated_rows = max(worksheet.max_row - 1, 0)
+            rows = worksheet.iter_rows(values_only=True)
+        elif lower_name.endswith('.csv'):
+            text_stream = io.TextIOWrapper(fileobj, encoding='utf-8-sig', newline='')
+            rows = csv.reader(text_stream)
+        else:
+            raise ValueError("Unsupported file format")
+
+        try:
+            header_row = next(rows)
+        except StopIteration:
+            header_row = ()
+
+        self.header = [
+            _cell_text(name) if name is not None else f"Unnamed: {position}"
+            for position, name in enumerate(header_row)
+        ]
+        self._rows = rows
+
+        # Only the columns named in the marketplace mapping are kept per row
+        for field in MAPPED_FIELDS:
+            column_name = self.mapping.get(field)
+            if column_name and column_name in self.header:
+                self._column_index[field] = self.header.index(column_name)
+
+        return self.header
+
+    def missing_columns(self) -> List[str]:
+        """Required mapped columns that are not present in the header"""
+        return [
+            self.mapping[field] for field in REQUIRED_FIELDS
+            if self.mapping.get(field) and field not in self._column_index
+        ]
+
+    def _value(self, row, field: str):
+        position = self._column_index.get(field)
+        if position is None or position >= len(row):
+            return None
+        return row[position]
+
+    def _resolve_dates(self, pending: List[Dict[str, Any]], raw_dates: List[Any]):
+        """Convert the first-row order dates of a batch in one vectorized pass"""
+        text_positions = [i for i, raw in enumerate(raw_dates)
+                          if raw not in (None, '') and not isinstance(raw, datetime)]
+        parsed_text = {}
+        if text_positions:
+            parsed = pd.to_datetime(
+                pd.Series([str(raw_dates[i]) for i in text_positions]),
+                dayfirst=True,
+                errors='coerce'
+            )
+            parsed_text = dict(zip(text_positions, parsed))
+
+        for i, record in enumerate(pending):
+            raw = raw_dates[i]
+            if raw in (None, ''):
+                record['OrderDate'] = self.default_order_date
+                continue
+            value = raw if isinstance(raw, datetime) else parsed_text.get(i)
+            if value is None or pd.isna(value):
+                record['OrderDate'] = self.current_time
+                continue
+            if isinstance(value, pd.Timestamp):
+                value = value.to_pydatetime()
+            record['OrderDate'] = self.convert_date(value)
+
+    def iter_batches(self) -> Iterator[List[Dict[str, Any]]]:
+        """Yield lists of order records, batch_size at a time
+
+        Rows are grouped by OrderNumber within a batch (first row's fields, every row's SKUs).
+        """
+        if self._rows is None:
+            self.open()
+
+        pending: List[Dict[str, Any]] = []
+        raw_dates: List[Any] = []
+        has_sku = 'sku_field' in self._column_index
+
+        try:
+            for row in self._rows:
+                self.rows_read += 1
+                order_number = _cell_text(self._value(row, 'order_number')).strip()
+                if not order_number or order_number == 'nan':
+                    self.empty_order_rows += 1
+                    continue
+
+                sku = _cell_text(self._value(row, 'sku_field')).strip() if has_sku else ''
+                record = self._orders.get(order_number)
+
+                if record is None:
+                    record = dict(self.base_record)
+                    record.update({
+                        'OrderNumber': order_number,
+                        'OrderStatus': _cell_text(self._value(row, 'order_status')),
+                        'AWB': _cell_text(self._value(row, 'awb')),
+                        'Transporter': _cell_text(self._value(row, 'transporter')),
+                        'SLA': _cell_text(self._value(row, 'sla')),
+                        'ItemId': None,
+                    })
+                    self._orders[order_number] = record
+                    self._skus[order_number] = []
+                    pending.append(record)
+                    raw_dates.append(self._value(row, 'order_date'))
+
+                if sku and sku != 'nan':
+                    skus = self._skus[order_number]
+                    if sku not in skus:
+                        skus.append(sku)
+                        record['ItemId'] = ','.join(skus)
+
+                if len(pending) >= self.batch_size:
+                    self._resolve_dates(pending, raw_dates)
+                    self._orders, self._skus = {}, {}
+                    yield pending
+                    pending, raw_dates = [], []
+
+            if pending:
+                self._resolve_dates(pending, raw_dates)
+                yield pending
+        finally:
+            self.close()
+
+    def close(self):
+        if self._workbook is not None:
+            try:
+                self._workbook.close()
+            except Exception as e:
+                logger.warning(f"Error closing workbook {self.filename}: {e}")
+            self._workbook = None
+
+
+def prefetch_batches(batches: Iterator[List[Dict[str, Any]]],
+                     depth: int = PREFETCH_BATCHES) -> Iterator[List[Dict[str, Any]]]:
+    """Run a batch iterator in a background thread so parsing overlaps the consumer's work"""
+    buffer: queue.Queue = queue.Queue(maxsize=depth)
+    stop_event = threading.Event()
+    end_marker = object()
+
+    def put(item) -> bool:
+        while not stop_event.is_set():
+            try:
+                buffer.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for batch in batches:
+                if not put(batch):
+                    return
+            put(end_marker)
+        except BaseException as e:
+            put(e)
+
+    producer = threading.Thread(target=produce, name="upload-ingest-reader", daemon=True)
+    producer.start()
+
+    try:
+        while True:
+            item = buffer.get()
+            if item is end_marker:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+    finally:
+        stop_event.set()
+        producer.join(timeout=5)
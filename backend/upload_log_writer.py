@@ -0,0 +1,97 @@
+"""
+Buffered upload log persistence
+Upload log lines are queued in memory and written to upload_task_logs in multi-row INSERTs by a background thread
+"""
+import logging
+import threading
+from datetime import datetime
+from typing import Any, Dict, List
+
+from sqlalchemy import column, insert, table
+
+from database_config import UPLOAD_LOG_FLUSH_INTERVAL, UPLOAD_LOG_FLUSH_BATCH_SIZE, UPLOAD_LOG_MAX_PENDING
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_TASK_LOGS = table(
+    "upload_task_logs",
+    column("task_id"), column("level"), column("message"), column("created_at")
+)
+
+
+class UploadLogWriter:
+    """Queue of log lines flushed every flush_interval seconds, or as soon as batch_size lines are waiting
+
+    Lines keep their order: one flush runs at a time and a failed flush puts its lines back in
+    front of the queue. While the database is unreachable at most max_pending lines are kept.
+    """
+
+    def __init__(self, engine, flush_interval: float = UPLOAD_LOG_FLUSH_INTERVAL,
+                 batch_size: int = UPLOAD_LOG_FLUSH_BATCH_SIZE, max_pending: int = UPLOAD_LOG_MAX_PENDING):
+        self.engine = engine
+        self.flush_interval = flush_interval
+        self.batch_size = max(1, batch_size)
+        self.max_pending = max(self.batch_size, max_pending)
+        self._pending: List[Dict[str, Any]] = []
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake_event = threading.Event()
+        self._thread = None
+        self.written = 0
+        self.dropped = 0
+        self.failed_flushes = 0
+
+    def add(self, task_id: str, level: str, message: str, created_at: datetime):
+        """Queue one log line; never touches the database in the caller's thread"""
+        with self._lock:
+            self._pending.append({"task_id": task_id, "level": level, "message": message, "created_at": created_at})
+            self._trim()
+            full = len(self._pending) >= self.batch_size
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="upload-log-writer", daemon=True)
+                self._thread.start()
+        if full:
+            self._wake_event.set()
+
+    def _trim(self):
+        overflow = len(self._pending) - self.max_pending
+        if overflow > 0:
+            # The oldest lines go first; they are still in the in-process log of their task
+            del self._pending[:overflow]
+            self.dropped += overflow
+
+    def flush(self) -> int:
+        """Write every queued line now (end of an upload stage, shutdown); returns the lines written"""
+        with self._flush_lock:
+            with self._lock:
+                rows, self._pending = self._pending, []
+            if not rows:
+                return 0
+            try:
+                with self.engine.begin() as conn:
+                    conn.execute(insert(UPLOAD_TASK_LOGS), rows)
+            except Exception as e:
+                with self._lock:
+                    self._pending[:0] = rows
+                    self._trim()
+                    self.failed_flushes += 1
+                logger.warning(f"Could not persist {len(rows)} upload log lines: {str(e)}")
+                return 0
+            with self._lock:
+                self.written += len(rows)
+            return len(rows)
+
+    def _run(self):
+        while True:
+            self._wake_event.wait(self.flush_interval)
+            self._wake_event.clear()
+            self.flush()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "pending": len(self._pending),
+                "written": self.written,
+                "dropped": self.dropped,
+                "failed_flushes": self.failed_flushes,
+            }
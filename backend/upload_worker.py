@@ -0,0 +1,76 @@
+"""
+Dedicated upload queue worker for SweepingApps
+Runs queued uploads from upload_tasks outside the API processes: python upload_worker.py [--processes N]
+"""
+import os
+import sys
+import time
+import signal
+import socket
+import argparse
+import threading
+import multiprocessing
+
+from database_config import UPLOAD_WORKER_PROCESSES
+
+# Seconds to wait before restarting a worker process that exited unexpectedly
+RESTART_DELAY = 5
+
+
+def run_worker_process(index: int):
+    """Entry point of one worker process"""
+    # Imported here so every process builds its own engine and connection pools
+    from main import run_upload_queue_worker
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop_event.set())
+    signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+
+    worker_id = f"{socket.gethostname()}-{os.getpid()}-w{index}"
+    run_upload_queue_worker(worker_id, stop_event)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process queued SweepingApps uploads")
+    parser.add_argument("--processes", type=int, default=UPLOAD_WORKER_PROCESSES,
+                        help="Number of worker processes (default: UPLOAD_WORKER_PROCESSES)")
+    args = parser.parse_args()
+
+    stopping = threading.Event()
+    processes = {}
+
+    def start(index: int):
+        process = multiprocessing.Process(target=run_worker_process, args=(index,), name=f"upload-worker-{index}")
+        process.start()
+        processes[index] = process
+        print(f"🚀 Started upload worker {index} (pid {process.pid})")
+
+    def shutdown(*_):
+        stopping.set()
+        for process in processes.values():
+            if process.is_alive():
+                process.terminate()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+
+    for index in range(max(1, args.processes)):
+        start(index)
+
+    # Supervise: a crashed process is replaced; its task is re-queued once its heartbeat goes stale
+    while not stopping.is_set():
+        for index, process in list(processes.items()):
+            if not process.is_alive() and not stopping.is_set():
+                print(f"⚠️ Upload worker {index} exited with code {process.exitcode}, restarting")
+                time.sleep(RESTART_DELAY)
+                start(index)
+        stopping.wait(1)
+
+    for process in processes.values():
+        process.join(timeout=60)
+    print("🛑 Upload workers stopped")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
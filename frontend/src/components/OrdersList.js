@@ -533,18 +533,24 @@ const OrdersList = () => {
           console.log(`🔄 Trying chunked approach for ${field}...`);
           let allOrders = [];
           let page = 1;
+          let cursor = null;
           let hasMore = true;
           
           while (hasMore && page <= 10) { // Limit to 10 pages to avoid infinite loop
+            // Keyset pages without a total count stay fast however deep the range is
             const chunkResponse = await api.get('/api/orders/list', { 
               params: { 
-                page: page, 
+                pagination_mode: 'cursor',
+                count_mode: 'none',
+                cursor: cursor || undefined,
                 page_size: 5000 
               } 
             });
             
             if (chunkResponse.data && chunkResponse.data.orders && chunkResponse.data.orders.length > 0) {
               allOrders = [...allOrders, ...chunkResponse.data.orders];
+              cursor = chunkResponse.data.pagination.next_cursor;
+              hasMore = Boolean(cursor);
               page++;
             } else {
               hasMore = false;
@@ -884,6 +884,16 @@ const UploadNew = () => {
                       </Tag>
                     </div>
                     
+                    {taskStatus.status === 'pending' && taskStatus.queue_position && (
+                      <div style={{ display: 'flex', justifyContent: 'space-between' }}>
+                        <Text>Queue:</Text>
+                        <Text strong>
+                          #{taskStatus.queue_position} of {taskStatus.queue_length}
+                          {taskStatus.estimated_wait_seconds > 0 && ` (~${Math.ceil(taskStatus.estimated_wait_seconds / 60)} min)`}
+                        </Text>
+                      </div>
+                    )}
+                    
                     {taskStatus.total_orders && (
                       <div style={{ display: 'flex', justifyContent: 'space-between' }}>
                         <Text>Orders:</Text>
@@ -905,6 +915,13 @@ const UploadNew = () => {
                       </div>
                     )}
                     
+                    {taskStatus.pending_check_count > 0 && (
+                      <div style={{ display: 'flex', justifyContent: 'space-between' }}>
+                        <Text>Pending Check:</Text>
+                        <Text strong style={{ color: '#faad14' }}>{taskStatus.pending_check_count}</Text>
+                      </div>
+                    )}
+                    
                     {taskStatus.processing_time && (
                       <div style={{ display: 'flex', justifyContent: 'space-between' }}>
                         <Text>Time:</Text>